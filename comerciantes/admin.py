@@ -1,7 +1,7 @@
 # backend/comerciantes/admin.py
 
 from django.contrib import admin
-from .models import Business, Offer # Importa también Offer
+from .models import ArchivedOffer, Business, Offer # Importa también Offer
 
 
 # Personaliza la administración del modelo Business
@@ -45,7 +45,8 @@ class BusinessAdmin(admin.ModelAdmin):
             'fields': ('user', 'name', 'what_they_sell', 'hours')
         }),
         ('Ubicación y Contacto', {
-            'fields': ('municipality', 'street_address', 'location_type', 'contact_phone')
+            'fields': ('municipality', 'street_address', 'latitude', 'longitude', 'location_is_approximate',
+                       'location_type', 'contact_phone')
         }),
         ('Redes Sociales e Imagen', {
             'fields': ('social_media_facebook_username', 'social_media_instagram_username', 'social_media_twitter_username', 'image_url')
@@ -65,7 +66,8 @@ class BusinessAdmin(admin.ModelAdmin):
     )
     
     # Campos que se mostrarán pero no se podrán editar
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'location_is_approximate')
 
 # Mantiene el registro del modelo Offer como lo tenías
-admin.site.register(Offer)
\ No newline at end of file
+admin.site.register(Offer)
+admin.site.register(ArchivedOffer)
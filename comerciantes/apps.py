@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ComerciantesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'comerciantes'
+
+    def ready(self):
+        # Registra los receivers de signals (índice de búsqueda, etc.)
+        from . import signals  # noqa: F401
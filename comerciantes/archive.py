@@ -0,0 +1,113 @@
+# comerciantes/archive.py
+"""
+Archivado de ofertas: separa las ofertas vivas (tabla de Offer) de las que ya no se
+muestran (tabla de ArchivedOffer).
+
+Se archivan las ofertas activas que vencieron hace más de OFFER_ARCHIVE_AFTER_DAYS
+días y las inactivas que no cambian desde hace ese tiempo. Cada lote se copia a
+ArchivedOffer y se borra de Offer en una sola transacción, con INSERT y DELETE por
+lote (sin signals por oferta); sus entradas del índice de búsqueda pasan, también por
+lote, al tipo ARCHIVED_OFFER, que las búsquedas públicas no consultan. Ninguna de
+estas ofertas aparece en los listados públicos, así que la caché de listados no cambia.
+
+`manage.py archive_offers` recorre los lotes con una pausa configurable entre ellos.
+"""
+
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import search
+from .models import ArchivedOffer, Offer
+
+# Columnas que se copian de Offer a ArchivedOffer (las mismas en ambos modelos).
+COPIED_FIELDS = [f.attname for f in Offer._meta.concrete_fields]
+
+
+@dataclass
+class ArchiveStats:
+    archived: int = 0
+    batches: int = 0
+    elapsed: float = 0.0
+    # Segundos de cada lote (sin contar las pausas).
+    batch_times: list = field(default_factory=list)
+
+    @property
+    def rows_per_second(self):
+        return self.archived / self.elapsed if self.elapsed else 0.0
+
+
+def archivable_querysets(now=None):
+    """
+    Ofertas por archivar, en dos consultas que usan índices parciales distintos:
+    activas vencidas (offer_live_end_date_idx) e inactivas sin cambios (offer_inactive_idx).
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=settings.OFFER_ARCHIVE_AFTER_DAYS)
+    return [
+        Offer.objects.filter(is_active=True, end_date__lt=cutoff.date()),
+        Offer.objects.filter(is_active=False, updated_at__lt=cutoff),
+    ]
+
+
+def count_archivable(now=None):
+    return sum(queryset.count() for queryset in archivable_querysets(now))
+
+
+def archive_batch(queryset, batch_size, now=None):
+    """Archiva hasta `batch_size` ofertas de `queryset`. Devuelve cuántas se archivaron."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        queryset = queryset.order_by('pk')
+        if connection.features.has_select_for_update_skip_locked:
+            # Las filas bloqueadas (p. ej. una oferta que su dueño edita) quedan para el siguiente lote.
+            queryset = queryset.select_for_update(skip_locked=True)
+        rows = list(queryset.values(*COPIED_FIELDS)[:batch_size])
+        if not rows:
+            return 0
+        ArchivedOffer.objects.bulk_create(
+            [ArchivedOffer(archived_at=now, **row) for row in rows],
+            batch_size=batch_size,
+        )
+        ids = [row['id'] for row in rows]
+        # _raw_delete: un DELETE ... WHERE id IN (...) sin cargar las ofertas ni mandar
+        # post_delete por cada una (Offer no tiene relaciones que dependan de ella).
+        Offer.objects.filter(pk__in=ids)._raw_delete(Offer.objects.db)
+        search.archive_offers(ids)
+    return len(rows)
+
+
+def archive_offers(batch_size=None, pause=None, max_rows=None, on_batch=None):
+    """
+    Archiva por lotes todas las ofertas archivables (o hasta `max_rows`), con `pause`
+    segundos entre lotes para no saturar la base de datos. Devuelve ArchiveStats.
+    """
+    batch_size = batch_size or settings.OFFER_ARCHIVE_BATCH_SIZE
+    pause = settings.OFFER_ARCHIVE_PAUSE if pause is None else pause
+    stats = ArchiveStats()
+    started = time.perf_counter()
+    now = timezone.now()
+
+    for queryset in archivable_querysets(now):
+        while max_rows is None or stats.archived < max_rows:
+            limit = batch_size if max_rows is None else min(batch_size, max_rows - stats.archived)
+            batch_started = time.perf_counter()
+            archived = archive_batch(queryset, limit, now)
+            if not archived:
+                break
+            stats.archived += archived
+            stats.batches += 1
+            stats.batch_times.append(time.perf_counter() - batch_started)
+            if on_batch is not None:
+                on_batch(stats)
+            if archived < limit:
+                break
+            if pause:
+                time.sleep(pause)
+
+    stats.elapsed = time.perf_counter() - started
+    return stats
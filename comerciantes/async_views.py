@@ -0,0 +1,204 @@
+# comerciantes/async_views.py
+"""
+Variantes async (ASGI) de las lecturas más frecuentes: listado y detalle de negocios
+y de ofertas, y my_business.
+
+Reutilizan los ViewSets de comerciantes/views.py para todo lo que no toca la base de
+datos (permisos, get_queryset, filtros, paginación, serializers y manejo de errores) y
+evalúan las consultas con la API async del ORM. La verificación del token de Firebase
+no bloquea el event loop (FirebaseAuthentication.aauthenticate), así que una petición
+que espera a Firebase ya no ocupa un worker completo.
+
+Se montan en las mismas URLs cuando ASYNC_READ_VIEWS está activo (por defecto al
+arrancar con asgi.py). Los demás métodos (POST, PUT, PATCH, DELETE, OPTIONS) se
+delegan a la vista síncrona del ViewSet.
+
+Django ejecuta cada consulta async en el hilo de la petición, con su propia conexión
+a la base de datos. Para que mil peticiones concurrentes no abran mil conexiones, la
+parte que usa el ORM se limita a ASYNC_DB_CONCURRENCY peticiones por proceso y la
+conexión se cierra al terminar.
+"""
+
+import asyncio
+import contextlib
+import logging
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.response import Response
+
+from mercadolocalmx_backend.authentication import FirebaseAuthentication
+
+from . import cache as list_cache
+
+# Crea una instancia de logger para este módulo
+logger = logging.getLogger(__name__)
+
+# Un semáforo por event loop (asyncio.Semaphore no puede compartirse entre loops).
+_db_semaphores = weakref.WeakKeyDictionary()
+
+
+def _close_connection():
+    # `connection` se resuelve en el hilo que ejecuta la función, no en el del event loop.
+    connection.close()
+
+
+@contextlib.asynccontextmanager
+async def database_slot():
+    """Limita las peticiones que usan el ORM a la vez y cierra su conexión al salir."""
+    loop = asyncio.get_running_loop()
+    semaphore = _db_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _db_semaphores[loop] = asyncio.Semaphore(settings.ASYNC_DB_CONCURRENCY)
+    async with semaphore:
+        try:
+            yield
+        finally:
+            # Se ejecuta en el hilo de la petición, el mismo que abrió la conexión.
+            await sync_to_async(_close_connection)()
+
+
+class AsyncReadView(View):
+    """
+    Vista async para una acción de lectura de un ViewSet:
+
+        AsyncReadView.as_view(viewset_class=OfferViewSet, basename='offer', action='list',
+                              write_actions={'post': 'create'})
+
+    `basename` debe ser el mismo que el del router (forma parte de las claves de caché).
+    """
+    viewset_class = None
+    basename = None
+    action = None
+    write_actions = {}
+    # Vista síncrona del ViewSet para los métodos que no son de lectura (la crea as_view).
+    sync_view = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        viewset_class = initkwargs.get('viewset_class', cls.viewset_class)
+        actions = {'get': initkwargs.get('action', cls.action), **initkwargs.get('write_actions', cls.write_actions)}
+        initkwargs['sync_view'] = viewset_class.as_view(actions, basename=initkwargs.get('basename', cls.basename))
+        # Igual que las vistas de DRF: la autenticación no usa cookies de sesión para escribir.
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+        return await self.get(request, *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        viewset = self.viewset_class(basename=self.basename, action_map={'get': self.action, 'head': self.action})
+        viewset.args, viewset.kwargs = args, kwargs
+        viewset.format_kwarg = None
+        viewset.headers = viewset.default_response_headers
+        # initialize_request también fija viewset.action según el método.
+        request = viewset.initialize_request(request, *args, **kwargs)
+        viewset.request = request
+
+        try:
+            await self._authenticate(request)
+            request.accepted_renderer, request.accepted_media_type = viewset.perform_content_negotiation(request)
+            viewset.check_permissions(request)
+            viewset.check_throttles(request)
+            async with database_slot():
+                response = await getattr(self, self.action)(viewset, request, *args, **kwargs)
+        except Exception as exc:
+            response = viewset.handle_exception(exc)
+
+        response = viewset.finalize_response(request, response, *args, **kwargs)
+        if getattr(response, 'accepted_renderer', None) is not None and response.accepted_renderer.format == 'json':
+            # JSON se renderiza aquí mismo; otros renderers (la API navegable) pueden
+            # consultar la base de datos y los renderiza Django en un hilo.
+            response.render()
+        return response
+
+    async def _authenticate(self, request):
+        """Equivalente async de Request._authenticate con los autenticadores del ViewSet."""
+        try:
+            for authenticator in request.authenticators:
+                if isinstance(authenticator, FirebaseAuthentication):
+                    user_auth = await authenticator.aauthenticate(request)
+                elif isinstance(authenticator, SessionAuthentication):
+                    # En GET no se exige CSRF: basta con el usuario de la sesión.
+                    user = await request._request.auser()
+                    user_auth = (user, None) if user and user.is_active else None
+                else:
+                    user_auth = await sync_to_async(authenticator.authenticate)(request)
+                if user_auth is not None:
+                    request._authenticator = authenticator
+                    request.user, request.auth = user_auth
+                    return
+        except exceptions.APIException:
+            request._not_authenticated()
+            raise
+        request._not_authenticated()
+
+    # --- Acciones ---
+
+    async def list(self, viewset, request, *args, **kwargs):
+        # Los filtros pueden consultar la base de datos (la búsqueda decide si ordena por
+        # relevancia contando entradas del índice): se aplican fuera del event loop.
+        queryset = await sync_to_async(viewset.filter_queryset)(viewset.get_queryset())
+        if viewset._list_cacheable(request):
+            return await self._cached_list(viewset, request, queryset)
+
+        etag, _ = await viewset._avalidators(request, queryset)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = await self._list_response(viewset, request, queryset)
+            if response.status_code != 200:
+                return response
+        return viewset._set_validators(response, etag, None)
+
+    async def _cached_list(self, viewset, request, queryset):
+        # Mismo comportamiento que CachedListMixin.list (y las mismas claves y entradas,
+        # con su ETag: la consulta agregada solo se ejecuta al construir la entrada).
+        params, municipality = viewset._list_cache_params(request)
+        key = await list_cache.abuild_key(viewset.basename, params, municipality)
+        built = {}
+
+        async def build():
+            # El ETag antes que el listado, como en CachedListMixin.list.
+            etag, _ = await viewset._avalidators(request, queryset)
+            response = await self._list_response(viewset, request, queryset)
+            built['response'] = response
+            if response.status_code != 200:
+                return None
+            return {'data': response.data, 'etag': etag}
+
+        entry, hit = await list_cache.aget_or_build(key, build)
+        return viewset._cached_list_response(request, entry, hit, built.get('response'))
+
+    async def _list_response(self, viewset, request, queryset):
+        page = await viewset.paginator.apaginate_queryset(queryset, request, view=viewset)
+        if page is not None:
+            return viewset.get_paginated_response(viewset.get_serializer(page, many=True).data)
+        return Response(viewset.get_serializer([obj async for obj in queryset], many=True).data)
+
+    async def retrieve(self, viewset, request, *args, **kwargs):
+        queryset = await sync_to_async(viewset._lookup_queryset)(kwargs)
+        etag, last_modified = await viewset._avalidators(request, queryset)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            instance = await queryset.afirst()
+            if instance is None:
+                raise Http404
+            viewset.check_object_permissions(request, instance)
+            response = Response(viewset.get_serializer(instance).data)
+        return viewset._set_validators(response, etag, last_modified)
+
+    async def my_business(self, viewset, request, *args, **kwargs):
+        user_business = await viewset.get_queryset().afirst()
+        if user_business is None:
+            return Response({"detail": "No se encontró ningún negocio para este usuario."},
+                            status=status.HTTP_404_NOT_FOUND)
+        return Response(viewset.get_serializer(user_business).data)
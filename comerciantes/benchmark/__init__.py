@@ -0,0 +1,14 @@
+# comerciantes/benchmark/__init__.py
+"""
+Benchmark de la API de negocios y ofertas.
+
+- data.py genera un catálogo sintético de Guanajuato (de 1k a 1M ofertas) con las
+  opciones reales de los modelos y una distribución sesgada como la del tráfico real:
+  León, Irapuato y Celaya concentran la mayoría de los negocios.
+- driver.py reproduce en el mismo proceso una mezcla de listados, búsquedas, detalles,
+  my_offers y ediciones contra las vistas de DRF (middleware incluido), con Firebase y
+  Stripe simulados, y reporta req/s, latencias p50/p95/p99 y consultas por petición.
+  Los resultados se guardan como línea base (JSON) para comparar cambios posteriores.
+
+Se usan con `manage.py benchmark_seed` y `manage.py benchmark_api`.
+"""
@@ -0,0 +1,286 @@
+# comerciantes/benchmark/data.py
+"""
+Catálogo sintético para el benchmark.
+
+Los negocios usan los códigos reales de MUNICIPALITY_CHOICES, BUSINESS_TYPE_CHOICES y
+LOCATION_TYPE_CHOICES. El municipio se elige en proporción aproximada a la población
+(censo 2020), así que León, Irapuato y Celaya reúnen casi la mitad del catálogo, y las
+ofertas por negocio siguen una distribución de Pareto: la mayoría tiene pocas y unos
+cuantos negocios tienen cientos. Hay dueños sin suscripción activa, ofertas inactivas
+y ofertas vencidas, como en producción.
+
+Todo se inserta con bulk_create en lotes de `batch_size` ofertas, cada lote en su
+transacción y con su índice de búsqueda, así que la memoria no depende del tamaño del
+catálogo. Los usuarios sintéticos tienen el prefijo PREFIX en username y uid, y clear()
+los borra junto con sus negocios, ofertas y entradas del índice.
+"""
+
+import random
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from usuarios.cache import invalidate_users
+
+from .. import cache as list_cache
+from .. import facets, geo, search
+from ..models import (
+    BUSINESS_TYPE_CHOICES, LOCATION_TYPE_CHOICES, MUNICIPALITY_CHOICES, ArchivedOffer, Business, Offer,
+    SearchEntry,
+)
+
+User = get_user_model()
+
+PREFIX = 'bench-data-'
+SHOPPER_PREFIX = f'{PREFIX}shopper-'
+
+# Habitantes (miles, censo 2020, aproximado). Los municipios que no aparecen pesan DEFAULT_MUNICIPALITY_WEIGHT.
+MUNICIPALITY_WEIGHTS = {
+    'LEON': 1721, 'IRAPUATO': 593, 'CELAYA': 521, 'SALAMANCA': 274, 'SILAO': 204,
+    'GUANAJUATO': 194, 'ALLENDE': 174, 'DOLORES_HIDALGO': 163, 'PENJAMO': 151,
+    'VALLE_DE_SANTIAGO': 151, 'SAN_FRANCISCO_DEL_RINCON': 127, 'SAN_LUIS_DE_LA_PAZ': 121,
+    'SAN_FELIPE': 119, 'ACAMBARO': 113, 'SALVATIERRA': 97, 'CORTAZAR': 95,
+    'APASEO_EL_GRANDE': 92, 'ABASOLO': 92, 'SAN_JOSE_ITURBIDE': 85, 'COMONFORT': 82,
+    'SANTA_CRUZ_DE_JUVENTINO_ROSAS': 82, 'PURISIMA_DEL_RINCON': 80, 'YURIRIA': 70,
+    'APASEO_EL_ALTO': 68, 'URIANGATO': 62, 'ROMITA': 60, 'VILLAGRAN': 58, 'MOROLEON': 50,
+}
+DEFAULT_MUNICIPALITY_WEIGHT = 25
+
+# Giros más comunes en mercados y calles del estado; el resto pesa 1.
+BUSINESS_TYPE_WEIGHTS = {
+    'ABARROTES': 8, 'ROPA_MAYOREO_MENUDEO': 7, 'CALZADO': 6, 'ZAPATERIAS': 4, 'TAQUERIAS_ANTOJITOS': 6,
+    'FONDAS_COCINAS': 4, 'TORTILLERIAS': 4, 'PANADERIAS': 4, 'FRUTERIAS_VERDULERIAS': 4,
+    'ESTETICAS': 3, 'PAPELERIAS_CIBER': 3, 'FARMACIAS': 2, 'CARNICERIAS': 3, 'TLAPALERIAS_FERRETERIAS': 2,
+}
+LOCATION_TYPE_WEIGHTS = {
+    'LOCAL_CALLE': 40, 'MERCADO': 25, 'TIANGUIS': 15, 'PLAZA_TEXTIL': 8, 'ONLINE': 7, 'OTRO': 5,
+}
+
+# Productos por giro (los demás giros usan GENERIC_PRODUCTS).
+PRODUCTS = {
+    'ABARROTES': ['frijol', 'arroz', 'aceite', 'azúcar', 'café', 'refrescos', 'galletas', 'huevo'],
+    'ROPA_MAYOREO_MENUDEO': ['playeras', 'pantalones', 'vestidos', 'sudaderas', 'blusas', 'uniformes'],
+    'CALZADO': ['botas de piel', 'tenis', 'zapatos escolares', 'sandalias', 'botines', 'mocasines'],
+    'ZAPATERIAS': ['zapatos de vestir', 'tenis', 'huaraches', 'botas vaqueras', 'zapatillas'],
+    'TAQUERIAS_ANTOJITOS': ['tacos de pastor', 'gorditas', 'enchiladas mineras', 'guacamayas', 'tostadas'],
+    'FONDAS_COCINAS': ['comida corrida', 'caldo de res', 'chiles rellenos', 'menú del día', 'pozole'],
+    'TORTILLERIAS': ['tortillas de maíz', 'masa', 'tostadas', 'totopos'],
+    'PANADERIAS': ['conchas', 'bolillo', 'pan de nata', 'cuernitos', 'roscas', 'pan de muerto'],
+    'FRUTERIAS_VERDULERIAS': ['fresas de Irapuato', 'aguacate', 'jitomate', 'mango', 'naranja', 'papaya'],
+    'ESTETICAS': ['corte de cabello', 'tinte', 'manicure', 'peinado', 'alaciado'],
+    'PAPELERIAS_CIBER': ['copias', 'impresiones', 'útiles escolares', 'engargolado', 'mochilas'],
+    'FARMACIAS': ['medicamentos genéricos', 'vitaminas', 'pañales', 'consulta médica'],
+    'CARNICERIAS': ['bistec', 'chuletas', 'carne molida', 'chorizo', 'arrachera'],
+    'TLAPALERIAS_FERRETERIAS': ['pintura', 'tornillos', 'herramienta', 'material eléctrico', 'tubería'],
+}
+GENERIC_PRODUCTS = ['artículos', 'servicio', 'paquete', 'promoción', 'regalos', 'accesorios', 'reparación']
+PROMOTIONS = ['al 2x1', 'con descuento', 'a mitad de precio', 'de temporada', 'en liquidación', 'al mayoreo',
+              'en oferta', 'con envío gratis', 'de fin de semana']
+DESCRIPTION_WORDS = ['calidad', 'precio', 'económico', 'surtido', 'nuevo', 'hecho', 'en', 'Guanajuato',
+                     'entrega', 'inmediata', 'pregunta', 'por', 'tallas', 'colores', 'disponibles', 'hasta',
+                     'agotar', 'existencias', 'horario', 'corrido', 'aceptamos', 'tarjeta']
+NAME_SUFFIXES = ['La Esperanza', 'El Güero', 'Doña Lupe', 'San Juan', 'Los Arcos', 'El Centro', 'La Guadalupana',
+                 'Hermanos López', 'El Bajío', 'La Estrella', 'Don Chuy', 'La Mina', 'El Jardín', 'Santa Fe']
+
+# Ofertas por negocio: Pareto(OFFERS_PARETO_ALPHA) truncada (media cercana a 5).
+OFFERS_PARETO_ALPHA = 1.2
+MAX_OFFERS_PER_BUSINESS = 300
+
+OWNER_RATIO = 0.95           # dueños con suscripción activa (los demás no aparecen en los listados)
+OFFER_ACTIVE_RATIO = 0.92
+OFFER_EXPIRED_RATIO = 0.15
+APPROXIMATE_LOCATION_RATIO = 0.15
+
+
+@dataclass
+class SeedStats:
+    businesses: int = 0
+    offers: int = 0
+    shoppers: int = 0
+    batches: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return (self.businesses + self.offers) / self.elapsed if self.elapsed else 0.0
+
+
+def _weights(choices, weights, default):
+    codes = [code for code, _ in choices]
+    return codes, [weights.get(code, default) for code in codes]
+
+
+class _Generator:
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.municipalities = _weights(MUNICIPALITY_CHOICES, MUNICIPALITY_WEIGHTS, DEFAULT_MUNICIPALITY_WEIGHT)
+        self.business_types = _weights(BUSINESS_TYPE_CHOICES, BUSINESS_TYPE_WEIGHTS, 1)
+        self.location_types = _weights(LOCATION_TYPE_CHOICES, LOCATION_TYPE_WEIGHTS, 1)
+        self.type_labels = dict(BUSINESS_TYPE_CHOICES)
+        self.today = date.today()
+        self.now = timezone.now()
+
+    def _pick(self, codes_and_weights):
+        codes, weights = codes_and_weights
+        return self.rng.choices(codes, weights=weights)[0]
+
+    def offer_count(self):
+        return min(MAX_OFFERS_PER_BUSINESS, int(self.rng.paretovariate(OFFERS_PARETO_ALPHA)))
+
+    def user(self, n):
+        is_owner = self.rng.random() < OWNER_RATIO
+        uid = f'{PREFIX}{n}'
+        return User(username=uid, uid=uid, email=f'{uid}@example.com',
+                    is_business_owner=is_owner, has_active_subscription=is_owner)
+
+    def business(self, user):
+        rng = self.rng
+        municipality = self._pick(self.municipalities)
+        business_type = self._pick(self.business_types)
+        products = PRODUCTS.get(business_type, GENERIC_PRODUCTS)
+        latitude, longitude = geo.municipality_centroid(municipality) or (None, None)
+        approximate = True
+        if latitude is not None and rng.random() >= APPROXIMATE_LOCATION_RATIO:
+            latitude, longitude = latitude + rng.gauss(0, 0.02), longitude + rng.gauss(0, 0.02)
+            approximate = False
+        label = self.type_labels[business_type].split('/')[0].split(' (')[0]
+        return Business(
+            user=user,
+            name=f'{label} {rng.choice(NAME_SUFFIXES)}',
+            what_they_sell=', '.join(rng.sample(products, k=min(3, len(products)))),
+            hours='Lun-Sáb: 9am-8pm',
+            municipality=municipality,
+            street_address=f'Calle {rng.choice(NAME_SUFFIXES)} {rng.randint(1, 999)}',
+            latitude=latitude,
+            longitude=longitude,
+            location_is_approximate=approximate,
+            geohash=geo.encode(latitude, longitude) if latitude is not None else '',
+            location_type=self._pick(self.location_types),
+            business_type=business_type,
+            is_paid_member=user.is_business_owner,
+            membership_expires_at=(
+                self.now + timedelta(days=rng.randint(1, 30)) if user.is_business_owner
+                else self.now - timedelta(days=rng.randint(10, 90))
+            ),
+        )
+
+    def offer(self, business):
+        rng = self.rng
+        product = rng.choice(PRODUCTS.get(business.business_type, GENERIC_PRODUCTS))
+        original = Decimal(rng.randint(40, 5000)) / 2
+        discount = (original * Decimal(rng.randint(50, 95)) / 100).quantize(Decimal('0.01'))
+        start = self.today - timedelta(days=rng.randint(0, 30))
+        if rng.random() < OFFER_EXPIRED_RATIO:
+            end = self.today - timedelta(days=rng.randint(1, 60))
+        else:
+            end = self.today + timedelta(days=rng.randint(0, 30))
+        return Offer(
+            business=business,
+            title=f'{product.capitalize()} {rng.choice(PROMOTIONS)}',
+            description=' '.join([product, *rng.choices(DESCRIPTION_WORDS, k=rng.randint(8, 20))]),
+            original_price=original,
+            discount_price=discount,
+            start_date=start,
+            end_date=end,
+            is_active=rng.random() < OFFER_ACTIVE_RATIO,
+        )
+
+
+def seed(offers, batch_size=5000, shoppers=None, rng_seed=42, on_batch=None):
+    """
+    Crea al menos `offers` ofertas sintéticas (con sus negocios y dueños) y `shoppers`
+    usuarios sin negocio que hacen las lecturas del benchmark. Devuelve SeedStats.
+    """
+    rng = random.Random(rng_seed)
+    generator = _Generator(rng)
+    stats = SeedStats()
+    started = time.perf_counter()
+    municipalities = set()
+
+    shoppers = max(50, min(1000, offers // 1000)) if shoppers is None else shoppers
+    User.objects.bulk_create(
+        [User(username=f'{SHOPPER_PREFIX}{i}', uid=f'{SHOPPER_PREFIX}{i}') for i in range(shoppers)],
+        batch_size=1000,
+    )
+    stats.shoppers = shoppers
+
+    while stats.offers < offers:
+        # Negocios del lote con su número de ofertas, hasta completar unas `batch_size` ofertas.
+        plan = []
+        planned = 0
+        while planned < batch_size and stats.offers + planned < offers:
+            count = min(generator.offer_count(), offers - stats.offers - planned)
+            plan.append(count)
+            planned += count
+
+        with transaction.atomic():
+            users = User.objects.bulk_create(
+                [generator.user(stats.businesses + i) for i in range(len(plan))], batch_size=1000
+            )
+            businesses = Business.objects.bulk_create([generator.business(user) for user in users], batch_size=1000)
+            created = Offer.objects.bulk_create(
+                [generator.offer(business) for business, count in zip(businesses, plan) for _ in range(count)],
+                batch_size=1000,
+            )
+            search.index_businesses(businesses)
+            search.index_offers(created)
+
+        municipalities.update(business.municipality for business in businesses)
+        stats.businesses += len(businesses)
+        stats.offers += len(created)
+        stats.batches += 1
+        stats.elapsed = time.perf_counter() - started
+        if on_batch is not None:
+            on_batch(stats)
+
+    list_cache.bump_generations(*municipalities)
+    facets.invalidate(facets.BUSINESS, facets.OFFER)
+    stats.elapsed = time.perf_counter() - started
+    return stats
+
+
+def exists():
+    return User.objects.filter(username__startswith=PREFIX).exists()
+
+
+def clear(batch_size=1000):
+    """
+    Borra los datos sintéticos por lotes de negocios con DELETE directos (sin cargar
+    las filas ni mandar signals por cada una). Devuelve cuántos negocios se borraron.
+    """
+    deleted = 0
+    municipalities = set()
+    businesses = Business.objects.filter(user__username__startswith=PREFIX).order_by('pk')
+    while True:
+        rows = list(businesses.values_list('pk', 'municipality')[:batch_size])
+        if not rows:
+            break
+        ids = [pk for pk, _ in rows]
+        with transaction.atomic():
+            for model, kind in ((Offer, search.OFFER), (ArchivedOffer, search.ARCHIVED_OFFER)):
+                queryset = model.objects.filter(business_id__in=ids)
+                SearchEntry.objects.filter(kind=kind, object_id__in=queryset.values('pk'))._raw_delete(SearchEntry.objects.db)
+                queryset._raw_delete(model.objects.db)
+            search.remove(search.BUSINESS, ids)
+            Business.objects.filter(pk__in=ids)._raw_delete(Business.objects.db)
+        municipalities.update(municipality for _, municipality in rows)
+        deleted += len(rows)
+
+    users = User.objects.filter(username__startswith=PREFIX).order_by('pk')
+    while True:
+        rows = list(users.values_list('pk', 'uid')[:batch_size])
+        if not rows:
+            break
+        User.objects.filter(pk__in=[pk for pk, _ in rows])._raw_delete(User.objects.db)
+        invalidate_users([uid for _, uid in rows])
+
+    if deleted:
+        list_cache.bump_generations(*municipalities)
+        facets.invalidate(facets.BUSINESS, facets.OFFER)
+    return deleted
@@ -0,0 +1,304 @@
+# comerciantes/benchmark/driver.py
+"""
+Driver del benchmark: reproduce tráfico de la app contra las vistas de DRF en el
+mismo proceso, con el cliente de pruebas de Django (pasa por todo el middleware,
+la autenticación de Firebase y el enrutamiento, pero sin red ni servidor).
+
+Escenarios (SCENARIOS) y su peso por defecto en la mezcla (DEFAULT_MIX):
+
+- list: GET /api/offers/, a veces con municipio o giro, o la página siguiente de un listado anterior.
+- search: GET /api/offers/?search=...
+- retrieve: GET /api/offers/<id>/
+- my_offers: GET /api/offers/my_offers/ de un dueño.
+- update: PATCH /api/offers/<id>/ del dueño de la oferta.
+
+Firebase se simula (verify_id_token y get_user devuelven al instante y los claims van
+a FakeFirebaseClient) y Stripe queda deshabilitado: una llamada a stripe_client.get()
+durante el benchmark es un error. Las consultas SQL se cuentan con
+connection.execute_wrapper, así que no hace falta DEBUG.
+"""
+
+import contextlib
+import json
+import platform
+import random
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Max, Min
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from mercadolocalmx_backend import firebase_tokens, stripe_client
+
+from ..models import Business, Offer
+from . import data
+
+User = get_user_model()
+
+SCENARIOS = ('list', 'search', 'retrieve', 'my_offers', 'update')
+DEFAULT_MIX = {'list': 40, 'search': 20, 'retrieve': 25, 'my_offers': 10, 'update': 5}
+
+SEARCH_TERMS = ['tenis', 'botas piel', 'conchas', 'tacos pastor', 'fresas', 'playeras', 'copias', 'pan',
+                'zapatos', 'leon', 'celaya abarrotes', 'comida corrida', 'pintura', 'mayoreo', 'descuento']
+# Fracción de listados que piden la página siguiente de un listado anterior.
+NEXT_PAGE_RATIO = 0.25
+# Ofertas que se muestrean para elegir detalles, dueños y ediciones.
+SAMPLE_SIZE = 5000
+
+# Métricas comparadas con la línea base y si un valor mayor es mejor.
+COMPARED_METRICS = {'rps': True, 'p50': False, 'p95': False, 'p99': False, 'queries_mean': False}
+
+
+class BenchmarkError(Exception):
+    """No hay datos sintéticos suficientes o la línea base no existe."""
+
+
+def percentile(samples, p):
+    """Percentil por rango más cercano de una lista ya ordenada."""
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+@dataclass
+class ScenarioStats:
+    latencies: list = field(default_factory=list)
+    queries: list = field(default_factory=list)
+    errors: int = 0
+
+    def summary(self):
+        if not self.latencies:
+            return None
+        latencies = sorted(self.latencies)
+        return {
+            'requests': len(latencies),
+            'errors': self.errors,
+            'rps': len(latencies) / (sum(latencies) / 1000) if sum(latencies) else 0.0,
+            'mean': statistics.fmean(latencies),
+            'p50': statistics.median(latencies),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'queries_mean': statistics.fmean(self.queries),
+            'queries_max': max(self.queries),
+        }
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _stripe_disabled():
+    raise RuntimeError("Stripe no está disponible durante el benchmark.")
+
+
+@contextlib.contextmanager
+def stubbed_services():
+    """Firebase simulado y Stripe deshabilitado mientras dura el bloque."""
+    now = int(time.time())
+
+    def verify_id_token(id_token, app=None, check_revoked=False, clock_skew_seconds=0):
+        # El token es el uid del usuario sintético.
+        return {'uid': id_token, 'iat': now, 'exp': now + 3600}
+
+    def get_user(uid, app=None):
+        return SimpleNamespace(disabled=False, tokens_valid_after_timestamp=0)
+
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(mock.patch.object(firebase_tokens.auth, 'verify_id_token', verify_id_token))
+        stack.enter_context(mock.patch.object(firebase_tokens.auth, 'get_user', get_user))
+        stack.enter_context(mock.patch.object(stripe_client, 'get', _stripe_disabled))
+        stack.enter_context(override_settings(
+            ALLOWED_HOSTS=['testserver'],
+            FIREBASE_ADMIN_SDK_CREDENTIALS='',
+            FIREBASE_CERT_REFRESH_INTERVAL=0,
+            FIREBASE_CLAIMS_CLIENT='usuarios.firebase_client.FakeFirebaseClient',
+            STRIPE_SECRET_KEY='',
+            STRIPE_PREPROVISION_CUSTOMERS=False,
+        ))
+        yield
+
+
+class Driver:
+
+    def __init__(self, mix=None, rng_seed=42):
+        self.mix = {name: weight for name, weight in (mix or DEFAULT_MIX).items() if weight > 0}
+        self.rng = random.Random(rng_seed)
+        self.client = Client(raise_request_exception=False)
+        self.next_pages = deque(maxlen=50)
+        self._load_targets()
+
+    def _load_targets(self):
+        """Muestrea ofertas visibles (y sus dueños) y los usuarios que hacen las lecturas."""
+        offers = Offer.objects.filter(business__user__username__startswith=data.PREFIX)
+        bounds = offers.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            raise BenchmarkError("No hay datos sintéticos: ejecuta antes manage.py benchmark_seed.")
+        candidates = {self.rng.randint(bounds['low'], bounds['high']) for _ in range(SAMPLE_SIZE)}
+        self.offers = list(
+            offers.filter(
+                pk__in=candidates, is_active=True, end_date__gte=date.today(), business__user__is_business_owner=True,
+            ).values_list('pk', 'business__user__uid', 'original_price')
+        )
+        self.shoppers = list(
+            User.objects.filter(username__startswith=data.SHOPPER_PREFIX).values_list('uid', flat=True)
+        )
+        if not self.offers or not self.shoppers:
+            raise BenchmarkError("Los datos sintéticos no tienen ofertas visibles o compradores.")
+        self.municipalities = list(data.MUNICIPALITY_WEIGHTS)
+        self.municipality_weights = list(data.MUNICIPALITY_WEIGHTS.values())
+        self.business_types = list(data.BUSINESS_TYPE_WEIGHTS)
+
+    # --- Peticiones ---
+
+    def _request(self, method, path, uid, **kwargs):
+        return getattr(self.client, method)(path, headers={'Authorization': f'Bearer {uid}'}, **kwargs)
+
+    def _list(self):
+        if self.next_pages and self.rng.random() < NEXT_PAGE_RATIO:
+            return self._request('get', self.next_pages.popleft(), self.rng.choice(self.shoppers))
+        params = {}
+        roll = self.rng.random()
+        if roll < 0.4:
+            params['municipality'] = self.rng.choices(self.municipalities, weights=self.municipality_weights)[0].lower()
+        elif roll < 0.6:
+            params['business_type'] = self.rng.choice(self.business_types).lower()
+        return self._request('get', '/api/offers/', self.rng.choice(self.shoppers), data=params)
+
+    def _after(self, name, response):
+        # Fuera de la medición. La respuesta puede venir de la caché de listados (sin .data).
+        if name == 'list' and response.status_code == 200:
+            next_page = response.json().get('next')
+            if next_page:
+                self.next_pages.append(next_page)
+
+    def _search(self):
+        return self._request('get', '/api/offers/', self.rng.choice(self.shoppers),
+                             data={'search': self.rng.choice(SEARCH_TERMS)})
+
+    def _retrieve(self):
+        pk, _, _ = self.rng.choice(self.offers)
+        return self._request('get', f'/api/offers/{pk}/', self.rng.choice(self.shoppers))
+
+    def _my_offers(self):
+        _, owner, _ = self.rng.choice(self.offers)
+        return self._request('get', '/api/offers/my_offers/', owner)
+
+    def _update(self):
+        pk, owner, original_price = self.rng.choice(self.offers)
+        discount = (original_price * Decimal(self.rng.randint(50, 95)) / 100).quantize(Decimal('0.01'))
+        return self._request('patch', f'/api/offers/{pk}/', owner,
+                             data=json.dumps({'discount_price': str(discount)}), content_type='application/json')
+
+    def _next_scenario(self):
+        names = list(self.mix)
+        return self.rng.choices(names, weights=[self.mix[name] for name in names])[0]
+
+    # --- Ejecución ---
+
+    def run(self, requests, warmup=200):
+        """
+        Hace `warmup` peticiones sin medir (cachés de tokens, usuarios y listados) y
+        luego `requests` medidas. Devuelve (segundos totales, {escenario: ScenarioStats}).
+        """
+        for _ in range(warmup):
+            name = self._next_scenario()
+            self._after(name, getattr(self, f'_{name}')())
+
+        stats = {name: ScenarioStats() for name in self.mix}
+        counter = _QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            for _ in range(requests):
+                name = self._next_scenario()
+                counter.count = 0
+                request_started = time.perf_counter()
+                response = getattr(self, f'_{name}')()
+                stats[name].latencies.append((time.perf_counter() - request_started) * 1000)
+                stats[name].queries.append(counter.count)
+                if response.status_code >= 400:
+                    stats[name].errors += 1
+                self._after(name, response)
+        return time.perf_counter() - started, stats
+
+
+def run(requests, warmup=200, mix=None, rng_seed=42, list_cache=None):
+    """Ejecuta el benchmark y devuelve el reporte (el mismo formato que se guarda como línea base)."""
+    overrides = {} if list_cache is None else {'LIST_CACHE_ENABLED': list_cache}
+    with stubbed_services(), override_settings(**overrides):
+        driver = Driver(mix, rng_seed)
+        elapsed, stats = driver.run(requests, warmup)
+        meta = {
+            'created_at': timezone.now().isoformat(),
+            'businesses': Business.objects.filter(user__username__startswith=data.PREFIX).count(),
+            'offers': Offer.objects.filter(business__user__username__startswith=data.PREFIX).count(),
+            'requests': requests,
+            'warmup': warmup,
+            'mix': driver.mix,
+            'seed': rng_seed,
+            'database': connection.vendor,
+            'list_cache': settings.LIST_CACHE_ENABLED,
+            'debug': settings.DEBUG,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+        }
+    summaries = {name: summary for name, scenario in stats.items() if (summary := scenario.summary())}
+    return {
+        'meta': meta,
+        'total': {'requests': requests, 'elapsed': elapsed, 'rps': requests / elapsed if elapsed else 0.0},
+        'scenarios': summaries,
+    }
+
+
+# --- Líneas base ---
+
+def baseline_path(name):
+    return Path(settings.BENCHMARK_BASELINE_DIR) / f'{name}.json'
+
+
+def save_baseline(name, report):
+    path = baseline_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+    return path
+
+
+def load_baseline(name):
+    path = baseline_path(name)
+    if not path.exists():
+        raise BenchmarkError(f"No existe la línea base {path}.")
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+def compare(report, baseline, threshold=0.10):
+    """
+    Cambio relativo de cada métrica frente a la línea base:
+    [(escenario, métrica, anterior, actual, cambio, es_regresión)]. Un cambio que empeora
+    la métrica más de `threshold` (0.10 = 10 %) cuenta como regresión.
+    """
+    rows = []
+    for name, current in report['scenarios'].items():
+        previous = baseline['scenarios'].get(name)
+        if previous is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            before, after = previous[metric], current[metric]
+            change = (after - before) / before if before else 0.0
+            worse = -change if higher_is_better else change
+            rows.append((name, metric, before, after, change, worse > threshold))
+    return rows
@@ -0,0 +1,162 @@
+# comerciantes/cache.py
+"""
+Caché de respuestas de los listados de negocios y ofertas.
+
+Las claves incluyen un contador de generación: uno global y otro por municipio.
+Los signals de comerciantes/signals.py incrementan los contadores afectados cuando
+se guarda o elimina un negocio o una oferta, así que las entradas viejas dejan de
+leerse de inmediato (y expiran solas por TTL), sin depender de un tiempo de vida corto.
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+_GENERATION_PREFIX = 'comerciantes:gen:'
+GLOBAL_SCOPE = '*'
+
+
+def _cache():
+    return caches[settings.LIST_CACHE_ALIAS]
+
+
+def _generation_key(scope):
+    return f'{_GENERATION_PREFIX}{scope}'
+
+
+def get_generation(scope):
+    return _cache().get(_generation_key(scope), 0)
+
+
+def bump_generations(*municipalities):
+    """
+    Invalida los listados sin filtro de municipio y los de los municipios dados.
+
+    Se aplica al confirmar la transacción: si se incrementara antes, una petición
+    concurrente podría cachear los datos anteriores con la generación nueva.
+    """
+    scopes = {GLOBAL_SCOPE, *(m for m in municipalities if m)}
+    transaction.on_commit(lambda: _bump(scopes))
+
+
+def _bump(scopes):
+    cache = _cache()
+    for scope in scopes:
+        key = _generation_key(scope)
+        try:
+            # add() no hace nada si la clave existe; incr() es atómico en Redis.
+            cache.add(key, 0, timeout=None)
+            cache.incr(key)
+        except ValueError:
+            # La clave expiró o fue desalojada entre add() e incr().
+            cache.set(key, 1, timeout=None)
+        except Exception as e:
+            logger.warning(f"No se pudo invalidar la caché de listados ({scope}): {e}")
+
+
+def build_key(basename, params, municipality=None):
+    """
+    Clave de una entrada: recurso, fecha de hoy (las ofertas vencen al cambiar el día),
+    generación del municipio filtrado (o la global) y los parámetros normalizados.
+    """
+    scope = municipality or GLOBAL_SCOPE
+    return _entry_key(basename, params, scope, get_generation(scope))
+
+
+async def abuild_key(basename, params, municipality=None):
+    """build_key para las vistas async."""
+    scope = municipality or GLOBAL_SCOPE
+    return _entry_key(basename, params, scope, await _cache().aget(_generation_key(scope), 0))
+
+
+def _entry_key(basename, params, scope, generation):
+    # Se ordena solo por nombre: con valores repetidos, el filtro usa el último.
+    normalized = '&'.join(f'{name}={value}' for name, value in sorted(params, key=lambda p: p[0]))
+    digest = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+    return f'comerciantes:list:{basename}:{date.today().isoformat()}:{scope}:{generation}:{digest}'
+
+
+def get_or_build(key, build):
+    """
+    Devuelve (entrada, hit). `build()` debe devolver los campos de la entrada (un dict
+    serializable con la respuesta en 'data' y, si la vista responde GET condicionales,
+    su 'etag') o None si el resultado no debe cachearse.
+
+    Si varias peticiones fallan a la vez con la misma clave, solo una reconstruye la
+    entrada (la que consigue el lock con cache.add); las demás esperan a que aparezca,
+    hasta LIST_CACHE_LOCK_TIMEOUT segundos, y si no, la construyen ellas mismas.
+
+    El lock guarda un token único y solo lo borra quien lo tomó, y solo si sigue siendo
+    suyo: si la reconstrucción tarda más que el timeout, el lock expira y puede tomarlo
+    otra petición, cuyo lock no se toca.
+    """
+    cache = _cache()
+    entry = cache.get(key)
+    if entry is not None:
+        return entry, True
+
+    lock_key = f'{key}:lock'
+    token = uuid.uuid4().hex
+    timeout = settings.LIST_CACHE_LOCK_TIMEOUT
+    locked = cache.add(lock_key, token, timeout=timeout)
+    if not locked:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry, True
+
+    try:
+        fields = build()
+        entry = {**(fields or {'data': None}), 'created_at': time.time()}
+        if fields is not None:
+            cache.set(key, entry, timeout=settings.LIST_CACHE_TTL)
+        return entry, False
+    finally:
+        # La API de caché de Django no tiene un borrado condicional atómico; entre el get y
+        # el delete solo cabe que el lock expire justo en ese instante.
+        if locked and cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+async def aget_or_build(key, build):
+    """
+    get_or_build para las vistas async: `build` es una corrutina y la espera por el
+    lock usa asyncio.sleep, así que no bloquea el event loop.
+    """
+    cache = _cache()
+    entry = await cache.aget(key)
+    if entry is not None:
+        return entry, True
+
+    lock_key = f'{key}:lock'
+    token = uuid.uuid4().hex
+    timeout = settings.LIST_CACHE_LOCK_TIMEOUT
+    locked = await cache.aadd(lock_key, token, timeout=timeout)
+    if not locked:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            entry = await cache.aget(key)
+            if entry is not None:
+                return entry, True
+
+    try:
+        fields = await build()
+        entry = {**(fields or {'data': None}), 'created_at': time.time()}
+        if fields is not None:
+            await cache.aset(key, entry, timeout=settings.LIST_CACHE_TTL)
+        return entry, False
+    finally:
+        if locked and await cache.aget(lock_key) == token:
+            await cache.adelete(lock_key)
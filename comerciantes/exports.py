@@ -0,0 +1,140 @@
+# comerciantes/exports.py
+"""
+Exportación del catálogo de ofertas activas en NDJSON o CSV, sin cargarlo en memoria.
+
+Las filas se leen por bloques de EXPORT_CHUNK_SIZE con paginación por clave
+(WHERE id > último ORDER BY id LIMIT n): cada bloque es una consulta corta, sin un
+cursor abierto durante toda la descarga, y se codifica y se envía antes de leer el
+siguiente. Las columnas son planas (los datos del negocio van en la misma fila) y se
+leen con values_list, sin instanciar modelos ni serializers anidados.
+
+Hay una versión síncrona (stream, para WSGI y `manage.py export_offers`) y otra
+async (astream, para ASGI: Django solo transmite un iterador síncrono bajo ASGI
+después de consumirlo completo).
+"""
+
+import contextlib
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from .filters import OfferExportFilter
+from .models import Offer
+
+FORMATS = ('ndjson', 'csv')
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+# (columna, campo del ORM)
+EXPORT_FIELDS = [
+    ('id', 'id'),
+    ('title', 'title'),
+    ('description', 'description'),
+    ('original_price', 'original_price'),
+    ('discount_price', 'discount_price'),
+    ('start_date', 'start_date'),
+    ('end_date', 'end_date'),
+    ('image_url', 'image'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+    ('business_id', 'business_id'),
+    ('business_name', 'business__name'),
+    ('municipality', 'business__municipality'),
+    ('business_type', 'business__business_type'),
+    ('location_type', 'business__location_type'),
+    ('latitude', 'business__latitude'),
+    ('longitude', 'business__longitude'),
+]
+COLUMNS = [column for column, _ in EXPORT_FIELDS]
+_LOOKUPS = [lookup for _, lookup in EXPORT_FIELDS]
+_IMAGE_INDEX = COLUMNS.index('image_url')
+
+
+def export_queryset(params=None, today=None):
+    """Ofertas visibles en el listado público, con los filtros municipality y business_type."""
+    queryset = Offer.objects.filter(
+        is_active=True,
+        end_date__gte=today or date.today(),
+        business__user__is_business_owner=True,
+    )
+    return OfferExportFilter(params or {}, queryset=queryset).qs
+
+
+def _chunk(queryset, after, chunk_size):
+    return queryset.filter(pk__gt=after).order_by('pk').values_list(*_LOOKUPS)[:chunk_size]
+
+
+def _value(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _row(values):
+    row = [_value(value) for value in values]
+    image = row[_IMAGE_INDEX]
+    row[_IMAGE_INDEX] = default_storage.url(image) if image else None
+    return row
+
+
+def header(fmt):
+    if fmt == 'csv':
+        return _encode_csv([COLUMNS])
+    return ''
+
+
+def encode(rows, fmt):
+    """Codifica un bloque de filas (tuplas de values_list) como texto NDJSON o CSV."""
+    rows = [_row(values) for values in rows]
+    if fmt == 'csv':
+        return _encode_csv(rows)
+    return ''.join(json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False) + '\n' for row in rows)
+
+
+def _encode_csv(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def stream(queryset, fmt, chunk_size=None):
+    """Genera el archivo por bloques de texto."""
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    if fmt == 'csv':
+        yield header(fmt)
+    last = 0
+    while True:
+        rows = list(_chunk(queryset, last, chunk_size))
+        if not rows:
+            return
+        yield encode(rows, fmt)
+        last = rows[-1][0]
+
+
+async def astream(queryset, fmt, chunk_size=None, slot=None):
+    """
+    Versión async de stream(). `slot` (p. ej. async_views.database_slot) envuelve cada
+    consulta de bloque: la conexión se ocupa solo mientras se lee el bloque, no mientras
+    el cliente lo descarga.
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    slot = slot or contextlib.nullcontext
+    if fmt == 'csv':
+        yield header(fmt)
+    last = 0
+    while True:
+        async with slot():
+            rows = [row async for row in _chunk(queryset, last, chunk_size)]
+        if not rows:
+            return
+        yield encode(rows, fmt)
+        last = rows[-1][0]
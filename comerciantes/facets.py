@@ -0,0 +1,190 @@
+# comerciantes/facets.py
+"""
+Conteos por municipio, tipo de negocio y tipo de ubicación (facetas) para la barra
+de filtros: GET /api/businesses/facets/ y /api/offers/facets/, con los mismos
+parámetros que el listado.
+
+Cada faceta es una consulta agrupada (GROUP BY) sobre el queryset del listado con
+todos los filtros salvo el de la propia faceta: el cliente ve cuántos resultados
+tendría al cambiar ese filtro.
+
+Sin filtros (la barra inicial, la consulta más frecuente) los conteos se guardan en
+la caché de listados, un contador por valor. Los signals de comerciantes/signals.py
+los ajustan con incr/decr al guardar o eliminar un negocio o una oferta, sin
+recalcular. Los cambios masivos (UPDATE por lote, importaciones, cambios de
+suscripción) los invalidan y se recalculan en la siguiente lectura. Las claves
+incluyen la fecha (las ofertas vencen al cambiar el día) y expiran a los
+FACET_CACHE_TTL segundos, lo que acota el desajuste de una carrera entre un
+recálculo y un ajuste.
+
+Como la caché de listados, solo se usa con LIST_CACHE_ENABLED: con LocMem cada
+proceso tendría sus propios contadores y no vería los ajustes de los demás. Sin
+ella los conteos se calculan en cada petición.
+"""
+
+import logging
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count
+from django_filters.utils import translate_validation
+
+from .models import BUSINESS_TYPE_CHOICES, FACET_FIELDS, LOCATION_TYPE_CHOICES, MUNICIPALITY_CHOICES
+
+logger = logging.getLogger(__name__)
+
+# basename de los ViewSets en el router.
+BUSINESS = 'business'
+OFFER = 'offer'
+
+FACET_CHOICES = {
+    'municipality': MUNICIPALITY_CHOICES,
+    'business_type': BUSINESS_TYPE_CHOICES,
+    'location_type': LOCATION_TYPE_CHOICES,
+}
+_LABELS = {facet: dict(choices) for facet, choices in FACET_CHOICES.items()}
+
+
+def count(queryset, filterset_class, params, request=None):
+    """
+    {faceta: {código: cantidad}} para `queryset` con los filtros de `params`, una
+    consulta agrupada por faceta. Lanza el ValidationError de DRF si los parámetros no son válidos.
+    """
+    filters = filterset_class.base_filters
+    counts = {}
+    for facet in FACET_FIELDS:
+        facet_params = params.copy()
+        facet_params.pop(facet, None)
+        filterset = filterset_class(facet_params, queryset=queryset, request=request)
+        if not filterset.is_valid():
+            raise translate_validation(filterset.errors)
+        field = filters[facet].field_name
+        rows = filterset.qs.order_by().values_list(field).annotate(count=Count('pk'))
+        counts[facet] = {code: total for code, total in rows if code is not None}
+    return counts
+
+
+def as_response(counts):
+    """Lista por faceta, de mayor a menor cantidad: [{"value", "label", "count"}, ...]."""
+    return {
+        facet: sorted(
+            (
+                {'value': code, 'label': _LABELS[facet].get(code, code), 'count': total}
+                for code, total in counts[facet].items() if total > 0
+            ),
+            key=lambda item: (-item['count'], item['label']),
+        )
+        for facet in FACET_FIELDS
+    }
+
+
+# --- Conteos sin filtros en caché ---
+
+def enabled():
+    return settings.LIST_CACHE_ENABLED
+
+
+def _cache():
+    return caches[settings.LIST_CACHE_ALIAS]
+
+
+def _prefix(basename):
+    return f'comerciantes:facets:{basename}:{date.today().isoformat()}:'
+
+
+def _marker_key(basename):
+    return _prefix(basename) + 'built'
+
+
+def _value_key(basename, facet, code):
+    return f'{_prefix(basename)}{facet}:{code}'
+
+
+def cached_counts(basename):
+    """Conteos sin filtros de la caché, o None si no están (o están incompletos, o no hay caché)."""
+    if not enabled():
+        return None
+    keys = {
+        (facet, code): _value_key(basename, facet, code)
+        for facet, choices in FACET_CHOICES.items()
+        for code, _ in choices
+    }
+    try:
+        values = _cache().get_many([_marker_key(basename), *keys.values()])
+    except Exception as e:
+        logger.warning(f"No se pudieron leer las facetas de la caché ({basename}): {e}")
+        return None
+    if _marker_key(basename) not in values or len(values) <= len(keys):
+        return None
+    counts = {facet: {} for facet in FACET_FIELDS}
+    for (facet, code), key in keys.items():
+        counts[facet][code] = values[key]
+    return counts
+
+
+def store_counts(basename, counts):
+    if not enabled():
+        return
+    # Todos los valores (también los de cero) tienen su contador, para poder usar incr/decr.
+    entries = {
+        _value_key(basename, facet, code): counts[facet].get(code, 0)
+        for facet, choices in FACET_CHOICES.items()
+        for code, _ in choices
+    }
+    entries[_marker_key(basename)] = 1
+    try:
+        _cache().set_many(entries, timeout=settings.FACET_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"No se pudieron guardar las facetas en la caché ({basename}): {e}")
+
+
+def adjust(basename, removed, added, amount=1):
+    """
+    Ajusta los conteos sin filtros al confirmar la transacción: `amount` resultados
+    dejan de tener los valores `removed` y pasan a tener `added` (dicts faceta -> código;
+    None si antes no contaban o ya no cuentan).
+    """
+    if not enabled():
+        return
+    transaction.on_commit(lambda: _adjust(basename, removed or {}, added or {}, amount))
+
+
+def _adjust(basename, removed, added, amount):
+    cache = _cache()
+    try:
+        if cache.get(_marker_key(basename)) is None:
+            return
+        for facet in FACET_FIELDS:
+            old, new = removed.get(facet), added.get(facet)
+            if old == new:
+                continue
+            if old is not None:
+                cache.decr(_value_key(basename, facet, old), amount)
+            if new is not None:
+                cache.incr(_value_key(basename, facet, new), amount)
+    except ValueError:
+        # Un contador expiró o fue desalojado: se recalculan en la siguiente lectura.
+        cache.delete(_marker_key(basename))
+    except Exception as e:
+        logger.warning(f"No se pudieron ajustar las facetas ({basename}): {e}")
+
+
+def invalidate(*basenames):
+    """Descarta los conteos sin filtros al confirmar la transacción (cambios masivos)."""
+    if not enabled():
+        return
+    transaction.on_commit(lambda: _invalidate(basenames))
+
+
+def _invalidate(basenames):
+    try:
+        _cache().delete_many([_marker_key(basename) for basename in basenames])
+    except Exception as e:
+        logger.warning(f"No se pudieron invalidar las facetas ({', '.join(basenames)}): {e}")
+
+
+def values_of(business):
+    """{faceta: código} de un negocio (las ofertas cuentan con los valores de su negocio)."""
+    return {name: getattr(business, name) for name in FACET_FIELDS}
@@ -1,51 +1,160 @@
 # comerciantes/filters.py
+import math
+import re
+
 import django_filters
-from django.db.models import Q 
-from .models import Business, Offer
+from django import forms
+from django.conf import settings
+from django_filters.constants import EMPTY_VALUES
+from .models import ArchivedOffer, Business, Offer, BUSINESS_TYPE_CHOICES, LOCATION_TYPE_CHOICES, MUNICIPALITY_CHOICES
+from . import geo
+from . import search
+
+
+def normalize_choice(value):
+    """'San Miguel de Allende', 'león' -> 'san_miguel_de_allende', 'leon'."""
+    return re.sub(r'[^a-z0-9]+', '_', search.fold(value)).strip('_')
+
+
+def choice_codes(choices):
+    """Valor normalizado (del código o de la etiqueta) -> código guardado en la base de datos."""
+    codes = {}
+    for code, label in choices:
+        codes[normalize_choice(code)] = code
+        codes[normalize_choice(label)] = code
+    return codes
+
+
+class ChoiceCodeFilter(django_filters.CharFilter):
+    """
+    Filtro exacto sobre el código de un campo con choices.
+
+    Normaliza lo que envía el cliente ('leon', 'León', 'LEON' o 'san miguel de allende')
+    al código guardado en la base de datos ('LEON', 'ALLENDE'), de modo que la consulta
+    es un `=` que puede usar los índices, en lugar de un `iexact` (UPPER/LIKE) que no.
+    Un valor que no corresponde a ningún código no devuelve resultados.
+    """
+    def __init__(self, *args, choices, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.codes = choice_codes(choices)
+
+    @staticmethod
+    def _normalize(value):
+        return normalize_choice(value)
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        code = self.codes.get(self._normalize(value))
+        if code is None:
+            return qs.none()
+        return qs.filter(**{self.field_name: code})
+
+
+class LatLonField(forms.CharField):
+    """Punto en el formato 'latitud,longitud' (grados decimales) -> (lat, lon)."""
+
+    def clean(self, value):
+        value = super().clean(value)
+        if value in EMPTY_VALUES:
+            return None
+        try:
+            latitude, longitude = (float(part) for part in value.split(','))
+        except ValueError:
+            raise forms.ValidationError("Usa el formato 'latitud,longitud' (p. ej. 21.1250,-101.6860).")
+        if not (math.isfinite(latitude) and math.isfinite(longitude)
+                and -90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise forms.ValidationError("Coordenadas fuera de rango.")
+        return latitude, longitude
+
+
+class LatLonFilter(django_filters.Filter):
+    field_class = LatLonField
+
+
+class NearFilterSet(django_filters.FilterSet):
+    """
+    Base de los filtros con búsqueda por cercanía (ver comerciantes/geo.py):
+    ?near=lat,lon&radius_km=r devuelve lo que está a menos de r km del punto
+    (GEO_DEFAULT_RADIUS_KM si no se indica), ordenado por distancia.
+    """
+    near = LatLonFilter(method='filter_near')
+    radius_km = django_filters.NumberFilter(
+        method='filter_radius', min_value=0.1, max_value=settings.GEO_MAX_RADIUS_KM
+    )
+    # Ruta de la relación con Business ('' para el propio negocio).
+    near_prefix = ''
+
+    def filter_near(self, queryset, name, value):
+        radius_km = self.form.cleaned_data.get('radius_km') or settings.GEO_DEFAULT_RADIUS_KM
+        latitude, longitude = value
+        return geo.near(queryset, latitude, longitude, float(radius_km), prefix=self.near_prefix)
+
+    def filter_radius(self, queryset, name, value):
+        # radius_km solo tiene efecto junto con near (ver filter_near).
+        return queryset
+
 
 # --- Filtro para el modelo Business ---
-class BusinessFilter(django_filters.FilterSet):
+class BusinessFilter(NearFilterSet):
     """
     Filtro personalizado para el modelo Business.
     Permite filtrar por una búsqueda de texto en múltiples campos,
-    tipo de negocio y por municipio.
+    tipo de negocio, municipio, tipo de ubicación y cercanía.
     """
     search = django_filters.CharFilter(method='filter_search')
-    business_type = django_filters.CharFilter(field_name='business_type', lookup_expr='iexact') 
-    municipality = django_filters.CharFilter(field_name='municipality', lookup_expr='iexact')
+    business_type = ChoiceCodeFilter(field_name='business_type', choices=BUSINESS_TYPE_CHOICES)
+    municipality = ChoiceCodeFilter(field_name='municipality', choices=MUNICIPALITY_CHOICES)
+    location_type = ChoiceCodeFilter(field_name='location_type', choices=LOCATION_TYPE_CHOICES)
 
     class Meta:
         model = Business
         fields = []
     
     def filter_search(self, queryset, name, value):
-        # Implementa la lógica de búsqueda de texto "OR" en varios campos
-        # Busca en el nombre del negocio, qué venden, municipio y tipo de negocio
-        return queryset.filter(
-            Q(name__icontains=value) | 
-            Q(what_they_sell__icontains=value) | 
-            Q(municipality__icontains=value) |
-            Q(business_type__icontains=value)
-        )
+        # Búsqueda en el índice invertido (sin acentos y ordenada por relevancia) sobre
+        # el nombre del negocio, qué venden y las etiquetas de municipio y tipo de negocio
+        return search.search(queryset, search.BUSINESS, value)
 
 
 # --- Filtro para el modelo Offer (el que ya tenías) ---
-class OfferFilter(django_filters.FilterSet):
+class OfferFilter(NearFilterSet):
     """
     Filtro para el modelo Offer.
-    Permite filtrar por búsqueda de texto, tipo de negocio y municipio.
+    Permite filtrar por búsqueda de texto, tipo de negocio, municipio, tipo de ubicación
+    y cercanía del negocio.
     """
     search = django_filters.CharFilter(method='filter_search')
-    business_type = django_filters.CharFilter(field_name='business__business_type', lookup_expr='iexact') 
-    municipality = django_filters.CharFilter(field_name='business__municipality', lookup_expr='iexact')
+    business_type = ChoiceCodeFilter(field_name='business__business_type', choices=BUSINESS_TYPE_CHOICES)
+    municipality = ChoiceCodeFilter(field_name='business__municipality', choices=MUNICIPALITY_CHOICES)
+    location_type = ChoiceCodeFilter(field_name='business__location_type', choices=LOCATION_TYPE_CHOICES)
+    near_prefix = 'business__'
+
+    class Meta:
+        model = Offer
+        fields = []
+
+    def filter_search(self, queryset, name, value):
+        # Búsqueda en el índice invertido sobre título, descripción y datos del negocio
+        return search.search(queryset, search.OFFER, value)
+
+
+class OfferExportFilter(django_filters.FilterSet):
+    """Filtros de la exportación de ofertas (comerciantes/exports.py): los de código de OfferFilter."""
+    business_type = ChoiceCodeFilter(field_name='business__business_type', choices=BUSINESS_TYPE_CHOICES)
+    municipality = ChoiceCodeFilter(field_name='business__municipality', choices=MUNICIPALITY_CHOICES)
 
     class Meta:
         model = Offer
         fields = []
 
+
+class ArchivedOfferFilter(OfferFilter):
+    """Los mismos filtros sobre las ofertas archivadas (my_offers?include_archived)."""
+
+    class Meta:
+        model = ArchivedOffer
+        fields = []
+
     def filter_search(self, queryset, name, value):
-        return queryset.filter(
-            Q(title__icontains=value) | 
-            Q(description__icontains=value) | 
-            Q(business__name__icontains=value)
-        )
+        return search.search(queryset, search.ARCHIVED_OFFER, value)
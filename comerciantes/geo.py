@@ -0,0 +1,188 @@
+# comerciantes/geo.py
+"""
+Búsqueda de negocios y ofertas por cercanía ("cerca de mí") sin PostGIS.
+
+Cada negocio guarda su ubicación (latitude/longitude) y el geohash de esa ubicación
+(GEOHASH_PRECISION caracteres, celdas de ~150 m). Si el dueño no captura coordenadas
+se usa el centroide de su municipio (MUNICIPALITY_CENTROIDS, la cabecera municipal) y
+la ubicación queda marcada como aproximada.
+
+Una búsqueda `near=lat,lon&radius_km=r`:
+
+1. Cubre el recuadro del círculo con a lo sumo MAX_COVER_CELLS celdas de geohash, con
+   la precisión más fina que lo permita. Cada celda es un prefijo, que se consulta como
+   rango sobre el índice de `geohash` (igual que los prefijos de comerciantes/search.py).
+2. Recorta al recuadro exacto con latitude/longitude.
+3. Anota `distance_km` y descarta lo que queda fuera del radio. La distancia es
+   equirectangular (aritmética simple en SQL, sin funciones trigonométricas): a escala
+   de un estado el error frente a haversine es muy inferior a 0.1 %.
+
+La paginación por cursor antepone `distance_km` al ordenamiento (ver pagination.py).
+"""
+
+import math
+
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Sqrt
+
+# Kilómetros por grado de latitud (radio medio de la Tierra: 6371.0088 km).
+KM_PER_DEGREE = 111.195
+
+GEOHASH_PRECISION = 7
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Celdas máximas con las que se cubre el recuadro de una búsqueda (un rango por celda).
+MAX_COVER_CELLS = 12
+
+# Centroides aproximados (cabecera municipal) de los 46 municipios de Guanajuato.
+# OJITOS_DE_JAUREGUI no es un municipio: sus negocios necesitan coordenadas propias.
+MUNICIPALITY_CENTROIDS = {
+    'ABASOLO': (20.4497, -101.5300),
+    'ACAMBARO': (20.0303, -100.7222),
+    'ALLENDE': (20.9144, -100.7453),
+    'APASEO_EL_ALTO': (20.4583, -100.6208),
+    'APASEO_EL_GRANDE': (20.5464, -100.6867),
+    'ATARJEA': (21.2675, -99.7186),
+    'CELAYA': (20.5233, -100.8157),
+    'MANUEL_DOBLADO': (20.7297, -101.9533),
+    'COMONFORT': (20.7197, -100.7597),
+    'CORONEO': (20.1997, -100.3650),
+    'CORTAZAR': (20.4831, -100.9619),
+    'CUERAMARO': (20.6253, -101.6742),
+    'DOCTOR_MORA': (21.1422, -100.3194),
+    'DOLORES_HIDALGO': (21.1561, -100.9325),
+    'GUANAJUATO': (21.0190, -101.2574),
+    'HUANIMARO': (20.3672, -101.4986),
+    'IRAPUATO': (20.6767, -101.3563),
+    'JARAL_DEL_PROGRESO': (20.3714, -101.0628),
+    'JERECUARO': (20.1553, -100.5094),
+    'LEON': (21.1250, -101.6860),
+    'MOROLEON': (20.1278, -101.1917),
+    'OCAMPO': (21.6478, -101.4792),
+    'PENJAMO': (20.4311, -101.7225),
+    'PUEBLO_NUEVO': (20.5353, -101.3728),
+    'PURISIMA_DEL_RINCON': (21.0336, -101.8786),
+    'ROMITA': (20.8706, -101.5167),
+    'SALAMANCA': (20.5739, -101.1957),
+    'SALVATIERRA': (20.2133, -100.8806),
+    'SAN_DIEGO_DE_LA_UNION': (21.4664, -100.8733),
+    'SAN_FELIPE': (21.4789, -101.2142),
+    'SAN_FRANCISCO_DEL_RINCON': (21.0181, -101.8553),
+    'SAN_JOSE_ITURBIDE': (21.0014, -100.3842),
+    'SAN_LUIS_DE_LA_PAZ': (21.2983, -100.5164),
+    'SANTA_CATARINA': (21.1383, -100.0650),
+    'SANTA_CRUZ_DE_JUVENTINO_ROSAS': (20.6431, -101.0011),
+    'SANTIAGO_MARAVATIO': (20.1733, -100.9931),
+    'SILAO': (20.9439, -101.4281),
+    'TARANDACUAO': (20.0000, -100.5181),
+    'TARIMORO': (20.2878, -100.7575),
+    'TIERRA_BLANCA': (21.1003, -100.1569),
+    'URIANGATO': (20.1417, -101.1747),
+    'VALLE_DE_SANTIAGO': (20.3931, -101.1917),
+    'VICTORIA': (21.2117, -100.2144),
+    'VILLAGRAN': (20.5150, -100.9947),
+    'XICHU': (21.2983, -100.0592),
+    'YURIRIA': (20.2108, -101.1328),
+}
+
+
+def municipality_centroid(code):
+    """(lat, lon) de la cabecera del municipio, o None si no hay centroide."""
+    return MUNICIPALITY_CENTROIDS.get(code)
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Geohash de un punto: encode(21.125, -101.686) -> '9ez8njd'."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits = value = 0
+    even = True  # Los bits pares son de longitud.
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def _cell_size(precision):
+    """(alto, ancho) en grados de una celda de geohash con esa precisión."""
+    total_bits = 5 * precision
+    lon_bits = (total_bits + 1) // 2
+    return 180.0 / 2 ** (total_bits - lon_bits), 360.0 / 2 ** lon_bits
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """(lat_min, lat_max, lon_min, lon_max) del recuadro que contiene el círculo."""
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    return (
+        max(latitude - dlat, -90.0), min(latitude + dlat, 90.0),
+        max(longitude - dlon, -180.0), min(longitude + dlon, 180.0),
+    )
+
+
+def covering_cells(box):
+    """
+    Prefijos de geohash que cubren el recuadro: la precisión más fina con la que
+    bastan MAX_COVER_CELLS celdas.
+    """
+    lat_min, lat_max, lon_min, lon_max = box
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = _cell_size(precision)
+        rows = range(math.floor((lat_min + 90) / height), math.floor((lat_max + 90) / height) + 1)
+        columns = range(math.floor((lon_min + 180) / width), math.floor((lon_max + 180) / width) + 1)
+        if len(rows) * len(columns) <= MAX_COVER_CELLS or precision == 1:
+            # Se codifica el centro de cada celda (sin salirse del rango válido).
+            return sorted({
+                encode(min((row + 0.5) * height - 90, 90.0), min((column + 0.5) * width - 180, 180.0), precision)
+                for row in rows
+                for column in columns
+            })
+
+
+def _cell_q(field, prefix):
+    # Todos los geohash guardados tienen GEOHASH_PRECISION caracteres del alfabeto base32.
+    last = prefix + _BASE32[-1] * (GEOHASH_PRECISION - len(prefix))
+    return Q(**{f'{field}__gte': prefix, f'{field}__lte': last})
+
+
+def distance_expression(latitude, longitude, prefix=''):
+    """Distancia en km (equirectangular) de las filas al punto dado."""
+    dy = (F(f'{prefix}latitude') - latitude) * KM_PER_DEGREE
+    dx = (F(f'{prefix}longitude') - longitude) * (KM_PER_DEGREE * math.cos(math.radians(latitude)))
+    return Sqrt(dy * dy + dx * dx, output_field=FloatField())
+
+
+def near(queryset, latitude, longitude, radius_km, prefix=''):
+    """
+    Filtra `queryset` a los negocios (o, con prefix='business__', a las ofertas de
+    negocios) a menos de `radius_km` del punto y lo ordena por distancia, anotando
+    `distance_km`.
+    """
+    box = bounding_box(latitude, longitude, radius_km)
+    cells = Q()
+    for cell in covering_cells(box):
+        cells |= _cell_q(f'{prefix}geohash', cell)
+
+    ordering = queryset.query.order_by or queryset.model._meta.ordering
+    return (
+        queryset.filter(
+            cells,
+            **{
+                f'{prefix}latitude__range': box[:2],
+                f'{prefix}longitude__range': box[2:],
+            },
+        )
+        .annotate(distance_km=distance_expression(latitude, longitude, prefix))
+        .filter(distance_km__lte=radius_km)
+        .order_by('distance_km', *ordering)
+    )
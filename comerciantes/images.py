@@ -0,0 +1,177 @@
+# comerciantes/images.py
+"""
+Renditions de Business.logo y Offer.image.
+
+Al guardar un negocio u oferta con una imagen nueva, comerciantes/signals.py programa
+el procesamiento al confirmar la transacción, en un pool de hilos (fuera del hilo de
+la petición). Por cada tamaño de IMAGE_RENDITIONS se guardan una versión WebP y una
+JPEG, sin metadatos EXIF (la orientación se aplica antes de quitarlos), y se calcula
+un BlurHash. El resultado se guarda en `<campo>_renditions`:
+
+    {"source": "offers_images/foto.jpg", "blurhash": "LEHV6n...",
+     "sizes": {"thumb": {"width": 160, "height": 160,
+                         "webp": "renditions/offers_images/foto-3f2a-thumb.webp",
+                         "jpeg": "renditions/offers_images/foto-3f2a-thumb.jpg"}, ...}}
+
+Si el proceso se reinicia antes de terminar, `manage.py process_images` procesa las
+imágenes pendientes.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from . import blurhash
+from . import cache as list_cache
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def renditions_field(field_name):
+    return f'{field_name}_renditions'
+
+
+def needs_processing(instance, field_name):
+    """La imagen cambió (o se quitó) desde el último procesamiento."""
+    name = getattr(instance, field_name).name or ''
+    return name != (getattr(instance, renditions_field(field_name)) or {}).get('source', '')
+
+
+def _rendition_name(source_name, size_name, extension):
+    stem, _ = os.path.splitext(source_name)
+    # El hash evita choques si se sube otra imagen con el mismo nombre.
+    digest = hashlib.sha1(source_name.encode('utf-8')).hexdigest()[:8]
+    return f'renditions/{stem}-{digest}-{size_name}.{extension}'
+
+
+def _resize(image, width, height, mode):
+    if mode == 'crop':
+        return ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+    resized = image.copy()
+    resized.thumbnail((width, height), Image.Resampling.LANCZOS)
+    return resized
+
+
+def _flatten(image):
+    """JPEG no admite transparencia: se compone sobre fondo blanco."""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _save(image, name, format, **options):
+    buffer = io.BytesIO()
+    # Sin exif=...: Pillow no copia los metadatos del original.
+    image.save(buffer, format=format, **options)
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def build_renditions(field_file):
+    """Genera las renditions y el BlurHash de un archivo de imagen. Devuelve el dict a guardar."""
+    with field_file.open('rb') as source:
+        image = Image.open(source)
+        image.load()
+    # Aplica la orientación de EXIF a los píxeles antes de descartar los metadatos.
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    sizes = {}
+    for size_name, (width, height, mode) in settings.IMAGE_RENDITIONS.items():
+        resized = _resize(image, width, height, mode)
+        sizes[size_name] = {
+            'width': resized.width,
+            'height': resized.height,
+            'webp': _save(resized, _rendition_name(field_file.name, size_name, 'webp'), 'WEBP',
+                          quality=settings.IMAGE_WEBP_QUALITY, method=4),
+            'jpeg': _save(_flatten(resized), _rendition_name(field_file.name, size_name, 'jpg'), 'JPEG',
+                          quality=settings.IMAGE_JPEG_QUALITY, optimize=True, progressive=True),
+        }
+    return {'source': field_file.name, 'blurhash': blurhash.encode(image), 'sizes': sizes}
+
+
+def _rendition_names(renditions):
+    return {
+        size[key]
+        for size in (renditions or {}).get('sizes', {}).values()
+        for key in ('webp', 'jpeg')
+        if size.get(key)
+    }
+
+
+def _delete_renditions(renditions, keep=None):
+    # Con almacenamientos que sobrescriben (S3), la rendition nueva puede tener el mismo nombre.
+    for name in _rendition_names(renditions) - _rendition_names(keep):
+        try:
+            default_storage.delete(name)
+        except Exception as e:
+            logger.warning(f"No se pudo borrar la rendition {name}: {e}")
+
+
+def process(model, pk, field_name, force=False):
+    """
+    Procesa la imagen actual de un objeto y guarda el resultado. Devuelve True si
+    se actualizó. Si la imagen cambió mientras tanto, el resultado se descarta (el
+    guardado que la cambió ya programó otro procesamiento).
+    """
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or not (force or needs_processing(instance, field_name)):
+        return False
+
+    field_file = getattr(instance, field_name)
+    previous = getattr(instance, renditions_field(field_name))
+    renditions = build_renditions(field_file) if field_file.name else {}
+
+    # update() no dispara signals (no se reindexa la búsqueda), pero sí cambia updated_at
+    # para los ETag y se invalida la caché de listados a mano.
+    if field_file.name:
+        unchanged = Q(**{field_name: field_file.name})
+    else:
+        unchanged = Q(**{f'{field_name}__isnull': True}) | Q(**{field_name: ''})
+    updated = model.objects.filter(unchanged, pk=pk).update(
+        **{renditions_field(field_name): renditions, 'updated_at': timezone.now()}
+    )
+    if not updated:
+        _delete_renditions(renditions)
+        return False
+    _delete_renditions(previous, keep=renditions)
+    municipality = instance.municipality if model.__name__ == 'Business' else instance.business.municipality
+    list_cache.bump_generations(municipality)
+    return True
+
+
+def _process_in_background(model, pk, field_name):
+    try:
+        process(model, pk, field_name)
+    except Exception as e:
+        logger.error(f"Error al procesar la imagen {model.__name__}.{field_name} del objeto {pk}: {e}")
+    finally:
+        # El hilo del executor abre su propia conexión a la base de datos.
+        connection.close()
+
+
+def schedule(instance, field_name):
+    """Programa el procesamiento de la imagen al confirmar la transacción."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.IMAGE_PROCESSING_WORKERS, thread_name_prefix='images')
+    model, pk = instance.__class__, instance.pk
+    transaction.on_commit(lambda: _executor.submit(_process_in_background, model, pk, field_name))
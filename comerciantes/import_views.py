@@ -0,0 +1,79 @@
+# comerciantes/import_views.py
+import io
+import logging
+
+from django.conf import settings
+from rest_framework import permissions, serializers, status
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import imports
+
+# Crea una instancia de logger para este módulo
+logger = logging.getLogger(__name__)
+
+
+class BulkImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=list(imports.FORMATS), required=False)
+    create_owners = serializers.BooleanField(default=False)
+    dry_run = serializers.BooleanField(default=False)
+
+
+class BulkImportView(APIView):
+    """
+    POST /api/imports/businesses/ y /api/imports/offers/ (solo staff): importa el CSV o
+    JSONL del campo 'file' (ver comerciantes/imports.py). Responde con el resumen y los
+    errores por fila, hasta IMPORT_MAX_REPORTED_ERRORS; los demás solo se cuentan.
+    Para archivos muy grandes conviene `manage.py bulk_import`.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [MultiPartParser, FormParser]
+    kind = None
+
+    def post(self, request, *args, **kwargs):
+        serializer = BulkImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        upload = data['file']
+        fmt = data.get('format') or imports.detect_format(upload.name)
+        if fmt is None:
+            return Response({"detail": "No se reconoce el formato del archivo; indica format=csv o format=jsonl."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        row_errors = []
+
+        def collect(row_error):
+            if len(row_errors) < settings.IMPORT_MAX_REPORTED_ERRORS:
+                row_errors.append({'line': row_error.line, 'errors': row_error.errors})
+
+        # Los archivos grandes ya están en un temporal en disco: se leen por líneas.
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        try:
+            stats = imports.import_rows(
+                self.kind, stream, fmt,
+                create_owners=data['create_owners'],
+                dry_run=data['dry_run'],
+                on_error=collect,
+            )
+        except imports.ImportFormatError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        finally:
+            # El archivo subido lo cierra Django al terminar la petición.
+            stream.detach()
+
+        logger.info(
+            f"Importación de {self.kind} por {request.user}: {stats.rows} filas, {stats.created} creados, "
+            f"{stats.updated} actualizados, {stats.errors} con errores ({stats.elapsed:.1f} s)."
+        )
+        return Response({
+            'rows': stats.rows,
+            'created': stats.created,
+            'updated': stats.updated,
+            'errors': stats.errors,
+            'dry_run': data['dry_run'],
+            'row_errors': row_errors,
+            'row_errors_truncated': stats.errors - len(row_errors),
+        })
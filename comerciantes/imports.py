@@ -0,0 +1,412 @@
+# comerciantes/imports.py
+"""
+Importación masiva de negocios y ofertas desde CSV o JSONL (un objeto por línea).
+
+La entrada se lee como flujo y se escribe por lotes de IMPORT_BATCH_SIZE filas, cada
+lote en su propia transacción, así que la memoria no depende del tamaño del archivo:
+
+- Cada fila se valida con los campos del modelo (longitudes, números, fechas) y con
+  los códigos de MUNICIPALITY_CHOICES, LOCATION_TYPE_CHOICES y BUSINESS_TYPE_CHOICES
+  (se acepta el código o la etiqueta, sin importar mayúsculas ni acentos).
+- Negocios: uno por dueño (owner_uid, el uid de Firebase), con un solo
+  INSERT ... ON CONFLICT (user) DO UPDATE por lote. Sin coordenadas se usa el
+  centroide del municipio, o se conservan las que el dueño ya había capturado.
+- Ofertas: un bulk_create por lote; el negocio se indica con business_id u owner_uid.
+- Por lote hay una consulta para resolver dueños o negocios, el índice de búsqueda
+  se actualiza con INSERTs por lote y la caché de listados y las facetas se invalidan
+  al confirmar.
+
+Las filas inválidas no detienen la importación: se informan a `on_error` como RowError
+(número de línea y mensajes por campo). Lo usan `manage.py bulk_import` y
+POST /api/imports/<businesses|offers>/ (solo staff).
+"""
+
+import csv
+import json
+import logging
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import DatabaseError, models, transaction
+from django.db.models import Q
+
+from . import cache as list_cache
+from . import facets
+from . import search
+from .filters import choice_codes, normalize_choice
+from .models import (
+    BUSINESS_TYPE_CHOICES, LOCATION_TYPE_CHOICES, MUNICIPALITY_CHOICES, Business, Offer,
+)
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+BUSINESSES = 'businesses'
+OFFERS = 'offers'
+FORMATS = ('csv', 'jsonl')
+
+# Campos que se importan (los de membresía, imágenes y ubicación calculada no).
+BUSINESS_FIELDS = [
+    'name', 'what_they_sell', 'hours', 'municipality', 'street_address', 'latitude', 'longitude',
+    'location_type', 'contact_phone', 'social_media_facebook_username',
+    'social_media_instagram_username', 'social_media_tiktok_username', 'business_type',
+]
+OFFER_FIELDS = ['title', 'description', 'original_price', 'discount_price', 'start_date', 'end_date', 'is_active']
+
+# Columnas aceptadas: las de referencia al dueño o al negocio más los campos.
+BUSINESS_COLUMNS = ['owner_uid', 'owner_email', *BUSINESS_FIELDS]
+OFFER_COLUMNS = ['business_id', 'owner_uid', *OFFER_FIELDS]
+
+_CHOICE_CODES = {
+    'municipality': choice_codes(MUNICIPALITY_CHOICES),
+    'location_type': choice_codes(LOCATION_TYPE_CHOICES),
+    'business_type': choice_codes(BUSINESS_TYPE_CHOICES),
+}
+_BOOLEANS = {'1': True, 'true': True, 't': True, 'si': True, 'sí': True, 'yes': True,
+             '0': False, 'false': False, 'f': False, 'no': False}
+
+# Si cambia alguno, hay que reindexar las ofertas del negocio (se indexan con estos datos).
+_OFFER_INDEXED_FIELDS = ('name', 'business_type', 'municipality')
+
+
+class ImportFormatError(ValueError):
+    """El archivo no se puede leer: formato desconocido, columnas desconocidas o no es UTF-8."""
+
+
+@dataclass
+class RowError:
+    line: int
+    # Campo -> mensajes; '__all__' para los errores de la fila completa.
+    errors: dict
+
+
+@dataclass
+class ImportStats:
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    errors: int = 0
+    batches: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+@dataclass
+class _Row:
+    line: int
+    # Referencias al dueño o al negocio (owner_uid, owner_email, business_id).
+    refs: dict
+    data: dict
+
+
+def detect_format(filename):
+    """'csv' o 'jsonl' según la extensión del archivo, o None."""
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return None
+
+
+def read_rows(stream, fmt, columns):
+    """
+    Genera (línea, fila) a partir de un flujo de texto. La fila es un dict, o un
+    RowError si la línea no se puede leer.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        unknown = sorted(set(reader.fieldnames or []) - set(columns))
+        if unknown:
+            raise ImportFormatError(f"Columnas desconocidas: {', '.join(unknown)}.")
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for line, text in enumerate(stream, start=1):
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+            except ValueError as e:
+                yield line, RowError(line, {'__all__': [f"JSON inválido: {e}"]})
+                continue
+            if not isinstance(row, dict):
+                yield line, RowError(line, {'__all__': ["Cada línea debe ser un objeto JSON."]})
+                continue
+            yield line, row
+    else:
+        raise ImportFormatError(f"Formato desconocido: {fmt!r} (usa csv o jsonl).")
+
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+def _clean_value(model_field, value):
+    """Convierte el valor de la fila (texto del CSV o valor JSON) y lo valida con el campo del modelo."""
+    if isinstance(value, str):
+        value = value.strip() or None
+    if value is None:
+        if model_field.has_default():
+            return model_field.get_default()
+        if model_field.empty_strings_allowed and not model_field.null:
+            value = ''
+    elif model_field.name in _CHOICE_CODES:
+        code = _CHOICE_CODES[model_field.name].get(normalize_choice(str(value)))
+        if code is None:
+            raise ValidationError(f"'{value}' no es un código válido.")
+        value = code
+    elif isinstance(model_field, models.BooleanField) and isinstance(value, str):
+        value = _BOOLEANS.get(value.lower(), value)
+    return model_field.clean(value, None)
+
+
+def _clean_fields(model, names, row, errors):
+    data = {}
+    for name in names:
+        try:
+            data[name] = _clean_value(model._meta.get_field(name), row.get(name))
+        except ValidationError as e:
+            errors[name] = e.messages
+    return data
+
+
+def _column_errors(row, columns):
+    # csv.DictReader guarda los valores sobrantes bajo la clave None.
+    if None in row:
+        return {'__all__': ["La fila tiene más valores que columnas."]}
+    unknown = sorted(str(key) for key in row if key not in columns)
+    if unknown:
+        return {'__all__': [f"Columnas desconocidas: {', '.join(unknown)}."]}
+    return {}
+
+
+def _clean_business(line, row):
+    errors = _column_errors(row, BUSINESS_COLUMNS)
+    data = _clean_fields(Business, BUSINESS_FIELDS, row, errors)
+    refs = {'owner_uid': _text(row.get('owner_uid')), 'owner_email': _text(row.get('owner_email'))}
+    if not refs['owner_uid']:
+        errors['owner_uid'] = ["Este campo es obligatorio."]
+    elif len(refs['owner_uid']) > User._meta.get_field('uid').max_length:
+        errors['owner_uid'] = ["El uid es demasiado largo."]
+    if refs['owner_email']:
+        try:
+            validate_email(refs['owner_email'])
+        except ValidationError as e:
+            errors['owner_email'] = e.messages
+    if not {'latitude', 'longitude'} & set(errors) and (data['latitude'] is None) != (data['longitude'] is None):
+        errors['latitude'] = ["Indica latitude y longitude juntas."]
+    return RowError(line, errors) if errors else _Row(line, refs, data)
+
+
+def _clean_offer(line, row):
+    errors = _column_errors(row, OFFER_COLUMNS)
+    data = _clean_fields(Offer, OFFER_FIELDS, row, errors)
+    refs = {'business_id': _text(row.get('business_id')) or None, 'owner_uid': _text(row.get('owner_uid')) or None}
+    if (refs['business_id'] is None) == (refs['owner_uid'] is None):
+        errors['business_id'] = ["Indica business_id u owner_uid (solo uno de los dos)."]
+    elif refs['business_id'] is not None:
+        try:
+            refs['business_id'] = int(refs['business_id'])
+        except ValueError:
+            errors['business_id'] = ["Debe ser un número entero."]
+    return RowError(line, errors) if errors else _Row(line, refs, data)
+
+
+def _write_businesses(batch, create_owners, errors):
+    """Inserta o actualiza los negocios del lote. Devuelve (creados, actualizados)."""
+    # Si un dueño aparece varias veces en el lote, gana la última fila.
+    latest = {}
+    for row in batch:
+        previous = latest.get(row.refs['owner_uid'])
+        if previous is not None:
+            errors.append(RowError(previous.line, {'owner_uid': [f"Reemplazada por la línea {row.line} (mismo owner_uid)."]}))
+        latest[row.refs['owner_uid']] = row
+
+    users = dict(User.objects.filter(uid__in=list(latest)).values_list('uid', 'pk'))
+    missing = [uid for uid in latest if uid not in users]
+    if missing and create_owners:
+        # Cuentas sin contraseña: el dueño entra con Firebase y el login encuentra el usuario por uid.
+        new_users = []
+        for uid in missing:
+            user = User(username=uid, uid=uid, email=latest[uid].refs['owner_email'])
+            user.set_unusable_password()
+            new_users.append(user)
+        User.objects.bulk_create(new_users, ignore_conflicts=True)
+        users.update(User.objects.filter(uid__in=missing).values_list('uid', 'pk'))
+
+    existing = {
+        row['user_id']: row
+        for row in Business.objects.filter(user_id__in=list(users.values())).values(
+            'user_id', 'latitude', 'longitude', 'location_is_approximate', *_OFFER_INDEXED_FIELDS
+        )
+    }
+
+    businesses = []
+    for uid, row in latest.items():
+        user_id = users.get(uid)
+        if user_id is None:
+            message = "No se pudo crear el usuario." if create_owners else "No existe un usuario con este uid."
+            errors.append(RowError(row.line, {'owner_uid': [message]}))
+            continue
+        business = Business(user_id=user_id, **row.data)
+        previous = existing.get(user_id)
+        if previous is not None:
+            # Mismo cálculo de ubicación que Business.save() para un negocio ya guardado.
+            business._loaded_municipality = previous['municipality']
+            if business.latitude is None and not previous['location_is_approximate']:
+                business.latitude, business.longitude = previous['latitude'], previous['longitude']
+                business.location_is_approximate = False
+        business.sync_location()
+        businesses.append(business)
+    if not businesses:
+        return 0, 0
+
+    Business.objects.bulk_create(
+        businesses,
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=[*BUSINESS_FIELDS, 'location_is_approximate', 'geohash', 'updated_at'],
+    )
+    # No todos los motores devuelven el id de las filas actualizadas: se leen en una consulta.
+    ids = dict(Business.objects.filter(user_id__in=[b.user_id for b in businesses]).values_list('user_id', 'pk'))
+    for business in businesses:
+        business.pk = ids[business.user_id]
+
+    search.index_businesses(businesses)
+    search.index_business_offers(
+        business.pk for business in businesses
+        if business.user_id in existing
+        and any(getattr(business, name) != existing[business.user_id][name] for name in _OFFER_INDEXED_FIELDS)
+    )
+    list_cache.bump_generations(
+        *{business.municipality for business in businesses},
+        *{previous['municipality'] for previous in existing.values()},
+    )
+    facets.invalidate(facets.BUSINESS, facets.OFFER)
+    updated = sum(1 for business in businesses if business.user_id in existing)
+    return len(businesses) - updated, updated
+
+
+def _write_offers(batch, create_owners, errors):
+    """Inserta las ofertas del lote. Devuelve (creadas, 0)."""
+    business_ids = {row.refs['business_id'] for row in batch if row.refs['business_id'] is not None}
+    owner_uids = {row.refs['owner_uid'] for row in batch if row.refs['owner_uid'] is not None}
+    # Solo las columnas que usa el índice de búsqueda de las ofertas.
+    businesses = list(
+        Business.objects.filter(Q(pk__in=business_ids) | Q(user__uid__in=owner_uids))
+        .select_related('user')
+        .only('id', *_OFFER_INDEXED_FIELDS, 'user__uid', 'user__is_business_owner')
+    )
+    by_id = {business.pk: business for business in businesses}
+    by_uid = {business.user.uid: business for business in businesses}
+
+    offers = []
+    for row in batch:
+        if row.refs['business_id'] is not None:
+            business = by_id.get(row.refs['business_id'])
+            if business is None:
+                errors.append(RowError(row.line, {'business_id': ["No existe el negocio."]}))
+                continue
+        else:
+            business = by_uid.get(row.refs['owner_uid'])
+            if business is None:
+                errors.append(RowError(row.line, {'owner_uid': ["El usuario no existe o no tiene negocio."]}))
+                continue
+        offers.append(Offer(business=business, **row.data))
+    if not offers:
+        return 0, 0
+
+    # Postgres y SQLite devuelven los ids del INSERT, que necesita el índice de búsqueda.
+    Offer.objects.bulk_create(offers)
+    search.index_offers(offers)
+    list_cache.bump_generations(*{offer.business.municipality for offer in offers})
+    facets.invalidate(facets.OFFER)
+    return len(offers), 0
+
+
+_KINDS = {
+    BUSINESSES: (BUSINESS_COLUMNS, _clean_business, _write_businesses),
+    OFFERS: (OFFER_COLUMNS, _clean_offer, _write_offers),
+}
+
+
+def import_rows(kind, stream, fmt, batch_size=None, create_owners=False, dry_run=False,
+                on_error=None, on_batch=None):
+    """
+    Importa negocios (kind=BUSINESSES) u ofertas (kind=OFFERS) desde un flujo de texto
+    CSV o JSONL. Cada lote es una transacción; con `dry_run` se valida y se escribe
+    igual, pero cada transacción se revierte. Con `create_owners` se crean los usuarios
+    de los owner_uid que aún no existen (solo al importar negocios).
+
+    Los errores por fila se pasan a `on_error` al terminar cada lote, ordenados por
+    línea (los de validación junto con los de escritura). Devuelve ImportStats.
+    Lanza ImportFormatError si el archivo no se puede leer.
+    """
+    columns, clean, write = _KINDS[kind]
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    stats = ImportStats()
+    started = time.perf_counter()
+
+    def report(row_error):
+        stats.errors += 1
+        if on_error is not None:
+            on_error(row_error)
+
+    def flush(batch, pending):
+        # `pending` trae los errores de validación del lote; se informan junto con los de escritura.
+        errors = []
+        try:
+            with transaction.atomic():
+                created, updated = write(batch, create_owners, errors)
+                if dry_run:
+                    transaction.set_rollback(True)
+        except DatabaseError as e:
+            logger.warning(f"Importación de {kind}: falló el lote de las líneas {batch[0].line}-{batch[-1].line}: {e}")
+            errors = [RowError(row.line, {'__all__': [f"Error de base de datos en el lote: {e}"]}) for row in batch]
+            created = updated = 0
+        stats.created += created
+        stats.updated += updated
+        stats.batches += 1
+        report_all(pending + errors)
+        if on_batch is not None:
+            on_batch(stats)
+
+    def report_all(errors):
+        for row_error in sorted(errors, key=lambda row_error: row_error.line):
+            report(row_error)
+
+    batch = []
+    pending = []
+    try:
+        for line, row in read_rows(stream, fmt, columns):
+            stats.rows += 1
+            item = row if isinstance(row, RowError) else clean(line, row)
+            if isinstance(item, RowError):
+                pending.append(item)
+                continue
+            batch.append(item)
+            if len(batch) >= batch_size:
+                flush(batch, pending)
+                batch, pending = [], []
+    except UnicodeDecodeError as e:
+        report_all(pending)
+        raise ImportFormatError(
+            f"El archivo no está en UTF-8 ({e.reason}); se detuvo después de {stats.rows} filas "
+            f"y los lotes anteriores ya se guardaron."
+        ) from e
+    if batch:
+        flush(batch, pending)
+    else:
+        report_all(pending)
+
+    stats.elapsed = time.perf_counter() - started
+    return stats
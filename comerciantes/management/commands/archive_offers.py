@@ -0,0 +1,48 @@
+# comerciantes/management/commands/archive_offers.py
+import statistics
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from comerciantes import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve a la tabla de ofertas archivadas las ofertas vencidas o inactivas desde hace "
+        "más de OFFER_ARCHIVE_AFTER_DAYS días, por lotes y con una pausa entre lotes. "
+        "Pensado para correr de forma programada (p. ej. una vez al día)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.OFFER_ARCHIVE_BATCH_SIZE,
+                            help="Ofertas por lote (cada lote es una transacción).")
+        parser.add_argument('--pause', type=float, default=settings.OFFER_ARCHIVE_PAUSE,
+                            help="Segundos de espera entre lotes.")
+        parser.add_argument('--max-rows', type=int, help="Máximo de ofertas a archivar en esta ejecución.")
+        parser.add_argument('--dry-run', action='store_true', help="Solo cuenta las ofertas archivables.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size debe ser al menos 1.")
+
+        if options['dry_run']:
+            self.stdout.write(f"{archive.count_archivable()} ofertas archivables.")
+            return
+
+        stats = archive.archive_offers(
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            max_rows=options['max_rows'],
+            on_batch=self._report_batch if options['verbosity'] > 1 else None,
+        )
+        summary = f"{stats.archived} ofertas archivadas en {stats.batches} lotes, {stats.elapsed:.1f} s"
+        if stats.batches:
+            summary += (
+                f" ({stats.rows_per_second:.0f} ofertas/s; lote mediano "
+                f"{statistics.median(stats.batch_times) * 1000:.0f} ms, máximo {max(stats.batch_times) * 1000:.0f} ms)"
+            )
+        self.stdout.write(summary + ".")
+
+    def _report_batch(self, stats):
+        self.stdout.write(f"Lote {stats.batches}: {stats.archived} archivadas, {stats.batch_times[-1] * 1000:.0f} ms.")
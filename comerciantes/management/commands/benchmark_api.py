@@ -0,0 +1,98 @@
+# comerciantes/management/commands/benchmark_api.py
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from comerciantes.benchmark import driver
+
+
+class Command(BaseCommand):
+    help = (
+        "Reproduce en el mismo proceso una mezcla de listados, búsquedas, detalles, my_offers "
+        "y ediciones de ofertas contra las vistas de DRF (comerciantes/benchmark/driver.py), "
+        "con Firebase y Stripe simulados, sobre los datos de `manage.py benchmark_seed`. "
+        "Reporta req/s, latencias p50/p95/p99 y consultas por petición; guarda el resultado "
+        "como línea base (--save) o lo compara con una anterior (--compare)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help="Peticiones medidas.")
+        parser.add_argument('--warmup', type=int, default=200, help="Peticiones previas sin medir.")
+        parser.add_argument('--mix', default=','.join(f'{name}={weight}' for name, weight in driver.DEFAULT_MIX.items()),
+                            help="Peso de cada escenario, p. ej. list=40,search=20,retrieve=25,my_offers=10,update=5.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--list-cache', choices=['on', 'off'],
+                            help="Fuerza la caché de listados (por omisión, LIST_CACHE_ENABLED).")
+        parser.add_argument('--save', metavar='NOMBRE', help="Guarda el resultado como línea base.")
+        parser.add_argument('--compare', metavar='NOMBRE', help="Compara con una línea base guardada.")
+        parser.add_argument('--threshold', type=float, default=0.10,
+                            help="Empeoramiento relativo que cuenta como regresión (0.10 = 10%%).")
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help="Termina con error si alguna métrica empeora más que --threshold.")
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError("--requests debe ser al menos 1.")
+        mix = self._parse_mix(options['mix'])
+        if settings.DEBUG:
+            self.stderr.write("Aviso: DEBUG=True guarda cada consulta en memoria y distorsiona las latencias.")
+
+        try:
+            baseline = driver.load_baseline(options['compare']) if options['compare'] else None
+            list_cache = None if options['list_cache'] is None else options['list_cache'] == 'on'
+            report = driver.run(options['requests'], warmup=options['warmup'], mix=mix,
+                                rng_seed=options['seed'], list_cache=list_cache)
+        except driver.BenchmarkError as e:
+            raise CommandError(str(e))
+
+        self._print_report(report)
+        if options['save']:
+            path = driver.save_baseline(options['save'], report)
+            self.stdout.write(f"Línea base guardada en {path}.")
+        if baseline is not None:
+            regressions = self._print_comparison(report, baseline, options['threshold'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f"{regressions} métricas empeoraron más de {options['threshold']:.0%}.")
+
+    def _parse_mix(self, value):
+        mix = {}
+        for item in value.split(','):
+            name, _, weight = item.partition('=')
+            name = name.strip()
+            if name not in driver.SCENARIOS:
+                raise CommandError(f"Escenario desconocido: {name!r} (usa {', '.join(driver.SCENARIOS)}).")
+            try:
+                mix[name] = float(weight)
+            except ValueError:
+                raise CommandError(f"Peso inválido para {name}: {weight!r}.")
+        if not any(weight > 0 for weight in mix.values()):
+            raise CommandError("--mix debe tener al menos un escenario con peso mayor que cero.")
+        return mix
+
+    def _print_report(self, report):
+        meta, total = report['meta'], report['total']
+        self.stdout.write(
+            f"{meta['offers']} ofertas de {meta['businesses']} negocios ({meta['database']}, caché de listados "
+            f"{'activa' if meta['list_cache'] else 'inactiva'}). {total['requests']} peticiones en "
+            f"{total['elapsed']:.1f} s: {total['rps']:.0f} req/s."
+        )
+        self.stdout.write(
+            f"{'escenario':<10} {'peticiones':>10} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+            f"{'consultas':>9} {'máx':>4} {'errores':>8}"
+        )
+        for name, row in report['scenarios'].items():
+            self.stdout.write(
+                f"{name:<10} {row['requests']:>10} {row['rps']:>8.0f} {row['p50']:>8.2f} {row['p95']:>8.2f} "
+                f"{row['p99']:>8.2f} {row['queries_mean']:>9.2f} {row['queries_max']:>4} {row['errors']:>8}"
+            )
+
+    def _print_comparison(self, report, baseline, threshold):
+        self.stdout.write(f"Comparación con la línea base del {baseline['meta']['created_at'][:19]}:")
+        self.stdout.write(f"{'escenario':<10} {'métrica':<13} {'antes':>10} {'ahora':>10} {'cambio':>8}")
+        regressions = 0
+        for name, metric, before, after, change, regressed in driver.compare(report, baseline, threshold):
+            regressions += regressed
+            self.stdout.write(
+                f"{name:<10} {metric:<13} {before:>10.2f} {after:>10.2f} {change:>+8.1%}"
+                + ("  REGRESIÓN" if regressed else "")
+            )
+        return regressions
@@ -0,0 +1,296 @@
+# comerciantes/management/commands/benchmark_asgi.py
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from comerciantes.models import Business, Offer
+from mercadolocalmx_backend import firebase_tokens
+
+User = get_user_model()
+
+PREFIX = 'bench-asgi-'
+HOST = 'testserver'
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el rendimiento de las lecturas de negocios y ofertas con WSGI (vistas "
+        "síncronas, N workers) y con ASGI (comerciantes/async_views.py, un proceso) a "
+        "distintas conexiones concurrentes. Firebase se simula con una latencia fija para "
+        "los tokens que no están en caché. Cada servidor corre en un subproceso y recibe "
+        "las peticiones en memoria (sin sockets), así que se mide la aplicación y no la red."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', default='50,200,1000',
+                            help="Niveles de conexiones concurrentes, separados por comas.")
+        parser.add_argument('--requests', type=int, default=3000, help="Peticiones por nivel.")
+        parser.add_argument('--wsgi-workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', '4')),
+                            help="Workers síncronos del lado WSGI (se simulan con hilos).")
+        parser.add_argument('--verify-latency-ms', type=float, default=100.0,
+                            help="Latencia simulada de cada llamada a Firebase.")
+        parser.add_argument('--cold-ratio', type=float, default=0.2,
+                            help="Fracción de peticiones con un token que no está en caché.")
+        parser.add_argument('--businesses', type=int, default=200, help="Negocios sintéticos (3 ofertas cada uno).")
+        parser.add_argument('--seed', type=int, default=42)
+        # Uso interno: el subproceso que ejecuta un servidor.
+        parser.add_argument('--mode', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        levels = [int(value) for value in options['connections'].split(',') if value.strip()]
+        if options['mode']:
+            return self._drive(options, levels)
+
+        self._seed(options['businesses'])
+        try:
+            results = {mode: self._spawn(mode, options) for mode in ('wsgi', 'asgi')}
+        finally:
+            self._cleanup()
+
+        self.stdout.write(
+            f"Firebase simulado: {options['verify_latency_ms']:.0f} ms, {options['cold_ratio']:.0%} de tokens "
+            f"sin caché. WSGI: {options['wsgi_workers']} workers; ASGI: 1 proceso."
+        )
+        self.stdout.write(
+            f"{'conexiones':>10} {'servidor':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errores':>8}"
+        )
+        for level in levels:
+            for mode in ('wsgi', 'asgi'):
+                row = results[mode][str(level)]
+                self.stdout.write(
+                    f"{level:>10} {mode:>8} {row['rps']:>8.0f} {row['p50']:>8.1f} {row['p95']:>8.1f} "
+                    f"{row['p99']:>8.1f} {row['errors']:>8}"
+                )
+
+    # --- Proceso principal ---
+
+    def _seed(self, count):
+        self._cleanup()
+        users = User.objects.bulk_create(
+            [User(username=f'{PREFIX}{i}', uid=f'{PREFIX}{i}', is_business_owner=True) for i in range(count)]
+        )
+        businesses = Business.objects.bulk_create(
+            [
+                Business(
+                    user=user, name=f'Negocio {i}', what_they_sell='pan dulce, zapatos y ropa',
+                    hours='9-19', municipality=('LEON', 'IRAPUATO', 'CELAYA')[i % 3],
+                    street_address='Calle Conocida 1', location_type='MERCADO', business_type='PANADERIAS',
+                )
+                for i, user in enumerate(users)
+            ]
+        )
+        Offer.objects.bulk_create(
+            [
+                Offer(business=business, title=f'Oferta {j}', description='Descuento de temporada')
+                for business in businesses
+                for j in range(3)
+            ]
+        )
+        self.stdout.write(f"Creados {count} negocios y {count * 3} ofertas sintéticos.")
+
+    def _cleanup(self):
+        Offer.objects.filter(business__user__username__startswith=PREFIX).delete()
+        Business.objects.filter(user__username__startswith=PREFIX).delete()
+        User.objects.filter(username__startswith=PREFIX).delete()
+
+    def _spawn(self, mode, options):
+        command = [
+            sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'benchmark_asgi', '--mode', mode,
+            '--connections', options['connections'], '--requests', str(options['requests']),
+            '--wsgi-workers', str(options['wsgi_workers']),
+            '--verify-latency-ms', str(options['verify_latency_ms']),
+            '--cold-ratio', str(options['cold_ratio']), '--seed', str(options['seed']),
+        ]
+        env = {**os.environ, 'ASYNC_READ_VIEWS': str(mode == 'asgi')}
+        self.stdout.write(f"Midiendo {mode.upper()}...")
+        result = subprocess.run(command, env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise CommandError(f"Falló el subproceso {mode}:\n{result.stderr[-2000:]}")
+        # La última línea es el JSON con los resultados (settings.py imprime otras al importarse).
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    # --- Subproceso ---
+
+    def _drive(self, options, levels):
+        if settings.ASYNC_READ_VIEWS != (options['mode'] == 'asgi'):
+            raise CommandError("ASYNC_READ_VIEWS no corresponde al modo pedido.")
+        latency = options['verify_latency_ms'] / 1000
+        random.seed(options['seed'])
+
+        def verify_id_token(id_token, app=None, check_revoked=False, clock_skew_seconds=0):
+            time.sleep(latency)
+            now = int(time.time())
+            return {'uid': id_token.split(':')[0], 'iat': now, 'exp': now + 3600}
+
+        def get_user(uid, app=None):
+            time.sleep(latency)
+            return SimpleNamespace(disabled=False, tokens_valid_after_timestamp=0)
+
+        self._requests = self._request_mix()
+        self._cold_ratio = options['cold_ratio']
+        self._cold_tokens = itertools.count()
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(mock.patch.object(firebase_tokens.auth, 'verify_id_token', verify_id_token))
+            stack.enter_context(mock.patch.object(firebase_tokens.auth, 'get_user', get_user))
+            stack.enter_context(override_settings(FIREBASE_CERT_REFRESH_INTERVAL=0, ALLOWED_HOSTS=[HOST]))
+            if options['mode'] == 'asgi':
+                call = self._asgi_caller()
+            else:
+                call = self._wsgi_caller(options['wsgi_workers'])
+            results = asyncio.run(self._run_levels(call, levels, options['requests']))
+        self.stdout.write(json.dumps(results))
+
+    def _request_mix(self):
+        """(ruta, query string, uid del usuario) con el peso de cada lectura en el tráfico."""
+        offers = list(Offer.objects.filter(business__user__username__startswith=PREFIX).values_list('pk', flat=True))
+        businesses = list(
+            Business.objects.filter(user__username__startswith=PREFIX).values_list('pk', 'user__uid')
+        )
+        if not offers or not businesses:
+            raise CommandError("No hay datos sintéticos: ejecuta el comando sin --mode.")
+        uids = [uid for _, uid in businesses]
+        return [
+            (6, lambda: ('/api/offers/', '', random.choice(uids))),
+            (2, lambda: ('/api/offers/', 'municipality=leon', random.choice(uids))),
+            (4, lambda: (f'/api/offers/{random.choice(offers)}/', '', random.choice(uids))),
+            (2, lambda: ('/api/businesses/', '', random.choice(uids))),
+            (2, lambda: (f'/api/businesses/{random.choice(businesses)[0]}/', '', random.choice(uids))),
+            (1, lambda: ('/api/businesses/my_business/', '', random.choice(uids))),
+        ]
+
+    def _next_request(self):
+        weights = [weight for weight, _ in self._requests]
+        path, query, uid = random.choices([build for _, build in self._requests], weights=weights)[0]()
+        # Un token "frío" obliga a verificarlo con Firebase; los demás ya están en caché.
+        suffix = next(self._cold_tokens) if random.random() < self._cold_ratio else 'warm'
+        return path, query, f'{uid}:{suffix}'
+
+    async def _run_levels(self, call, levels, total):
+        # Calentamiento: cada usuario verifica su token "warm" y queda en las cachés.
+        for _ in range(20):
+            await call(*self._next_request())
+        for weight, build in self._requests:
+            for _ in range(50):
+                path, query, uid = build()
+                await call(path, query, f'{uid}:warm')
+
+        results = {}
+        for level in levels:
+            results[str(level)] = await self._run_level(call, level, max(total, level * 2))
+        return results
+
+    async def _run_level(self, call, connections, total):
+        counter = itertools.count()
+        latencies = []
+        statuses = Counter()
+
+        async def client():
+            while next(counter) < total:
+                request = self._next_request()
+                start = time.perf_counter()
+                status = await call(*request)
+                latencies.append((time.perf_counter() - start) * 1000)
+                statuses[status] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(connections)))
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+        return {
+            'rps': len(latencies) / elapsed,
+            'p50': statistics.median(latencies),
+            'p95': percentile(0.95),
+            'p99': percentile(0.99),
+            'errors': sum(count for status, count in statuses.items() if status != 200),
+        }
+
+    def _wsgi_caller(self, workers):
+        """Como gunicorn con workers síncronos: `workers` peticiones a la vez y el resto en cola."""
+        handler = WSGIHandler()
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='wsgi')
+
+        def call_sync(path, query, token):
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+                'SERVER_NAME': HOST, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_HOST': HOST, 'HTTP_AUTHORIZATION': f'Bearer {token}',
+                'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+                'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': True, 'wsgi.run_once': False,
+            }
+            status = []
+            response = handler(environ, lambda value, headers, exc_info=None: status.append(value))
+            try:
+                for _ in response:
+                    pass
+            finally:
+                # Dispara request_finished (cierra la conexión a la base de datos).
+                response.close()
+            return int(status[0].split()[0])
+
+        async def call(path, query, token):
+            return await asyncio.get_running_loop().run_in_executor(pool, call_sync, path, query, token)
+
+        return call
+
+    def _asgi_caller(self):
+        application = ASGIHandler()
+
+        async def call(path, query, token):
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '',
+                'query_string': query.encode(), 'client': ('127.0.0.1', 0), 'server': (HOST, 80),
+                'headers': [(b'host', HOST.encode()), (b'authorization', f'Bearer {token}'.encode())],
+            }
+            finished = asyncio.Event()
+            request_sent = False
+            status = None
+
+            async def receive():
+                nonlocal request_sent
+                if not request_sent:
+                    request_sent = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # Django escucha la desconexión del cliente mientras responde.
+                await finished.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                nonlocal status
+                if message['type'] == 'http.response.start':
+                    status = message['status']
+                elif message['type'] == 'http.response.body' and not message.get('more_body'):
+                    finished.set()
+
+            try:
+                await application(scope, receive, send)
+            finally:
+                finished.set()
+            return status
+
+        return call
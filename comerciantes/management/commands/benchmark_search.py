@@ -0,0 +1,132 @@
+# comerciantes/management/commands/benchmark_search.py
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from comerciantes import search
+from comerciantes.models import (
+    Business, Offer, BUSINESS_TYPE_CHOICES, LOCATION_TYPE_CHOICES, MUNICIPALITY_CHOICES,
+)
+
+User = get_user_model()
+
+WORDS = [
+    'pan', 'dulce', 'bolillo', 'conchas', 'zapatos', 'botas', 'tenis', 'piel', 'ropa',
+    'mayoreo', 'menudeo', 'playeras', 'vestidos', 'telas', 'hilos', 'tortillas', 'maíz',
+    'carne', 'pollo', 'frutas', 'verduras', 'tacos', 'pastor', 'gorditas', 'corte',
+    'cabello', 'barba', 'medicinas', 'copias', 'impresiones', 'tornillos', 'pintura',
+    'llantas', 'refacciones', 'flores', 'anillos', 'regalos', 'muebles', 'celulares',
+    'dulces', 'artesanías', 'talavera', 'descuento', 'promoción', 'oferta', 'económico',
+]
+# Frecuencia tipo Zipf: unas pocas palabras aparecen en casi todo el catálogo y la mayoría son raras.
+WORD_WEIGHTS = [1 / (rank + 1) for rank in range(len(WORDS))]
+QUERIES = ['panaderia', 'Panadería', 'zapatos piel', 'leon', 'ropa mayoreo', 'tortilla', 'acambaro']
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la latencia de la búsqueda anterior (icontains) con el índice invertido "
+        "sobre datos sintéticos. Los datos se crean dentro de una transacción que se revierte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--offers', type=int, default=100000, help="Número de ofertas sintéticas.")
+        parser.add_argument('--offers-per-business', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=20, help="Repeticiones por consulta.")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        try:
+            with transaction.atomic():
+                self._seed(options['offers'], options['offers_per_business'])
+                self._run(options['repeat'])
+                raise _Rollback()
+        except _Rollback:
+            self.stdout.write("Datos sintéticos revertidos.")
+
+    def _text(self, n):
+        return ' '.join(random.choices(WORDS, weights=WORD_WEIGHTS, k=n))
+
+    def _seed(self, offer_count, per_business):
+        business_count = max(1, offer_count // per_business)
+        start = time.perf_counter()
+
+        users = User.objects.bulk_create(
+            [User(username=f'bench-{i}', uid=f'bench-{i}', is_business_owner=True) for i in range(business_count)],
+            batch_size=1000,
+        )
+        businesses = Business.objects.bulk_create(
+            [
+                Business(
+                    user=user,
+                    name=f"{random.choice(BUSINESS_TYPE_CHOICES)[1]} {self._text(2)}",
+                    what_they_sell=self._text(12),
+                    hours='Lun-Sáb: 9am-8pm',
+                    municipality=random.choice(MUNICIPALITY_CHOICES)[0],
+                    street_address='Calle Conocida 1',
+                    location_type=random.choice(LOCATION_TYPE_CHOICES)[0],
+                    business_type=random.choice(BUSINESS_TYPE_CHOICES)[0],
+                )
+                for user in users
+            ],
+            batch_size=1000,
+        )
+        offers = Offer.objects.bulk_create(
+            [
+                Offer(business=businesses[i % business_count], title=self._text(4), description=self._text(25))
+                for i in range(offer_count)
+            ],
+            batch_size=1000,
+        )
+        self.stdout.write(f"Creados {business_count} negocios y {offer_count} ofertas en {time.perf_counter() - start:.1f} s.")
+
+        start = time.perf_counter()
+        for i in range(0, business_count, 1000):
+            search.index_businesses(businesses[i:i + 1000])
+        for i in range(0, offer_count, 1000):
+            search.index_offers(offers[i:i + 1000])
+        self.stdout.write(f"Índice construido en {time.perf_counter() - start:.1f} s.")
+
+    def _legacy_offer_search(self, value):
+        return Offer.objects.filter(
+            Q(title__icontains=value) | Q(description__icontains=value) | Q(business__name__icontains=value)
+        )
+
+    def _legacy_business_search(self, value):
+        return Business.objects.filter(
+            Q(name__icontains=value) | Q(what_they_sell__icontains=value)
+            | Q(municipality__icontains=value) | Q(business_type__icontains=value)
+        )
+
+    def _time(self, build_queryset, repeat):
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rows = list(build_queryset()[:20])
+            samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        return statistics.median(samples), p95, len(rows)
+
+    def _run(self, repeat):
+        self.stdout.write(f"{'consulta':<16} {'modelo':<9} {'motor':<10} {'p50 ms':>8} {'p95 ms':>8} {'filas':>6}")
+        for query in QUERIES:
+            cases = [
+                ('oferta', 'icontains', lambda: self._legacy_offer_search(query)),
+                ('oferta', 'índice', lambda: search.search(Offer.objects.all(), search.OFFER, query)),
+                ('negocio', 'icontains', lambda: self._legacy_business_search(query)),
+                ('negocio', 'índice', lambda: search.search(Business.objects.all(), search.BUSINESS, query)),
+            ]
+            for model_name, engine, build in cases:
+                p50, p95, rows = self._time(build, repeat)
+                self.stdout.write(f"{query:<16} {model_name:<9} {engine:<10} {p50:>8.2f} {p95:>8.2f} {rows:>6}")
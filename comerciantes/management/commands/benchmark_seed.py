@@ -0,0 +1,58 @@
+# comerciantes/management/commands/benchmark_seed.py
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from comerciantes.benchmark import data
+
+
+class Command(BaseCommand):
+    help = (
+        "Crea el catálogo sintético del benchmark (comerciantes/benchmark/data.py): negocios "
+        "de Guanajuato con la distribución de municipios, giros y ofertas por negocio de "
+        "producción, insertados por lotes con su índice de búsqueda. Reemplaza los datos "
+        "sintéticos anteriores; con --clear solo los borra."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--offers', type=int, default=10000, help="Ofertas sintéticas (de 1,000 a 1,000,000).")
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="Ofertas por lote (cada lote es una transacción).")
+        parser.add_argument('--shoppers', type=int,
+                            help="Usuarios sin negocio que hacen las lecturas (por omisión, según --offers).")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--clear', action='store_true', help="Solo borra los datos sintéticos.")
+        parser.add_argument('--allow-production', action='store_true',
+                            help="Permite ejecutarlo con DEBUG=False (p. ej. en una base de staging).")
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['allow_production']:
+            # Borra usuarios con DELETE directos (sin signals): no debe correr por error contra producción.
+            raise CommandError(
+                "benchmark_seed solo se permite con DEBUG=True; usa --allow-production si la base "
+                "de datos es de pruebas."
+            )
+        if not 1000 <= options['offers'] <= 1_000_000:
+            raise CommandError("--offers debe estar entre 1,000 y 1,000,000.")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size debe ser al menos 1.")
+
+        if data.exists():
+            deleted = data.clear()
+            self.stdout.write(f"Borrados {deleted} negocios sintéticos anteriores.")
+        if options['clear']:
+            return
+
+        stats = data.seed(
+            options['offers'],
+            batch_size=options['batch_size'],
+            shoppers=options['shoppers'],
+            rng_seed=options['seed'],
+            on_batch=self._report_batch if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(
+            f"Creados {stats.businesses} negocios, {stats.offers} ofertas y {stats.shoppers} compradores "
+            f"en {stats.batches} lotes, {stats.elapsed:.1f} s ({stats.rows_per_second:.0f} filas/s)."
+        )
+
+    def _report_batch(self, stats):
+        self.stdout.write(f"Lote {stats.batches}: {stats.offers} ofertas, {stats.elapsed:.1f} s.")
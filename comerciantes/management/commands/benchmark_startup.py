@@ -0,0 +1,149 @@
+# comerciantes/management/commands/benchmark_startup.py
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Módulos propios del proyecto (se listan aparte en el reporte).
+PROJECT_PACKAGES = ('comerciantes', 'usuarios', 'mercadolocalmx_backend')
+
+# Se ejecuta en un intérprete nuevo con -X importtime. Mide cada fase del arranque e
+# imprime los tiempos como JSON en la última línea de stdout.
+_PROBE = r'''
+import importlib, json, os, sys, time
+
+entrypoint = sys.argv[1]
+phases = {}
+start = time.perf_counter()
+
+def phase(name, fn):
+    began = time.perf_counter()
+    fn()
+    phases[name] = time.perf_counter() - began
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mercadolocalmx_backend.settings')
+phase('settings', lambda: importlib.import_module(os.environ['DJANGO_SETTINGS_MODULE']))
+import django
+phase('django.setup', django.setup)
+if entrypoint != 'manage':
+    # Incluye get_*_application() y la carga anticipada de preload.warm_up().
+    phase('application', lambda: importlib.import_module(f'mercadolocalmx_backend.{entrypoint}'))
+phases['listo'] = time.perf_counter() - start
+
+# Costo del primer uso de los SDKs en un worker (lo que no se adelantó al arrancar).
+from mercadolocalmx_backend import firebase_app, stripe_client
+phase('primer uso Firebase', firebase_app.get_app)
+phase('primer uso Stripe', stripe_client.get)
+print(json.dumps(phases))
+'''
+
+
+def _parse_importtime(stderr):
+    """
+    Devuelve {módulo: (self_us, cumulative_us)} a partir de la salida de -X importtime:
+
+        import time: self [us] | cumulative | imported package
+        import time:       706 |     426966 |   stripe
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        modules[fields[2].strip()] = (int(fields[0]), int(fields[1]))
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el tiempo de arranque de cada punto de entrada (manage.py, wsgi.py, asgi.py) "
+        "en intérpretes nuevos: tiempo por fase (settings, django.setup, aplicación, primer "
+        "uso de Firebase y Stripe) y tiempo de importación por paquete y por módulo del "
+        "proyecto (python -X importtime). Se reporta la mediana de varias ejecuciones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entrypoints', default='manage,wsgi,asgi',
+                            help="Puntos de entrada a medir, separados por comas (manage, wsgi, asgi).")
+        parser.add_argument('--runs', type=int, default=5, help="Ejecuciones por punto de entrada.")
+        parser.add_argument('--top', type=int, default=15, help="Paquetes y módulos a mostrar.")
+        parser.add_argument('--json', action='store_true', help="Imprime el resultado como JSON.")
+
+    def handle(self, *args, **options):
+        entrypoints = [value.strip() for value in options['entrypoints'].split(',') if value.strip()]
+        unknown = set(entrypoints) - {'manage', 'wsgi', 'asgi'}
+        if unknown:
+            raise CommandError(f"Puntos de entrada desconocidos: {', '.join(sorted(unknown))}")
+        if options['runs'] < 1:
+            raise CommandError("--runs debe ser al menos 1.")
+
+        results = {entrypoint: self._measure(entrypoint, options['runs']) for entrypoint in entrypoints}
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for entrypoint, result in results.items():
+            self._report(entrypoint, result, options['top'])
+
+    def _run_once(self, entrypoint):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'mercadolocalmx_backend.settings')}
+        began = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', _PROBE, entrypoint],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        wall = time.perf_counter() - began
+        if completed.returncode != 0:
+            raise CommandError(f"Falló el arranque de '{entrypoint}':\n{completed.stderr[-2000:]}")
+        # settings.py puede escribir en stdout; el JSON es la última línea.
+        phases = json.loads(completed.stdout.strip().splitlines()[-1])
+        phases['proceso'] = wall
+        return phases, _parse_importtime(completed.stderr)
+
+    def _measure(self, entrypoint, runs):
+        phase_runs = defaultdict(list)
+        package_runs = defaultdict(list)
+        module_runs = defaultdict(list)
+        for _ in range(runs):
+            phases, modules = self._run_once(entrypoint)
+            for name, seconds in phases.items():
+                phase_runs[name].append(seconds * 1000)
+            # La suma de los tiempos propios de un paquete es su costo total de importación.
+            packages = defaultdict(int)
+            for name, (self_us, cumulative_us) in modules.items():
+                packages[name.split('.')[0]] += self_us
+                if name.split('.')[0] in PROJECT_PACKAGES:
+                    module_runs[name].append(cumulative_us / 1000)
+            for name, total_us in packages.items():
+                package_runs[name].append(total_us / 1000)
+
+        def medians(values):
+            return {name: round(statistics.median(times), 1) for name, times in values.items()}
+
+        return {
+            'phases_ms': medians(phase_runs),
+            'packages_ms': medians(package_runs),
+            'project_modules_ms': medians(module_runs),
+        }
+
+    def _report(self, entrypoint, result, top):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n{entrypoint} (mediana, ms)"))
+        for name, ms in result['phases_ms'].items():
+            self.stdout.write(f"  {name:<24} {ms:>9.1f}")
+
+        packages = sorted(result['packages_ms'].items(), key=lambda item: item[1], reverse=True)[:top]
+        self.stdout.write(f"  {'paquete':<40} {'importación ms':>14}")
+        for name, ms in packages:
+            self.stdout.write(f"  {name:<40} {ms:>14.1f}")
+
+        modules = sorted(result['project_modules_ms'].items(), key=lambda item: item[1], reverse=True)[:top]
+        self.stdout.write(f"  {'módulo del proyecto':<40} {'acumulado ms':>14}")
+        for name, ms in modules:
+            self.stdout.write(f"  {name:<40} {ms:>14.1f}")
@@ -0,0 +1,83 @@
+# comerciantes/management/commands/bulk_import.py
+import csv
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from comerciantes import imports
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa negocios u ofertas desde un archivo CSV o JSONL, por lotes (cada lote es una "
+        "transacción). Las filas inválidas no detienen la importación: se informan en stderr "
+        "o, con --report, en un CSV (línea, campo, mensaje)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=[imports.BUSINESSES, imports.OFFERS])
+        parser.add_argument('path', help="Archivo CSV o JSONL ('-' para leer de la entrada estándar).")
+        parser.add_argument('--format', choices=imports.FORMATS,
+                            help="Formato del archivo (por defecto, según la extensión).")
+        parser.add_argument('--batch-size', type=int, default=settings.IMPORT_BATCH_SIZE,
+                            help="Filas por lote (cada lote es una transacción).")
+        parser.add_argument('--create-owners', action='store_true',
+                            help="Crea los usuarios de los owner_uid que no existen (solo negocios).")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Valida e intenta escribir cada lote, pero revierte las transacciones.")
+        parser.add_argument('--report', help="Escribe los errores por fila en este archivo CSV.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size debe ser al menos 1.")
+        fmt = options['format'] or imports.detect_format(options['path'])
+        if fmt is None:
+            raise CommandError("No se reconoce el formato del archivo; indica --format csv o --format jsonl.")
+
+        try:
+            stream = sys.stdin if options['path'] == '-' else open(options['path'], encoding='utf-8-sig', newline='')
+        except OSError as e:
+            raise CommandError(f"No se pudo abrir el archivo: {e}")
+        report_file = open(options['report'], 'w', encoding='utf-8', newline='') if options['report'] else None
+        self._report_writer = None
+        if report_file is not None:
+            self._report_writer = csv.writer(report_file)
+            self._report_writer.writerow(['line', 'field', 'message'])
+
+        try:
+            stats = imports.import_rows(
+                options['kind'], stream, fmt,
+                batch_size=options['batch_size'],
+                create_owners=options['create_owners'],
+                dry_run=options['dry_run'],
+                on_error=self._report_error,
+                on_batch=self._report_batch if options['verbosity'] > 1 else None,
+            )
+        except imports.ImportFormatError as e:
+            raise CommandError(str(e))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if report_file is not None:
+                report_file.close()
+
+        summary = (
+            f"{stats.rows} filas: {stats.created} creados, {stats.updated} actualizados y "
+            f"{stats.errors} con errores, en {stats.batches} lotes, {stats.elapsed:.1f} s "
+            f"({stats.rows_per_second:.0f} filas/s)"
+        )
+        if options['dry_run']:
+            summary += "; simulación, no se guardó nada"
+        self.stdout.write(summary + ".")
+
+    def _report_error(self, row_error):
+        for field, messages in row_error.errors.items():
+            for message in messages:
+                if self._report_writer is not None:
+                    self._report_writer.writerow([row_error.line, field, message])
+                else:
+                    self.stderr.write(f"Línea {row_error.line}, {field}: {message}")
+
+    def _report_batch(self, stats):
+        self.stdout.write(f"Lote {stats.batches}: {stats.rows} filas leídas, {stats.errors} con errores.")
@@ -0,0 +1,34 @@
+# comerciantes/management/commands/clean_uploads.py
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from comerciantes import uploads
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra las subidas directas (comerciantes/uploads.py) que nunca se asignaron a un "
+        "negocio u oferta, con más de UPLOAD_ORPHAN_MAX_AGE_HOURS de antigüedad. "
+        "Pensado para correr periódicamente (p. ej. una vez al día con el scheduler)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-hours', type=int, default=settings.UPLOAD_ORPHAN_MAX_AGE_HOURS,
+                            help="Solo borra las subidas con más de estas horas.")
+        parser.add_argument('--dry-run', action='store_true', help="Lista las subidas huérfanas sin borrarlas.")
+
+    def handle(self, *args, **options):
+        deleted = failed = 0
+        for key in uploads.orphaned_keys(options['max_age_hours']):
+            if options['dry_run']:
+                self.stdout.write(key)
+                continue
+            try:
+                default_storage.delete(key)
+                deleted += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"{key}: {e}")
+        if not options['dry_run']:
+            self.stdout.write(f"Subidas huérfanas: {deleted} borradas, {failed} con error.")
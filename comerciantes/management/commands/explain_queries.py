@@ -0,0 +1,61 @@
+# comerciantes/management/commands/explain_queries.py
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from comerciantes.views import BusinessViewSet, OfferViewSet
+
+User = get_user_model()
+
+# (nombre, ViewSet, acción, parámetros de la URL)
+QUERIES = [
+    ('Feed de ofertas', OfferViewSet, 'list', {}),
+    ('Ofertas por municipio', OfferViewSet, 'list', {'municipality': 'LEON'}),
+    ('Ofertas por municipio y tipo', OfferViewSet, 'list', {'municipality': 'LEON', 'business_type': 'CALZADO'}),
+    ('Búsqueda de ofertas', OfferViewSet, 'list', {'search': 'zapatos'}),
+    ('Mis ofertas', OfferViewSet, 'my_offers', {}),
+    ('Listado de negocios', BusinessViewSet, 'list', {}),
+    ('Negocios por municipio y tipo', BusinessViewSet, 'list', {'municipality': 'LEON', 'business_type': 'CALZADO'}),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Imprime el plan de ejecución (EXPLAIN) de las consultas principales de los listados, "
+        "tal como las construyen los ViewSets, para comprobar qué índices se usan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help="Ejecuta las consultas (EXPLAIN ANALYZE) en Postgres y MySQL.",
+        )
+
+    def _queryset(self, viewset_class, action, params):
+        # Usuario dueño de negocio sin guardar: basta para construir las consultas.
+        user = User(pk=1, username='explain', is_business_owner=True)
+        request = Request(APIRequestFactory().get('/', params))
+        request.user = user
+
+        view = viewset_class(action=action, request=request, format_kwarg=None, kwargs={})
+        queryset = view.filter_queryset(view.get_queryset())
+
+        # Mismo orden y límite que la primera página de la paginación por cursor.
+        paginator = view.paginator
+        ordering = paginator.get_ordering(request, queryset, view)
+        return queryset.order_by(*ordering)[:paginator.page_size + 1]
+
+    def handle(self, *args, **options):
+        explain_options = {}
+        if options['analyze'] and connection.vendor in ('postgresql', 'mysql'):
+            explain_options['analyze'] = True
+
+        self.stdout.write(f"Base de datos: {connection.vendor}\n")
+        for name, viewset_class, action, params in QUERIES:
+            queryset = self._queryset(viewset_class, action, params)
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== {name} ({viewset_class.__name__}.{action} {params})"))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write("")
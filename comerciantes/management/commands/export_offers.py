@@ -0,0 +1,38 @@
+# comerciantes/management/commands/export_offers.py
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from comerciantes import exports
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta las ofertas activas (las del listado público) en NDJSON o CSV, por bloques "
+        "de --chunk-size filas, sin cargar el catálogo en memoria."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=exports.FORMATS, default='ndjson')
+        parser.add_argument('--municipality', help="Código o nombre del municipio.")
+        parser.add_argument('--business-type', help="Código o nombre del tipo de negocio.")
+        parser.add_argument('--output', help="Archivo de salida (por defecto, la salida estándar).")
+        parser.add_argument('--chunk-size', type=int, default=settings.EXPORT_CHUNK_SIZE,
+                            help="Filas por consulta.")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size debe ser al menos 1.")
+        params = {
+            name: options[name] for name in ('municipality', 'business_type') if options[name]
+        }
+        queryset = exports.export_queryset(params)
+
+        output = open(options['output'], 'w', encoding='utf-8', newline='') if options['output'] else sys.stdout
+        try:
+            for part in exports.stream(queryset, options['format'], options['chunk_size']):
+                output.write(part)
+        finally:
+            if output is not sys.stdout:
+                output.close()
@@ -0,0 +1,43 @@
+# comerciantes/management/commands/process_images.py
+from django.core.management.base import BaseCommand
+
+from comerciantes import images
+from comerciantes.models import Business, Offer
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera las renditions y el BlurHash de los logos y las imágenes de ofertas que "
+        "están pendientes (p. ej. si el proceso se reinició antes de procesarlas). Descarga "
+        "y recodifica cada imagen, así que no va en la fase release: se ejecuta como proceso "
+        "aparte (p. ej. `heroku run python manage.py process_images --limit 500`). Un error "
+        "en una imagen se reporta y no detiene las demás."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help="Vuelve a procesar todas las imágenes (p. ej. tras cambiar IMAGE_RENDITIONS).")
+        parser.add_argument('--limit', type=int, default=0,
+                            help="Máximo de imágenes que se intentan procesar en esta ejecución (0 = todas).")
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        attempted = 0
+        for model, field_name in ((Business, 'logo'), (Offer, 'image')):
+            processed = failed = 0
+            rows = model.objects.only('pk', field_name, images.renditions_field(field_name)).order_by('pk')
+            for instance in rows.iterator(chunk_size=500):
+                if limit and attempted >= limit:
+                    break
+                if not (options['force'] or images.needs_processing(instance, field_name)):
+                    continue
+                attempted += 1
+                try:
+                    if images.process(model, instance.pk, field_name, force=options['force']):
+                        processed += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"{model.__name__} {instance.pk}: {e}")
+            self.stdout.write(f"{model.__name__}.{field_name}: {processed} procesadas, {failed} con error.")
+        if limit and attempted >= limit:
+            self.stdout.write(f"Se alcanzó el límite de {limit} imágenes; vuelve a ejecutarlo para continuar.")
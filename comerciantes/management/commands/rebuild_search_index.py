@@ -0,0 +1,22 @@
+# comerciantes/management/commands/rebuild_search_index.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from comerciantes import search
+
+
+class Command(BaseCommand):
+    help = "Reconstruye desde cero el índice de búsqueda de negocios y ofertas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Número de objetos indexados por lote.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        business_count, offer_count = search.rebuild(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Índice reconstruido: {business_count} negocios y {offer_count} ofertas en {elapsed:.1f} s."
+        ))
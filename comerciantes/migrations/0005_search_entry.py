@@ -0,0 +1,144 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:23
+
+import re
+import unicodedata
+from collections import defaultdict
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+# Copia de la tokenización y los pesos de comerciantes/search.py al crear el índice: la
+# migración no debe cambiar si cambia el módulo. Para reindexar con las reglas actuales
+# se usa `manage.py rebuild_search_index`.
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+STOPWORDS = frozenset({
+    'al', 'con', 'de', 'del', 'el', 'en', 'la', 'las', 'lo', 'los', 'para',
+    'por', 'sin', 'su', 'sus', 'un', 'una', 'unos', 'unas', 'y', 'o', 'a', 'e',
+})
+BUSINESS_WEIGHTS = {
+    'name': 8,
+    'business_type': 4,
+    'municipality': 4,
+    'location_type': 2,
+    'what_they_sell': 2,
+}
+OFFER_WEIGHTS = {
+    'title': 8,
+    'business_name': 4,
+    'business_type': 2,
+    'municipality': 2,
+    'description': 1,
+}
+
+
+def fold(text):
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def _stem(token):
+    if len(token) > 3 and token.endswith('s'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    return [
+        _stem(token)[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall(fold(text))
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+def _weighted_terms(weighted_texts):
+    terms = defaultdict(int)
+    for text, weight in weighted_texts:
+        for token in tokenize(text):
+            terms[token] += weight
+    return terms
+
+
+def business_terms(business):
+    # Las etiquetas de los choices salen del estado de los modelos en esta migración.
+    w = BUSINESS_WEIGHTS
+    return _weighted_terms([
+        (business.name, w['name']),
+        (business.get_business_type_display() if business.business_type else '', w['business_type']),
+        (business.get_municipality_display(), w['municipality']),
+        (business.get_location_type_display(), w['location_type']),
+        (business.what_they_sell, w['what_they_sell']),
+    ])
+
+
+def offer_terms(offer):
+    w = OFFER_WEIGHTS
+    business = offer.business
+    return _weighted_terms([
+        (offer.title, w['title']),
+        (business.name, w['business_name']),
+        (business.get_business_type_display() if business.business_type else '', w['business_type']),
+        (business.get_municipality_display(), w['municipality']),
+        (offer.description, w['description']),
+    ])
+
+
+def _index(SearchEntry, kind, objects, terms):
+    SearchEntry.objects.bulk_create(
+        [
+            SearchEntry(kind=kind, object_id=obj.pk, term=term, weight=weight)
+            for obj in objects
+            for term, weight in terms(obj).items()
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+def index_existing(apps, schema_editor):
+    """
+    Indexa los negocios y ofertas que ya existían: los signals solo indexan lo que se
+    guarde después.
+    """
+    Business = apps.get_model('comerciantes', 'Business')
+    Offer = apps.get_model('comerciantes', 'Offer')
+    SearchEntry = apps.get_model('comerciantes', 'SearchEntry')
+
+    for kind, queryset, terms in (
+        ('business', Business.objects.all(), business_terms),
+        ('offer', Offer.objects.select_related('business'), offer_terms),
+    ):
+        batch = []
+        for obj in queryset.order_by('pk').iterator(chunk_size=BATCH_SIZE):
+            batch.append(obj)
+            if len(batch) >= BATCH_SIZE:
+                _index(SearchEntry, kind, batch, terms)
+                batch = []
+        _index(SearchEntry, kind, batch, terms)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comerciantes', '0004_remove_business_social_media_twitter_username_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('business', 'Negocio'), ('offer', 'Oferta')], help_text='Tipo de objeto indexado.', max_length=10)),
+                ('object_id', models.PositiveBigIntegerField(help_text='ID del negocio u oferta indexado.')),
+                ('term', models.CharField(help_text='Término normalizado, en minúsculas y sin acentos.', max_length=64)),
+                ('weight', models.PositiveIntegerField(default=1, help_text='Relevancia del término para este objeto.')),
+            ],
+            options={
+                'verbose_name': 'Entrada del índice de búsqueda',
+                'verbose_name_plural': 'Entradas del índice de búsqueda',
+                'indexes': [models.Index(fields=['kind', 'term', 'object_id'], name='search_entry_term_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id', 'term'), name='unique_search_entry')],
+            },
+        ),
+        migrations.RunPython(index_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:57
+
+import django.core.validators
+from django.conf import settings
+from django.db import migrations, models
+
+from comerciantes import geo
+
+
+def set_municipality_locations(apps, schema_editor):
+    # Un UPDATE por municipio: los negocios existentes toman el centroide de su municipio.
+    Business = apps.get_model('comerciantes', 'Business')
+    for code, (latitude, longitude) in geo.MUNICIPALITY_CENTROIDS.items():
+        Business.objects.filter(municipality=code, latitude__isnull=True).update(
+            latitude=latitude,
+            longitude=longitude,
+            location_is_approximate=True,
+            geohash=geo.encode(latitude, longitude),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comerciantes', '0007_image_renditions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='geohash',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Geohash de la ubicación (índice de la búsqueda por cercanía).', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='latitude',
+            field=models.FloatField(blank=True, help_text='Latitud del negocio (opcional; por defecto, la del municipio).', null=True, validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(90)]),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='location_is_approximate',
+            field=models.BooleanField(default=True, editable=False, help_text='La ubicación es el centroide del municipio, no la del negocio.'),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='longitude',
+            field=models.FloatField(blank=True, help_text='Longitud del negocio (opcional; por defecto, la del municipio).', null=True, validators=[django.core.validators.MinValueValidator(-180), django.core.validators.MaxValueValidator(180)]),
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(fields=['geohash'], name='business_geohash_idx'),
+        ),
+        migrations.RunPython(set_municipality_locations, migrations.RunPython.noop),
+    ]
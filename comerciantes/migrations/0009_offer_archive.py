@@ -0,0 +1,55 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comerciantes', '0008_business_location'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOffer',
+            fields=[
+                ('id', models.BigIntegerField(help_text='ID que tenía la oferta en la tabla de ofertas.', primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField()),
+                ('original_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('discount_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('image', models.ImageField(blank=True, null=True, upload_to='offers_images/')),
+                ('image_renditions', models.JSONField(blank=True, default=dict)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('is_active', models.BooleanField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(help_text='Fecha y hora en que se archivó la oferta.')),
+            ],
+            options={
+                'verbose_name': 'Oferta archivada',
+                'verbose_name_plural': 'Ofertas archivadas',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='searchentry',
+            name='kind',
+            field=models.CharField(choices=[('business', 'Negocio'), ('offer', 'Oferta'), ('archived_offer', 'Oferta archivada')], help_text='Tipo de objeto indexado.', max_length=16),
+        ),
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['updated_at'], name='offer_inactive_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedoffer',
+            name='business',
+            field=models.ForeignKey(help_text='El negocio que publicó esta oferta.', on_delete=django.db.models.deletion.CASCADE, related_name='archived_offers', to='comerciantes.business'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedoffer',
+            index=models.Index(fields=['business', '-created_at', '-id'], name='archived_offer_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comerciantes', '0009_offer_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(condition=models.Q(('is_paid_member', True)), fields=['membership_expires_at'], name='business_membership_expiry_idx'),
+        ),
+    ]
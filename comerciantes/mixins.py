@@ -0,0 +1,283 @@
+# comerciantes/mixins.py
+
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from . import cache as list_cache
+from . import facets
+from . import search
+from .filters import ChoiceCodeFilter
+
+# Crea una instancia de logger para este módulo
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Se lanza cuando una acción de un ViewSet ejecuta más consultas SQL de las
+    permitidas en su presupuesto (solo con QUERY_BUDGET_ENFORCED activo).
+    """
+
+
+class _QueryCounter:
+    """execute_wrapper de Django que cuenta (y recuerda) las consultas ejecutadas."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMixin:
+    """
+    Mixin para ViewSets que impone un número máximo de consultas SQL por acción.
+
+    Se declara en la vista como `query_budgets = {'list': 1, 'retrieve': 1}`.
+    Se cuentan las consultas del handler (después de la autenticación y los permisos).
+    Con ?search=, el presupuesto suma una consulta por término de la búsqueda: la de
+    search._too_common cuando el conteo del término no está en la caché.
+    Si una acción se pasa de su presupuesto y QUERY_BUDGET_ENFORCED está activo
+    (por defecto, cuando DEBUG=True), se lanza QueryBudgetExceeded para que la
+    regresión (p. ej. un N+1 en un serializer) salte a la vista en desarrollo.
+    """
+    query_budgets = {}
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._query_counter = None
+        if settings.QUERY_BUDGET_ENFORCED and self.action in self.query_budgets:
+            self._query_counter = _QueryCounter()
+            connection.execute_wrappers.append(self._query_counter)
+
+    def get_query_budget(self):
+        return self.query_budgets[self.action] + self.get_search_allowance()
+
+    def get_search_allowance(self):
+        """Consultas de conteo que puede hacer la búsqueda de ?search= en un tipo de objeto."""
+        return len(search.query_terms(self.request.query_params.get('search', '')))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        counter = getattr(self, '_query_counter', None)
+        if counter is not None:
+            connection.execute_wrappers.remove(counter)
+            self._query_counter = None
+            budget = self.get_query_budget()
+            if len(counter.queries) > budget and response.status_code < 400:
+                logger.error(
+                    f"{self.__class__.__name__}.{self.action} ejecutó {len(counter.queries)} consultas "
+                    f"(presupuesto: {budget})."
+                )
+                raise QueryBudgetExceeded(
+                    f"{self.__class__.__name__}.{self.action} ejecutó {len(counter.queries)} consultas "
+                    f"y su presupuesto es {budget}:\n" + "\n".join(counter.queries)
+                )
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class CachedListMixin:
+    """
+    Mixin para ViewSets que cachea la respuesta de `list` (ver comerciantes/cache.py).
+
+    La clave se forma con los parámetros de la petición normalizados (los códigos de
+    municipio y tipo de negocio en cualquier forma que acepten los filtros, y la búsqueda
+    ya tokenizada) y con la generación del municipio filtrado. La respuesta indica
+    `X-Cache: HIT|MISS` y la antigüedad de la entrada en `Age` (segundos).
+
+    Los usuarios staff ven todos los registros, así que sus listados no se cachean.
+    Tampoco los listados con parámetros de `uncached_list_params`.
+
+    Con ConditionalGetMixin, el ETag se calcula al construir la entrada y se guarda con
+    ella: un HIT (o un 304) no vuelve a consultar la base de datos.
+    """
+    # Las coordenadas de ?near= casi nunca se repiten: cachearlas solo llenaría la caché.
+    uncached_list_params = ('near',)
+
+    def list(self, request, *args, **kwargs):
+        if not self._list_cacheable(request):
+            return super().list(request, *args, **kwargs)
+
+        params, municipality = self._list_cache_params(request)
+        key = list_cache.build_key(self.basename, params, municipality)
+        built = {}
+
+        def build():
+            fields = {}
+            if isinstance(self, ConditionalGetMixin):
+                # Antes que el listado: si alguien escribe entre las dos consultas, el ETag
+                # queda viejo (otro 200 después) y no más nuevo que los datos.
+                fields['etag'], _ = self._validators(request, self.filter_queryset(self.get_queryset()))
+            response = super(CachedListMixin, self).list(request, *args, **kwargs)
+            built['response'] = response
+            if response.status_code != 200:
+                return None
+            return {**fields, 'data': response.data}
+
+        entry, hit = list_cache.get_or_build(key, build)
+        return self._cached_list_response(request, entry, hit, built.get('response'))
+
+    def _cached_list_response(self, request, entry, hit, built_response):
+        """Respuesta de una entrada de la caché (o 304 si el cliente ya tiene su ETag)."""
+        etag = entry.get('etag')
+        if etag is not None:
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return self._set_validators(not_modified, etag, None)
+        response = built_response or Response(entry['data'])
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        response['Age'] = str(max(0, int(time.time() - entry['created_at'])))
+        if etag is not None:
+            self._set_validators(response, etag, None)
+        return response
+
+    def _list_cacheable(self, request):
+        return (
+            settings.LIST_CACHE_ENABLED
+            and not request.user.is_staff
+            and not any(param in request.query_params for param in self.uncached_list_params)
+        )
+
+    def _list_cache_params(self, request):
+        """
+        Devuelve los parámetros normalizados como lista de (nombre, valor) y el código
+        de municipio filtrado (o None). El host forma parte de la clave porque los
+        enlaces de paginación son absolutos.
+        """
+        filters = self.filterset_class.base_filters
+        params = [('_host', request.build_absolute_uri('/'))]
+        municipality = None
+        for name, values in request.query_params.lists():
+            for value in values:
+                param_filter = filters.get(name)
+                if isinstance(param_filter, ChoiceCodeFilter):
+                    value = param_filter.codes.get(param_filter._normalize(value), value)
+                    if name == 'municipality':
+                        municipality = value
+                elif name == 'search':
+                    value = ' '.join(search.tokenize(value))
+                params.append((name, value))
+        return params, municipality
+
+
+class FacetsMixin:
+    """
+    Acción `facets`: conteos por municipio, tipo de negocio y tipo de ubicación para
+    los filtros actuales del listado (ver comerciantes/facets.py). Sin filtros, y salvo
+    para el staff (que ve también lo que no es público), los conteos salen de la caché
+    cuando LIST_CACHE_ENABLED está activo.
+    """
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        queryset = self.get_queryset()
+        unfiltered = not set(request.query_params) & set(self.filterset_class.base_filters)
+        if not unfiltered or request.user.is_staff or not facets.enabled():
+            return Response(facets.as_response(
+                facets.count(queryset, self.filterset_class, request.query_params, request)
+            ))
+
+        counts = facets.cached_counts(self.basename)
+        hit = counts is not None
+        if not hit:
+            counts = facets.count(queryset, self.filterset_class, request.query_params, request)
+            facets.store_counts(self.basename, counts)
+        response = Response(facets.as_response(counts))
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    Mixin para ViewSets que responde GET condicionales (If-None-Match / If-Modified-Since)
+    en `list` y `retrieve`.
+
+    Los validadores salen de una sola consulta agregada sobre el queryset filtrado
+    (COUNT y MAX de `conditional_timestamp_fields`), sin cargar ni serializar filas.
+    Si coinciden, se devuelve 304 antes de ejecutar el handler.
+
+    `retrieve` envía ETag y Last-Modified. `list` solo envía ETag: quitar una fila
+    (o que una oferta venza) no cambia el MAX(updated_at), pero sí el conteo.
+
+    Los listados que van a la caché de CachedListMixin guardan el ETag con la entrada,
+    así que la consulta agregada solo se ejecuta al construirla.
+    """
+    conditional_timestamp_fields = ('updated_at',)
+
+    def list(self, request, *args, **kwargs):
+        if isinstance(self, CachedListMixin) and self._list_cacheable(request):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return self._conditional_response(
+            request, queryset, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs),
+            send_last_modified=False,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        queryset = self._lookup_queryset(kwargs)
+        return self._conditional_response(
+            request, queryset, lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs),
+        )
+
+    def _lookup_queryset(self, kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            return self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: kwargs[lookup_url_kwarg]}
+            )
+        except (TypeError, ValueError, ValidationError):
+            # Como get_object_or_404 de DRF: un id mal formado es un 404, no un error 500.
+            raise Http404
+
+    def _validators(self, request, queryset):
+        return self._build_validators(request, queryset.aggregate(**self._validator_aggregates()))
+
+    async def _avalidators(self, request, queryset):
+        return self._build_validators(request, await queryset.aaggregate(**self._validator_aggregates()))
+
+    def _validator_aggregates(self):
+        maximums = {f'max_{i}': Max(field) for i, field in enumerate(self.conditional_timestamp_fields)}
+        return {'count': Count('pk'), **maximums}
+
+    def _build_validators(self, request, values):
+        maximums = [f'max_{i}' for i in range(len(self.conditional_timestamp_fields))]
+        timestamps = [values[name] for name in maximums if values[name] is not None]
+        last_modified = int(max(timestamps).timestamp()) if timestamps else None
+
+        # La URL completa forma parte del ETag: cada combinación de filtros y cada página
+        # de cursor es una representación distinta.
+        raw = '|'.join(
+            [request.get_full_path(), str(values['count'])]
+            + [values[name].isoformat() if values[name] else '' for name in maximums]
+        )
+        etag = f'W/"{hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]}"'
+        return etag, last_modified
+
+    def _conditional_response(self, request, queryset, handler, send_last_modified=True):
+        etag, last_modified = self._validators(request, queryset)
+        if not send_last_modified:
+            last_modified = None
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler()
+            if response.status_code != 200:
+                return response
+        return self._set_validators(response, etag, last_modified)
+
+    def _set_validators(self, response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
@@ -4,10 +4,16 @@ from django.db import models
 from django.conf import settings # Para settings.AUTH_USER_MODEL
 from decimal import Decimal
 from datetime import date, timedelta # Importa 'date' y 'timedelta' para defaults de fecha
+from django.core.validators import MaxValueValidator, MinValueValidator
+
+from . import geo
 
 def default_end_date():
     return date.today() + timedelta(days=7)
 
+# Campos con conteos por valor en /facets/ (ver comerciantes/facets.py).
+FACET_FIELDS = ('municipality', 'business_type', 'location_type')
+
 # --- OPCIONAL: Definición de Choices para campos específicos ---
 # Se recomienda usar choices para estandarizar entradas de datos
 # Puedes mover esto a un archivo 'choices.py' si se vuelve muy largo.
@@ -150,6 +156,32 @@ class Business(models.Model):
         max_length=255,
         help_text="Dirección física completa del negocio."
     )
+    # Ubicación para la búsqueda por cercanía (ver comerciantes/geo.py). Sin coordenadas
+    # del dueño se usa el centroide del municipio y la ubicación queda como aproximada.
+    latitude = models.FloatField(
+        blank=True,
+        null=True,
+        validators=[MinValueValidator(-90), MaxValueValidator(90)],
+        help_text="Latitud del negocio (opcional; por defecto, la del municipio)."
+    )
+    longitude = models.FloatField(
+        blank=True,
+        null=True,
+        validators=[MinValueValidator(-180), MaxValueValidator(180)],
+        help_text="Longitud del negocio (opcional; por defecto, la del municipio)."
+    )
+    location_is_approximate = models.BooleanField(
+        default=True,
+        editable=False,
+        help_text="La ubicación es el centroide del municipio, no la del negocio."
+    )
+    geohash = models.CharField(
+        max_length=12,
+        blank=True,
+        default='',
+        editable=False,
+        help_text="Geohash de la ubicación (índice de la búsqueda por cercanía)."
+    )
     location_type = models.CharField(
         max_length=50,
         choices=LOCATION_TYPE_CHOICES, # Opcional: Usar choices definidos arriba
@@ -185,6 +217,8 @@ class Business(models.Model):
         null=True,
         help_text="Logotipo del negocio."
     )
+    # Renditions y BlurHash del logo (las genera comerciantes/images.py).
+    logo_renditions = models.JSONField(default=dict, blank=True, editable=False)
     business_type = models.CharField(
         max_length=100, 
         blank=True, 
@@ -217,6 +251,55 @@ class Business(models.Model):
         verbose_name = "Negocio"
         verbose_name_plural = "Negocios" # Buena práctica para los nombres en plural
         ordering = ['name'] # Ordenar negocios por nombre por defecto
+        indexes = [
+            # Listado paginado por (name, id) y filtros exactos por municipio / tipo de negocio.
+            models.Index(fields=['name', 'id'], name='business_name_idx'),
+            models.Index(fields=['municipality', 'business_type', 'name', 'id'], name='business_muni_type_idx'),
+            models.Index(fields=['business_type', 'name', 'id'], name='business_type_idx'),
+            # Búsqueda por cercanía: un rango de geohash por celda.
+            models.Index(fields=['geohash'], name='business_geohash_idx'),
+            # Barrido de membresías vencidas (usuarios/memberships.py): solo los miembros de pago.
+            models.Index(fields=['membership_expires_at'], condition=models.Q(is_paid_member=True),
+                         name='business_membership_expiry_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Municipio con el que se cargó: si cambia, también se invalida la caché de
+        # listados del municipio anterior. Se lee de __dict__ para no cargar un campo diferido.
+        instance._loaded_municipality = instance.__dict__.get('municipality')
+        # Valores de las facetas con los que se cargó (solo los campos no diferidos).
+        instance._loaded_facets = {name: instance.__dict__[name] for name in FACET_FIELDS if name in instance.__dict__}
+        return instance
+
+    def sync_location(self):
+        """
+        Completa la ubicación con el centroide del municipio si el dueño no capturó
+        coordenadas (o si la ubicación era el centroide del municipio anterior) y
+        recalcula el geohash.
+        """
+        previous_centroid = geo.municipality_centroid(getattr(self, '_loaded_municipality', None))
+        if (
+            self.latitude is None
+            or self.longitude is None
+            or (self.location_is_approximate and (self.latitude, self.longitude) == previous_centroid)
+        ):
+            self.latitude, self.longitude = geo.municipality_centroid(self.municipality) or (None, None)
+            self.location_is_approximate = True
+        else:
+            self.location_is_approximate = False
+        self.geohash = geo.encode(self.latitude, self.longitude) if self.latitude is not None else ''
+
+    def save(self, *args, **kwargs):
+        self.sync_location()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude', 'municipality'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'latitude', 'longitude', 'location_is_approximate', 'geohash'}
+        super().save(*args, **kwargs)
+        # Los signals de post_save ya vieron los valores anteriores; desde aquí son los guardados.
+        self._loaded_municipality = self.municipality
+        self._loaded_facets = {name: getattr(self, name) for name in FACET_FIELDS}
 
     def __str__(self):
         return self.name
@@ -262,6 +345,8 @@ class Offer(models.Model):
         blank=True,
         help_text="Imagen representativa de la oferta (opcional)."
     )
+    # Renditions y BlurHash de la imagen (las genera comerciantes/images.py).
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
 
     # Fechas de validez de la oferta
     start_date = models.DateField(
@@ -286,7 +371,125 @@ class Offer(models.Model):
         verbose_name = "Oferta"
         verbose_name_plural = "Ofertas"
         ordering = ['-created_at'] # Ordenar ofertas por fecha de creación descendente
+        indexes = [
+            # Feed público: is_active=True ordenado por (-created_at, -id), igual que la paginación.
+            models.Index(fields=['is_active', '-created_at', '-id'], name='offer_active_feed_idx'),
+            # my_offers y ofertas de un negocio, en el orden de la paginación.
+            models.Index(fields=['business', '-created_at', '-id'], name='offer_business_feed_idx'),
+            # Índice parcial (Postgres/SQLite) para end_date__gte=hoy sobre las ofertas activas.
+            models.Index(fields=['end_date'], condition=models.Q(is_active=True), name='offer_live_end_date_idx'),
+            # Barrido de archivado: ofertas inactivas por antigüedad de su último cambio.
+            models.Index(fields=['updated_at'], condition=models.Q(is_active=False), name='offer_inactive_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Si la oferta estaba en el listado público al cargarse (None si is_active o end_date están diferidos).
+        if 'is_active' in instance.__dict__ and 'end_date' in instance.__dict__:
+            instance._loaded_live = instance.is_live()
+        else:
+            instance._loaded_live = None
+        return instance
+
+    def is_live(self, today=None):
+        """Activa y sin vencer: la condición de oferta del listado público (además del dueño con suscripción)."""
+        return self.is_active and self.end_date >= (today or date.today())
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Los signals de post_save ya vieron el estado anterior.
+        self._loaded_live = self.is_live()
 
     def __str__(self):
         # Muestra el título de la oferta y el nombre del negocio asociado
-        return f"{self.title} ({self.business.name})"
\ No newline at end of file
+        return f"{self.title} ({self.business.name})"
+
+
+class ArchivedOffer(models.Model):
+    """
+    Ofertas vencidas o inactivas que `manage.py archive_offers` sacó de la tabla de
+    Offer (ver comerciantes/archive.py). Conservan el id y los datos de la oferta, y
+    el dueño las ve en my_offers con ?include_archived=true.
+    """
+    id = models.BigIntegerField(
+        primary_key=True,
+        help_text="ID que tenía la oferta en la tabla de ofertas."
+    )
+    business = models.ForeignKey(
+        Business,
+        on_delete=models.CASCADE,
+        related_name='archived_offers',
+        help_text="El negocio que publicó esta oferta."
+    )
+    title = models.CharField(max_length=200)
+    description = models.TextField()
+    original_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    discount_price = models.DecimalField(max_digits=10, decimal_places=2)
+    image = models.ImageField(upload_to='offers_images/', null=True, blank=True)
+    image_renditions = models.JSONField(default=dict, blank=True)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    is_active = models.BooleanField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(
+        help_text="Fecha y hora en que se archivó la oferta."
+    )
+
+    class Meta:
+        verbose_name = "Oferta archivada"
+        verbose_name_plural = "Ofertas archivadas"
+        ordering = ['-created_at']
+        indexes = [
+            # my_offers?include_archived, en el orden de la paginación.
+            models.Index(fields=['business', '-created_at', '-id'], name='archived_offer_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} (archivada)"
+
+
+class SearchEntry(models.Model):
+    """
+    Índice invertido para la búsqueda de texto (ver comerciantes/search.py).
+    Cada fila relaciona un término normalizado (minúsculas y sin acentos) con un
+    negocio u oferta, junto con el peso acumulado de los campos donde aparece.
+    """
+    KIND_CHOICES = [
+        ('business', 'Negocio'),
+        ('offer', 'Oferta'),
+        ('archived_offer', 'Oferta archivada'),
+    ]
+
+    kind = models.CharField(
+        max_length=16,
+        choices=KIND_CHOICES,
+        help_text="Tipo de objeto indexado."
+    )
+    object_id = models.PositiveBigIntegerField(
+        help_text="ID del negocio u oferta indexado."
+    )
+    term = models.CharField(
+        max_length=64,
+        help_text="Término normalizado, en minúsculas y sin acentos."
+    )
+    weight = models.PositiveIntegerField(
+        default=1,
+        help_text="Relevancia del término para este objeto."
+    )
+
+    class Meta:
+        verbose_name = "Entrada del índice de búsqueda"
+        verbose_name_plural = "Entradas del índice de búsqueda"
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id', 'term'], name='unique_search_entry'),
+        ]
+        indexes = [
+            # Búsquedas por prefijo de término. No incluye 'weight' a propósito: así el cálculo
+            # de relevancia por objeto usa el índice único (kind, object_id, term).
+            models.Index(fields=['kind', 'term', 'object_id'], name='search_entry_term_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> {self.kind}:{self.object_id}"
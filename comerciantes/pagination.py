@@ -0,0 +1,185 @@
+# comerciantes/pagination.py
+import itertools
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, Cursor
+
+
+def _invert(ordering):
+    return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+
+def _to_json(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Paginación por cursor opaco basada en keyset.
+
+    A diferencia de CursorPagination de DRF (que guarda solo el primer campo del
+    ordenamiento y resuelve empates con un offset), el cursor guarda todos los
+    valores del ordenamiento de la última fila, cuyo último campo debe ser único
+    (normalmente el id). Cada página se obtiene con un WHERE sobre esos valores,
+    así que la página 1000 cuesta lo mismo que la primera.
+
+    Si el queryset viene ordenado por relevancia de búsqueda (anotación
+    `search_rank`), esta se antepone al ordenamiento; si viene de una búsqueda por
+    cercanía (anotación `distance_km`), la distancia va antes que todo lo demás.
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        return self._ordering_for([queryset])
+
+    def _ordering_for(self, querysets):
+        # Siempre desde el de la clase: self.ordering queda con los prefijos de la página anterior.
+        ordering = tuple(type(self).ordering)
+        # Un prefijo solo cuenta si todos los querysets lo tienen: la búsqueda decide por
+        # separado si ordena por relevancia cada tipo (ver search._too_common).
+        annotations = [queryset.query.annotations for queryset in querysets]
+        if all('search_rank' in names for names in annotations):
+            ordering = ('-search_rank',) + ordering
+        if all('distance_km' in names for names in annotations):
+            ordering = ('distance_km',) + ordering
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self._page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self._set_page(list(queryset))
+
+    def paginate_querysets(self, querysets, request, view=None):
+        """
+        Pagina la unión de varios querysets con el mismo ordenamiento y sin ids en común
+        (p. ej. ofertas vivas y archivadas): cada uno aporta a lo sumo una página y las
+        filas se mezclan aquí según el ordenamiento. Si solo algunos vienen ordenados por
+        relevancia, ninguno se pagina por relevancia.
+        """
+        shared_ordering = self._ordering_for(querysets)
+        pages = [self._page_queryset(queryset, request, view, shared_ordering) for queryset in querysets]
+        if pages[0] is None:
+            return None
+        ordering = _invert(self.ordering) if self._reverse else self.ordering
+        rows = list(itertools.chain.from_iterable(pages))
+        # Ordenamiento estable por cada campo, del último al primero.
+        for field in reversed(ordering):
+            rows.sort(key=lambda row: getattr(row, field.lstrip('-')), reverse=field.startswith('-'))
+        return self._set_page(rows[:self.page_size + 1])
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Igual que paginate_queryset, pero evalúa la página con el ORM async."""
+        queryset = self._page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self._set_page([obj async for obj in queryset])
+
+    def _page_queryset(self, queryset, request, view, ordering=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = ordering or self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        # Para ir a la página anterior se recorre el ordenamiento al revés.
+        ordering = _invert(self.ordering) if self._reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            values = self._decode_position(self.cursor.position, queryset)
+            queryset = queryset.filter(self._keyset_filter(ordering, values))
+
+        # Se pide una fila extra para saber si hay más resultados, sin COUNT(*).
+        return queryset[:self.page_size + 1]
+
+    @property
+    def _reverse(self):
+        return bool(self.cursor and self.cursor.reverse)
+
+    def _set_page(self, results):
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if self._reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        return self.page
+
+    def _keyset_filter(self, ordering, values):
+        """
+        Filas que van después de `values` según `ordering`:
+        (a < x) OR (a = x AND b < y) OR ... La primera condición se repite fuera
+        del OR (a <= x) para que la base de datos pueda usar un rango del índice.
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+
+        first = ordering[0]
+        first_lookup = 'lte' if first.startswith('-') else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{first_lookup}': values[0]}) & condition
+
+    def _decode_position(self, position, queryset):
+        try:
+            values = json.loads(position)
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            converted = []
+            for field, value in zip(self.ordering, values):
+                try:
+                    value = queryset.model._meta.get_field(field.lstrip('-')).to_python(value)
+                except FieldDoesNotExist:
+                    pass # Anotaciones como search_rank o distance_km
+                converted.append(value)
+            return converted
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _encode_position(self, instance):
+        values = [_to_json(getattr(instance, field.lstrip('-'))) for field in self.ordering]
+        return json.dumps(values)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        position = self._encode_position(self.page[-1])
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        position = self._encode_position(self.page[0])
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+
+class OfferCursorPagination(KeysetCursorPagination):
+    # Offer.Meta.ordering = ['-created_at'] con el id como desempate
+    ordering = ('-created_at', '-id')
+
+
+class BusinessCursorPagination(KeysetCursorPagination):
+    # Business.Meta.ordering = ['name'] con el id como desempate
+    ordering = ('name', 'id')
@@ -0,0 +1,290 @@
+# comerciantes/search.py
+"""
+Motor de búsqueda de texto para negocios y ofertas.
+
+Mantiene un índice invertido (modelo SearchEntry) con los términos de los campos
+de texto y de las etiquetas de los choices, normalizados a minúsculas y sin acentos
+("Panadería" -> "panaderia"). Una búsqueda exige que todos los términos de la consulta
+aparezcan (como prefijo) y ordena los resultados por la suma de los pesos. Si hasta el
+término más selectivo tiene más de SEARCH_RANK_MAX_MATCHES entradas (palabras muy
+comunes o prefijos cortos como "pa"), no se ordena por relevancia sino por el orden
+normal del listado, como la búsqueda anterior: calcular la relevancia de decenas de
+miles de coincidencias para mostrar 20 costaba más que el resto de la consulta.
+
+`manage.py benchmark_search` compara la latencia con la búsqueda anterior (icontains).
+
+El índice se actualiza de forma incremental con los signals de comerciantes/signals.py;
+`manage.py rebuild_search_index` lo reconstruye completo.
+"""
+
+import re
+import unicodedata
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Case, IntegerField, OuterRef, Q, Subquery, Sum, When
+
+from .models import ArchivedOffer, Business, Offer, SearchEntry
+
+BUSINESS = 'business'
+OFFER = 'offer'
+# Ofertas archivadas (comerciantes/archive.py): solo se buscan desde my_offers?include_archived.
+ARCHIVED_OFFER = 'archived_offer'
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+# Términos máximos de una consulta (el resto se ignora).
+MAX_QUERY_TERMS = 8
+# Segundos que se recuerda si un término es demasiado común para ordenar por relevancia.
+COMMON_TERM_TTL = 3600
+
+# Palabras muy frecuentes que no aportan a la relevancia.
+STOPWORDS = frozenset({
+    'al', 'con', 'de', 'del', 'el', 'en', 'la', 'las', 'lo', 'los', 'para',
+    'por', 'sin', 'su', 'sus', 'un', 'una', 'unos', 'unas', 'y', 'o', 'a', 'e',
+})
+
+# Peso de cada campo en la relevancia.
+BUSINESS_WEIGHTS = {
+    'name': 8,
+    'business_type': 4,
+    'municipality': 4,
+    'location_type': 2,
+    'what_they_sell': 2,
+}
+OFFER_WEIGHTS = {
+    'title': 8,
+    'business_name': 4,
+    'business_type': 2,
+    'municipality': 2,
+    'description': 1,
+}
+
+
+def fold(text):
+    """Pasa a minúsculas y quita acentos y diéresis: 'Acámbaro' -> 'acambaro'."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def _stem(token):
+    """Singular aproximado para que 'panaderias' encuentre 'Panadería' y viceversa."""
+    if len(token) > 3 and token.endswith('s'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Divide el texto normalizado en términos indexables."""
+    return [
+        _stem(token)[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall(fold(text))
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+def _weighted_terms(weighted_texts):
+    terms = defaultdict(int)
+    for text, weight in weighted_texts:
+        for token in tokenize(text):
+            terms[token] += weight
+    return terms
+
+
+def business_terms(business):
+    w = BUSINESS_WEIGHTS
+    return _weighted_terms([
+        (business.name, w['name']),
+        (business.get_business_type_display() if business.business_type else '', w['business_type']),
+        (business.get_municipality_display(), w['municipality']),
+        (business.get_location_type_display(), w['location_type']),
+        (business.what_they_sell, w['what_they_sell']),
+    ])
+
+
+def offer_terms(offer, business):
+    w = OFFER_WEIGHTS
+    return _weighted_terms([
+        (offer.title, w['title']),
+        (business.name, w['business_name']),
+        (business.get_business_type_display() if business.business_type else '', w['business_type']),
+        (business.get_municipality_display(), w['municipality']),
+        (offer.description, w['description']),
+    ])
+
+
+def _replace_entries(kind, terms_by_id):
+    """Sustituye las entradas de los objetos dados por sus términos actuales."""
+    if not terms_by_id:
+        return
+    with transaction.atomic():
+        SearchEntry.objects.filter(kind=kind, object_id__in=list(terms_by_id)).delete()
+        SearchEntry.objects.bulk_create(
+            [
+                SearchEntry(kind=kind, object_id=object_id, term=term, weight=weight)
+                for object_id, terms in terms_by_id.items()
+                for term, weight in terms.items()
+            ],
+            batch_size=1000,
+        )
+
+
+def index_businesses(businesses):
+    _replace_entries(BUSINESS, {b.pk: business_terms(b) for b in businesses})
+
+
+def index_offers(offers):
+    """Indexa ofertas; conviene pasarlas con select_related('business')."""
+    _replace_entries(OFFER, {o.pk: offer_terms(o, o.business) for o in offers})
+
+
+def index_archived_offers(offers):
+    _replace_entries(ARCHIVED_OFFER, {o.pk: offer_terms(o, o.business) for o in offers})
+
+
+def index_business(business):
+    """
+    Reindexa un negocio y sus ofertas, también las archivadas (que se indexan con
+    el nombre y las categorías del negocio).
+    """
+    index_businesses([business])
+    for related, index in ((business.offers, index_offers), (business.archived_offers, index_archived_offers)):
+        offers = list(related.all())
+        for offer in offers:
+            offer.business = business
+        index(offers)
+
+
+def archive_offers(offer_ids):
+    """Pasa las entradas de las ofertas al tipo ARCHIVED_OFFER, con un solo UPDATE."""
+    SearchEntry.objects.filter(kind=OFFER, object_id__in=list(offer_ids)).update(kind=ARCHIVED_OFFER)
+
+
+def remove(kind, object_ids):
+    SearchEntry.objects.filter(kind=kind, object_id__in=list(object_ids)).delete()
+
+
+def _prefix_q(token):
+    """
+    Coincidencia por prefijo expresada como rango (term >= 'pan' AND term < 'pao'):
+    a diferencia de LIKE 'pan%', usa el índice (kind, term) en SQLite, MySQL y Postgres
+    sin depender de la colación.
+    """
+    upper = token[:-1] + chr(ord(token[-1]) + 1)
+    return Q(term__gte=token, term__lt=upper)
+
+
+def _too_common(kind, tokens, prefixes):
+    """
+    True si todos los términos tienen más de SEARCH_RANK_MAX_MATCHES entradas. Cada
+    conteo recorre a lo sumo ese número de entradas del índice (kind, term) y su
+    resultado se guarda COMMON_TERM_TTL segundos en la caché.
+    """
+    limit = settings.SEARCH_RANK_MAX_MATCHES
+    if not limit:
+        return False
+    cache = caches['default']
+    for token, prefix in zip(tokens, prefixes):
+        key = f'comerciantes:search:common:{kind}:{limit}:{token}'
+        common = cache.get(key)
+        if common is None:
+            common = SearchEntry.objects.filter(prefix, kind=kind).values('pk')[:limit + 1].count() > limit
+            cache.set(key, common, timeout=COMMON_TERM_TTL)
+        if not common:
+            return False
+    return True
+
+
+def query_terms(text):
+    """
+    Términos de una consulta, sin repetir y como máximo MAX_QUERY_TERMS. Cada uno puede
+    costar una consulta de conteo (_too_common) cuando su resultado no está en la caché.
+    """
+    return list(dict.fromkeys(tokenize(text)))[:MAX_QUERY_TERMS]
+
+
+def search(queryset, kind, text):
+    """
+    Filtra `queryset` a los objetos que contienen todos los términos de `text`
+    (por prefijo) y lo ordena por relevancia, anotando `search_rank`; si los términos
+    son demasiado comunes (_too_common), conserva el orden del queryset.
+    """
+    tokens = query_terms(text)
+    if not tokens:
+        return queryset
+
+    prefixes = [_prefix_q(token) for token in tokens]
+
+    # Un semijoin por término (rango sobre el índice (kind, term, object_id)): el objeto
+    # debe contener todos los términos de la consulta.
+    for prefix in prefixes:
+        queryset = queryset.filter(
+            pk__in=SearchEntry.objects.filter(prefix, kind=kind).values('object_id')
+        )
+
+    if _too_common(kind, tokens, prefixes):
+        return queryset
+
+    # Relevancia: suma de los pesos de los términos coincidentes. Se calcula solo para
+    # los objetos ya filtrados, leyendo sus entradas por (kind, object_id).
+    any_prefix = prefixes[0]
+    for prefix in prefixes[1:]:
+        any_prefix |= prefix
+    rank = (
+        SearchEntry.objects.filter(kind=kind, object_id=OuterRef('pk'))
+        .values('object_id')
+        .annotate(score=Sum(Case(When(any_prefix, then='weight'), default=0, output_field=IntegerField())))
+        .values('score')
+    )
+
+    ordering = queryset.query.order_by or queryset.model._meta.ordering
+    return (
+        queryset.annotate(search_rank=Subquery(rank, output_field=IntegerField()))
+        .order_by('-search_rank', *ordering, '-pk')
+    )
+
+
+def _index_in_batches(queryset, index, batch_size):
+    count = 0
+    batch = []
+    for obj in queryset.order_by('pk').iterator(chunk_size=batch_size):
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            index(batch)
+            count += len(batch)
+            batch = []
+    index(batch)
+    return count + len(batch)
+
+
+def index_business_offers(business_ids, batch_size=1000):
+    """
+    Reindexa, por lotes, las ofertas (vivas y archivadas) de varios negocios; p. ej.
+    después de cambiar sus nombres o categorías con un UPDATE masivo.
+    """
+    business_ids = list(business_ids)
+    if not business_ids:
+        return 0
+    return _index_in_batches(
+        Offer.objects.filter(business_id__in=business_ids).select_related('business'), index_offers, batch_size
+    ) + _index_in_batches(
+        ArchivedOffer.objects.filter(business_id__in=business_ids).select_related('business'),
+        index_archived_offers, batch_size,
+    )
+
+
+def rebuild(batch_size=1000):
+    """
+    Reconstruye el índice completo por lotes. Devuelve (negocios, ofertas) indexados;
+    las ofertas incluyen las archivadas.
+    """
+    SearchEntry.objects.all().delete()
+
+    business_count = _index_in_batches(Business.objects.all(), index_businesses, batch_size)
+    offer_count = _index_in_batches(Offer.objects.select_related('business'), index_offers, batch_size)
+    offer_count += _index_in_batches(
+        ArchivedOffer.objects.select_related('business'), index_archived_offers, batch_size
+    )
+    return business_count, offer_count
@@ -1,12 +1,72 @@
+from collections.abc import Mapping
+
+from django.conf import settings
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 from .models import Business, Offer # Correct import for serializers to use models
 
+
+class RenditionMapField(serializers.ReadOnlyField):
+    """
+    Renditions de una imagen (ver comerciantes/images.py) con sus URLs:
+    {"blurhash": "...", "sizes": {"thumb": {"width": 160, "height": 160, "webp": url, "jpeg": url}, ...}}
+
+    Mientras la imagen `image_field` no se ha procesado (una recién subida, o las que
+    había antes de las renditions hasta que corre `manage.py process_images`), es
+    {"original": url} para que el cliente no se quede sin imagen. Sin imagen, {}.
+    """
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return super().get_attribute(instance), getattr(instance, self.image_field)
+
+    def _url(self, name):
+        url = default_storage.url(name)
+        request = self.context.get('request')
+        # Igual que ImageField de DRF: las URLs relativas (almacenamiento local) se hacen absolutas.
+        return request.build_absolute_uri(url) if request is not None and url.startswith('/') else url
+
+    def to_representation(self, value):
+        value, image = value
+        if not value or not value.get('sizes'):
+            return {'original': self._url(image.name)} if image else {}
+        return {
+            'blurhash': value.get('blurhash', ''),
+            'sizes': {
+                name: {
+                    'width': size['width'],
+                    'height': size['height'],
+                    'webp': self._url(size['webp']),
+                    'jpeg': self._url(size['jpeg']),
+                }
+                for name, size in value['sizes'].items()
+            },
+        }
+
+
+def _reject_image_upload(data, field_name):
+    # Las imágenes solo se suben directo al almacenamiento (comerciantes/uploads.py): la API
+    # ya no recibe sus bytes, y un campo que se ignorara en silencio confundiría al cliente.
+    # Se revisan los datos de entrada (no initial_data) para cubrir también run_validation,
+    # con la que OfferViewSet.bulk_create valida cada oferta.
+    if isinstance(data, Mapping) and field_name in data:
+        raise serializers.ValidationError(
+            {field_name: "Se sube con /api/uploads/presign/ y se asigna con /api/uploads/finalize/."}
+        )
+
+
 class BusinessSerializer(serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='user.uid') # Asumiendo que quieres el UID de Firebase
+    # El logo se lee como renditions (el original solo mientras no las hay); se sube con /api/uploads/.
+    logo_renditions = RenditionMapField(image_field='logo')
+    # Solo en los resultados de ?near= (anotación de comerciantes/geo.py).
+    distance_km = serializers.FloatField(read_only=True)
 
     class Meta:
         model = Business
-        fields = '__all__'
+        exclude = ['logo']
         read_only_fields = [
             'user',
             'is_paid_member',
@@ -16,6 +76,17 @@ class BusinessSerializer(serializers.ModelSerializer):
             'updated_at',
         ]
 
+    def to_internal_value(self, data):
+        _reject_image_upload(data, 'logo')
+        return super().to_internal_value(data)
+
+    def validate(self, attrs):
+        # Las coordenadas se capturan juntas (o se quitan juntas para volver al centroide del municipio).
+        if 'latitude' in attrs or 'longitude' in attrs:
+            if (attrs.get('latitude') is None) != (attrs.get('longitude') is None):
+                raise serializers.ValidationError("Indica latitude y longitude juntas.")
+        return attrs
+
 class OfferSerializer(serializers.ModelSerializer):
     # ¡CAMBIO CLAVE AQUÍ!
     # Definimos 'business' para que use el BusinessSerializer.
@@ -23,16 +94,74 @@ class OfferSerializer(serializers.ModelSerializer):
     # (ej., un comerciante solo puede crear ofertas para su propio negocio),
     # y solo queremos mostrar los detalles del negocio, no permitir su edición a través de la oferta.
     business = BusinessSerializer(read_only=True)
+    # La imagen se lee como renditions (el original solo mientras no las hay); se sube con /api/uploads/.
+    image_renditions = RenditionMapField(image_field='image')
+    # Distancia al negocio, solo en los resultados de ?near=.
+    distance_km = serializers.FloatField(read_only=True)
+    # Solo en las ofertas archivadas (my_offers?include_archived=true).
+    archived_at = serializers.DateTimeField(read_only=True)
 
     class Meta:
         model = Offer
         fields = [
             'id', 'business', 'title', 'description', 'original_price',
-            'discount_price', 'image', 'start_date', 'end_date', 'is_active',
-            'created_at', 'updated_at'
+            'discount_price', 'image_renditions', 'start_date', 'end_date', 'is_active',
+            'created_at', 'updated_at', 'distance_km', 'archived_at'
         ]
         # ¡CAMBIO CLAVE AQUÍ!
         # Removemos 'business' de read_only_fields en el Meta.
         # Ya que lo hemos definido explícitamente arriba para ser serializado como un objeto,
         # no queremos que DRF lo trate solo como un ID read-only para la salida.
-        read_only_fields = ['id', 'created_at', 'updated_at']
\ No newline at end of file
+        read_only_fields = ['id', 'created_at', 'updated_at']
+
+    def to_internal_value(self, data):
+        _reject_image_upload(data, 'image')
+        return super().to_internal_value(data)
+
+
+# --- Acciones masivas de OfferViewSet (bulk_create, bulk_update, bulk_deactivate) ---
+class OfferBulkCreateSerializer(serializers.Serializer):
+    # Cada oferta se valida por separado con OfferSerializer (ver OfferViewSet.bulk_create).
+    offers = serializers.ListField(
+        child=serializers.DictField(), allow_empty=False, max_length=settings.OFFER_BULK_MAX_ITEMS
+    )
+
+
+class OfferBulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=settings.OFFER_BULK_MAX_ITEMS
+    )
+
+
+class OfferBulkUpdateSerializer(OfferBulkIdsSerializer):
+    """
+    Los mismos cambios para todas las ofertas de `ids`: `changes` con campos de
+    OfferSerializer y/o `extend_days`, que mueve end_date esa cantidad de días
+    (negativa para acortarla).
+    """
+    changes = serializers.DictField(required=False, default=dict)
+    extend_days = serializers.IntegerField(required=False, min_value=-365, max_value=365)
+
+    def validate_extend_days(self, value):
+        # Con 0 no cambiaría nada, pero se responderían las ofertas como actualizadas.
+        if value == 0:
+            raise serializers.ValidationError("Debe ser distinto de 0.")
+        return value
+
+    def validate_changes(self, value):
+        if 'image' in value:
+            raise serializers.ValidationError("La imagen se cambia con /api/uploads/, una oferta a la vez.")
+        offer = OfferSerializer(data=value, partial=True, context=self.context)
+        offer.is_valid(raise_exception=True)
+        # OfferSerializer ignora los campos de solo lectura y los desconocidos.
+        ignored = sorted(set(value) - set(offer.validated_data))
+        if ignored:
+            raise serializers.ValidationError(f"Campos que no se pueden cambiar: {', '.join(ignored)}.")
+        return offer.validated_data
+
+    def validate(self, attrs):
+        if not attrs['changes'] and 'extend_days' not in attrs:
+            raise serializers.ValidationError("Indica changes, extend_days o ambos.")
+        if 'extend_days' in attrs and 'end_date' in attrs['changes']:
+            raise serializers.ValidationError("Usa end_date o extend_days, no ambos.")
+        return attrs
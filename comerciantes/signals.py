@@ -0,0 +1,170 @@
+# comerciantes/signals.py
+from datetime import date
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+import logging
+
+from .models import ArchivedOffer, Business, FACET_FIELDS, Offer
+from . import cache as list_cache
+from . import facets
+from . import images
+from . import search
+
+# Crea una instancia de logger para este módulo
+logger = logging.getLogger(__name__)
+
+
+# --- Índice de búsqueda: se actualiza de forma incremental ---
+@receiver(post_save, sender=Business)
+def index_business_on_save(sender, instance, raw=False, **kwargs):
+    """
+    Reindexa el negocio y sus ofertas (que incluyen el nombre y las categorías del negocio).
+    """
+    if raw:
+        return
+    search.index_business(instance)
+
+
+@receiver(post_delete, sender=Business)
+def remove_business_from_index(sender, instance, **kwargs):
+    # Las ofertas se eliminan en cascada y disparan su propio post_delete.
+    search.remove(search.BUSINESS, [instance.pk])
+
+
+@receiver(post_save, sender=Offer)
+def index_offer_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_offers([instance])
+
+
+@receiver(post_delete, sender=Offer)
+def remove_offer_from_index(sender, instance, **kwargs):
+    search.remove(search.OFFER, [instance.pk])
+
+
+@receiver(post_delete, sender=ArchivedOffer)
+def remove_archived_offer_from_index(sender, instance, **kwargs):
+    search.remove(search.ARCHIVED_OFFER, [instance.pk])
+
+
+# --- Caché de listados: se invalida por municipio ---
+def _offer_municipality(offer):
+    if Offer.business.is_cached(offer):
+        return offer.business.municipality
+    return Business.objects.filter(pk=offer.business_id).values_list('municipality', flat=True).first()
+
+
+@receiver(post_save, sender=Business)
+@receiver(post_delete, sender=Business)
+def invalidate_business_lists(sender, instance, **kwargs):
+    # Las ofertas muestran los datos del negocio, así que se invalidan ambos listados.
+    list_cache.bump_generations(instance.municipality, getattr(instance, '_loaded_municipality', None))
+
+
+@receiver(post_save, sender=Offer)
+@receiver(post_delete, sender=Offer)
+def invalidate_offer_lists(sender, instance, **kwargs):
+    list_cache.bump_generations(_offer_municipality(instance))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_owner_lists(sender, instance, created, raw=False, **kwargs):
+    """
+    Los listados solo muestran negocios y ofertas de dueños con suscripción: si
+    is_business_owner cambia, cambia la visibilidad del negocio del usuario.
+    """
+    if raw or created or not instance.business_owner_changed():
+        return
+    municipality = Business.objects.filter(user=instance).values_list('municipality', flat=True).first()
+    if municipality:
+        list_cache.bump_generations(municipality)
+        # Cambia la visibilidad del negocio y de todas sus ofertas: se recalculan las facetas.
+        facets.invalidate(facets.BUSINESS, facets.OFFER)
+
+
+# --- Facetas sin filtros: se ajustan los conteos (ver comerciantes/facets.py) ---
+# Sin caché de facetas no hay nada que ajustar: los handlers salen antes de consultar
+# la visibilidad del dueño o las ofertas vigentes.
+def _owner_is_visible(business):
+    # Solo cuentan los negocios (y ofertas) de dueños con suscripción, como en los listados.
+    if Business.user.is_cached(business):
+        return business.user.is_business_owner
+    return get_user_model().objects.filter(pk=business.user_id, is_business_owner=True).exists()
+
+
+def _offer_business(offer):
+    if Offer.business.is_cached(offer):
+        return offer.business
+    return Business.objects.only('user', *FACET_FIELDS).filter(pk=offer.business_id).first()
+
+
+@receiver(post_save, sender=Business)
+def adjust_business_facets(sender, instance, created, raw=False, **kwargs):
+    if raw or not facets.enabled():
+        return
+    loaded = getattr(instance, '_loaded_facets', None)
+    current = facets.values_of(instance)
+    if not created and loaded == current:
+        return
+    if not created and (loaded is None or len(loaded) < len(FACET_FIELDS)):
+        # No se sabe con qué valores se cargó (campos diferidos o instancia sin cargar).
+        facets.invalidate(facets.BUSINESS, facets.OFFER)
+        return
+    if not _owner_is_visible(instance):
+        return
+    facets.adjust(facets.BUSINESS, None if created else loaded, current)
+    if not created:
+        # Sus ofertas del listado pasan a contar con los valores nuevos del negocio.
+        live = Offer.objects.filter(business=instance, is_active=True, end_date__gte=date.today()).count()
+        if live:
+            facets.adjust(facets.OFFER, loaded, current, amount=live)
+
+
+@receiver(post_delete, sender=Business)
+def remove_business_from_facets(sender, instance, **kwargs):
+    # Las ofertas se eliminan en cascada y se descuentan con su propio post_delete.
+    if facets.enabled() and _owner_is_visible(instance):
+        facets.adjust(facets.BUSINESS, facets.values_of(instance), None)
+
+
+@receiver(post_save, sender=Offer)
+def adjust_offer_facets(sender, instance, created, raw=False, **kwargs):
+    if raw or not facets.enabled():
+        return
+    was_live = False if created else getattr(instance, '_loaded_live', None)
+    if was_live is None:
+        facets.invalidate(facets.OFFER)
+        return
+    is_live = instance.is_live()
+    if was_live == is_live:
+        return
+    business = _offer_business(instance)
+    if business is not None and _owner_is_visible(business):
+        values = facets.values_of(business)
+        facets.adjust(facets.OFFER, values if was_live else None, values if is_live else None)
+
+
+@receiver(post_delete, sender=Offer)
+def remove_offer_from_facets(sender, instance, **kwargs):
+    if not facets.enabled() or not instance.is_live():
+        return
+    business = _offer_business(instance)
+    if business is not None and _owner_is_visible(business):
+        facets.adjust(facets.OFFER, facets.values_of(business), None)
+
+
+# --- Renditions de imágenes: se generan en segundo plano ---
+@receiver(post_save, sender=Business)
+def schedule_logo_renditions(sender, instance, raw=False, **kwargs):
+    if not raw and images.needs_processing(instance, 'logo'):
+        images.schedule(instance, 'logo')
+
+
+@receiver(post_save, sender=Offer)
+def schedule_image_renditions(sender, instance, raw=False, **kwargs):
+    if not raw and images.needs_processing(instance, 'image'):
+        images.schedule(instance, 'image')
@@ -1,3 +1,1385 @@
-from django.test import TestCase
+# comerciantes/tests.py
+import asyncio
+import base64
+import contextlib
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+from unittest import mock
+from urllib.parse import urlencode
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import include, path
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from usuarios.models import CustomUser
+
+from . import cache as list_cache
+from . import urls as comerciantes_urls
+from . import archive, blurhash, exports, facets, geo, images, imports, search, signals, uploads
+from .mixins import QueryBudgetExceeded, QueryBudgetMixin
+from .benchmark import data as benchmark_data
+from .models import Business, Offer, SearchEntry
+from .serializers import BusinessSerializer, OfferSerializer
+
+# URLconf de AsyncReadViewTests: las lecturas async delante del router, como con ASYNC_READ_VIEWS.
+urlpatterns = [path('api/', include(comerciantes_urls.async_urlpatterns + comerciantes_urls.router.urls))]
+
+
+def image_bytes(size=(300, 200), mode='RGB', color=(200, 100, 50), format='JPEG', orientation=None):
+    image = Image.new(mode, size, color)
+    buffer = io.BytesIO()
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        image.save(buffer, format=format, exif=exif)
+    else:
+        image.save(buffer, format=format)
+    return buffer.getvalue()
+
+
+class LocalStorageTestCase(TestCase):
+    """
+    Sustituye S3 por un FileSystemStorage en un directorio temporal (MEDIA_STORAGE='local'
+    hace lo mismo en desarrollo).
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.enterContext(override_settings(
+            STORAGES={
+                **settings.STORAGES,
+                'default': {
+                    'BACKEND': 'django.core.files.storage.FileSystemStorage',
+                    'OPTIONS': {'location': self.media_root, 'base_url': '/media/'},
+                },
+            },
+            MEDIA_URL='/media/',
+        ))
+        self.user = CustomUser.objects.create(username='dueno', uid='uid-dueno', is_business_owner=True)
+
+    def create_business(self, logo=None):
+        return Business.objects.create(
+            user=self.user, name='Panadería La Espiga', what_they_sell='Pan dulce', hours='9-18',
+            municipality='LEON', street_address='Madero 10', location_type='MERCADO',
+            business_type='PANADERIAS',
+            logo=default_storage.save('business_logos/logo.jpg', ContentFile(logo)) if logo else None,
+        )
+
+    def open_rendition(self, name):
+        with default_storage.open(name) as file:
+            image = Image.open(file)
+            image.load()
+        return image
+
+
+class ImageRenditionTests(LocalStorageTestCase):
+
+    def test_process_builds_webp_and_jpeg_for_each_size(self):
+        business = self.create_business(logo=image_bytes((1600, 1000)))
+
+        self.assertTrue(images.process(Business, business.pk, 'logo'))
+
+        renditions = Business.objects.get(pk=business.pk).logo_renditions
+        self.assertEqual(renditions['source'], business.logo.name)
+        self.assertEqual(set(renditions['sizes']), set(settings.IMAGE_RENDITIONS))
+        thumb, large = renditions['sizes']['thumb'], renditions['sizes']['large']
+        self.assertEqual((thumb['width'], thumb['height']), (160, 160))
+        self.assertEqual((large['width'], large['height']), (1280, 800))
+        self.assertEqual(self.open_rendition(large['webp']).format, 'WEBP')
+        self.assertEqual(self.open_rendition(large['jpeg']).size, (1280, 800))
+
+    def test_command_stops_at_the_limit_and_skips_failures(self):
+        broken = self.create_business(logo=b'no es una imagen')
+        pending = [
+            Offer.objects.create(business=broken, title='Conchas', description='Pan', start_date=date.today(),
+                                 end_date=date.today(),
+                                 image=default_storage.save('offers_images/oferta.jpg', ContentFile(image_bytes())))
+            for _ in range(2)
+        ]
+        stderr = io.StringIO()
+
+        call_command('process_images', '--limit', '2', stdout=io.StringIO(), stderr=stderr)
+
+        self.assertIn(f'Business {broken.pk}', stderr.getvalue())
+        processed = [bool(Offer.objects.get(pk=offer.pk).image_renditions) for offer in pending]
+        self.assertEqual(processed, [True, False])
+
+    def test_already_processed_image_is_skipped(self):
+        business = self.create_business(logo=image_bytes())
+        images.process(Business, business.pk, 'logo')
+
+        self.assertFalse(images.process(Business, business.pk, 'logo'))
+
+    def test_exif_orientation_is_applied_and_metadata_dropped(self):
+        # Orientación 6: la cámara guardó la foto girada 90°; se ve vertical.
+        business = self.create_business(logo=image_bytes((300, 200), orientation=6))
+
+        images.process(Business, business.pk, 'logo')
+
+        small = Business.objects.get(pk=business.pk).logo_renditions['sizes']['small']
+        self.assertEqual((small['width'], small['height']), (200, 300))
+        jpeg = self.open_rendition(small['jpeg'])
+        self.assertEqual(jpeg.size, (200, 300))
+        self.assertEqual(dict(jpeg.getexif()), {})
+
+    def test_transparent_png_is_flattened_on_white_for_jpeg(self):
+        business = self.create_business()
+        business.logo = default_storage.save(
+            'business_logos/logo.png', ContentFile(image_bytes((100, 100), 'RGBA', (0, 0, 0, 0), 'PNG'))
+        )
+        business.save()
+
+        images.process(Business, business.pk, 'logo')
+
+        sizes = Business.objects.get(pk=business.pk).logo_renditions['sizes']
+        self.assertEqual(self.open_rendition(sizes['thumb']['webp']).mode, 'RGBA')
+        self.assertEqual(self.open_rendition(sizes['thumb']['jpeg']).getpixel((80, 80)), (255, 255, 255))
+
+    def test_new_image_replaces_previous_renditions(self):
+        business = self.create_business(logo=image_bytes())
+        images.process(Business, business.pk, 'logo')
+        previous = Business.objects.get(pk=business.pk).logo_renditions
+
+        business.refresh_from_db()
+        business.logo = default_storage.save('business_logos/nuevo.jpg', ContentFile(image_bytes((400, 400))))
+        business.save()
+        images.process(Business, business.pk, 'logo')
+
+        current = Business.objects.get(pk=business.pk).logo_renditions
+        self.assertEqual(current['source'], business.logo.name)
+        for size in previous['sizes'].values():
+            self.assertFalse(default_storage.exists(size['webp']))
+            self.assertFalse(default_storage.exists(size['jpeg']))
+        for size in current['sizes'].values():
+            self.assertTrue(default_storage.exists(size['webp']))
+
+    def test_removing_image_clears_renditions(self):
+        business = self.create_business(logo=image_bytes())
+        images.process(Business, business.pk, 'logo')
+        thumb = Business.objects.get(pk=business.pk).logo_renditions['sizes']['thumb']
+
+        business.refresh_from_db()
+        business.logo = None
+        business.save()
+        images.process(Business, business.pk, 'logo')
+
+        self.assertEqual(Business.objects.get(pk=business.pk).logo_renditions, {})
+        self.assertFalse(default_storage.exists(thumb['jpeg']))
+
+
+class BlurhashTests(TestCase):
+
+    def _decode83(self, text):
+        value = 0
+        for char in text:
+            value = value * 83 + blurhash._BASE83.index(char)
+        return value
+
+    def test_solid_color_encodes_only_the_average_color(self):
+        value = blurhash.encode(Image.new('RGB', (64, 48), (200, 100, 50)))
+
+        # 1 (componentes) + 1 (máximo AC) + 4 (color promedio) + 2 por cada uno de los 11 AC.
+        self.assertEqual(len(value), 28)
+        self.assertEqual(self._decode83(value[0]), (4 - 1) + (3 - 1) * 9)
+        self.assertEqual(self._decode83(value[2:6]), (200 << 16) + (100 << 8) + 50)
+
+    def test_large_images_are_downsampled_first(self):
+        small = blurhash.encode(Image.new('RGB', (32, 32), (10, 20, 30)))
+        large = blurhash.encode(Image.new('RGB', (3000, 3000), (10, 20, 30)))
+
+        self.assertEqual(small, large)
+
+
+class RenditionSerializerTests(LocalStorageTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.request = RequestFactory().get('/api/businesses/')
+
+    def test_pending_image_exposes_original_url(self):
+        business = self.create_business(logo=image_bytes())
+
+        data = BusinessSerializer(business, context={'request': self.request}).data
+
+        self.assertNotIn('logo', data)
+        self.assertEqual(data['logo_renditions'], {'original': f'http://testserver/media/{business.logo.name}'})
+
+    def test_processed_image_exposes_renditions(self):
+        business = self.create_business(logo=image_bytes())
+        images.process(Business, business.pk, 'logo')
+        business.refresh_from_db()
+
+        data = BusinessSerializer(business, context={'request': self.request}).data
+
+        renditions = data['logo_renditions']
+        self.assertNotIn('original', renditions)
+        self.assertEqual(renditions['blurhash'], business.logo_renditions['blurhash'])
+        thumb = renditions['sizes']['thumb']
+        self.assertEqual((thumb['width'], thumb['height']), (160, 160))
+        self.assertEqual(thumb['webp'], f"http://testserver/media/{business.logo_renditions['sizes']['thumb']['webp']}")
+
+    def test_without_image_renditions_are_empty(self):
+        business = self.create_business()
+        offer = Offer.objects.create(business=business, title='Conchas', description='De vainilla')
+
+        self.assertEqual(BusinessSerializer(business, context={'request': self.request}).data['logo_renditions'], {})
+        data = OfferSerializer(offer, context={'request': self.request}).data
+        self.assertEqual(data['image_renditions'], {})
+        self.assertNotIn('image', data)
+
+
+@override_settings(MEDIA_STORAGE='local')
+class DirectUploadTests(LocalStorageTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Las renditions se prueban en ImageRenditionTests; aquí no se lanzan hilos.
+        self.enterContext(mock.patch.object(images, 'schedule'))
+        self.business = self.create_business()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def presign(self, target='logo', content_type='image/png', size=1000, method='PUT'):
+        return self.client.post(
+            '/api/uploads/presign/',
+            {'target': target, 'content_type': content_type, 'size': size, 'method': method},
+            format='json',
+        )
+
+    def upload(self, content, content_type='image/png', target='logo'):
+        grant = self.presign(target=target, content_type=content_type).data
+        response = self.client.generic('PUT', grant['url'], content, content_type=content_type)
+        self.assertEqual(response.status_code, 204)
+        return grant['key']
+
+    def finalize(self, key, target='logo', **extra):
+        return self.client.post('/api/uploads/finalize/', {'target': target, 'key': key, **extra}, format='json')
+
+    def test_put_upload_and_finalize_assigns_logo(self):
+        key = self.upload(image_bytes(format='PNG'))
+
+        response = self.finalize(key)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(key.startswith(f'business_logos/{self.business.pk}/'))
+        self.assertEqual(Business.objects.get(pk=self.business.pk).logo.name, key)
+        self.assertEqual(response.data['logo_renditions'], {'original': f'http://testserver/media/{key}'})
+
+    def test_multipart_post_upload(self):
+        grant = self.presign(target='offer_image', content_type='image/jpeg', method='POST').data
+        offer = Offer.objects.create(business=self.business, title='Conchas', description='De vainilla',
+                                     discount_price=10, start_date=date.today(),
+                                     end_date=date.today() + timedelta(days=7))
+
+        response = self.client.post(
+            grant['url'],
+            {**grant['fields'], 'file': SimpleUploadedFile('foto.jpg', image_bytes(), 'image/jpeg')},
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, 204)
+        response = self.finalize(grant['key'], target='offer_image', offer_id=offer.pk)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Offer.objects.get(pk=offer.pk).image.name, grant['key'])
+
+    def test_presign_rejects_files_over_the_limit(self):
+        with self.settings(UPLOAD_MAX_BYTES=1000):
+            response = self.presign(size=1001)
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_local_upload_rejects_other_content_type_and_tampered_token(self):
+        grant = self.presign(content_type='image/png').data
+
+        wrong_type = self.client.generic('PUT', grant['url'], image_bytes(), content_type='image/jpeg')
+        tampered = self.client.generic('PUT', grant['url'].rstrip('/') + 'x/', image_bytes(format='PNG'),
+                                       content_type='image/png')
+
+        self.assertEqual(wrong_type.status_code, 400)
+        self.assertEqual(tampered.status_code, 403)
+        self.assertFalse(default_storage.exists(grant['key']))
+
+    def test_finalize_rejects_key_of_another_business(self):
+        other = CustomUser.objects.create(username='otro', uid='uid-otro', is_business_owner=True)
+        other_business = Business.objects.create(
+            user=other, name='Otro', what_they_sell='Ropa', hours='9-18', municipality='LEON',
+            street_address='Juárez 1', location_type='MERCADO', business_type='PANADERIAS',
+        )
+
+        response = self.finalize(f'business_logos/{other_business.pk}/robado.png')
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_finalize_rejects_and_deletes_files_that_are_not_images(self):
+        key = self.upload(b'<html>no soy una imagen</html>')
+
+        response = self.finalize(key)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(default_storage.exists(key))
+        self.assertFalse(Business.objects.get(pk=self.business.pk).logo)
+
+    def test_replacing_logo_deletes_previous_upload(self):
+        first = self.upload(image_bytes(format='PNG'))
+        self.finalize(first)
+        second = self.upload(image_bytes((50, 50), format='PNG'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.finalize(second)
+
+        self.assertFalse(default_storage.exists(first))
+        self.assertTrue(default_storage.exists(second))
+
+    def test_business_update_rejects_logo_field(self):
+        response = self.client.patch(
+            f'/api/businesses/{self.business.pk}/',
+            {'name': 'Nuevo nombre', 'logo': 'business_logos/1/ajeno.png'},
+            format='json',
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('logo', response.data)
+        self.assertEqual(Business.objects.get(pk=self.business.pk).name, 'Panadería La Espiga')
+
+    def test_multipart_writes_are_unsupported(self):
+        offer = Offer.objects.create(business=self.business, title='Conchas', description='De vainilla',
+                                     start_date=date.today(), end_date=date.today())
+        logo = {'name': 'Nuevo nombre', 'logo': SimpleUploadedFile('logo.png', image_bytes(format='PNG'), 'image/png')}
+        image = {'title': 'Bolillo', 'image': SimpleUploadedFile('pan.png', image_bytes(format='PNG'), 'image/png')}
+
+        for method, url, data in (
+            (self.client.patch, f'/api/businesses/{self.business.pk}/', logo),
+            (self.client.post, '/api/businesses/', logo),
+            (self.client.post, '/api/offers/', image),
+            (self.client.patch, f'/api/offers/{offer.pk}/', image),
+        ):
+            with self.subTest(url=url):
+                response = method(url, data, format='multipart')
+                self.assertEqual(response.status_code, 415)
+        self.assertEqual(Business.objects.get(pk=self.business.pk).name, 'Panadería La Espiga')
+        self.assertEqual(Offer.objects.get().title, 'Conchas')
+
+    def test_offer_create_rejects_image_field(self):
+        response = self.client.post('/api/offers/', {
+            'title': 'Conchas', 'description': 'De vainilla', 'discount_price': '10.00',
+            'start_date': date.today().isoformat(), 'end_date': date.today().isoformat(),
+            'image': 'offers_images/1/ajena.jpg',
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image', response.data)
+        self.assertFalse(Offer.objects.exists())
+
+    def test_business_update_without_logo_still_works(self):
+        response = self.client.patch(f'/api/businesses/{self.business.pk}/', {'name': 'Nuevo nombre'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('logo', response.data)
+
+
+class CleanUploadsTests(LocalStorageTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(mock.patch.object(images, 'schedule'))
+        self.business = self.create_business()
+
+    def store(self, name, age_hours):
+        name = default_storage.save(name, ContentFile(image_bytes()))
+        modified = time.time() - age_hours * 3600
+        os.utime(default_storage.path(name), (modified, modified))
+        return name
+
+    def test_deletes_only_old_unreferenced_uploads(self):
+        prefix = f'business_logos/{self.business.pk}/'
+        abandoned = self.store(prefix + 'abandonado.jpg', age_hours=48)
+        in_progress = self.store(prefix + 'subiendo.jpg', age_hours=0)
+        assigned = self.store(prefix + 'asignado.jpg', age_hours=48)
+        legacy = self.store('business_logos/anterior.jpg', age_hours=48)
+        self.business.logo = assigned
+        self.business.save()
+
+        self.assertEqual(list(uploads.orphaned_keys(max_age_hours=24)), [abandoned])
+        call_command('clean_uploads', max_age_hours=24, stdout=io.StringIO())
+
+        self.assertFalse(default_storage.exists(abandoned))
+        for name in (in_progress, assigned, legacy):
+            self.assertTrue(default_storage.exists(name))
+
+    def test_dry_run_keeps_files(self):
+        abandoned = self.store(f'offers_images/{self.business.pk}/abandonada.jpg', age_hours=48)
+        out = io.StringIO()
+
+        call_command('clean_uploads', max_age_hours=24, dry_run=True, stdout=out)
+
+        self.assertIn(abandoned, out.getvalue())
+        self.assertTrue(default_storage.exists(abandoned))
+
+    def test_without_uploads_there_is_nothing_to_clean(self):
+        self.assertEqual(list(uploads.orphaned_keys()), [])
+
+
+class ExportStreamTests(TestCase):
+
+    def setUp(self):
+        user = CustomUser.objects.create(username='dueno', uid='uid-dueno', is_business_owner=True)
+        business = Business.objects.create(
+            user=user, name='Panadería La Espiga', what_they_sell='Pan dulce', hours='9-18',
+            municipality='LEON', street_address='Madero 10', location_type='MERCADO', business_type='PANADERIAS',
+        )
+        for number in range(5):
+            Offer.objects.create(business=business, title=f'Oferta {number}', description='Pan',
+                                 discount_price=10, start_date=date.today(),
+                                 end_date=date.today() + timedelta(days=7))
+
+    async def test_async_export_takes_the_database_slot_per_chunk(self):
+        held = []
+
+        @contextlib.asynccontextmanager
+        async def slot():
+            held.append(True)
+            try:
+                yield
+            finally:
+                held.pop()
+
+        parts = []
+        async for part in exports.astream(exports.export_queryset(), 'ndjson', chunk_size=2, slot=slot):
+            # Mientras el cliente recibe un bloque no se ocupa ninguna conexión.
+            self.assertEqual(held, [])
+            parts.append(part)
+
+        self.assertEqual(len(parts), 3)
+        self.assertEqual(sum(part.count('\n') for part in parts), 5)
+
+
+class FacetCacheTests(TestCase):
+
+    def setUp(self):
+        caches[settings.LIST_CACHE_ALIAS].clear()
+        self.addCleanup(caches[settings.LIST_CACHE_ALIAS].clear)
+        self.create_business('LEON')
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create(username='cliente', uid='uid-cliente'))
+
+    def create_business(self, municipality):
+        user = CustomUser.objects.create(username=f'dueno-{municipality}', uid=f'uid-{municipality}',
+                                         is_business_owner=True)
+        return Business.objects.create(
+            user=user, name='Panadería', what_they_sell='Pan', hours='9-18', municipality=municipality,
+            street_address='Madero 10', location_type='MERCADO', business_type='PANADERIAS',
+        )
+
+    def municipality_counts(self, response):
+        return {item['value']: item['count'] for item in response.data['municipality']}
+
+    @override_settings(LIST_CACHE_ENABLED=False)
+    def test_without_list_cache_counts_are_computed_live(self):
+        first = self.client.get('/api/businesses/facets/')
+        with mock.patch.object(facets, '_adjust') as adjust, self.captureOnCommitCallbacks(execute=True):
+            self.create_business('CELAYA')
+        second = self.client.get('/api/businesses/facets/')
+
+        self.assertNotIn('X-Cache', first)
+        self.assertEqual(self.municipality_counts(second), {'LEON': 1, 'CELAYA': 1})
+        self.assertIsNone(facets.cached_counts(facets.BUSINESS))
+        adjust.assert_not_called()
+
+    @override_settings(LIST_CACHE_ENABLED=False)
+    def test_without_list_cache_signals_skip_the_facet_queries(self):
+        with mock.patch.object(signals, '_owner_is_visible') as owner_is_visible, \
+                mock.patch.object(signals, '_offer_business') as offer_business:
+            business = self.create_business('CELAYA')
+            business.municipality = 'LEON'
+            business.save()
+            offer = Offer.objects.create(business=business, title='Conchas', description='Pan',
+                                         start_date=date.today(), end_date=date.today() + timedelta(days=7))
+            offer.delete()
+            business.delete()
+
+        owner_is_visible.assert_not_called()
+        offer_business.assert_not_called()
+
+    @override_settings(LIST_CACHE_ENABLED=True)
+    def test_with_list_cache_counts_are_cached_and_adjusted(self):
+        first = self.client.get('/api/businesses/facets/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_business('CELAYA')
+        second = self.client.get('/api/businesses/facets/')
+
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(self.municipality_counts(second), {'LEON': 1, 'CELAYA': 1})
+
+
+class ListCacheLockTests(TestCase):
+
+    def setUp(self):
+        self.cache = caches[settings.LIST_CACHE_ALIAS]
+        self.cache.clear()
+        self.addCleanup(self.cache.clear)
+
+    def test_builder_releases_its_own_lock(self):
+        entry, hit = list_cache.get_or_build('clave', lambda: {'data': [1]})
+
+        self.assertEqual((entry['data'], hit), ([1], False))
+        self.assertIsNone(self.cache.get('clave:lock'))
+
+    def test_expired_lock_taken_by_another_worker_is_kept(self):
+        def build():
+            # El lock expira durante la reconstrucción y lo toma otra petición.
+            self.cache.set('clave:lock', 'otro', timeout=60)
+            return {'data': [1]}
+
+        list_cache.get_or_build('clave', build)
+
+        self.assertEqual(self.cache.get('clave:lock'), 'otro')
+
+    @override_settings(LIST_CACHE_LOCK_TIMEOUT=0)
+    def test_waiter_that_gives_up_does_not_release_the_lock(self):
+        self.cache.set('clave:lock', 'otro', timeout=60)
+
+        entry, hit = list_cache.get_or_build('clave', lambda: {'data': [1]})
+
+        self.assertFalse(hit)
+        self.assertEqual(self.cache.get('clave:lock'), 'otro')
+
+    async def test_async_builder_keeps_a_lock_it_no_longer_owns(self):
+        async def build():
+            await self.cache.aset('clave:lock', 'otro', timeout=60)
+            return {'data': [1]}
+
+        await list_cache.aget_or_build('clave', build)
+
+        self.assertEqual(await self.cache.aget('clave:lock'), 'otro')
+
+
+class BusinessOwnerTestCase(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+        self.user = CustomUser.objects.create(username='dueno', uid='uid-dueno', is_business_owner=True)
+        self.business = Business.objects.create(
+            user=self.user, name='Panadería La Espiga', what_they_sell='Pan dulce', hours='9-18',
+            municipality='LEON', street_address='Madero 10', location_type='MERCADO', business_type='PANADERIAS',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_offers(self, titles):
+        return [
+            Offer.objects.create(business=self.business, title=title, description='Recién horneado',
+                                 discount_price=10, start_date=date.today(),
+                                 end_date=date.today() + timedelta(days=7))
+            for title in titles
+        ]
+
+    def archive(self, offers):
+        archive.archive_batch(Offer.objects.filter(pk__in=[offer.pk for offer in offers]), batch_size=100)
+
+    def walk(self, url):
+        """Ids de todas las páginas siguiendo `next`, y las respuestas de cada página."""
+        ids, pages = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.data)
+            pages.append(response)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return ids, pages
+
+
+@override_settings(LIST_CACHE_ENABLED=True)
+class ListCacheInvalidationTests(BusinessOwnerTestCase):
+    """Generaciones por municipio de comerciantes/cache.py y CachedListMixin."""
+
+    def setUp(self):
+        super().setUp()
+        self.offers = self.create_offers(['Concha', 'Bolillo'])
+
+    def titles(self, url='/api/offers/?municipality=leon'):
+        response = self.client.get(url)
+        return response['X-Cache'], sorted(item['title'] for item in response.data['results'])
+
+    def generations(self):
+        return list_cache.get_generation('LEON'), list_cache.get_generation(list_cache.GLOBAL_SCOPE)
+
+    def assert_bumps(self, change, expected_titles):
+        self.assertEqual(self.titles()[0], 'MISS')
+        self.assertEqual(self.titles()[0], 'HIT')
+        leon, everywhere = self.generations()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+
+        self.assertEqual(self.generations(), (leon + 1, everywhere + 1))
+        self.assertEqual(self.titles(), ('MISS', expected_titles))
+        self.assertEqual(self.titles('/api/offers/')[1], expected_titles)
+
+    def test_save_bumps_the_generation(self):
+        def change():
+            self.offers[0].title = 'Concha de nata'
+            self.offers[0].save()
+        self.assert_bumps(change, ['Bolillo', 'Concha de nata'])
+
+    def test_delete_bumps_the_generation(self):
+        self.assert_bumps(self.offers[1].delete, ['Concha'])
+
+    def test_bulk_update_bumps_the_generation(self):
+        self.assert_bumps(
+            lambda: self.client.patch('/api/offers/bulk_update/',
+                                      {'ids': [self.offers[0].pk], 'changes': {'title': 'Cuernito'}}, format='json'),
+            ['Bolillo', 'Cuernito'],
+        )
+
+    def test_bulk_deactivate_bumps_the_generation(self):
+        self.assert_bumps(
+            lambda: self.client.post('/api/offers/bulk_deactivate/', {'ids': [self.offers[0].pk]}, format='json'),
+            ['Bolillo'],
+        )
+
+    def test_other_municipalities_keep_their_entries(self):
+        self.titles()
+        user = CustomUser.objects.create(username='otro', uid='uid-otro', is_business_owner=True)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Business.objects.create(
+                user=user, name='Tortillería', what_they_sell='Tortillas', hours='9-18', municipality='CELAYA',
+                street_address='Juárez 1', location_type='MERCADO', business_type='TORTILLERIAS',
+            )
+
+        self.assertEqual(self.titles()[0], 'HIT')
+
+
+class ConditionalGetTests(BusinessOwnerTestCase):
+    """ETag / If-None-Match e If-Modified-Since de ConditionalGetMixin."""
+
+    def setUp(self):
+        super().setUp()
+        self.offer = self.create_offers(['Concha'])[0]
+
+    def assert_not_modified(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+
+        again = self.client.get(url, headers={'If-None-Match': first['ETag']})
+
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], first['ETag'])
+        self.assertEqual(again.content, b'')
+        return first
+
+    def test_list_and_retrieve_answer_304(self):
+        for url in ('/api/offers/', f'/api/offers/{self.offer.pk}/', '/api/businesses/',
+                    f'/api/businesses/{self.business.pk}/'):
+            with self.subTest(url=url):
+                self.assert_not_modified(url)
+
+    @override_settings(LIST_CACHE_ENABLED=True)
+    def test_cached_list_answers_304(self):
+        first = self.assert_not_modified('/api/offers/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+
+    def test_etag_changes_after_an_update(self):
+        for url in ('/api/offers/', f'/api/offers/{self.offer.pk}/'):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                Offer.objects.filter(pk=self.offer.pk).update(title=f'Concha {url}', updated_at=timezone.now())
+
+                response = self.client.get(url, headers={'If-None-Match': etag})
+
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_business_update_changes_the_offer_etag(self):
+        url = f'/api/offers/{self.offer.pk}/'
+        etag = self.client.get(url)['ETag']
+        Business.objects.filter(pk=self.business.pk).update(name='La Espiga', updated_at=timezone.now())
+
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_removed_offer_changes_the_list_etag(self):
+        etag = self.client.get('/api/offers/')['ETag']
+        Offer.objects.filter(pk=self.offer.pk).update(is_active=False)
+
+        self.assertEqual(self.client.get('/api/offers/', headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_retrieve_answers_if_modified_since(self):
+        url = f'/api/offers/{self.offer.pk}/'
+        last_modified = self.client.get(url)['Last-Modified']
+
+        self.assertEqual(self.client.get(url, headers={'If-Modified-Since': last_modified}).status_code, 304)
+        # El listado no envía Last-Modified.
+        self.assertNotIn('Last-Modified', self.client.get('/api/offers/'))
+
+
+class MyOffersArchivedPaginationTests(BusinessOwnerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.live = self.create_offers(['Pan de muerto', 'Pan dulce', 'Pan blanco', 'Pan integral'])
+        archived = self.create_offers(['Pan de elote', 'Pan de nata', 'Pan de anís'])
+        self.archive(archived)
+        self.archived_ids = [offer.pk for offer in archived]
+        self.all_ids = {offer.pk for offer in self.live} | set(self.archived_ids)
+
+    def assert_walks_every_offer(self, query):
+        ids, pages = self.walk(f'/api/offers/my_offers/?include_archived=1&page_size=3&{query}')
+
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(ids), self.all_ids)
+        self.assertEqual(len(pages), 3)
+        # La página anterior de la última es la segunda.
+        previous = self.client.get(pages[-1].data['previous'])
+        self.assertEqual(previous.status_code, 200)
+        self.assertEqual(previous.data['results'], pages[1].data['results'])
+
+    def test_search_pages_through_live_and_archived_offers(self):
+        self.assert_walks_every_offer('search=pan')
+
+    def test_search_ranked_for_only_one_kind_pages_without_rank(self):
+        # Un límite entre ambos conteos: "pan" es demasiado común entre las vivas (sin
+        # relevancia) pero no entre las archivadas (con relevancia).
+        live, archived = (
+            SearchEntry.objects.filter(search._prefix_q('pan'), kind=kind).count()
+            for kind in (search.OFFER, search.ARCHIVED_OFFER)
+        )
+        self.assertGreater(live, archived)
+        with self.settings(SEARCH_RANK_MAX_MATCHES=archived):
+            self.assert_walks_every_offer('search=pan')
+
+    def test_near_pages_through_live_and_archived_offers(self):
+        latitude, longitude = geo.municipality_centroid('LEON')
+        self.assert_walks_every_offer(f'near={latitude},{longitude}')
+
+    def test_near_and_search_page_through_live_and_archived_offers(self):
+        latitude, longitude = geo.municipality_centroid('LEON')
+        self.assert_walks_every_offer(f'near={latitude},{longitude}&search=pan')
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncReadViewTests(BusinessOwnerTestCase):
+    """Lecturas async de comerciantes/async_views.py a través de AsyncClient."""
+
+    def setUp(self):
+        super().setUp()
+        self.offers = self.create_offers(['Concha de vainilla', 'Bolillo'])
+        self.async_client.force_login(self.user)
+
+    async def test_offer_search_with_empty_cache(self):
+        # Sin la caché de términos comunes, la búsqueda cuenta entradas del índice.
+        response = await self.async_client.get('/api/offers/', {'search': 'concha'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.json()['results']], [self.offers[0].pk])
+
+    async def test_list_matches_the_sync_view(self):
+        for url in ('/api/offers/', '/api/businesses/'):
+            for params in ({}, {'search': 'concha'}, {'search': 'espiga'}):
+                with self.subTest(url=url, params=params):
+                    response = await self.async_client.get(url, params)
+                    expected = await sync_to_async(self.client.get)(url, params)
+
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(response.json(), expected.json())
+                    self.assertEqual(response['ETag'], expected['ETag'])
+
+    @override_settings(LIST_CACHE_ENABLED=True)
+    async def test_cached_list_shares_entries_with_the_sync_view(self):
+        for params in ({}, {'search': 'bolillo'}):
+            with self.subTest(params=params):
+                first = await self.async_client.get('/api/offers/', params)
+                second = await sync_to_async(self.client.get)('/api/offers/', params)
+                third = await self.async_client.get('/api/offers/', params, headers={'If-None-Match': first['ETag']})
+
+                self.assertEqual((first['X-Cache'], second['X-Cache']), ('MISS', 'HIT'))
+                self.assertEqual(first.json(), second.json())
+                self.assertEqual(third.status_code, 304)
+
+    async def test_retrieve(self):
+        for url in (f'/api/offers/{self.offers[0].pk}/', f'/api/businesses/{self.business.pk}/'):
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                expected = await sync_to_async(self.client.get)(url)
+
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), expected.json())
+                not_modified = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+                self.assertEqual(not_modified.status_code, 304)
+
+        self.assertEqual((await self.async_client.get('/api/offers/0/')).status_code, 404)
+
+    async def test_my_business(self):
+        response = await self.async_client.get('/api/businesses/my_business/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], self.business.pk)
+
+        await sync_to_async(Business.objects.filter(pk=self.business.pk).delete)()
+        response = await self.async_client.get('/api/businesses/my_business/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_anonymous_requests_are_rejected(self):
+        await sync_to_async(self.async_client.logout)()
+
+        for url in ('/api/offers/', '/api/businesses/my_business/', f'/api/offers/{self.offers[0].pk}/'):
+            with self.subTest(url=url):
+                self.assertIn((await self.async_client.get(url)).status_code, (401, 403))
+
+    async def test_firebase_token_authenticates(self):
+        await sync_to_async(self.async_client.logout)()
+
+        with mock.patch('mercadolocalmx_backend.authentication.verify_firebase_token',
+                        return_value={'uid': self.user.uid}) as verify:
+            response = await self.async_client.get(
+                '/api/businesses/my_business/', headers={'Authorization': 'Bearer token-async-dueno'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], self.business.pk)
+        verify.assert_called_once_with('token-async-dueno')
+
+    async def test_malformed_authorization_header_is_rejected(self):
+        response = await self.async_client.get('/api/offers/', headers={'Authorization': 'Token abc'})
+        expected = await sync_to_async(APIClient().get)('/api/offers/', headers={'Authorization': 'Token abc'})
+
+        # La sesión no se usa: el error de FirebaseAuthentication responde igual que la vista síncrona.
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertIn(response.status_code, (401, 403))
+        self.assertEqual(response.json(), expected.json())
+
+    async def test_writes_are_delegated_to_the_sync_view(self):
+        response = await self.async_client.patch(
+            f'/api/offers/{self.offers[0].pk}/', {'title': 'Concha de chocolate'}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        offer = await Offer.objects.aget(pk=self.offers[0].pk)
+        self.assertEqual(offer.title, 'Concha de chocolate')
+
+    @override_settings(ASYNC_DB_CONCURRENCY=1)
+    async def test_database_slot_limits_concurrency_and_closes_the_connection(self):
+        from . import async_views
+
+        active, peak = 0, 0
+
+        async def use_slot():
+            nonlocal active, peak
+            async with async_views.database_slot():
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0)
+                active -= 1
+
+        with mock.patch.object(async_views, '_close_connection') as close:
+            await asyncio.gather(*(use_slot() for _ in range(3)))
+
+        self.assertEqual(peak, 1)
+        self.assertEqual(close.call_count, 3)
+
+
+class SearchTests(TestCase):
+    """Índice invertido y búsqueda de comerciantes/search.py."""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+        self.panaderia = self.create_business('Panadería La Espiga', 'Pan dulce y bolillos')
+        self.tortilleria = self.create_business('Tortillería Doña Mary', 'Tortillas de maíz')
+        self.cafe = self.create_business('Café de Olla', 'Café, pan de nata y chocolate')
+
+    def create_business(self, name, what_they_sell):
+        user = CustomUser.objects.create(username=name, uid=f'uid-{name}', is_business_owner=True)
+        return Business.objects.create(
+            user=user, name=name, what_they_sell=what_they_sell, hours='9-18', municipality='LEON',
+            street_address='Madero 10', location_type='MERCADO', business_type='OTROS',
+        )
+
+    def find(self, text):
+        return list(search.search(Business.objects.all(), search.BUSINESS, text).values_list('pk', flat=True))
+
+    def test_accents_and_case_are_folded(self):
+        self.assertEqual(search.tokenize('Panadería ACÁMBARO pingüino'), ['panaderia', 'acambaro', 'pinguino'])
+        self.assertEqual(self.find('panaderia'), [self.panaderia.pk])
+        self.assertEqual(self.find('TORTILLERÍA'), [self.tortilleria.pk])
+
+    def test_plurals_match_singulars(self):
+        self.assertEqual(self.find('panaderias'), [self.panaderia.pk])
+        self.assertEqual(self.find('tortilla'), [self.tortilleria.pk])
+        # Las palabras cortas no se recortan.
+        self.assertEqual(search.tokenize('gas mas'), ['gas', 'mas'])
+
+    def test_every_term_must_match(self):
+        self.assertEqual(set(self.find('pan')), {self.panaderia.pk, self.cafe.pk})
+        self.assertEqual(self.find('pan chocolate'), [self.cafe.pk])
+        self.assertEqual(self.find('pan tortilla'), [])
+
+    def test_results_are_ordered_by_rank(self):
+        # "Café" en el nombre pesa más que "café" en lo que venden.
+        cafeteria = self.create_business('La Esquina', 'Café de grano')
+
+        results = list(search.search(Business.objects.all(), search.BUSINESS, 'cafe'))
+
+        self.assertEqual([business.pk for business in results], [self.cafe.pk, cafeteria.pk])
+        self.assertGreater(results[0].search_rank, results[1].search_rank)
+
+    def test_stopwords_and_empty_queries_do_not_filter(self):
+        self.assertEqual(search.tokenize('pan de la casa'), ['pan', 'casa'])
+        self.assertEqual(len(self.find('de la')), 3)
+
+    @override_settings(SEARCH_RANK_MAX_MATCHES=1)
+    def test_common_terms_keep_the_list_order_and_are_cached(self):
+        # "pan" está en dos negocios: más que el límite, así que no se ordena por relevancia.
+        with self.assertNumQueries(2):
+            results = list(search.search(Business.objects.order_by('name'), search.BUSINESS, 'pan'))
+        self.assertEqual([business.pk for business in results], [self.cafe.pk, self.panaderia.pk])
+        self.assertFalse(hasattr(results[0], 'search_rank'))
+
+        # El conteo del término sale de la caché.
+        with self.assertNumQueries(1):
+            list(search.search(Business.objects.order_by('name'), search.BUSINESS, 'pan'))
+
+    @override_settings(SEARCH_RANK_MAX_MATCHES=1)
+    def test_one_selective_term_keeps_the_ranking(self):
+        results = list(search.search(Business.objects.all(), search.BUSINESS, 'pan chocolate'))
+
+        self.assertEqual([business.pk for business in results], [self.cafe.pk])
+        self.assertTrue(hasattr(results[0], 'search_rank'))
+
+    def test_saving_reindexes_and_deleting_removes_entries(self):
+        self.tortilleria.name = 'Tortillería y Panadería'
+        self.tortilleria.save()
+        self.assertEqual(set(self.find('panaderia')), {self.panaderia.pk, self.tortilleria.pk})
+
+        self.panaderia.delete()
+        self.assertEqual(self.find('panaderia'), [self.tortilleria.pk])
+        self.assertFalse(SearchEntry.objects.filter(kind=search.BUSINESS, object_id=self.panaderia.pk).exists())
+
+
+@override_settings(QUERY_BUDGET_ENFORCED=True)
+class SearchQueryBudgetTests(BusinessOwnerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_offers(['Concha de vainilla', 'Pan de elote'])
+
+    def test_term_counts_fit_the_search_allowance(self):
+        for url in (
+            '/api/offers/?search=concha+vainilla',
+            '/api/offers/facets/?search=concha',
+            '/api/businesses/?search=panaderia',
+            '/api/offers/my_offers/?include_archived=1&search=pan+elote',
+        ):
+            with self.subTest(url=url):
+                # Sin la caché de términos comunes: cada término se cuenta en la base de datos.
+                caches['default'].clear()
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_term_counts_are_charged_to_the_budget(self):
+        with mock.patch.object(QueryBudgetMixin, 'get_search_allowance', return_value=0):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get('/api/offers/?search=concha')
+            # Con el conteo en la caché, la búsqueda cabe en el presupuesto del listado.
+            self.assertEqual(self.client.get('/api/offers/?search=concha').status_code, 200)
+
+
+class KeysetCursorPaginationTests(BusinessOwnerTestCase):
+
+    def walk_back(self, response):
+        """Resultados de cada página siguiendo `previous` desde `response` hasta la primera."""
+        pages = []
+        while response.data['previous']:
+            response = self.client.get(response.data['previous'])
+            self.assertEqual(response.status_code, 200, response.data)
+            pages.append(response.data['results'])
+        return pages
+
+    def assert_pages_both_ways(self, url, expected_ids):
+        ids, pages = self.walk(url)
+        self.assertEqual(ids, expected_ids)
+        self.assertIsNone(pages[0].data['previous'])
+        self.assertEqual(self.walk_back(pages[-1]), [page.data['results'] for page in reversed(pages[:-1])])
+
+    def cursor(self, position, reverse=False):
+        querystring = urlencode({'o': 0, 'r': int(reverse), 'p': json.dumps(position)})
+        return base64.b64encode(querystring.encode('ascii')).decode('ascii')
+
+    def test_created_at_ties_are_broken_by_id(self):
+        offers = self.create_offers([f'Oferta {number}' for number in range(7)])
+        # Cuatro ofertas con el mismo created_at: el orden entre ellas lo decide el id.
+        same_time = timezone.now()
+        Offer.objects.filter(pk__in=[offer.pk for offer in offers[1:5]]).update(created_at=same_time)
+        expected = list(Offer.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+        self.assert_pages_both_ways('/api/offers/?page_size=2', expected)
+
+    def test_business_name_ties_are_broken_by_id(self):
+        for number in range(4):
+            user = CustomUser.objects.create(username=f'otro{number}', uid=f'uid-otro{number}', is_business_owner=True)
+            Business.objects.create(
+                user=user, name='Panadería La Espiga', what_they_sell='Pan', hours='9-18', municipality='LEON',
+                street_address='Madero 10', location_type='MERCADO', business_type='PANADERIAS',
+            )
+        expected = list(Business.objects.order_by('name', 'id').values_list('id', flat=True))
+
+        self.assert_pages_both_ways('/api/businesses/?page_size=2', expected)
+
+    def test_search_pages_by_rank_then_recency(self):
+        # "concha" en el título pesa más que en la descripción.
+        in_title = self.create_offers(['Concha de vainilla', 'Concha de chocolate'])
+        in_description = [
+            Offer.objects.create(business=self.business, title=f'Pan {number}', description='Como una concha',
+                                 discount_price=10, start_date=date.today(),
+                                 end_date=date.today() + timedelta(days=7))
+            for number in range(3)
+        ]
+        self.create_offers(['Bolillo'])
+        expected = (
+            sorted((offer.pk for offer in in_title), reverse=True)
+            + sorted((offer.pk for offer in in_description), reverse=True)
+        )
+
+        self.assert_pages_both_ways('/api/offers/?page_size=2&search=concha', expected)
+
+    def test_near_pages_by_distance(self):
+        latitude, longitude = geo.municipality_centroid('LEON')
+        for number in range(5):
+            user = CustomUser.objects.create(username=f'otro{number}', uid=f'uid-otro{number}', is_business_owner=True)
+            Business.objects.create(
+                user=user, name=f'Negocio {number}', what_they_sell='Pan', hours='9-18', municipality='LEON',
+                street_address='Madero 10', location_type='MERCADO', business_type='PANADERIAS',
+                latitude=latitude + 0.01 * (5 - number), longitude=longitude,
+            )
+        # El negocio de setUp está en el centroide; los demás, cada vez más cerca.
+        expected = [self.business.pk] + list(
+            Business.objects.exclude(pk=self.business.pk).order_by('-latitude').values_list('id', flat=True)
+        )[::-1]
+
+        self.assert_pages_both_ways(f'/api/businesses/?page_size=2&near={latitude},{longitude}', expected)
+
+    def test_invalid_cursors_are_not_found(self):
+        self.create_offers(['Concha', 'Bolillo', 'Telera'])
+        valid = self.client.get('/api/offers/?page_size=1').data['next']
+        self.assertEqual(self.client.get(valid).status_code, 200)
+
+        for cursor in (
+            'no-es-base64',
+            self.cursor('no es una lista'),
+            # Falta el id del desempate.
+            self.cursor([timezone.now().isoformat()]),
+            self.cursor(['no es una fecha', 1]),
+            # Con search_rank, aunque la petición no busca.
+            self.cursor([5, timezone.now().isoformat(), 1]),
+        ):
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/offers/', {'page_size': 1, 'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+
+class OfferBulkActionTests(BusinessOwnerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.offers = self.create_offers(['Concha', 'Bolillo', 'Telera'])
+        other = CustomUser.objects.create(username='otro', uid='uid-otro', is_business_owner=True)
+        other_business = Business.objects.create(
+            user=other, name='Tortillería', what_they_sell='Tortillas', hours='9-18', municipality='LEON',
+            street_address='Juárez 1', location_type='MERCADO', business_type='PANADERIAS',
+        )
+        self.foreign = Offer.objects.create(business=other_business, title='Tortillas', description='De maíz',
+                                            discount_price=20, start_date=date.today(),
+                                            end_date=date.today() + timedelta(days=7))
+
+    def ids(self, offers):
+        return [offer.pk for offer in offers]
+
+    def matches(self, text):
+        return set(search.search(Offer.objects.all(), search.OFFER, text).values_list('pk', flat=True))
+
+    def test_bulk_create_reports_each_offer(self):
+        valid = {'title': 'Pan de muerto', 'description': 'De temporada', 'discount_price': '35.00',
+                 'start_date': date.today().isoformat(), 'end_date': (date.today() + timedelta(days=5)).isoformat()}
+
+        response = self.client.post('/api/offers/bulk_create/', {'offers': [
+            valid,
+            {'title': 'Sin precio'},
+            {**valid, 'title': 'Rosca', 'image': 'offers_images/1/x.jpg'},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['created'], 1)
+        created, missing_fields, with_image = response.data['results']
+        self.assertEqual(created['status'], 201)
+        self.assertEqual(Offer.objects.get(pk=created['id']).business, self.business)
+        self.assertEqual((missing_fields['index'], missing_fields['status']), (1, 400))
+        self.assertIn('description', missing_fields['errors'])
+        self.assertEqual(with_image['status'], 400)
+        self.assertEqual(self.matches('muerto'), {created['id']})
+
+    def test_bulk_create_without_returned_ids_saves_each_offer(self):
+        # Como en MySQL, donde un INSERT múltiple no devuelve los ids.
+        offer = {'title': 'Pan de muerto', 'description': 'De temporada', 'discount_price': '35.00',
+                 'start_date': date.today().isoformat(), 'end_date': (date.today() + timedelta(days=5)).isoformat()}
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False), \
+                mock.patch.object(Offer.objects, 'bulk_create') as bulk_create:
+            response = self.client.post('/api/offers/bulk_create/',
+                                        {'offers': [offer, {**offer, 'title': 'Rosca de reyes'}]}, format='json')
+
+        bulk_create.assert_not_called()
+        ids = [result['id'] for result in response.data['results']]
+        self.assertEqual(set(Offer.objects.filter(title__in=['Pan de muerto', 'Rosca de reyes']).values_list('pk', flat=True)),
+                         set(ids))
+        self.assertEqual(self.matches('muerto'), {ids[0]})
+        self.assertEqual(self.matches('rosca'), {ids[1]})
+
+    def test_bulk_update_applies_changes_to_owned_offers_only(self):
+        ids = self.ids(self.offers[:2]) + [self.foreign.pk, 999999, self.offers[0].pk]
+
+        response = self.client.patch('/api/offers/bulk_update/', {'ids': ids, 'changes': {'discount_price': '5.00'}},
+                                     format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['updated'], 2)
+        # Los ids repetidos se responden una vez.
+        self.assertEqual(
+            [(result['id'], result['status']) for result in response.data['results']],
+            [(self.offers[0].pk, 200), (self.offers[1].pk, 200), (self.foreign.pk, 404), (999999, 404)],
+        )
+        prices = dict(Offer.objects.values_list('pk', 'discount_price'))
+        self.assertEqual([prices[pk] for pk in self.ids(self.offers)], [5, 5, 10])
+        self.assertEqual(prices[self.foreign.pk], 20)
+
+    def test_bulk_update_extend_days_moves_end_date(self):
+        end_dates = dict(Offer.objects.values_list('pk', 'end_date'))
+
+        self.client.patch('/api/offers/bulk_update/', {'ids': self.ids(self.offers[:2]), 'extend_days': 3},
+                          format='json')
+        self.client.patch('/api/offers/bulk_update/', {'ids': self.ids(self.offers[1:2]), 'extend_days': -1},
+                          format='json')
+
+        moved = dict(Offer.objects.values_list('pk', 'end_date'))
+        self.assertEqual(moved[self.offers[0].pk], end_dates[self.offers[0].pk] + timedelta(days=3))
+        self.assertEqual(moved[self.offers[1].pk], end_dates[self.offers[1].pk] + timedelta(days=2))
+        self.assertEqual(moved[self.offers[2].pk], end_dates[self.offers[2].pk])
+
+    def test_bulk_update_rejects_invalid_requests(self):
+        ids = self.ids(self.offers)
+        for body in (
+            {'ids': ids, 'extend_days': 0},
+            {'ids': ids},
+            {'ids': ids, 'extend_days': 2, 'changes': {'end_date': date.today().isoformat()}},
+            {'ids': ids, 'changes': {'business': self.foreign.business_id}},
+            {'ids': ids, 'changes': {'discount_price': 'gratis'}},
+        ):
+            with self.subTest(body=body):
+                response = self.client.patch('/api/offers/bulk_update/', body, format='json')
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(Offer.objects.values_list('discount_price', flat=True)), {10, 20})
+
+    def test_bulk_update_reindexes_changed_titles(self):
+        self.client.patch('/api/offers/bulk_update/', {'ids': self.ids(self.offers[:2]), 'changes': {'title': 'Cuernito'}},
+                          format='json')
+
+        self.assertEqual(self.matches('cuernito'), set(self.ids(self.offers[:2])))
+        self.assertEqual(self.matches('concha'), set())
+
+    def test_staff_can_only_change_their_own_offers(self):
+        self.user.is_staff = True
+        self.user.save()
+
+        update = self.client.patch('/api/offers/bulk_update/', {'ids': [self.foreign.pk], 'changes': {'discount_price': '1.00'}},
+                                   format='json')
+        deactivate = self.client.post('/api/offers/bulk_deactivate/', {'ids': [self.foreign.pk]}, format='json')
+
+        self.assertEqual([result['status'] for result in update.data['results']], [404])
+        self.assertEqual([result['status'] for result in deactivate.data['results']], [404])
+        self.foreign.refresh_from_db()
+        self.assertEqual((self.foreign.discount_price, self.foreign.is_active), (20, True))
+
+    def test_bulk_deactivate_hides_offers_from_the_public_list(self):
+        response = self.client.post('/api/offers/bulk_deactivate/',
+                                    {'ids': self.ids(self.offers[:2]) + [self.foreign.pk]}, format='json')
+
+        self.assertEqual([result['status'] for result in response.data['results']], [200, 200, 404])
+        self.assertEqual(set(Offer.objects.filter(is_active=False).values_list('pk', flat=True)),
+                         set(self.ids(self.offers[:2])))
+        listed = {item['id'] for item in self.client.get('/api/offers/').data['results']}
+        self.assertEqual(listed, {self.offers[2].pk, self.foreign.pk})
+
+
+class BulkImportTests(TestCase):
+
+    def setUp(self):
+        self.owner = CustomUser.objects.create(username='dueno', uid='uid-dueno', is_business_owner=True)
+        self.business = Business.objects.create(
+            user=self.owner, name='Panadería', what_they_sell='Pan', hours='9-18', municipality='LEON',
+            street_address='Madero 10', location_type='MERCADO', business_type='PANADERIAS',
+        )
+
+    def run_import(self, kind, fmt, rows, **kwargs):
+        if fmt == 'csv':
+            columns = list(dict.fromkeys(column for row in rows for column in row))
+            stream = io.StringIO()
+            writer = csv.DictWriter(stream, columns)
+            writer.writeheader()
+            writer.writerows(rows)
+            stream.seek(0)
+        else:
+            stream = io.StringIO(''.join(row if isinstance(row, str) else json.dumps(row) + '\n' for row in rows))
+        errors = []
+        stats = imports.import_rows(kind, stream, fmt, on_error=errors.append, **kwargs)
+        return stats, {error.line: error.errors for error in errors}, [error.line for error in errors]
+
+    def business_row(self, owner_uid, **fields):
+        return {'owner_uid': owner_uid, 'name': 'Tortillería', 'what_they_sell': 'Tortillas', 'hours': '7-14',
+                'municipality': 'León', 'street_address': 'Juárez 5', 'location_type': 'Mercado',
+                'business_type': 'PANADERIAS', **fields}
+
+    def offer_row(self, **fields):
+        return {'title': 'Conchas', 'description': 'Pan dulce', 'discount_price': '12.50',
+                'start_date': '2026-01-01', 'end_date': '2026-12-31', **fields}
+
+    def test_businesses_are_upserted_by_owner(self):
+        for fmt in imports.FORMATS:
+            with self.subTest(fmt=fmt):
+                other = CustomUser.objects.create(username=f'otro-{fmt}', uid=f'uid-otro-{fmt}')
+                stats, errors, _ = self.run_import(imports.BUSINESSES, fmt, [
+                    self.business_row('uid-dueno', name=f'Panadería {fmt}'),
+                    self.business_row(other.uid),
+                ])
+
+                self.assertEqual(errors, {})
+                self.assertEqual((stats.rows, stats.created, stats.updated), (2, 1, 1))
+                self.business.refresh_from_db()
+                self.assertEqual(self.business.name, f'Panadería {fmt}')
+                self.assertEqual(Business.objects.filter(user=self.owner).count(), 1)
+                self.assertEqual(Business.objects.get(user=other).municipality, 'LEON')
+                self.assertTrue(SearchEntry.objects.filter(kind=search.BUSINESS, object_id=self.business.pk).exists())
+
+    def test_duplicate_owner_in_a_batch_keeps_the_last_row(self):
+        for fmt in imports.FORMATS:
+            with self.subTest(fmt=fmt):
+                stats, errors, _ = self.run_import(imports.BUSINESSES, fmt, [
+                    self.business_row('uid-dueno', name='Primera'),
+                    self.business_row('uid-dueno', name='Segunda'),
+                ])
+
+                first_line = 2 if fmt == 'csv' else 1
+                self.assertEqual(list(errors), [first_line])
+                self.assertIn('owner_uid', errors[first_line])
+                self.assertEqual((stats.created, stats.updated, stats.errors), (0, 1, 1))
+                self.business.refresh_from_db()
+                self.assertEqual(self.business.name, 'Segunda')
+
+    def test_unknown_owners_are_created_only_when_asked(self):
+        for fmt in imports.FORMATS:
+            with self.subTest(fmt=fmt):
+                uid = f'uid-nuevo-{fmt}'
+                row = self.business_row(uid, owner_email=f'nuevo-{fmt}@example.com')
+
+                stats, errors, _ = self.run_import(imports.BUSINESSES, fmt, [row])
+                self.assertEqual(stats.created, 0)
+                self.assertEqual([list(error) for error in errors.values()], [['owner_uid']])
+                self.assertFalse(CustomUser.objects.filter(uid=uid).exists())
+
+                stats, errors, _ = self.run_import(imports.BUSINESSES, fmt, [row], create_owners=True)
+                self.assertEqual(errors, {})
+                self.assertEqual(stats.created, 1)
+                user = CustomUser.objects.get(uid=uid)
+                self.assertEqual(user.email, f'nuevo-{fmt}@example.com')
+                self.assertFalse(user.has_usable_password())
+                self.assertTrue(Business.objects.filter(user=user).exists())
+
+    def test_dry_run_reports_but_rolls_back(self):
+        for fmt in imports.FORMATS:
+            with self.subTest(fmt=fmt):
+                stats, errors, _ = self.run_import(imports.BUSINESSES, fmt, [
+                    self.business_row('uid-dueno', name='Cambiado'),
+                    self.business_row(f'uid-nuevo-{fmt}'),
+                    self.business_row('uid-no-existe', municipality='Narnia'),
+                ], create_owners=True, dry_run=True)
+
+                self.assertEqual((stats.created, stats.updated, stats.errors), (1, 1, 1))
+                self.assertEqual([list(error) for error in errors.values()], [['municipality']])
+                self.business.refresh_from_db()
+                self.assertEqual(self.business.name, 'Panadería')
+                self.assertFalse(CustomUser.objects.filter(uid=f'uid-nuevo-{fmt}').exists())
+                self.assertEqual(Business.objects.count(), 1)
+
+    def test_offer_rows_report_per_row_errors(self):
+        for fmt in imports.FORMATS:
+            with self.subTest(fmt=fmt):
+                stats, errors, _ = self.run_import(imports.OFFERS, fmt, [
+                    self.offer_row(business_id=self.business.pk, title=f'Por id {fmt}'),
+                    self.offer_row(owner_uid='uid-dueno', title=f'Por dueño {fmt}'),
+                    self.offer_row(business_id=999999),
+                    self.offer_row(owner_uid='uid-dueno', discount_price='barato'),
+                    self.offer_row(),
+                ])
+
+                offset = 2 if fmt == 'csv' else 1
+                self.assertEqual((stats.rows, stats.created, stats.errors), (5, 2, 3))
+                self.assertIn('business_id', errors[offset + 2])
+                self.assertIn('discount_price', errors[offset + 3])
+                self.assertIn('business_id', errors[offset + 4])
+                for title in (f'Por id {fmt}', f'Por dueño {fmt}'):
+                    offer = Offer.objects.get(title=title)
+                    self.assertEqual(offer.business, self.business)
+                    self.assertTrue(SearchEntry.objects.filter(kind=search.OFFER, object_id=offer.pk).exists())
+
+    def test_invalid_jsonl_lines_are_reported(self):
+        stats, errors, _ = self.run_import(imports.OFFERS, 'jsonl', [
+            '{"title": \n', '[1, 2]\n', self.offer_row(owner_uid='uid-dueno'),
+        ])
+
+        self.assertEqual((stats.rows, stats.created, stats.errors), (3, 1, 2))
+        self.assertEqual(sorted(errors), [1, 2])
+
+    def test_errors_are_reported_in_line_order(self):
+        for fmt in imports.FORMATS:
+            with self.subTest(fmt=fmt):
+                # La línea 1 de cada lote falla al escribir y la 2 al validar.
+                _, _, lines = self.run_import(imports.OFFERS, fmt, [
+                    self.offer_row(business_id=999999),
+                    self.offer_row(owner_uid='uid-dueno', end_date='mañana'),
+                    self.offer_row(owner_uid='uid-no-existe'),
+                    self.offer_row(owner_uid='uid-dueno', title=''),
+                    self.offer_row(business_id=999999),
+                ], batch_size=2)
+
+                offset = 2 if fmt == 'csv' else 1
+                self.assertEqual(lines, [offset + line for line in range(5)])
+
+
+class BenchmarkSeedCommandTests(TestCase):
+
+    @override_settings(DEBUG=False)
+    def test_is_refused_outside_debug(self):
+        with mock.patch.object(benchmark_data, 'clear') as clear, mock.patch.object(benchmark_data, 'seed') as seed:
+            with self.assertRaises(CommandError):
+                call_command('benchmark_seed', '--clear')
+        clear.assert_not_called()
+        seed.assert_not_called()
+
+    @override_settings(DEBUG=False)
+    def test_allow_production_overrides_the_guard(self):
+        with mock.patch.object(benchmark_data, 'exists', return_value=True), \
+                mock.patch.object(benchmark_data, 'clear', return_value=3) as clear:
+            call_command('benchmark_seed', '--clear', '--allow-production', stdout=io.StringIO())
+        clear.assert_called_once_with()
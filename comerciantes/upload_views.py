@@ -0,0 +1,154 @@
+# comerciantes/upload_views.py
+import logging
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from rest_framework import permissions, serializers, status
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import uploads
+from .models import Business, Offer
+from .permissions import IsBusinessOwner
+from .serializers import BusinessSerializer, OfferSerializer
+
+# Crea una instancia de logger para este módulo
+logger = logging.getLogger(__name__)
+
+
+class PresignUploadSerializer(serializers.Serializer):
+    target = serializers.ChoiceField(choices=list(uploads.TARGET_FOLDERS))
+    content_type = serializers.ChoiceField(choices=list(uploads.EXTENSIONS))
+    size = serializers.IntegerField(min_value=1)
+    method = serializers.ChoiceField(choices=['POST', 'PUT'], default='POST')
+
+    def validate_size(self, value):
+        if value > settings.UPLOAD_MAX_BYTES:
+            raise serializers.ValidationError(f"El archivo no debe superar {settings.UPLOAD_MAX_BYTES} bytes.")
+        return value
+
+
+class FinalizeUploadSerializer(serializers.Serializer):
+    target = serializers.ChoiceField(choices=list(uploads.TARGET_FOLDERS))
+    key = serializers.CharField(max_length=255)
+    offer_id = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if attrs['target'] == 'offer_image' and 'offer_id' not in attrs:
+            raise serializers.ValidationError({'offer_id': "Se requiere para target='offer_image'."})
+        return attrs
+
+
+def _owned_business(request):
+    return Business.objects.filter(user=request.user).first()
+
+
+class PresignUploadView(APIView):
+    """
+    POST /api/uploads/presign/ -> URL prefirmada para subir un logo o una imagen de
+    oferta directamente al almacenamiento, en la carpeta del negocio del usuario.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsBusinessOwner]
+
+    def post(self, request, *args, **kwargs):
+        serializer = PresignUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        business = _owned_business(request)
+        if business is None:
+            return Response({"detail": "No se encontró ningún negocio para este usuario."},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        key = uploads.new_key(data['target'], business, data['content_type'])
+        upload = uploads.get_backend().presign(
+            key, data['content_type'], settings.UPLOAD_MAX_BYTES, data['method'],
+            build_url=lambda token: request.build_absolute_uri(reverse('upload-local', args=[token])),
+        )
+        return Response({'key': key, **upload}, status=status.HTTP_201_CREATED)
+
+
+class FinalizeUploadView(APIView):
+    """
+    POST /api/uploads/finalize/ -> comprueba el archivo subido (tamaño y tipo real) y lo
+    asigna a Business.logo u Offer.image; la imagen anterior se borra. Las renditions se
+    generan después en segundo plano.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsBusinessOwner]
+
+    def post(self, request, *args, **kwargs):
+        serializer = FinalizeUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        business = _owned_business(request)
+        if business is None:
+            return Response({"detail": "No se encontró ningún negocio para este usuario."},
+                            status=status.HTTP_404_NOT_FOUND)
+        if not uploads.key_belongs_to(data['key'], data['target'], business):
+            return Response({"detail": "La clave no corresponde a tu negocio."}, status=status.HTTP_403_FORBIDDEN)
+
+        offer = None
+        if data['target'] == 'offer_image':
+            offer = Offer.objects.filter(pk=data['offer_id'], business=business).first()
+            if offer is None:
+                return Response({"detail": "No se encontró la oferta."}, status=status.HTTP_404_NOT_FOUND)
+
+        backend = uploads.get_backend()
+        size = backend.size(data['key'])
+        if size is None:
+            return Response({"detail": "No se encontró el archivo subido."}, status=status.HTTP_400_BAD_REQUEST)
+        content_type = uploads.sniff_content_type(backend.read_head(data['key'], uploads.SNIFF_BYTES))
+        if size > settings.UPLOAD_MAX_BYTES or content_type not in uploads.EXTENSIONS:
+            backend.delete(data['key'])
+            logger.warning(f"Subida rechazada para el negocio {business.id}: {data['key']} ({size} bytes, {content_type}).")
+            return Response({"detail": "El archivo debe ser una imagen JPEG, PNG o WebP dentro del tamaño permitido."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        context = {'request': request}
+        instance, field_name, serializer_class = (
+            (business, 'logo', BusinessSerializer) if offer is None else (offer, 'image', OfferSerializer)
+        )
+        replaced = getattr(instance, field_name).name
+        setattr(instance, field_name, data['key'])
+        instance.save(update_fields=[field_name, 'updated_at'])
+        if replaced and replaced != data['key']:
+            uploads.discard(replaced)
+        return Response(serializer_class(instance, context=context).data)
+
+
+class LocalUploadView(APIView):
+    """
+    Sustituto local de la URL prefirmada de S3 (solo con MEDIA_STORAGE=local).
+    Acepta PUT con el archivo como cuerpo o POST multipart con el campo 'file'.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def _store(self, token, content, content_type):
+        if settings.MEDIA_STORAGE != 'local':
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        try:
+            grant = uploads.LocalUploadBackend.load_token(token)
+        except signing.BadSignature:
+            return Response({"detail": "URL de subida inválida o expirada."}, status=status.HTTP_403_FORBIDDEN)
+        if content_type != grant['content_type'] or not 0 < len(content) <= grant['max_size']:
+            return Response({"detail": "Tipo o tamaño de archivo no permitido."}, status=status.HTTP_400_BAD_REQUEST)
+        if default_storage.exists(grant['key']):
+            default_storage.delete(grant['key'])
+        default_storage.save(grant['key'], ContentFile(content))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def put(self, request, token):
+        return self._store(token, request.body, request.content_type)
+
+    def post(self, request, token):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"detail": "Falta el campo 'file'."}, status=status.HTTP_400_BAD_REQUEST)
+        return self._store(token, upload.read(), request.data.get('Content-Type', ''))
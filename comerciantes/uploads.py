@@ -0,0 +1,213 @@
+# comerciantes/uploads.py
+"""
+Subidas directas al almacenamiento con URLs prefirmadas.
+
+El cliente pide una URL (POST o PUT) para una clave dentro de la carpeta de su
+negocio, sube el archivo directamente a S3 y después llama a "finalize", que
+comprueba tamaño y tipo real del archivo (leyendo solo sus primeros bytes) y lo
+asigna a Business.logo u Offer.image. Los workers de gunicorn nunca reciben los bytes.
+
+Con MEDIA_STORAGE=local (desarrollo y pruebas) LocalUploadBackend imita el flujo:
+la URL prefirmada apunta a un endpoint local firmado con django.core.signing.
+
+Limpieza: al reemplazar una imagen, "finalize" borra la anterior al confirmar la
+transacción (discard). Las claves que se subieron pero nunca se finalizaron las borra
+`manage.py clean_uploads` (orphaned_keys) cuando tienen más de UPLOAD_ORPHAN_MAX_AGE_HOURS.
+"""
+
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from mercadolocalmx_backend import timing
+
+from .models import ArchivedOffer, Business, Offer
+
+# Destinos de subida y la carpeta de cada uno (la misma que el upload_to del campo).
+TARGET_FOLDERS = {
+    'logo': 'business_logos',
+    'offer_image': 'offers_images',
+}
+EXTENSIONS = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+}
+# Bytes que se leen del archivo para identificar su tipo real.
+SNIFF_BYTES = 16
+
+_LOCAL_SIGNING_SALT = 'comerciantes.uploads.local'
+
+logger = logging.getLogger(__name__)
+
+
+def new_key(target, business, content_type):
+    return f'{TARGET_FOLDERS[target]}/{business.pk}/{uuid.uuid4().hex}.{EXTENSIONS[content_type]}'
+
+
+def key_belongs_to(key, target, business):
+    """La clave está directamente en la carpeta del negocio para ese destino."""
+    prefix = f'{TARGET_FOLDERS[target]}/{business.pk}/'
+    name = key[len(prefix):] if key.startswith(prefix) else ''
+    return bool(name) and '/' not in name and '..' not in name
+
+
+# Campos que apuntan a archivos subidos (las ofertas archivadas conservan su imagen).
+IMAGE_FIELDS = ((Business, 'logo'), (Offer, 'image'), (ArchivedOffer, 'image'))
+
+
+def is_referenced(name):
+    return any(model.objects.filter(**{field: name}).exists() for model, field in IMAGE_FIELDS)
+
+
+def _referenced_with_prefix(prefix):
+    referenced = set()
+    for model, field in IMAGE_FIELDS:
+        referenced.update(model.objects.filter(**{f'{field}__startswith': prefix}).values_list(field, flat=True))
+    return referenced
+
+
+def discard(name):
+    """
+    Borra un archivo reemplazado al confirmar la transacción, si ya nadie lo usa.
+    Sus renditions las borra images.process al procesar la imagen nueva.
+    """
+    def delete():
+        if is_referenced(name):
+            return
+        try:
+            default_storage.delete(name)
+        except Exception as e:
+            logger.warning(f"No se pudo borrar el archivo reemplazado {name}: {e}")
+    transaction.on_commit(delete)
+
+
+def orphaned_keys(max_age_hours=None):
+    """
+    Claves de las carpetas de subida de cada negocio que no usa ningún registro y que
+    tienen más de `max_age_hours` (por defecto UPLOAD_ORPHAN_MAX_AGE_HOURS): subidas que
+    nunca se finalizaron o que "finalize" rechazó sin poder borrarlas.
+    """
+    if max_age_hours is None:
+        max_age_hours = settings.UPLOAD_ORPHAN_MAX_AGE_HOURS
+    cutoff = timezone.now() - timedelta(hours=max_age_hours)
+    for folder in TARGET_FOLDERS.values():
+        try:
+            business_folders = default_storage.listdir(folder)[0]
+        except FileNotFoundError:
+            # Almacenamiento local sin subidas todavía (en S3 las carpetas no existen como tales).
+            continue
+        # Solo las subcarpetas por negocio; los archivos sueltos son del upload_to anterior.
+        for business_folder in business_folders:
+            if not business_folder.isdigit():
+                continue
+            prefix = f'{folder}/{business_folder}/'
+            keys = [prefix + name for name in default_storage.listdir(prefix)[1]]
+            if not keys:
+                continue
+            referenced = _referenced_with_prefix(prefix)
+            for key in keys:
+                if key not in referenced and default_storage.get_modified_time(key) < cutoff:
+                    yield key
+
+
+def sniff_content_type(head):
+    """Tipo MIME según la firma del archivo (no según lo que declaró el cliente)."""
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+class S3UploadBackend:
+    """URLs prefirmadas de S3 a través del cliente boto3 de django-storages."""
+
+    def __init__(self, storage=None):
+        self.storage = storage or default_storage
+        self.client = self.storage.bucket.meta.client
+        self.bucket = self.storage.bucket_name
+
+    def presign(self, key, content_type, max_size, method, build_url=None):
+        expires = settings.UPLOAD_URL_EXPIRES
+        if method == 'POST':
+            # S3 rechaza por sí mismo los archivos fuera de rango o con otro Content-Type.
+            post = self.client.generate_presigned_post(
+                Bucket=self.bucket,
+                Key=key,
+                Fields={'Content-Type': content_type},
+                Conditions=[{'Content-Type': content_type}, ['content-length-range', 1, max_size]],
+                ExpiresIn=expires,
+            )
+            return {'method': 'POST', 'url': post['url'], 'fields': post['fields'], 'expires_in': expires}
+        url = self.client.generate_presigned_url(
+            'put_object',
+            Params={'Bucket': self.bucket, 'Key': key, 'ContentType': content_type},
+            ExpiresIn=expires,
+        )
+        return {'method': 'PUT', 'url': url, 'headers': {'Content-Type': content_type}, 'expires_in': expires}
+
+    def size(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            with timing.measure(timing.STORAGE):
+                return self.client.head_object(Bucket=self.bucket, Key=key)['ContentLength']
+        except ClientError:
+            return None
+
+    def read_head(self, key, length):
+        with timing.measure(timing.STORAGE):
+            response = self.client.get_object(Bucket=self.bucket, Key=key, Range=f'bytes=0-{length - 1}')
+            return response['Body'].read()
+
+    def delete(self, key):
+        self.storage.delete(key)
+
+
+class LocalUploadBackend:
+    """
+    Sustituto de S3 sobre el almacenamiento local: la "URL prefirmada" es
+    upload_views.LocalUploadView con un token firmado que fija clave, tipo,
+    tamaño máximo y expiración.
+    """
+
+    def __init__(self, storage=None):
+        self.storage = storage or default_storage
+
+    def presign(self, key, content_type, max_size, method, build_url=None):
+        token = signing.dumps(
+            {'key': key, 'content_type': content_type, 'max_size': max_size},
+            salt=_LOCAL_SIGNING_SALT,
+        )
+        url = build_url(token)
+        expires = settings.UPLOAD_URL_EXPIRES
+        if method == 'POST':
+            return {'method': 'POST', 'url': url, 'fields': {'Content-Type': content_type}, 'expires_in': expires}
+        return {'method': 'PUT', 'url': url, 'headers': {'Content-Type': content_type}, 'expires_in': expires}
+
+    @staticmethod
+    def load_token(token):
+        """Devuelve los datos del token o lanza signing.BadSignature (incluye expirado)."""
+        return signing.loads(token, salt=_LOCAL_SIGNING_SALT, max_age=settings.UPLOAD_URL_EXPIRES)
+
+    def size(self, key):
+        return self.storage.size(key) if self.storage.exists(key) else None
+
+    def read_head(self, key, length):
+        with self.storage.open(key, 'rb') as f:
+            return f.read(length)
+
+    def delete(self, key):
+        self.storage.delete(key)
+
+
+def get_backend():
+    return LocalUploadBackend() if settings.MEDIA_STORAGE == 'local' else S3UploadBackend()
@@ -1,9 +1,14 @@
 # backend/comerciantes/urls.py
 
 # Añade path e include, aunque no se usen directamente aquí, es buena práctica
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
+from .async_views import AsyncReadView
 from .views import BusinessViewSet, OfferViewSet
+from .upload_views import FinalizeUploadView, LocalUploadView, PresignUploadView
+from .import_views import BulkImportView
+from . import imports
 
 router = DefaultRouter()
 router.register(r'businesses', BusinessViewSet) # URL: /api/businesses/
@@ -12,4 +17,33 @@ router.register(r'offers', OfferViewSet, basename='offer') # URL: /api/offers/,
 
 # Cuando incluyes este router en tu urls.py principal,
 # las rutas serán, por ejemplo: /api/businesses/, /api/offers/
-urlpatterns = router.urls
\ No newline at end of file
+urlpatterns = router.urls + [
+    # Subidas directas al almacenamiento (comerciantes/uploads.py)
+    path('uploads/presign/', PresignUploadView.as_view(), name='upload-presign'),
+    path('uploads/finalize/', FinalizeUploadView.as_view(), name='upload-finalize'),
+    path('uploads/local/<str:token>/', LocalUploadView.as_view(), name='upload-local'),
+    # Importación masiva, solo staff (comerciantes/imports.py)
+    path('imports/businesses/', BulkImportView.as_view(kind=imports.BUSINESSES), name='import-businesses'),
+    path('imports/offers/', BulkImportView.as_view(kind=imports.OFFERS), name='import-offers'),
+]
+
+# Lecturas async (comerciantes/async_views.py) en las mismas URLs que el router. Solo ids
+# numéricos en el detalle: las demás acciones (my_offers, ...) siguen en el router.
+# POST/PUT/PATCH/DELETE se delegan al ViewSet síncrono.
+_detail_writes = {'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}
+async_urlpatterns = [
+    path('businesses/', AsyncReadView.as_view(
+        viewset_class=BusinessViewSet, basename='business', action='list', write_actions={'post': 'create'})),
+    path('businesses/my_business/', AsyncReadView.as_view(
+        viewset_class=BusinessViewSet, basename='business', action='my_business')),
+    re_path(r'^businesses/(?P<pk>[0-9]+)/$', AsyncReadView.as_view(
+        viewset_class=BusinessViewSet, basename='business', action='retrieve', write_actions=_detail_writes)),
+    path('offers/', AsyncReadView.as_view(
+        viewset_class=OfferViewSet, basename='offer', action='list', write_actions={'post': 'create'})),
+    re_path(r'^offers/(?P<pk>[0-9]+)/$', AsyncReadView.as_view(
+        viewset_class=OfferViewSet, basename='offer', action='retrieve', write_actions=_detail_writes)),
+]
+
+if settings.ASYNC_READ_VIEWS:
+    # Van antes que las del router para atender las mismas URLs.
+    urlpatterns = async_urlpatterns + urlpatterns
@@ -3,36 +3,78 @@
 import logging
 from rest_framework import viewsets, permissions, generics, status
 from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import APIException, PermissionDenied, ValidationError
 
 from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.db import connection, transaction
+from django.db.models import DateField, F
+from django.db.models.functions import Cast
+from django.utils import timezone
 import django_filters.rest_framework
 
-from .filters import OfferFilter, BusinessFilter
-from .models import Business, Offer
-from .serializers import BusinessSerializer, OfferSerializer
+from .filters import ArchivedOfferFilter, OfferFilter, BusinessFilter
+from .models import ArchivedOffer, Business, Offer
+from .serializers import (
+    BusinessSerializer, OfferBulkCreateSerializer, OfferBulkIdsSerializer, OfferBulkUpdateSerializer, OfferSerializer,
+)
 from .permissions import IsBusinessOwner, IsOwnerOfBusiness, IsOwnerOfOffer
+from .mixins import CachedListMixin, ConditionalGetMixin, FacetsMixin, QueryBudgetMixin
+from .pagination import BusinessCursorPagination, OfferCursorPagination
+from .async_views import database_slot
+from . import cache as list_cache
+from . import exports
+from . import facets
+from . import search
 
-from datetime import date
-
-import stripe
-from django.conf import settings
-
-stripe.api_key = settings.STRIPE_SECRET_KEY
+from datetime import date, timedelta
 
 User = get_user_model()
 
 # Crea una instancia de logger para este módulo
 logger = logging.getLogger(__name__)
 
-class BusinessViewSet(viewsets.ModelViewSet):
+
+def _concrete_field_names(model, prefix=''):
+    return [prefix + field.name for field in model._meta.concrete_fields]
+
+
+# Columnas que necesitan los serializers en las acciones de lectura. Del usuario solo
+# se serializa el uid de Firebase, así que el resto de columnas de CustomUser no se cargan.
+# 'is_business_owner' se incluye porque CustomUser.__init__ lo lee: si se difiriera,
+# cada fila dispararía una consulta extra.
+BUSINESS_READ_FIELDS = _concrete_field_names(Business) + ['user__uid', 'user__is_business_owner']
+OFFER_READ_FIELDS = (
+    _concrete_field_names(Offer)
+    + _concrete_field_names(Business, prefix='business__')
+    + ['business__user__uid', 'business__user__is_business_owner']
+)
+ARCHIVED_OFFER_READ_FIELDS = (
+    _concrete_field_names(ArchivedOffer)
+    + _concrete_field_names(Business, prefix='business__')
+    + ['business__user__uid', 'business__user__is_business_owner']
+)
+
+
+class BusinessViewSet(QueryBudgetMixin, ConditionalGetMixin, CachedListMixin, FacetsMixin, viewsets.ModelViewSet):
     queryset = Business.objects.all()
     serializer_class = BusinessSerializer
+
+    # Número máximo de consultas SQL por acción (se verifica con QUERY_BUDGET_ENFORCED).
+    # list y retrieve incluyen la consulta de validadores del GET condicional; facets, una por faceta.
+    query_budgets = {'list': 2, 'retrieve': 2, 'my_business': 1, 'facets': 3}
+    read_actions = ['list', 'retrieve', 'my_business']
     
     # Se habilita el backend de filtros de Django
     filter_backends = [django_filters.rest_framework.DjangoFilterBackend]
     filterset_class = BusinessFilter
+    pagination_class = BusinessCursorPagination
+    # Solo JSON: el logo se sube directo al almacenamiento (/api/uploads/), así que un
+    # multipart se rechaza con 415 sin que el worker lea el archivo.
+    parser_classes = [JSONParser]
 
     def get_permissions(self):
         # Esta lógica de permisos es excelente. Asigna permisos específicos
@@ -48,18 +90,23 @@ class BusinessViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
 
     def get_queryset(self):
+        # El serializer lee user.uid: se trae en el mismo JOIN para evitar una consulta por negocio.
+        queryset = Business.objects.select_related('user')
+        if self.action in self.read_actions:
+            queryset = queryset.only(*BUSINESS_READ_FIELDS)
+
         # La lógica para filtrar negocios por suscripción es robusta y clara.
         if self.request.user.is_authenticated and self.request.user.is_staff:
-            return Business.objects.all()
+            return queryset
         
         if self.action == 'my_business':
             if self.request.user.is_authenticated:
-                return Business.objects.filter(user=self.request.user)
+                return queryset.filter(user=self.request.user)
             return Business.objects.none()
         
         # Lógica para mostrar solo los negocios de usuarios con suscripción activa.
         if self.request.user.is_authenticated:
-            return Business.objects.filter(user__is_business_owner=True)
+            return queryset.filter(user__is_business_owner=True)
         
         return Business.objects.none()
 
@@ -71,15 +118,14 @@ class BusinessViewSet(viewsets.ModelViewSet):
         logger.info(f"Intentando actualizar el negocio ID: {instance.id}. Datos recibidos.")
         print(f"Intentando actualizar el negocio ID: {instance.id}. Datos recibidos.")
         
+        # El logo ya no viaja en esta petición: si trae 'logo' el serializer responde 400 y
+        # remite a /api/uploads/ (comerciantes/uploads.py).
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
-        
-        # Aquí se intenta guardar el archivo en S3
         serializer.save()
         
-        # Agrega este log si la subida fue exitosa
-        logger.info(f"Negocio ID: {instance.id} actualizado exitosamente. El archivo debería estar en S3.")
-        print(f"Negocio ID: {instance.id} actualizado exitosamente. El archivo debería estar en S3.")
+        logger.info(f"Negocio ID: {instance.id} actualizado exitosamente.")
+        print(f"Negocio ID: {instance.id} actualizado exitosamente.")
         return Response(serializer.data)
         
     def perform_create(self, serializer):
@@ -88,28 +134,43 @@ class BusinessViewSet(viewsets.ModelViewSet):
         
     @action(detail=False, methods=['get'])
     def my_business(self, request):
-        user_business_qs = self.get_queryset()
+        # Una sola consulta: first() ya devuelve None si el usuario no tiene negocio.
+        user_business = self.get_queryset().first()
 
-        if user_business_qs.exists():
-            serializer = self.get_serializer(user_business_qs.first())
+        if user_business is not None:
+            serializer = self.get_serializer(user_business)
             return Response(serializer.data)
         else:
             return Response({"detail": "No se encontró ningún negocio para este usuario."},
                             status=status.HTTP_404_NOT_FOUND)
 
 
-class OfferViewSet(viewsets.ModelViewSet):
+class OfferViewSet(QueryBudgetMixin, ConditionalGetMixin, CachedListMixin, FacetsMixin, viewsets.ModelViewSet):
     queryset = Offer.objects.all()
     serializer_class = OfferSerializer
 
+    # Número máximo de consultas SQL por acción (se verifica con QUERY_BUDGET_ENFORCED).
+    # list y retrieve incluyen la consulta de validadores del GET condicional; facets, una por faceta.
+    query_budgets = {'list': 2, 'retrieve': 2, 'my_offers': 1, 'facets': 3}
+    read_actions = ['list', 'retrieve', 'my_offers']
+    bulk_actions = ['bulk_create', 'bulk_update', 'bulk_deactivate']
+
+    # La oferta incluye los datos de su negocio: editar el negocio también cambia la respuesta.
+    conditional_timestamp_fields = ('updated_at', 'business__updated_at')
+
     filterset_class = OfferFilter
     filter_backends = [django_filters.rest_framework.DjangoFilterBackend]
+    # my_offers usa el mismo esquema de cursor a través de paginate_queryset()
+    pagination_class = OfferCursorPagination
+    # Solo JSON, como en BusinessViewSet: la imagen se sube por /api/uploads/.
+    parser_classes = [JSONParser]
 
     def get_permissions(self):
         # De nuevo, la lógica de permisos está correctamente definida por acción.
         if self.action in ['list', 'retrieve']:
             permission_classes = [permissions.IsAuthenticated]
-        elif self.action == 'my_offers':
+        elif self.action in ['my_offers', *self.bulk_actions]:
+            # En las acciones masivas la propiedad se comprueba en get_queryset() (una sola consulta).
             permission_classes = [permissions.IsAuthenticated, IsBusinessOwner]
         elif self.action in ['create', 'update', 'partial_update', 'destroy']:
             permission_classes = [permissions.IsAuthenticated, IsBusinessOwner, IsOwnerOfOffer]
@@ -118,22 +179,30 @@ class OfferViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        # OfferSerializer anida BusinessSerializer (que lee user.uid): negocio y usuario
+        # se traen en el mismo JOIN para evitar 2 consultas extra por oferta.
+        queryset = super().get_queryset().select_related('business__user')
+        if self.action in self.read_actions:
+            queryset = queryset.only(*OFFER_READ_FIELDS)
+
+        if self.action in self.bulk_actions:
+            # También para el staff: las acciones masivas solo modifican las ofertas propias,
+            # igual que IsOwnerOfOffer en update y destroy.
+            if self.request.user.is_authenticated and self.request.user.is_business_owner:
+                return queryset.filter(business__user=self.request.user)
+            return Offer.objects.none()
 
         if self.request.user.is_authenticated and self.request.user.is_staff:
             return queryset
         
         if self.action == 'my_offers':
             if self.request.user.is_authenticated and self.request.user.is_business_owner:
-                try:
-                    user_business = Business.objects.get(user=self.request.user)
-                    return queryset.filter(business=user_business)
-                except Business.DoesNotExist:
-                    return Offer.objects.none()
+                # Filtra por el dueño a través del JOIN, sin buscar antes su negocio.
+                return queryset.filter(business__user=self.request.user)
             return Offer.objects.none()
         
         if self.request.user.is_authenticated:
-            if self.action == 'list':
+            if self.action in ['list', 'facets']:
                 # Esta es una excelente implementación de la lógica de negocio para
                 # mostrar solo ofertas activas de negocios con suscripción.
                 return queryset.filter(
@@ -160,7 +229,10 @@ class OfferViewSet(viewsets.ModelViewSet):
             
             logger.info(f"Oferta ID: {instance.id} actualizada exitosamente. El archivo debería estar en S3.")
             return Response(serializer.data)
-        
+
+        except APIException:
+            # 400, 404 o 415: DRF responde con su código.
+            raise
         except Exception as e:
             logger.error(f"Error fatal al actualizar la oferta ID: {instance.id}.", exc_info=True)
             return Response({"error": "Ocurrió un error interno."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -174,14 +246,153 @@ class OfferViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("Debes tener un negocio registrado para crear ofertas.")
         serializer.save(business=user_business)
 
+    def _include_archived(self):
+        return self.request.query_params.get('include_archived', '').lower() in ('1', 'true', 'yes')
+
+    def get_query_budget(self):
+        # Con include_archived, my_offers consulta también la tabla de ofertas archivadas
+        # (y con ?search= cuenta también los términos entre las archivadas).
+        budget = super().get_query_budget()
+        if self.action == 'my_offers' and self._include_archived():
+            budget += 1 + self.get_search_allowance()
+        return budget
+
+    def get_archived_queryset(self):
+        """Ofertas archivadas del usuario (ver comerciantes/archive.py), con los mismos filtros."""
+        queryset = (
+            ArchivedOffer.objects.select_related('business__user')
+            .only(*ARCHIVED_OFFER_READ_FIELDS)
+            .filter(business__user=self.request.user)
+        )
+        return ArchivedOfferFilter(self.request.query_params, queryset=queryset, request=self.request).qs
+
     @action(detail=False, methods=['get'])
     def my_offers(self, request):
         queryset = self.get_queryset()
         filtered_queryset = self.filter_queryset(queryset)
-        page = self.paginate_queryset(filtered_queryset)
+        if self._include_archived():
+            # Vivas y archivadas en una sola lista, con el mismo cursor.
+            page = self.paginator.paginate_querysets([filtered_queryset, self.get_archived_queryset()], request, view=self)
+        else:
+            page = self.paginate_queryset(filtered_queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
         
         serializer = self.get_serializer(filtered_queryset, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        GET /api/offers/export/?output=ndjson|csv&municipality=...&business_type=...: el
+        catálogo de ofertas activas como archivo, transmitido por bloques (ver comerciantes/exports.py).
+        """
+        fmt = request.query_params.get('output', 'ndjson')
+        if fmt not in exports.FORMATS:
+            return Response({"detail": f"output debe ser uno de: {', '.join(exports.FORMATS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        queryset = exports.export_queryset(request.query_params)
+        if isinstance(request._request, ASGIRequest):
+            # Cada bloque ocupa un lugar de ASYNC_DB_CONCURRENCY solo mientras se consulta.
+            content = exports.astream(queryset, fmt, slot=database_slot)
+        else:
+            content = exports.stream(queryset, fmt)
+
+        response = StreamingHttpResponse(content, content_type=exports.CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = f'attachment; filename="ofertas.{fmt}"'
+        # Que los proxies (nginx) no acumulen la respuesta: el archivo empieza a llegar de inmediato.
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @action(detail=False, methods=['post'])
+    def bulk_create(self, request):
+        """
+        POST /api/offers/bulk_create/ {"offers": [{...}, ...]}: crea las ofertas válidas
+        con un solo INSERT. Cada oferta tiene su resultado (201 con el id o 400 con los errores).
+        """
+        serializer = OfferBulkCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        business = Business.objects.filter(user=request.user).only('id', 'name', 'business_type', 'municipality').first()
+        if business is None:
+            raise PermissionDenied("Debes tener un negocio registrado para crear ofertas.")
+
+        # Un solo OfferSerializer valida todas las ofertas (como hace ListSerializer), pero
+        # las inválidas no impiden crear las demás.
+        child = self.get_serializer()
+        results, offers = [], []
+        for index, item in enumerate(serializer.validated_data['offers']):
+            try:
+                attrs = child.run_validation(item)
+            except ValidationError as e:
+                results.append({'index': index, 'status': status.HTTP_400_BAD_REQUEST, 'errors': e.detail})
+                continue
+            offer = Offer(business=business, **attrs)
+            offers.append(offer)
+            results.append({'index': index, 'status': status.HTTP_201_CREATED, 'offer': offer})
+
+        if offers:
+            with transaction.atomic():
+                if connection.features.can_return_rows_from_bulk_insert:
+                    # Postgres y SQLite devuelven los ids del INSERT.
+                    Offer.objects.bulk_create(offers)
+                    search.index_offers(offers)
+                    list_cache.bump_generations(business.municipality)
+                    facets.invalidate(facets.OFFER)
+                else:
+                    # MySQL no los devuelve: se guardan una a una y los signals de post_save
+                    # indexan cada oferta e invalidan los listados y las facetas.
+                    for offer in offers:
+                        offer.save()
+        for result in results:
+            if 'offer' in result:
+                result['id'] = result.pop('offer').pk
+
+        logger.info(f"Negocio ID: {business.id} creó {len(offers)} ofertas en bloque ({len(results) - len(offers)} inválidas).")
+        return Response({'created': len(offers), 'results': results}, status=status.HTTP_207_MULTI_STATUS)
+
+    @action(detail=False, methods=['patch'])
+    def bulk_update(self, request):
+        """
+        PATCH /api/offers/bulk_update/ {"ids": [...], "changes": {...}, "extend_days": 7}:
+        aplica los mismos cambios a todas las ofertas con un solo UPDATE.
+        """
+        serializer = OfferBulkUpdateSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        changes = dict(serializer.validated_data['changes'])
+        extend_days = serializer.validated_data.get('extend_days')
+        if extend_days is not None:
+            # Cast a fecha: en SQLite la suma devuelve un datetime en texto.
+            changes['end_date'] = Cast(F('end_date') + timedelta(days=extend_days), output_field=DateField())
+        return self._bulk_apply(serializer.validated_data['ids'], changes)
+
+    @action(detail=False, methods=['post'])
+    def bulk_deactivate(self, request):
+        """POST /api/offers/bulk_deactivate/ {"ids": [...]}: desactiva las ofertas con un solo UPDATE."""
+        serializer = OfferBulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return self._bulk_apply(serializer.validated_data['ids'], {'is_active': False})
+
+    def _bulk_apply(self, ids, changes):
+        """
+        Aplica `changes` a las ofertas de `ids` que son del usuario: una consulta para
+        comprobar la propiedad y un UPDATE para todas. Las demás se responden con 404.
+        """
+        ids = list(dict.fromkeys(ids))
+        with transaction.atomic():
+            owned = dict(self.get_queryset().filter(pk__in=ids).values_list('pk', 'business__municipality'))
+            if owned:
+                Offer.objects.filter(pk__in=list(owned)).update(**changes, updated_at=timezone.now())
+                if {'title', 'description'} & set(changes):
+                    search.index_offers(Offer.objects.filter(pk__in=list(owned)).select_related('business'))
+                list_cache.bump_generations(*set(owned.values()))
+                facets.invalidate(facets.OFFER)
+
+        results = [
+            {'id': offer_id, 'status': status.HTTP_200_OK} if offer_id in owned
+            else {'id': offer_id, 'status': status.HTTP_404_NOT_FOUND, 'detail': "No se encontró la oferta."}
+            for offer_id in ids
+        ]
+        logger.info(f"Usuario {self.request.user.pk}: {self.action} sobre {len(owned)} de {len(ids)} ofertas.")
+        return Response({'updated': len(owned), 'results': results}, status=status.HTTP_207_MULTI_STATUS)
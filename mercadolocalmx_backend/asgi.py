@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mercadolocalmx_backend.settings')
+# Con ASGI las lecturas más frecuentes se sirven con vistas async (comerciantes/async_views.py).
+os.environ.setdefault('ASYNC_READ_VIEWS', 'True')
 
 application = get_asgi_application()
+
+# Importa vistas y SDKs antes de atender peticiones (una sola vez con gunicorn --preload).
+from mercadolocalmx_backend.preload import warm_up  # noqa: E402
+
+warm_up()
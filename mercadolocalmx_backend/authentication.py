@@ -2,18 +2,84 @@
 
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
-from firebase_admin import auth, exceptions as firebase_exceptions
+from firebase_admin import exceptions as firebase_exceptions
 from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from asgiref.sync import sync_to_async
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import logging
+import threading
+import zlib
+
+from usuarios.cache import cache_user, get_cached_user, is_process_local, lookup_user
+from usuarios.stripe_customers import provision_customer_async
+from . import timing
+from .firebase_tokens import get_cached_token, verify_firebase_token
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
+# Locks por franjas para serializar el auto-registro de un mismo uid dentro del proceso.
+_PROVISIONING_LOCKS = [threading.Lock() for _ in range(64)]
+
+
+def _provisioning_lock(uid):
+    return _PROVISIONING_LOCKS[zlib.crc32(uid.encode('utf-8')) % len(_PROVISIONING_LOCKS)]
+
+
+# Pool de las verificaciones que hacen llamadas de red a Firebase desde las vistas async.
+_verify_executor = None
+_verify_executor_lock = threading.Lock()
+
+
+def _get_verify_executor():
+    global _verify_executor
+    with _verify_executor_lock:
+        if _verify_executor is None:
+            _verify_executor = ThreadPoolExecutor(
+                max_workers=settings.FIREBASE_VERIFY_WORKERS, thread_name_prefix='firebase-verify'
+            )
+    return _verify_executor
+
+
 class FirebaseAuthentication(BaseAuthentication):
     """
     Autenticación de Django REST Framework usando tokens ID de Firebase.
     """
     def authenticate(self, request):
+        id_token = self._get_token(request)
+        if id_token is None:
+            return None
+        decoded_token = self._verify(id_token)
+        return (self._user_for_token(decoded_token), None)
+
+    async def aauthenticate(self, request):
+        """
+        Variante para las vistas async (comerciantes/async_views.py). En el event loop
+        solo se consulta la memoria del proceso: un token ya verificado y, sin caché
+        compartida, el usuario cacheado. La verificación con Firebase (y la lectura del
+        estado de revocación compartido) corre en un pool de hilos propio; la caché
+        compartida de usuarios y el ORM, en el hilo de la petición.
+        """
+        id_token = self._get_token(request)
+        if id_token is None:
+            return None
+        # Solo memoria del proceso (firebase_tokens.get_cached_token no lee la caché compartida).
+        decoded_token = get_cached_token(id_token)
+        if decoded_token is None:
+            loop = asyncio.get_running_loop()
+            # run_in_executor no copia la ContextVar de timing: se mide aquí, no dentro del pool.
+            with timing.measure(timing.FIREBASE):
+                decoded_token = await loop.run_in_executor(_get_verify_executor(), self._verify, id_token)
+        user = get_cached_user(decoded_token['uid']) if is_process_local() else None
+        if user is None:
+            # Con caché compartida (Redis), validar la copia en memoria ya es una llamada de red.
+            user = await sync_to_async(self._user_for_token)(decoded_token)
+        return (user, None)
+
+    def _get_token(self, request):
         auth_header = request.META.get('HTTP_AUTHORIZATION')
 
         if not auth_header:
@@ -23,11 +89,13 @@ class FirebaseAuthentication(BaseAuthentication):
         if parts[0].lower() != 'bearer' or len(parts) == 1 or len(parts) > 2:
             raise AuthenticationFailed('Formato de cabecera de autorización inválido. Se esperaba "Bearer <token>".')
 
-        id_token = parts[1]
+        return parts[1]
 
+    def _verify(self, id_token):
         try:
-            # Usa leeway=5. Puedes subirlo a 10 o 15 si persisten los problemas de "Token used too early"
-            decoded_token = auth.verify_id_token(id_token, check_revoked=True,clock_skew_seconds=10)
+            # Verificación con caché local: firma, expiración y revocación (por uid, a intervalos).
+            # La tolerancia de reloj (10 s) está en firebase_tokens.CLOCK_SKEW_SECONDS.
+            return verify_firebase_token(id_token)
         except firebase_exceptions.FirebaseError as e:
             logger.error(f"Fallo en la verificación del token de Firebase: {e}")
             if "Token used too early" in str(e):
@@ -37,24 +105,54 @@ class FirebaseAuthentication(BaseAuthentication):
             logger.error(f"Error inesperado durante la verificación del token de Firebase: {e}")
             raise AuthenticationFailed('Ocurrió un error inesperado durante la autenticación.')
 
+    def _user_for_token(self, decoded_token):
         firebase_uid = decoded_token['uid']
         email = decoded_token.get('email')
 
+        user, generation = lookup_user(firebase_uid)
+        if user is None:
+            # La generación se lee antes que la fila: si otra petición invalida al usuario
+            # entretanto, cache_user no deja la fila vieja como vigente.
+            user = self._get_or_create_user(firebase_uid, email)
+            cache_user(user, generation)
+        return user
+
+    def _get_or_create_user(self, firebase_uid, email):
+        """
+        Busca el usuario de Django asociado al uid de Firebase y lo crea en el primer login.
+        Es seguro ante ráfagas de peticiones paralelas con el mismo token: dentro del proceso
+        se serializan por uid, y entre procesos la restricción UNIQUE de 'uid' decide quién crea.
+        """
         try:
-            user = User.objects.get(uid=firebase_uid)
+            return User.objects.get(uid=firebase_uid)
         except User.DoesNotExist:
+            pass
+        except Exception as e:
+            logger.error(f"Error inesperado al buscar/crear usuario de Django: {e}")
+            raise AuthenticationFailed(f"Error al procesar el usuario de Django: {e}")
+
+        with _provisioning_lock(firebase_uid):
             try:
-                user = User.objects.create_user(
-                    username=firebase_uid,
-                    email=email,
-                    uid=firebase_uid
-                )
+                # Otra petición de este proceso pudo haberlo creado mientras esperábamos el lock.
+                return User.objects.get(uid=firebase_uid)
+            except User.DoesNotExist:
+                pass
+
+            try:
+                with transaction.atomic():
+                    user = User.objects.create_user(
+                        username=firebase_uid,
+                        email=email,
+                        uid=firebase_uid
+                    )
                 logger.info(f"Nuevo usuario de Django creado para Firebase UID: {firebase_uid}")
+                # El cliente de Stripe se crea en segundo plano, antes de que lo necesite el checkout.
+                provision_customer_async(user)
+                return user
+            except IntegrityError:
+                # Otro worker ganó la carrera: el usuario ya existe.
+                logger.info(f"El usuario para Firebase UID {firebase_uid} fue creado por otra petición en paralelo.")
+                return User.objects.get(uid=firebase_uid)
             except Exception as e:
                 logger.error(f"Error al crear el usuario de Django para Firebase UID {firebase_uid}: {e}")
                 raise AuthenticationFailed(f"No se pudo crear el usuario de Django: {e}")
-        except Exception as e:
-            logger.error(f"Error inesperado al buscar/crear usuario de Django: {e}")
-            raise AuthenticationFailed(f"Error al procesar el usuario de Django: {e}")
-
-        return (user, None)
\ No newline at end of file
@@ -0,0 +1,65 @@
+# mercadolocalmx_backend/firebase_app.py
+"""
+Inicialización perezosa del SDK de Firebase Admin.
+
+settings.py solo lee FIREBASE_ADMIN_SDK_CREDENTIALS. Las credenciales se parsean y la
+app se crea la primera vez que se necesita en cada proceso (get_app()), así que los
+comandos de manage.py que no usan Firebase no pagan ese costo. Si la app se creó en
+otro proceso (p. ej. en el maestro de gunicorn --preload antes del fork), el worker
+crea la suya: el transporte HTTP de las credenciales no se comparte entre procesos.
+"""
+
+import json
+import logging
+import os
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# PID del proceso que creó la app por defecto.
+_app_pid = None
+_lock = threading.Lock()
+
+
+def _credentials():
+    from firebase_admin import credentials
+
+    source = settings.FIREBASE_ADMIN_SDK_CREDENTIALS
+    # Ruta de un archivo de credenciales (desarrollo) o la cadena JSON (producción).
+    if os.path.exists(source):
+        return credentials.Certificate(source)
+    return credentials.Certificate(json.loads(source))
+
+
+def get_app():
+    """
+    Devuelve la app por defecto de Firebase de este proceso, creándola si hace falta,
+    o None si no hay credenciales configuradas.
+    """
+    global _app_pid
+    import firebase_admin
+
+    if _app_pid == os.getpid():
+        return firebase_admin.get_app()
+
+    with _lock:
+        if _app_pid != os.getpid():
+            if not settings.FIREBASE_ADMIN_SDK_CREDENTIALS:
+                return None
+            if firebase_admin._apps:
+                # Heredada del proceso padre.
+                firebase_admin.delete_app(firebase_admin.get_app())
+            try:
+                firebase_admin.initialize_app(_credentials())
+            except Exception as e:
+                logger.critical(f"Error fatal al inicializar Firebase Admin SDK: {e}")
+                raise
+            _app_pid = os.getpid()
+            logger.info("Firebase Admin SDK inicializado.")
+    return firebase_admin.get_app()
+
+
+def is_initialized():
+    return _app_pid == os.getpid()
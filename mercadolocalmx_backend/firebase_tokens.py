@@ -0,0 +1,229 @@
+# mercadolocalmx_backend/firebase_tokens.py
+
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from cachetools import TLRUCache, TTLCache
+from django.conf import settings
+from django.core.cache import caches
+from firebase_admin import auth, _token_gen
+
+from . import timing
+from .firebase_app import get_app, is_initialized
+
+# Crear una instancia de logger para este módulo
+logger = logging.getLogger(__name__)
+
+# Segundos de tolerancia de reloj al verificar la firma del token.
+CLOCK_SKEW_SECONDS = 10
+
+
+def _token_expiration(key, decoded_token, now):
+    """
+    Un token verificado vive en caché como máximo FIREBASE_TOKEN_CACHE_TTL segundos
+    y nunca más allá de su claim 'exp'.
+    """
+    return min(now + settings.FIREBASE_TOKEN_CACHE_TTL, decoded_token.get('exp', now))
+
+
+# Tokens ya verificados, indexados por el hash SHA-256 del token (nunca el token en claro).
+_token_cache = TLRUCache(
+    maxsize=settings.FIREBASE_TOKEN_CACHE_SIZE,
+    ttu=_token_expiration,
+    timer=time.time,
+)
+# Estado de revocación por uid: (disabled, tokens_valid_after_timestamp en ms). Con caché
+# compartida, cada proceso lo guarda solo FIREBASE_REVOCATION_LOCAL_TTL segundos y lo vuelve
+# a leer de ella, donde invalidate_uid() lo borra para todos los procesos.
+_revocation_cache = TTLCache(
+    maxsize=settings.FIREBASE_TOKEN_CACHE_SIZE,
+    ttl=settings.FIREBASE_REVOCATION_LOCAL_TTL,
+)
+_lock = threading.Lock()
+
+# PID del proceso que arrancó el hilo de refresco (los hilos no sobreviven a un fork).
+_refresher_pid = None
+
+
+def _token_key(id_token):
+    return hashlib.sha256(id_token.encode('utf-8')).hexdigest()
+
+
+def _revocation_key(uid):
+    return f'firebase_tokens:revocation:{uid}'
+
+
+def _shared_cache():
+    """Caché compartida entre procesos para el estado de revocación, o None si no está habilitada."""
+    if not settings.FIREBASE_REVOCATION_SHARED_ALIAS:
+        return None
+    return caches[settings.FIREBASE_REVOCATION_SHARED_ALIAS]
+
+
+def _revocation_state(uid):
+    with _lock:
+        state = _revocation_cache.get(uid)
+    if state is not None:
+        return state
+
+    shared = _shared_cache()
+    if shared is not None:
+        try:
+            state = shared.get(_revocation_key(uid))
+        except Exception as e:
+            logger.warning(f"No se pudo leer el estado de revocación compartido de {uid}: {e}")
+
+    if state is None:
+        with timing.measure(timing.FIREBASE):
+            user_record = auth.get_user(uid, app=get_app())
+        state = (user_record.disabled, user_record.tokens_valid_after_timestamp)
+        if shared is not None:
+            try:
+                shared.set(_revocation_key(uid), state, timeout=settings.FIREBASE_REVOCATION_CHECK_INTERVAL)
+            except Exception as e:
+                logger.warning(f"No se pudo guardar el estado de revocación compartido de {uid}: {e}")
+
+    with _lock:
+        _revocation_cache[uid] = state
+    return state
+
+
+def _check_revoked(decoded_token):
+    """
+    Equivalente a check_revoked=True de firebase_admin, pero consultando a Firebase
+    como mucho una vez cada FIREBASE_REVOCATION_CHECK_INTERVAL segundos por uid.
+    """
+    disabled, tokens_valid_after = _revocation_state(decoded_token['uid'])
+    if disabled:
+        raise auth.UserDisabledError('The user record is disabled.')
+    if decoded_token.get('iat', 0) * 1000 < tokens_valid_after:
+        raise auth.RevokedIdTokenError('The Firebase ID token has been revoked.')
+
+
+def verify_firebase_token(id_token):
+    """
+    Verifica un token ID de Firebase usando la caché local.
+
+    Un token ya visto (y no expirado) no se vuelve a verificar, y la comprobación de
+    revocación se hace por uid a intervalos, de modo que una petición "caliente"
+    no hace ninguna llamada de red. Lanza las mismas excepciones que auth.verify_id_token.
+    """
+    start_certificate_refresher()
+
+    key = _token_key(id_token)
+    with _lock:
+        decoded_token = _token_cache.get(key)
+
+    if decoded_token is None:
+        with timing.measure(timing.FIREBASE):
+            decoded_token = auth.verify_id_token(
+                id_token, app=get_app(), check_revoked=False, clock_skew_seconds=CLOCK_SKEW_SECONDS
+            )
+        with _lock:
+            _token_cache[key] = decoded_token
+
+    try:
+        _check_revoked(decoded_token)
+    except (auth.RevokedIdTokenError, auth.UserDisabledError):
+        with _lock:
+            _token_cache.pop(key, None)
+        raise
+
+    return decoded_token
+
+
+def get_cached_token(id_token):
+    """
+    Devuelve el token decodificado si ya está en caché y el estado de revocación de su
+    uid también, sin ninguna llamada de red. En cualquier otro caso devuelve None y hay
+    que usar verify_firebase_token (que además lanza las excepciones de revocación).
+    """
+    key = _token_key(id_token)
+    with _lock:
+        decoded_token = _token_cache.get(key)
+        state = _revocation_cache.get(decoded_token['uid']) if decoded_token is not None else None
+    if state is None:
+        return None
+
+    disabled, tokens_valid_after = state
+    if disabled or decoded_token.get('iat', 0) * 1000 < tokens_valid_after:
+        return None
+    return decoded_token
+
+
+def invalidate_uid(uid):
+    """
+    Olvida el estado de revocación de un uid para que la siguiente petición lo
+    vuelva a consultar en Firebase (p. ej. después de revoke_refresh_tokens).
+
+    Lo llama el worker del outbox: los procesos web se enteran por la caché compartida,
+    a más tardar en FIREBASE_REVOCATION_LOCAL_TTL segundos. Sin ella (sin Redis) solo
+    se olvida en este proceso, y los demás aceptan los tokens revocados hasta que su
+    copia cumpla FIREBASE_REVOCATION_CHECK_INTERVAL.
+    """
+    with _lock:
+        _revocation_cache.pop(uid, None)
+
+    shared = _shared_cache()
+    if shared is not None:
+        try:
+            shared.delete(_revocation_key(uid))
+        except Exception as e:
+            logger.warning(f"No se pudo invalidar el estado de revocación compartido de {uid}: {e}")
+
+
+def clear():
+    """Vacía ambas cachés (útil en pruebas y en comandos de mantenimiento)."""
+    with _lock:
+        _token_cache.clear()
+        _revocation_cache.clear()
+
+
+def _refresh_certificates():
+    """
+    Descarga de nuevo los certificados públicos de Google a través del mismo
+    transporte (con caché HTTP) que usa firebase_admin para verificar firmas.
+    """
+    client = auth._get_client(get_app())
+    client._token_verifier.request(
+        _token_gen.ID_TOKEN_CERT_URI,
+        headers={'Cache-Control': 'no-cache'},
+    )
+
+
+def _certificate_refresh_loop(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            _refresh_certificates()
+            logger.debug("Certificados de Firebase refrescados.")
+        except Exception as e:
+            logger.warning(f"No se pudieron refrescar los certificados de Firebase: {e}")
+
+
+def start_certificate_refresher():
+    """
+    Arranca (una vez por proceso) el hilo que mantiene caliente la caché de
+    certificados. Es seguro tras un fork: cada worker arranca su propio hilo.
+    """
+    global _refresher_pid
+
+    interval = settings.FIREBASE_CERT_REFRESH_INTERVAL
+    if _refresher_pid == os.getpid() or not interval or not is_initialized():
+        return
+
+    with _lock:
+        if _refresher_pid == os.getpid():
+            return
+        _refresher_pid = os.getpid()
+
+    thread = threading.Thread(
+        target=_certificate_refresh_loop,
+        args=(interval,),
+        name='firebase-cert-refresher',
+        daemon=True,
+    )
+    thread.start()
@@ -0,0 +1,199 @@
+# mercadolocalmx_backend/middleware.py
+
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import profiling, timing
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoiseMiddleware que también funciona en modo async (ASGI).
+
+    El de WhiteNoise solo es síncrono: en ASGI Django lo ejecutaría en un hilo y, con
+    él, toda la cadena de middleware y vistas que va después, aunque las vistas sean
+    async. Aquí la búsqueda del archivo estático se hace en el event loop y solo el
+    envío del archivo (lectura de disco) pasa a un hilo.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.async_mode = iscoroutinefunction(self.get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class RequestTimingMiddleware:
+    """
+    Mide cada petición (síncrona o async, ver timing.py): agrega la cabecera
+    Server-Timing, escribe la línea JSON de la petición y, si tardó más de
+    SLOW_REQUEST_THRESHOLD_MS, la registra en el log de peticiones lentas con sus
+    consultas. Va primero en MIDDLEWARE para que el total incluya a todos los demás.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        timing.install_query_wrapper()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not settings.REQUEST_TIMING_ENABLED:
+            return self.get_response(request)
+        timings, token = timing.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            timing.finish(token)
+        self._report(request, response, timings)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.REQUEST_TIMING_ENABLED:
+            return await self.get_response(request)
+        timings, token = timing.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            timing.finish(token)
+        self._report(request, response, timings)
+        return response
+
+    def _report(self, request, response, timings):
+        total = timings.elapsed()
+        if settings.REQUEST_TIMING_HEADER:
+            response['Server-Timing'] = timings.server_timing(total)
+            origin = request.headers.get('Origin')
+            if origin and origin in settings.CORS_ALLOWED_ORIGINS:
+                # Sin esta cabecera el navegador oculta Server-Timing a un frontend de otro origen.
+                response['Timing-Allow-Origin'] = origin
+
+        slow = total * 1000 >= settings.SLOW_REQUEST_THRESHOLD_MS
+        if not slow and not timing.logger.isEnabledFor(logging.INFO):
+            return
+        line = timing.log_line(request, response, timings, total)
+        timing.logger.info(json.dumps(line))
+        if slow:
+            line['queries'] = timings.slowest_queries(settings.SLOW_REQUEST_MAX_QUERIES)
+            timing.slow_logger.warning(json.dumps(line))
+
+
+class ProfilingMiddleware:
+    """
+    Perfila la vista de las peticiones elegidas por profiling.trigger() (ver profiling.py)
+    y guarda el perfil en PROFILING_DIR. Va al final de MIDDLEWARE: perfila la vista y el
+    render de la respuesta, no al resto de la cadena. Con PROFILING_ENABLED=False no se
+    instala, y una petición que no se perfila solo paga el sorteo de trigger().
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        if settings.PROFILING_MODE not in profiling.MODES:
+            raise ImproperlyConfigured(f"PROFILING_MODE debe ser uno de {', '.join(profiling.MODES)}.")
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # Django toma process_view de la instancia: en ASGI, la versión async evita pasar
+            # cada petición a un hilo solo para decidir si se perfila.
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        reason = profiling.trigger(request)
+        if reason is None and profiling.asks_staff_profile(request) and self._is_staff(request):
+            reason = profiling.REQUESTED
+        if reason is None or not profiling.acquire():
+            return None
+        try:
+            profiler, response, duration = self._profile(request, view_func, view_args, view_kwargs)
+            profiling.save(profiler, request, response, duration, reason)
+        finally:
+            profiling.release()
+        return response
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        reason = profiling.trigger(request)
+        if reason is None and profiling.asks_staff_profile(request) and (await request.auser()).is_staff:
+            reason = profiling.REQUESTED
+        if reason is None or not profiling.acquire():
+            return None
+        try:
+            if iscoroutinefunction(view_func):
+                # Se perfila el hilo del event loop (ver profiling.py).
+                profiler, response, duration = await self._aprofile(request, view_func, view_args, view_kwargs)
+            else:
+                # En el mismo hilo en que Django ejecutaría la vista síncrona.
+                profiler, response, duration = await sync_to_async(self._profile, thread_sensitive=True)(
+                    request, view_func, view_args, view_kwargs
+                )
+            await sync_to_async(profiling.save)(profiler, request, response, duration, reason)
+        finally:
+            profiling.release()
+        return response
+
+    def _profile(self, request, view_func, view_args, view_kwargs):
+        profiler = profiling.new_profiler()
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            response = view_func(request, *view_args, **view_kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response = response.render()
+        finally:
+            profiler.stop()
+        return profiler, response, time.perf_counter() - started
+
+    async def _aprofile(self, request, view_func, view_args, view_kwargs):
+        profiler = profiling.new_profiler()
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            response = await view_func(request, *view_args, **view_kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response = response.render()
+        finally:
+            profiler.stop()
+        return profiler, response, time.perf_counter() - started
+
+    def _is_staff(self, request):
+        # Antes de la vista, request.user es el de la sesión (AuthenticationMiddleware).
+        user = getattr(request, 'user', None)
+        return bool(user is not None and user.is_staff)
@@ -0,0 +1,20 @@
+# mercadolocalmx_backend/preload.py
+"""
+Carga anticipada de los procesos web (wsgi.py y asgi.py).
+
+Importa el URLconf (vistas, DRF y la autenticación con el SDK de Firebase) y el SDK de
+Stripe, sin crear clientes ni conexiones. Con gunicorn --preload esto ocurre una sola
+vez en el proceso maestro y los workers lo heredan al hacer fork; lo que abre conexiones
+o lee credenciales se inicializa en cada worker la primera vez que se usa
+(firebase_app.get_app y stripe_client.get). Los comandos de manage.py no pasan por aquí.
+"""
+
+import importlib
+
+from django.urls import get_resolver
+
+
+def warm_up():
+    # Acceder a url_patterns importa el URLconf y, con él, todas las vistas.
+    get_resolver().url_patterns
+    importlib.import_module('stripe')
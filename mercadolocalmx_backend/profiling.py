@@ -0,0 +1,271 @@
+# mercadolocalmx_backend/profiling.py
+"""
+Perfiles de peticiones en producción, bajo demanda y sin redesplegar.
+
+Con PROFILING_ENABLED, ProfilingMiddleware (middleware.py) perfila la vista de:
+
+- una fracción PROFILING_SAMPLE_RATE de las peticiones, elegida al azar;
+- las que piden perfil con la cabecera PROFILING_HEADER, solo si quien la manda tiene
+  permiso, y se comprueba antes de empezar a perfilar: la cabecera trae el secreto
+  compartido PROFILING_SECRET (`X-Profile: <secreto>`, para clientes de la API, cuyo
+  token de Firebase se verifica hasta la vista), o trae `1` y la petición tiene una
+  sesión de staff del admin (AuthenticationMiddleware). Cualquier otra se atiende sin
+  perfilar, así que nadie más puede hacer más lentas sus peticiones ni ocupar el perfilador.
+
+PROFILING_MODE elige el perfilador: 'sampling' toma la pila del hilo de la vista cada
+PROFILING_SAMPLE_INTERVAL_MS desde otro hilo (costo casi nulo, apto para muestrear en
+producción); 'cprofile' registra cada llamada (más detalle, y varias veces más lento).
+En las vistas async se perfila el hilo del event loop, que también atiende a las demás
+peticiones mientras la vista espera.
+
+Se perfila una petición a la vez por proceso. Cada perfil es un JSON en PROFILING_DIR
+(sus funciones más costosas y, con 'sampling', las pilas más frecuentes); al pasar de
+PROFILING_MAX_FILES se borran los más antiguos. Se consultan en /admin/profiles/.
+
+Desactivado, el middleware se quita de la cadena al arrancar (MiddlewareNotUsed).
+"""
+
+import cProfile
+import hmac
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CPROFILE = 'cprofile'
+SAMPLING = 'sampling'
+MODES = (CPROFILE, SAMPLING)
+
+# Por qué se perfiló la petición.
+SAMPLED = 'sample'
+REQUESTED = 'header'
+
+# Profundidad máxima de pila que guarda el muestreo.
+MAX_STACK_DEPTH = 100
+# Pilas que se guardan por perfil (las más frecuentes).
+MAX_STACKS = 50
+
+PROFILE_ID_RE = re.compile(r'^\d+-\d+$')
+
+# Un perfil a la vez por proceso: cProfile y el muestreo no se reparten bien entre peticiones.
+_busy = threading.Lock()
+
+
+def _header(request):
+    return request.headers.get(settings.PROFILING_HEADER, '') if settings.PROFILING_HEADER else ''
+
+
+def trigger(request):
+    """
+    REQUESTED si la cabecera trae PROFILING_SECRET, SAMPLED si la petición sale en el
+    sorteo; None si no. La petición de staff con sesión la resuelve el middleware
+    (ver asks_staff_profile).
+    """
+    secret = settings.PROFILING_SECRET
+    value = _header(request)
+    if secret and value and hmac.compare_digest(value.encode(), secret.encode()):
+        return REQUESTED
+    if settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:
+        return SAMPLED
+    return None
+
+
+def asks_staff_profile(request):
+    """La petición manda `PROFILING_HEADER: 1`: se perfila solo si su sesión es de staff."""
+    return _header(request) == '1'
+
+
+def acquire():
+    return _busy.acquire(blocking=False)
+
+
+def release():
+    _busy.release()
+
+
+def _function_label(filename, line, name):
+    # Ruta relativa a sys.path para que se lea mejor (site-packages/..., comerciantes/...).
+    for base in sorted((p for p in sys.path if p), key=len, reverse=True):
+        if filename.startswith(base + os.sep):
+            filename = filename[len(base) + 1:]
+            break
+    return f'{name} ({filename}:{line})'
+
+
+class CProfiler:
+    mode = CPROFILE
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def report(self, limit):
+        stats = pstats.Stats(self.profile).stats
+        rows = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+        return {
+            'functions': [
+                {
+                    'function': _function_label(*key),
+                    'calls': calls,
+                    'self_ms': round(self_time * 1000, 2),
+                    'total_ms': round(total_time * 1000, 2),
+                }
+                for key, (_, calls, self_time, total_time, _) in rows
+            ],
+        }
+
+
+class StackSampler:
+    """Toma la pila de un hilo cada `interval` segundos desde un hilo aparte."""
+    mode = SAMPLING
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.samples = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiling-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            if self._stopped.is_set():
+                # La pila ya es la de stop() esperando a este hilo, no la de la vista.
+                break
+            if stack:
+                self.samples[tuple(reversed(stack))] += 1
+
+    def report(self, limit):
+        own = Counter()
+        total = Counter()
+        for stack, count in self.samples.items():
+            own[stack[-1]] += count
+            # Una función recursiva cuenta una sola vez por muestra.
+            for function in set(stack):
+                total[function] += count
+        ms = self.interval * 1000
+        return {
+            'samples': sum(self.samples.values()),
+            'functions': [
+                {
+                    'function': _function_label(*function),
+                    'calls': None,
+                    'self_ms': round(own[function] * ms, 2),
+                    'total_ms': round(count * ms, 2),
+                }
+                for function, count in sorted(total.items(), key=lambda item: (own[item[0]], item[1]), reverse=True)[:limit]
+            ],
+            'stacks': [
+                {'stack': [_function_label(*function) for function in stack], 'samples': count}
+                for stack, count in self.samples.most_common(MAX_STACKS)
+            ],
+        }
+
+
+def new_profiler():
+    if settings.PROFILING_MODE == CPROFILE:
+        return CProfiler()
+    return StackSampler(settings.PROFILING_SAMPLE_INTERVAL_MS / 1000)
+
+
+# --- Búfer circular en disco ---
+
+def _directory():
+    return Path(settings.PROFILING_DIR)
+
+
+def save(profiler, request, response, duration, reason):
+    """Guarda el perfil y borra los más antiguos. Un error al escribir no afecta a la petición."""
+    match = request.resolver_match
+    user = getattr(request, 'user', None)
+    profile_id = f'{time.time_ns()}-{os.getpid()}'
+    profile = {
+        'id': profile_id,
+        'created_at': timezone.now().isoformat(),
+        'method': request.method,
+        'path': request.path,
+        'view': match.view_name if match else None,
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 1),
+        'mode': profiler.mode,
+        'trigger': reason,
+        'user': getattr(user, 'uid', None) if reason == REQUESTED else None,
+        **profiler.report(settings.PROFILING_MAX_FUNCTIONS),
+    }
+    directory = _directory()
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'{profile_id}.json'
+        temporary = path.with_suffix('.tmp')
+        temporary.write_text(json.dumps(profile), encoding='utf-8')
+        os.replace(temporary, path)
+        _prune(directory)
+    except OSError as e:
+        logger.warning(f"No se pudo guardar el perfil de {request.path}: {e}")
+        return None
+    return profile_id
+
+
+def _prune(directory):
+    # Los nombres empiezan con el instante en nanosegundos: el orden alfabético es el cronológico.
+    files = sorted(directory.glob('*.json'))
+    for old in files[:max(0, len(files) - settings.PROFILING_MAX_FILES)]:
+        # Otro worker pudo borrarlo primero.
+        old.unlink(missing_ok=True)
+
+
+def list_profiles():
+    """Perfiles guardados, del más reciente al más antiguo (sin las funciones ni las pilas)."""
+    profiles = []
+    directory = _directory()
+    if not directory.exists():
+        return profiles
+    for path in sorted(directory.glob('*.json'), reverse=True):
+        try:
+            profile = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            continue
+        functions = profile.pop('functions', None) or [None]
+        profile.pop('stacks', None)
+        profile['top_function'] = functions[0]
+        profiles.append(profile)
+    return profiles
+
+
+def load(profile_id):
+    """El perfil completo, o None si no existe (o el id no es válido)."""
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    try:
+        return json.loads((_directory() / f'{profile_id}.json').read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
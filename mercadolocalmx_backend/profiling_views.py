@@ -0,0 +1,43 @@
+# mercadolocalmx_backend/profiling_views.py
+"""
+Visor de los perfiles guardados por ProfilingMiddleware (profiling.py), dentro del
+admin y solo para staff: /admin/profiles/ los lista y /admin/profiles/<id>/ muestra
+las funciones más costosas y, con el modo 'sampling', las pilas más frecuentes.
+"""
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404
+from django.template.response import TemplateResponse
+
+from . import profiling
+
+
+@staff_member_required
+def profile_list(request):
+    context = {
+        **admin.site.each_context(request),
+        'title': "Perfiles de peticiones",
+        'profiles': profiling.list_profiles(),
+        'enabled': settings.PROFILING_ENABLED,
+        'mode': settings.PROFILING_MODE,
+        'sample_percent': settings.PROFILING_SAMPLE_RATE * 100,
+        'header': settings.PROFILING_HEADER,
+        'secret_configured': bool(settings.PROFILING_SECRET),
+        'max_files': settings.PROFILING_MAX_FILES,
+    }
+    return TemplateResponse(request, 'admin/profiles/list.html', context)
+
+
+@staff_member_required
+def profile_detail(request, profile_id):
+    profile = profiling.load(profile_id)
+    if profile is None:
+        raise Http404("El perfil no existe o ya se borró.")
+    context = {
+        **admin.site.each_context(request),
+        'title': f"{profile['method']} {profile['path']}",
+        'profile': profile,
+    }
+    return TemplateResponse(request, 'admin/profiles/detail.html', context)
@@ -4,11 +4,9 @@ Django settings for mercadolocalmx_backend project.
 
 from pathlib import Path
 import os
-import json
 from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials
 import logging
+import tempfile
 import dj_database_url
 
 
@@ -41,7 +39,9 @@ logger.info("Configuración de AWS S3")
 print("Configuración de AWS S3")
 
 # Configuración de django-storages
-DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
+# Backend de los archivos subidos (ver STORAGES): 's3' en producción; 'local' usa
+# FileSystemStorage en MEDIA_ROOT como sustituto de S3 en desarrollo y pruebas.
+MEDIA_STORAGE = os.environ.get('MEDIA_STORAGE', 's3')
 AWS_S3_USE_SSL = True
 AWS_QUERYSTRING_AUTH = False
 logger.info("Configuración de django-storages")
@@ -51,6 +51,9 @@ print("Configuración de django-storages")
 AWS_S3_CUSTOM_DOMAIN = f'{AWS_STORAGE_BUCKET_NAME}.s3.{AWS_S3_REGION_NAME}.amazonaws.com'
 MEDIA_URL = f"https://{AWS_S3_CUSTOM_DOMAIN}/"
 MEDIA_ROOT = ''
+if MEDIA_STORAGE == 'local':
+    MEDIA_URL = '/media/'
+    MEDIA_ROOT = os.environ.get('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
 logger.info("Define la URL de tus archivos de medios")
 print("Define la URL de tus archivos de medios")
 
@@ -82,9 +85,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para que Server-Timing y el log de peticiones lentas incluyan a todo lo demás.
+    'mercadolocalmx_backend.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     # WhiteNoise debe ir justo después de SecurityMiddleware para ser efectivo.
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # (Subclase que además funciona en ASGI sin pasar la petición a un hilo.)
+    'mercadolocalmx_backend.middleware.AsyncWhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -92,6 +98,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Al final, para perfilar solo la vista (se quita solo si PROFILING_ENABLED=False).
+    'mercadolocalmx_backend.middleware.ProfilingMiddleware',
 ]
 
 # CORS: En producción, usa CORS_ALLOWED_ORIGINS con una lista.
@@ -104,7 +112,8 @@ ROOT_URLCONF = 'mercadolocalmx_backend.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        # Plantillas del visor de perfiles en el admin (mercadolocalmx_backend no es una app).
+        'DIRS': [BASE_DIR / 'mercadolocalmx_backend' / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -129,6 +138,23 @@ DATABASES = {
     )
 }
 
+# Caché: en memoria por defecto; si hay REDIS_URL se usa Redis, compartido entre workers
+# (paquete 'redis' de requirements.txt).
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Configuración de Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -140,8 +166,16 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
-    ]
+    ],
+    # Tamaño de página por defecto de la paginación por cursor (?page_size= hasta 100).
+    'PAGE_SIZE': int(os.environ.get('API_PAGE_SIZE', '20')),
 }
+# PAGE_SIZE se define globalmente pero la paginación se asigna por vista (pagination_class).
+SILENCED_SYSTEM_CHECKS = ['rest_framework.W001']
+
+# Presupuesto de consultas SQL por acción (comerciantes.mixins.QueryBudgetMixin).
+# Activo por defecto en desarrollo: una acción que se pase de su presupuesto lanza un error.
+QUERY_BUDGET_ENFORCED = os.environ.get('QUERY_BUDGET_ENFORCED', str(DEBUG)) == 'True'
 
 
 # Password validation
@@ -174,8 +208,21 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-# Configuración para que Whitenoise comprima y optimice los archivos estáticos.
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Desde Django 5.1 los backends de almacenamiento solo se leen de STORAGES
+# (DEFAULT_FILE_STORAGE y STATICFILES_STORAGE se ignoran).
+STORAGES = {
+    'default': {
+        'BACKEND': (
+            # Subclases que miden su E/S por petición (mercadolocalmx_backend/storage.py).
+            'mercadolocalmx_backend.storage.TimedFileSystemStorage' if MEDIA_STORAGE == 'local'
+            else 'mercadolocalmx_backend.storage.TimedS3Storage'
+        ),
+    },
+    # Configuración para que Whitenoise comprima y optimice los archivos estáticos.
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
 
 
 # Default primary key field type
@@ -184,30 +231,224 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'usuarios.CustomUser'
 
 
-# Obtiene la variable de entorno de las credenciales de Firebase
-firebase_creds_source = os.environ.get('FIREBASE_ADMIN_SDK_CREDENTIALS')
-
-
-# Inicializar Firebase Admin SDK si no está inicializado
-if not firebase_admin._apps and firebase_creds_source:
-    try:
-        # Intenta inicializar usando una ruta de archivo (para desarrollo)
-        if os.path.exists(firebase_creds_source):
-            cred = credentials.Certificate(firebase_creds_source)
-            firebase_admin.initialize_app(cred)
-            print("Firebase Admin SDK inicializado desde archivo de credenciales 1.")
-            logger.info("Firebase Admin SDK inicializado desde archivo de credenciales.")
-        
-        # Si no es una ruta de archivo, intenta inicializarlo desde una cadena JSON (para producción)
-        else:
-            # Parseamos la cadena JSON de la variable de entorno
-            creds_json = json.loads(firebase_creds_source)
-            cred = credentials.Certificate(creds_json)
-            firebase_admin.initialize_app(cred)
-            print("Firebase Admin SDK inicializado desde cadena JSON.")
-            logger.info("Firebase Admin SDK inicializado desde cadena JSON.")
-
-    except Exception as e:
-        print(f"Error fatal al inicializar Firebase Admin SDK: {e}")
-        logger.critical(f"Error fatal al inicializar Firebase Admin SDK: {e}")
+# Credenciales de Firebase Admin: ruta de un archivo o la cadena JSON. El SDK se
+# inicializa al usarse por primera vez en cada proceso (mercadolocalmx_backend/firebase_app.py).
+FIREBASE_ADMIN_SDK_CREDENTIALS = os.environ.get('FIREBASE_ADMIN_SDK_CREDENTIALS')
+
+
+# --- Caché de verificación de tokens de Firebase ---
+# Número máximo de tokens verificados (y de uids) que se guardan en memoria por proceso.
+FIREBASE_TOKEN_CACHE_SIZE = int(os.environ.get('FIREBASE_TOKEN_CACHE_SIZE', '10000'))
+# Segundos que un token verificado permanece en caché; nunca supera su claim 'exp'.
+FIREBASE_TOKEN_CACHE_TTL = int(os.environ.get('FIREBASE_TOKEN_CACHE_TTL', '300'))
+# Cada cuántos segundos se vuelve a consultar en Firebase si los tokens de un uid fueron revocados.
+FIREBASE_REVOCATION_CHECK_INTERVAL = int(os.environ.get('FIREBASE_REVOCATION_CHECK_INTERVAL', '300'))
+# Alias de CACHES donde se comparte ese estado entre procesos (vacío lo desactiva). Por
+# defecto solo con Redis: así las revocaciones que hace el worker del outbox llegan a los
+# procesos web en FIREBASE_REVOCATION_LOCAL_TTL segundos; sin ella, en hasta
+# FIREBASE_REVOCATION_CHECK_INTERVAL.
+FIREBASE_REVOCATION_SHARED_ALIAS = os.environ.get('FIREBASE_REVOCATION_SHARED_ALIAS', 'default' if REDIS_URL else '')
+# Segundos que cada proceso conserva su copia del estado de revocación.
+FIREBASE_REVOCATION_LOCAL_TTL = int(os.environ.get(
+    'FIREBASE_REVOCATION_LOCAL_TTL', '5' if FIREBASE_REVOCATION_SHARED_ALIAS else str(FIREBASE_REVOCATION_CHECK_INTERVAL)
+))
+# Cada cuántos segundos se refrescan en segundo plano los certificados de Google (0 lo desactiva).
+FIREBASE_CERT_REFRESH_INTERVAL = int(os.environ.get('FIREBASE_CERT_REFRESH_INTERVAL', '3600'))
+
+
+# --- Caché de usuarios autenticados (por uid de Firebase) ---
+# Número máximo de usuarios en la caché en memoria de cada proceso.
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', '10000'))
+# Segundos que vive un usuario en la caché en memoria. Con el nivel compartido cada lectura
+# comprueba en él la generación del usuario y las invalidaciones llegan de inmediato a todos
+# los procesos; sin él solo alcanzan al proceso que guardó el usuario, así que se mantiene corto.
+USER_CACHE_LOCAL_TTL = int(os.environ.get('USER_CACHE_LOCAL_TTL', '5'))
+# Alias de CACHES para el nivel compartido (vacío lo desactiva). Por defecto solo con Redis.
+USER_CACHE_SHARED_ALIAS = os.environ.get('USER_CACHE_SHARED_ALIAS', 'default' if REDIS_URL else '')
+USER_CACHE_SHARED_TTL = int(os.environ.get('USER_CACHE_SHARED_TTL', '300'))
+
+
+# --- Búsqueda de texto (comerciantes/search.py) ---
+# Si hasta el término más selectivo de la búsqueda tiene más entradas que esto, los resultados
+# van en el orden normal del listado en vez de por relevancia (0 = siempre por relevancia).
+SEARCH_RANK_MAX_MATCHES = int(os.environ.get('SEARCH_RANK_MAX_MATCHES', '5000'))
+
+
+# --- Caché de respuestas de los listados de negocios y ofertas ---
+# Las generaciones que invalidan la caché viven en CACHES: con LocMem cada proceso tiene
+# las suyas y no ve los cambios guardados en otro, así que por defecto solo se activa con Redis.
+LIST_CACHE_ENABLED = os.environ.get('LIST_CACHE_ENABLED', 'True' if REDIS_URL else 'False') == 'True'
+LIST_CACHE_ALIAS = os.environ.get('LIST_CACHE_ALIAS', 'default')
+# Tiempo máximo de vida de una entrada (la invalidación normal es por generación, no por tiempo).
+LIST_CACHE_TTL = int(os.environ.get('LIST_CACHE_TTL', '600'))
+# Segundos que una petición espera a que otra termine de construir la misma entrada.
+LIST_CACHE_LOCK_TIMEOUT = int(os.environ.get('LIST_CACHE_LOCK_TIMEOUT', '3'))
+
+
+# --- Outbox de custom claims de Firebase (worker: manage.py sync_firebase_claims) ---
+# Cliente de Firebase del worker; 'usuarios.firebase_client.FakeFirebaseClient' trabaja sin red.
+FIREBASE_CLAIMS_CLIENT = os.environ.get('FIREBASE_CLAIMS_CLIENT', 'usuarios.firebase_client.FirebaseAdminClient')
+# Backoff de reintentos en segundos: base * 2^(intentos-1), hasta el máximo.
+CLAIM_SYNC_BASE_BACKOFF = int(os.environ.get('CLAIM_SYNC_BASE_BACKOFF', '5'))
+CLAIM_SYNC_MAX_BACKOFF = int(os.environ.get('CLAIM_SYNC_MAX_BACKOFF', '3600'))
+# Segundos que un worker reserva un lote; si muere, otro lo retoma al vencer.
+CLAIM_SYNC_LEASE_SECONDS = int(os.environ.get('CLAIM_SYNC_LEASE_SECONDS', '120'))
+# A partir de este número de intentos fallidos, los errores se registran como ERROR.
+CLAIM_SYNC_ALERT_ATTEMPTS = int(os.environ.get('CLAIM_SYNC_ALERT_ATTEMPTS', '5'))
+
+
+# --- Eventos de webhook de Stripe (worker: manage.py process_stripe_events) ---
+# Intentos antes de marcar un evento como fallido, y backoff de reintentos en segundos.
+STRIPE_EVENT_MAX_ATTEMPTS = int(os.environ.get('STRIPE_EVENT_MAX_ATTEMPTS', '8'))
+STRIPE_EVENT_BASE_BACKOFF = int(os.environ.get('STRIPE_EVENT_BASE_BACKOFF', '10'))
+STRIPE_EVENT_MAX_BACKOFF = int(os.environ.get('STRIPE_EVENT_MAX_BACKOFF', '3600'))
+
+
+# --- Cliente HTTP de Stripe y clientes de Stripe de los usuarios ---
+# URL base de la API (vacío = la de Stripe); permite usar un servidor simulado.
+STRIPE_API_BASE = os.environ.get('STRIPE_API_BASE', '')
+STRIPE_CONNECT_TIMEOUT = float(os.environ.get('STRIPE_CONNECT_TIMEOUT', '3'))
+STRIPE_READ_TIMEOUT = float(os.environ.get('STRIPE_READ_TIMEOUT', '10'))
+STRIPE_HTTP_POOL_SIZE = int(os.environ.get('STRIPE_HTTP_POOL_SIZE', '10'))
+STRIPE_MAX_NETWORK_RETRIES = int(os.environ.get('STRIPE_MAX_NETWORK_RETRIES', '2'))
+# Segundos que se considera válido un stripe_customer_id ya verificado (0 = verificar siempre).
+STRIPE_CUSTOMER_CACHE_TTL = int(os.environ.get('STRIPE_CUSTOMER_CACHE_TTL', '86400'))
+# Crear el cliente de Stripe en segundo plano cuando se registra un usuario.
+STRIPE_PREPROVISION_CUSTOMERS = os.environ.get('STRIPE_PREPROVISION_CUSTOMERS', 'True') == 'True'
+STRIPE_PROVISIONING_WORKERS = int(os.environ.get('STRIPE_PROVISIONING_WORKERS', '2'))
+
+
+# --- Renditions de imágenes de negocios y ofertas (comerciantes/images.py) ---
+# nombre: (ancho, alto, modo). 'crop' recorta al tamaño exacto; 'fit' ajusta dentro del recuadro.
+IMAGE_RENDITIONS = {
+    'thumb': (160, 160, 'crop'),
+    'small': (480, 480, 'fit'),
+    'large': (1280, 1280, 'fit'),
+}
+IMAGE_WEBP_QUALITY = int(os.environ.get('IMAGE_WEBP_QUALITY', '80'))
+IMAGE_JPEG_QUALITY = int(os.environ.get('IMAGE_JPEG_QUALITY', '82'))
+IMAGE_PROCESSING_WORKERS = int(os.environ.get('IMAGE_PROCESSING_WORKERS', '2'))
+
+
+# --- Subidas directas con URL prefirmada (comerciantes/uploads.py) ---
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', str(10 * 1024 * 1024)))
+# Segundos de validez de una URL de subida.
+UPLOAD_URL_EXPIRES = int(os.environ.get('UPLOAD_URL_EXPIRES', '600'))
+# Antigüedad a partir de la cual `manage.py clean_uploads` borra las subidas que nunca se
+# asignaron a un negocio u oferta (debe superar de sobra UPLOAD_URL_EXPIRES).
+UPLOAD_ORPHAN_MAX_AGE_HOURS = int(os.environ.get('UPLOAD_ORPHAN_MAX_AGE_HOURS', '24'))
+
+
+# --- Lecturas async bajo ASGI (comerciantes/async_views.py) ---
+# Sirve list/retrieve de negocios y ofertas y my_business con vistas async. asgi.py lo
+# activa por defecto; con WSGI no aporta nada (cada vista async correría en su propio loop).
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS', 'False') == 'True'
+# Peticiones async que usan el ORM a la vez por proceso (cada una abre su propia conexión).
+ASYNC_DB_CONCURRENCY = int(os.environ.get('ASYNC_DB_CONCURRENCY', '20'))
+# Hilos para las verificaciones de tokens que necesitan llamar a Firebase.
+FIREBASE_VERIFY_WORKERS = int(os.environ.get('FIREBASE_VERIFY_WORKERS', '32'))
+
+
+# --- Búsqueda por cercanía (comerciantes/geo.py) ---
+# Radio de ?near= cuando no se indica radius_km, y el máximo que se acepta.
+GEO_DEFAULT_RADIUS_KM = float(os.environ.get('GEO_DEFAULT_RADIUS_KM', '10'))
+GEO_MAX_RADIUS_KM = float(os.environ.get('GEO_MAX_RADIUS_KM', '100'))
+
+
+# --- Archivado de ofertas (comerciantes/archive.py, manage.py archive_offers) ---
+# Días después del vencimiento (o del último cambio, si está inactiva) para archivar una oferta.
+OFFER_ARCHIVE_AFTER_DAYS = int(os.environ.get('OFFER_ARCHIVE_AFTER_DAYS', '30'))
+OFFER_ARCHIVE_BATCH_SIZE = int(os.environ.get('OFFER_ARCHIVE_BATCH_SIZE', '500'))
+# Segundos de espera entre lotes.
+OFFER_ARCHIVE_PAUSE = float(os.environ.get('OFFER_ARCHIVE_PAUSE', '0.05'))
+
+
+# --- Barrido de membresías vencidas (usuarios/memberships.py, manage.py expire_memberships) ---
+# Horas de tolerancia después de membership_expires_at (p. ej. para un webhook de renovación que tarda).
+MEMBERSHIP_EXPIRY_GRACE_HOURS = int(os.environ.get('MEMBERSHIP_EXPIRY_GRACE_HOURS', '24'))
+MEMBERSHIP_SWEEP_BATCH_SIZE = int(os.environ.get('MEMBERSHIP_SWEEP_BATCH_SIZE', '1000'))
+# Segundos entre barridos del worker.
+MEMBERSHIP_SWEEP_INTERVAL = int(os.environ.get('MEMBERSHIP_SWEEP_INTERVAL', '900'))
+
+
+# --- Importación masiva de negocios y ofertas (comerciantes/imports.py, manage.py bulk_import) ---
+# Filas por lote; cada lote es una transacción.
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '500'))
+# Errores por fila que devuelve la API de importación (los demás solo se cuentan).
+IMPORT_MAX_REPORTED_ERRORS = int(os.environ.get('IMPORT_MAX_REPORTED_ERRORS', '1000'))
+
+
+# --- Acciones masivas sobre ofertas (OfferViewSet.bulk_create / bulk_update / bulk_deactivate) ---
+OFFER_BULK_MAX_ITEMS = int(os.environ.get('OFFER_BULK_MAX_ITEMS', '500'))
+
+
+# --- Exportación de ofertas (comerciantes/exports.py, /api/offers/export/, manage.py export_offers) ---
+# Filas por consulta (y por bloque transmitido).
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', '2000'))
+
+
+# --- Facetas de los listados (comerciantes/facets.py) ---
+# Segundos que duran los conteos sin filtros en la caché (acota el desajuste de los ajustes incrementales).
+FACET_CACHE_TTL = int(os.environ.get('FACET_CACHE_TTL', '3600'))
+
+
+# --- Benchmark de la API (comerciantes/benchmark) ---
+# Carpeta de las líneas base que guarda `manage.py benchmark_api --save <nombre>`.
+BENCHMARK_BASELINE_DIR = os.environ.get('BENCHMARK_BASELINE_DIR', str(BASE_DIR / 'benchmarks'))
+
+
+# --- Tiempos por petición (mercadolocalmx_backend/timing.py, RequestTimingMiddleware) ---
+REQUEST_TIMING_ENABLED = os.environ.get('REQUEST_TIMING_ENABLED', 'True') == 'True'
+# Cabecera Server-Timing con los tiempos de base de datos, Firebase, Stripe y almacenamiento.
+REQUEST_TIMING_HEADER = os.environ.get('REQUEST_TIMING_HEADER', 'True') == 'True'
+# Nivel del log de una línea por petición (WARNING lo apaga; las peticiones lentas se registran igual).
+REQUEST_TIMING_LOG_LEVEL = os.environ.get('REQUEST_TIMING_LOG_LEVEL', 'INFO')
+# Las peticiones que tardan al menos esto van al log de peticiones lentas con sus consultas SQL.
+SLOW_REQUEST_THRESHOLD_MS = float(os.environ.get('SLOW_REQUEST_THRESHOLD_MS', '1000'))
+# Consultas (agrupadas por texto SQL, las de más tiempo total) que se incluyen por petición lenta.
+SLOW_REQUEST_MAX_QUERIES = int(os.environ.get('SLOW_REQUEST_MAX_QUERIES', '20'))
+# Archivo del log de peticiones lentas; vacío = stderr.
+SLOW_REQUEST_LOG_FILE = os.environ.get('SLOW_REQUEST_LOG_FILE', '')
+
+# Solo configura los loggers de timing; los demás conservan la configuración por defecto.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'timestamped': {'format': '%(asctime)s %(name)s %(message)s'},
+    },
+    'handlers': {
+        'request_timing': {'class': 'logging.StreamHandler', 'formatter': 'timestamped'},
+        'slow_requests': (
+            {'class': 'logging.handlers.WatchedFileHandler', 'filename': SLOW_REQUEST_LOG_FILE, 'formatter': 'timestamped'}
+            if SLOW_REQUEST_LOG_FILE else {'class': 'logging.StreamHandler', 'formatter': 'timestamped'}
+        ),
+    },
+    'loggers': {
+        'mercadolocalmx_backend.timing': {
+            'handlers': ['request_timing'], 'level': REQUEST_TIMING_LOG_LEVEL, 'propagate': False,
+        },
+        'mercadolocalmx_backend.timing.slow': {
+            'handlers': ['slow_requests'], 'level': 'WARNING', 'propagate': False,
+        },
+    },
+}
+
 
+# --- Perfiles de peticiones bajo demanda (mercadolocalmx_backend/profiling.py, ProfilingMiddleware) ---
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'False') == 'True'
+# 'sampling' (pila cada PROFILING_SAMPLE_INTERVAL_MS, apto para producción) o 'cprofile' (cada llamada, más lento).
+PROFILING_MODE = os.environ.get('PROFILING_MODE', 'sampling')
+# Fracción de las peticiones que se perfilan al azar (0.01 = 1%); 0 = solo las que piden perfil.
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0'))
+# Cabecera con la que se pide el perfil de una petición; vacío = deshabilitada. Vale con el
+# secreto (`X-Profile: <PROFILING_SECRET>`) o con `X-Profile: 1` desde una sesión de staff del admin.
+PROFILING_HEADER = os.environ.get('PROFILING_HEADER', 'X-Profile')
+# Secreto compartido para pedir perfiles desde la API; vacío = solo con sesión de staff.
+PROFILING_SECRET = os.environ.get('PROFILING_SECRET', '')
+PROFILING_SAMPLE_INTERVAL_MS = float(os.environ.get('PROFILING_SAMPLE_INTERVAL_MS', '5'))
+# Carpeta de los perfiles; al pasar de PROFILING_MAX_FILES se borran los más antiguos.
+PROFILING_DIR = os.environ.get('PROFILING_DIR', os.path.join(tempfile.gettempdir(), 'mercadolocalmx-profiles'))
+PROFILING_MAX_FILES = int(os.environ.get('PROFILING_MAX_FILES', '200'))
+# Funciones que se guardan por perfil (las de más tiempo).
+PROFILING_MAX_FUNCTIONS = int(os.environ.get('PROFILING_MAX_FUNCTIONS', '100'))
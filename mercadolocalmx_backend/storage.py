@@ -0,0 +1,42 @@
+# mercadolocalmx_backend/storage.py
+"""
+Backends de almacenamiento de STORAGES['default'] que suman su tiempo de E/S a la
+petición en curso (timing.py, métrica `storage` de Server-Timing). Solo se miden
+las operaciones que tocan el disco o la red; url() en S3 se arma localmente.
+"""
+
+from django.core.files.storage import FileSystemStorage
+from storages.backends.s3boto3 import S3Boto3Storage
+
+from . import timing
+
+
+class TimedStorageMixin:
+
+    def _open(self, name, mode='rb'):
+        with timing.measure(timing.STORAGE):
+            return super()._open(name, mode)
+
+    def _save(self, name, content):
+        with timing.measure(timing.STORAGE):
+            return super()._save(name, content)
+
+    def delete(self, name):
+        with timing.measure(timing.STORAGE):
+            return super().delete(name)
+
+    def exists(self, name):
+        with timing.measure(timing.STORAGE):
+            return super().exists(name)
+
+    def size(self, name):
+        with timing.measure(timing.STORAGE):
+            return super().size(name)
+
+
+class TimedFileSystemStorage(TimedStorageMixin, FileSystemStorage):
+    pass
+
+
+class TimedS3Storage(TimedStorageMixin, S3Boto3Storage):
+    pass
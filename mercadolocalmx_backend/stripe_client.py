@@ -0,0 +1,75 @@
+# mercadolocalmx_backend/stripe_client.py
+"""
+Configuración del SDK de Stripe.
+
+Todas las llamadas salen por un único requests.Session con pool de conexiones
+keep-alive (se evita un handshake TLS por llamada) y con timeouts explícitos: el
+valor por defecto del SDK es de 80 s, demasiado para una petición de checkout.
+STRIPE_API_BASE permite apuntar a un servidor simulado (p. ej. en benchmark_checkout).
+El tiempo de cada llamada (con sus reintentos) se suma a la petición en curso (timing.py).
+
+El SDK tarda cerca de medio segundo en importarse, así que se importa y se configura
+la primera vez que se usa en cada proceso (get()), no al importar los módulos que lo
+usan. La configuración es por proceso: un worker creado con fork (gunicorn --preload)
+no reutiliza el cliente HTTP del proceso padre ni sus sockets.
+"""
+
+import os
+import threading
+
+from django.conf import settings
+
+from . import timing
+
+# PID del proceso en el que se aplicó la configuración.
+_configured_pid = None
+_lock = threading.Lock()
+
+
+def build_http_client():
+    import requests
+    import stripe
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.STRIPE_HTTP_POOL_SIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    class TimedRequestsClient(stripe.RequestsClient):
+        def request_with_retries(self, *args, **kwargs):
+            with timing.measure(timing.STRIPE):
+                return super().request_with_retries(*args, **kwargs)
+
+        def request_stream_with_retries(self, *args, **kwargs):
+            with timing.measure(timing.STRIPE):
+                return super().request_stream_with_retries(*args, **kwargs)
+
+    return TimedRequestsClient(
+        timeout=(settings.STRIPE_CONNECT_TIMEOUT, settings.STRIPE_READ_TIMEOUT),
+        session=session,
+    )
+
+
+def configure(force=False):
+    """Aplica la configuración una vez por proceso (o de nuevo con force=True)."""
+    global _configured_pid
+    import stripe
+
+    with _lock:
+        if _configured_pid == os.getpid() and not force:
+            return stripe
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        if settings.STRIPE_API_BASE:
+            stripe.api_base = settings.STRIPE_API_BASE
+        stripe.max_network_retries = settings.STRIPE_MAX_NETWORK_RETRIES
+        stripe.default_http_client = build_http_client()
+        _configured_pid = os.getpid()
+    return stripe
+
+
+def get():
+    """El módulo `stripe` ya configurado para este proceso."""
+    if _configured_pid == os.getpid():
+        import stripe
+        return stripe
+    return configure()
@@ -5,74 +5,62 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 import logging # Importar el módulo de logging
-import stripe
-from usuarios.models import CustomUser
+from usuarios.stripe_customers import ensure_customer, replace_customer
+from . import stripe_client
 
 # Crear una instancia de logger para este módulo
 logger = logging.getLogger(__name__)
 
-# La clave secreta se lee desde settings, que a su vez la obtiene de las variables de entorno.
-stripe.api_key = settings.STRIPE_SECRET_KEY
+
+def _create_checkout_session(customer_id):
+    # SDK configurado con la clave secreta y el cliente HTTP con pool y timeouts.
+    stripe = stripe_client.get()
+    # Obtener el ID del plan de suscripción desde las configuraciones
+    PRICE_ID = settings.STRIPE_MONTHLY_PLAN_PRICE_ID
+    return stripe.checkout.Session.create(
+        customer=customer_id,
+        payment_method_types=['card'],
+        line_items=[{
+            'price': PRICE_ID,
+            'quantity': 1,
+        }],
+        mode='subscription',
+        success_url=settings.FRONTEND_DOMAIN + '/subscription/success?session_id={CHECKOUT_SESSION_ID}',
+        cancel_url=settings.FRONTEND_DOMAIN + '/subscription/canceled',
+    )
+
 
 class CreateCheckoutSessionView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
+        stripe = stripe_client.get()
         try:
             user = request.user
-            customer_id_to_use = user.stripe_customer_id
 
-            # Verificar y crear el cliente de Stripe si no existe o si es inválido
-            if not customer_id_to_use:
+            # Normalmente el cliente ya existe (se crea por adelantado al registrarse el usuario)
+            # y su validez está en caché, así que aquí no hay llamadas a Stripe.
+            try:
+                customer_id_to_use = ensure_customer(user)
+            except stripe.error.StripeError as e:
+                logger.error(f"Error al crear el cliente de Stripe para el usuario {user.id}: {e}")
+                return Response({"error": "No se pudo crear el cliente de Stripe.", "details": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            logger.info("Iniciando el proceso de creación de sesión de pago de Stripe.")
+            try:
+                checkout_session = _create_checkout_session(customer_id_to_use)
+            except stripe.error.InvalidRequestError as e:
+                # El cliente cacheado como válido se borró en Stripe: se reemplaza y se reintenta una vez.
+                if getattr(e, 'param', None) != 'customer':
+                    raise
+                logger.warning(f"El cliente de Stripe {customer_id_to_use} del usuario {user.id} ya no existe. Creando uno nuevo.")
                 try:
-                    # Si el ID no existe en la base de datos, lo creamos
-                    logger.info(f"Creando nuevo cliente de Stripe para el usuario: {user.id}")
-                    customer = stripe.Customer.create(
-                        email=user.email,
-                        name=user.get_full_name() or user.username,
-                        metadata={'django_user_id': user.id},
-                    )
-                    user.stripe_customer_id = customer.id
-                    user.save()
-                    customer_id_to_use = customer.id
+                    customer_id_to_use = replace_customer(user, customer_id_to_use)
                 except stripe.error.StripeError as e:
-                    logger.error(f"Error al crear el cliente de Stripe para el usuario {user.id}: {e}")
+                    logger.error(f"Error al recrear el cliente de Stripe para el usuario {user.id}: {e}")
                     return Response({"error": "No se pudo crear el cliente de Stripe.", "details": str(e)}, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                try:
-                    # Si el ID existe, intentamos verificarlo con Stripe
-                    stripe.Customer.retrieve(customer_id_to_use)
-                except stripe.error.InvalidRequestError:
-                    # Si el ID es inválido, lo creamos de nuevo
-                    logger.warning(f"ID de cliente de Stripe inválido para el usuario {user.id}. Creando uno nuevo.")
-                    try:
-                        customer = stripe.Customer.create(
-                            email=user.email,
-                            name=user.get_full_name() or user.username,
-                            metadata={'django_user_id': user.id},
-                        )
-                        user.stripe_customer_id = customer.id
-                        user.save()
-                        customer_id_to_use = customer.id
-                    except stripe.error.StripeError as e:
-                        logger.error(f"Error al recrear el cliente de Stripe para el usuario {user.id}: {e}")
-                        return Response({"error": "No se pudo crear el cliente de Stripe.", "details": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+                checkout_session = _create_checkout_session(customer_id_to_use)
 
-            # Obtener el ID del plan de suscripción desde las configuraciones
-            PRICE_ID = settings.STRIPE_MONTHLY_PLAN_PRICE_ID
-            
-            logger.info("Iniciando el proceso de creación de sesión de pago de Stripe.")
-            checkout_session = stripe.checkout.Session.create(
-                customer=customer_id_to_use,
-                payment_method_types=['card'],
-                line_items=[{
-                    'price': PRICE_ID,
-                    'quantity': 1,
-                }],
-                mode='subscription',
-                success_url=settings.FRONTEND_DOMAIN + '/subscription/success?session_id={CHECKOUT_SESSION_ID}',
-                cancel_url=settings.FRONTEND_DOMAIN + '/subscription/canceled',
-            )
             logger.info(f"Sesión de checkout de Stripe creada correctamente con ID: {checkout_session.id}")
             return Response({'sessionId': checkout_session.id})
 
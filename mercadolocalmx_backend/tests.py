@@ -0,0 +1,241 @@
+# mercadolocalmx_backend/tests.py
+import json
+import re
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from usuarios.models import CustomUser
+
+from . import firebase_tokens, profiling, timing
+from .middleware import ProfilingMiddleware, RequestTimingMiddleware
+
+
+def view(request):
+    return HttpResponse('ok')
+
+
+async def async_view(request):
+    return HttpResponse('ok')
+
+
+def timed_view(request):
+    with timing.measure(timing.STRIPE):
+        pass
+    with connection.cursor() as cursor:
+        for value in (1, 1, 2):
+            cursor.execute('SELECT %s', [value])
+    return HttpResponse('ok')
+
+
+class ProfilingTriggerTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.enterContext(override_settings(
+            PROFILING_ENABLED=True, PROFILING_MODE=profiling.CPROFILE, PROFILING_SAMPLE_RATE=0,
+            PROFILING_HEADER='X-Profile', PROFILING_SECRET='s3cr3t', PROFILING_DIR=directory,
+        ))
+        self.middleware = ProfilingMiddleware(view)
+
+    def request(self, header=None, user=None):
+        headers = {'X-Profile': header} if header is not None else {}
+        request = RequestFactory().get('/api/offers/', headers=headers)
+        request.user = user or AnonymousUser()
+        request.resolver_match = None
+        return request
+
+    def profiled(self, request):
+        # process_view devuelve la respuesta solo si perfiló la vista.
+        return self.middleware.process_view(request, view, (), {}) is not None
+
+    def test_header_without_privilege_is_not_profiled(self):
+        self.assertFalse(self.profiled(self.request('1')))
+        self.assertFalse(self.profiled(self.request('1', user=CustomUser(username='cliente'))))
+        self.assertFalse(self.profiled(self.request('otro-secreto')))
+        self.assertEqual(profiling.list_profiles(), [])
+
+    def test_shared_secret_is_profiled(self):
+        self.assertTrue(self.profiled(self.request('s3cr3t')))
+
+        [profile] = profiling.list_profiles()
+        self.assertEqual(profile['trigger'], profiling.REQUESTED)
+
+    def test_staff_session_is_profiled(self):
+        self.assertTrue(self.profiled(self.request('1', user=CustomUser(username='admin', is_staff=True))))
+
+    def test_without_secret_configured_the_header_needs_a_staff_session(self):
+        with self.settings(PROFILING_SECRET=''):
+            self.assertIsNone(profiling.trigger(self.request('')))
+            self.assertFalse(self.profiled(self.request('1')))
+
+    def test_async_header_without_privilege_is_not_profiled(self):
+        middleware = ProfilingMiddleware(async_view)
+
+        async def profiled(request):
+            return await middleware.process_view(request, async_view, (), {}) is not None
+
+        anonymous = self.request('1')
+        anonymous.auser = self._auser(AnonymousUser())
+        staff = self.request('1')
+        staff.auser = self._auser(CustomUser(username='admin', is_staff=True))
+
+        self.assertFalse(async_to_sync(profiled)(anonymous))
+        self.assertTrue(async_to_sync(profiled)(staff))
+
+    def _auser(self, user):
+        async def auser():
+            return user
+        return auser
+
+
+@override_settings(FIREBASE_REVOCATION_SHARED_ALIAS='')
+class FirebaseTokenCacheTests(SimpleTestCase):
+    """Caché de tokens verificados y de estado de revocación (firebase_tokens.py)."""
+
+    def setUp(self):
+        firebase_tokens.clear()
+        self.addCleanup(firebase_tokens.clear)
+        now = int(time.time())
+        self.decoded = {'uid': 'uid-ana', 'iat': now - 60, 'exp': now + 3600}
+        self.enterContext(mock.patch.object(firebase_tokens, 'get_app'))
+        self.verify = self.enterContext(mock.patch.object(
+            firebase_tokens.auth, 'verify_id_token', return_value=self.decoded))
+        self.get_user = self.enterContext(mock.patch.object(
+            firebase_tokens.auth, 'get_user', return_value=mock.Mock(disabled=False, tokens_valid_after_timestamp=0)))
+
+    def test_verified_token_is_reused_without_network_calls(self):
+        self.assertIsNone(firebase_tokens.get_cached_token('token'))
+
+        for _ in range(3):
+            self.assertEqual(firebase_tokens.verify_firebase_token('token'), self.decoded)
+
+        self.verify.assert_called_once()
+        self.get_user.assert_called_once_with('uid-ana', app=mock.ANY)
+        self.assertEqual(firebase_tokens.get_cached_token('token'), self.decoded)
+
+    def test_revoked_token_is_rejected_and_forgotten(self):
+        self.get_user.return_value = mock.Mock(
+            disabled=False, tokens_valid_after_timestamp=(self.decoded['iat'] + 1) * 1000)
+
+        with self.assertRaises(firebase_tokens.auth.RevokedIdTokenError):
+            firebase_tokens.verify_firebase_token('token')
+
+        self.assertIsNone(firebase_tokens.get_cached_token('token'))
+        with self.assertRaises(firebase_tokens.auth.RevokedIdTokenError):
+            firebase_tokens.verify_firebase_token('token')
+        self.assertEqual(self.verify.call_count, 2)
+
+    def test_invalidated_uid_checks_revocation_again(self):
+        firebase_tokens.verify_firebase_token('token')
+
+        firebase_tokens.invalidate_uid('uid-ana')
+
+        self.assertIsNone(firebase_tokens.get_cached_token('token'))
+        firebase_tokens.verify_firebase_token('token')
+        self.verify.assert_called_once()
+        self.assertEqual(self.get_user.call_count, 2)
+
+    def test_token_is_not_cached_past_its_expiration(self):
+        self.decoded['exp'] = int(time.time()) - 1
+
+        firebase_tokens.verify_firebase_token('token')
+        firebase_tokens.verify_firebase_token('token')
+
+        self.assertEqual(self.verify.call_count, 2)
+
+
+@override_settings(REQUEST_TIMING_ENABLED=True, REQUEST_TIMING_HEADER=True, SLOW_REQUEST_THRESHOLD_MS=1000,
+                   SLOW_REQUEST_MAX_QUERIES=20, CORS_ALLOWED_ORIGINS=['https://mercadolocal.mx'])
+class RequestTimingTests(SimpleTestCase):
+    """RequestTimingMiddleware y timing.py."""
+    databases = {'default'}
+
+    def request(self, **headers):
+        request = RequestFactory().get('/api/offers/?search=ana', headers=headers)
+        request.resolver_match = None
+        return request
+
+    def test_server_timing_header(self):
+        response = RequestTimingMiddleware(timed_view)(self.request(Origin='https://mercadolocal.mx'))
+
+        metrics = response['Server-Timing'].split(', ')
+        self.assertRegex(metrics[0], r'^db;dur=[0-9.]+;desc="3 consultas"$')
+        self.assertRegex(metrics[1], r'^stripe;dur=[0-9.]+;desc="1 llamada"$')
+        self.assertRegex(metrics[-1], r'^total;dur=[0-9.]+$')
+        self.assertEqual(len(metrics), 3)
+        self.assertEqual(response['Timing-Allow-Origin'], 'https://mercadolocal.mx')
+
+        other_origin = RequestTimingMiddleware(view)(self.request(Origin='https://otro.example'))
+        self.assertEqual(other_origin['Server-Timing'].split(';')[0], 'total')
+        self.assertNotIn('Timing-Allow-Origin', other_origin)
+
+    def test_header_and_measurements_can_be_disabled(self):
+        with self.settings(REQUEST_TIMING_HEADER=False):
+            self.assertNotIn('Server-Timing', RequestTimingMiddleware(view)(self.request()))
+        with self.settings(REQUEST_TIMING_ENABLED=False), self.assertNoLogs(timing.logger):
+            self.assertNotIn('Server-Timing', RequestTimingMiddleware(timed_view)(self.request()))
+
+    def test_log_line_without_query_string(self):
+        with self.assertLogs(timing.logger, 'INFO') as logs, self.assertNoLogs(timing.slow_logger):
+            RequestTimingMiddleware(timed_view)(self.request())
+
+        [line] = [json.loads(record.getMessage()) for record in logs.records]
+        self.assertEqual(line['path'], '/api/offers/')
+        self.assertEqual((line['status'], line['db_queries'], line['stripe_calls']), (200, 3, 1))
+
+    def test_slow_requests_are_logged_with_their_queries_grouped(self):
+        with self.settings(SLOW_REQUEST_THRESHOLD_MS=0), self.assertLogs(timing.slow_logger, 'WARNING') as logs:
+            RequestTimingMiddleware(timed_view)(self.request())
+
+        queries = json.loads(logs.records[0].getMessage())['queries']
+        # Las tres ejecuciones comparten texto SQL: una entrada con count=3.
+        self.assertEqual([query['count'] for query in queries], [3])
+        self.assertTrue(re.fullmatch(r'SELECT (%s|\?)', queries[0]['sql']))
+
+    def test_slowest_queries_are_ranked_by_total_time(self):
+        timings = timing.RequestTimings()
+        timings.add_query('SELECT rapida', 0.001)
+        for seconds in (0.002, 0.004, 0.003):
+            timings.add_query('SELECT repetida', seconds)
+        timings.add_query('SELECT lenta', 0.005)
+
+        self.assertEqual(timings.slowest_queries(2), [
+            {'sql': 'SELECT repetida', 'count': 3, 'total_ms': 9.0, 'max_ms': 4.0},
+            {'sql': 'SELECT lenta', 'count': 1, 'total_ms': 5.0, 'max_ms': 5.0},
+        ])
+        self.assertEqual(timings.calls[timing.DB], 5)
+        long_sql = 'SELECT ' + 'x' * timing.MAX_SQL_LENGTH
+        timings.add_query(long_sql, 1)
+        self.assertEqual(len(timings.slowest_queries(1)[0]['sql']), timing.MAX_SQL_LENGTH)
+
+    def test_async_requests_are_measured(self):
+        async def timed_async_view(request):
+            with timing.measure(timing.FIREBASE):
+                pass
+            return HttpResponse('ok')
+
+        response = async_to_sync(RequestTimingMiddleware(timed_async_view))(self.request())
+
+        self.assertIn('firebase;', response['Server-Timing'])
+        self.assertIsNone(timing.current())
+
+    def test_measure_outside_a_request_does_nothing(self):
+        self.assertIsNone(timing.current())
+
+        with timing.measure(timing.STORAGE):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+
+        self.assertIsNone(timing.current())
+        timings, token = timing.start()
+        timing.finish(token)
+        self.assertEqual(dict(timings.calls), {})
@@ -0,0 +1,175 @@
+# mercadolocalmx_backend/timing.py
+"""
+Tiempos por petición: consultas SQL, Firebase Admin, Stripe y almacenamiento.
+
+RequestTimingMiddleware (middleware.py) crea un RequestTimings por petición y lo
+deja en una ContextVar, que también ven los hilos de sync_to_async en ASGI. Lo
+alimentan:
+
+- las consultas SQL, con un execute_wrapper que se instala en cada conexión
+  (signal connection_created), agrupadas por texto SQL para detectar N+1;
+- measure('firebase'), measure('stripe') y measure('storage') alrededor de las
+  llamadas externas (firebase_tokens.py, stripe_client.py, storage.py, uploads.py).
+
+Fuera de una petición (workers, comandos) la ContextVar está vacía y measure() no
+hace nada. Al terminar, la respuesta lleva una cabecera Server-Timing y se escribe
+una línea JSON en el logger `mercadolocalmx_backend.timing`; las peticiones que
+pasan de SLOW_REQUEST_THRESHOLD_MS van además a `mercadolocalmx_backend.timing.slow`
+con las consultas que más tiempo tomaron.
+"""
+
+import contextlib
+import logging
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# Una línea JSON por petición (INFO) y las peticiones lentas con sus consultas (WARNING).
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger(f'{__name__}.slow')
+
+DB = 'db'
+FIREBASE = 'firebase'
+STRIPE = 'stripe'
+STORAGE = 'storage'
+EXTERNAL = (FIREBASE, STRIPE, STORAGE)
+
+# Texto máximo de una consulta en el log de peticiones lentas.
+MAX_SQL_LENGTH = 2000
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = defaultdict(float)
+        self.calls = defaultdict(int)
+        # Texto SQL -> [ejecuciones, segundos en total, segundos la más lenta].
+        self.queries = {}
+
+    def add(self, category, seconds):
+        self.durations[category] += seconds
+        self.calls[category] += 1
+
+    def add_query(self, sql, seconds):
+        self.add(DB, seconds)
+        entry = self.queries.get(sql)
+        if entry is None:
+            self.queries[sql] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total):
+        """Valor de la cabecera Server-Timing (milisegundos)."""
+        metrics = []
+        for category in (DB, *EXTERNAL):
+            calls = self.calls[category]
+            if calls:
+                noun = 'consulta' if category == DB else 'llamada'
+                metrics.append(
+                    f'{category};dur={self.durations[category] * 1000:.1f};desc="{calls} {noun}{"s" if calls != 1 else ""}"'
+                )
+        metrics.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(metrics)
+
+    def summary(self, total):
+        data = {'total_ms': round(total * 1000, 1), 'db_queries': self.calls[DB]}
+        for category in (DB, *EXTERNAL):
+            data[f'{category}_ms'] = round(self.durations[category] * 1000, 1)
+        for category in EXTERNAL:
+            data[f'{category}_calls'] = self.calls[category]
+        return data
+
+    def slowest_queries(self, limit):
+        ranked = sorted(self.queries.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [
+            {
+                'sql': sql[:MAX_SQL_LENGTH],
+                'count': count,
+                'total_ms': round(total * 1000, 1),
+                'max_ms': round(slowest * 1000, 1),
+            }
+            for sql, (count, total, slowest) in ranked
+        ]
+
+
+def log_line(request, response, timings, total):
+    """Datos de la línea de log de una petición (sin la query string, que puede traer datos personales)."""
+    match = request.resolver_match
+    return {
+        'method': request.method,
+        'path': request.path,
+        'view': match.view_name if match else None,
+        'status': response.status_code,
+        **timings.summary(total),
+    }
+
+
+def current():
+    """RequestTimings de la petición en curso, o None."""
+    return _current.get()
+
+
+@contextlib.contextmanager
+def measure(category):
+    """Suma la duración del bloque a `category` en la petición en curso (si la hay)."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(category, time.perf_counter() - started)
+
+
+# --- Consultas SQL ---
+
+def _query_wrapper(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(sql, time.perf_counter() - started)
+
+
+def _install_query_wrapper(connection):
+    if _query_wrapper not in connection.execute_wrappers:
+        # Al principio de la lista: connection.execute_wrapper() saca el último al salir
+        # de su bloque, que así nunca es este aunque la conexión se abra dentro del bloque.
+        connection.execute_wrappers.insert(0, _query_wrapper)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    _install_query_wrapper(connection)
+
+
+def install_query_wrapper():
+    """Mide las consultas de las conexiones que se abran desde ahora y las de las ya abiertas en este hilo."""
+    connection_created.connect(_on_connection_created, dispatch_uid='request_timing_query_wrapper')
+    for connection in connections.all(initialized_only=True):
+        _install_query_wrapper(connection)
+
+
+def start():
+    """Empieza a medir una petición. Devuelve (RequestTimings, token para finish())."""
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def finish(token):
+    _current.reset(token)
@@ -2,13 +2,16 @@
 
 from django.contrib import admin
 from django.urls import path, include
-from comerciantes.urls import router as comerciantes_router
 from .stripe_views import CreateCheckoutSessionView
 from .stripe_webhook_views import stripe_webhook
+from .profiling_views import profile_detail, profile_list
 
 urlpatterns = [
+    # Antes de admin.site.urls, que respondería 404 a estas rutas.
+    path('admin/profiles/', profile_list, name='admin-profile-list'),
+    path('admin/profiles/<str:profile_id>/', profile_detail, name='admin-profile-detail'),
     path('admin/', admin.site.urls),
-    path('api/', include(comerciantes_router.urls)),
+    path('api/', include('comerciantes.urls')),
 
     path('api/create-checkout-session/', CreateCheckoutSessionView.as_view(), name='create-checkout-session'),
     path('api/stripe-webhook/', stripe_webhook, name='stripe-webhook'),
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mercadolocalmx_backend.settings')
 
 application = get_wsgi_application()
+
+# Importa vistas y SDKs antes de atender peticiones (una sola vez con gunicorn --preload).
+from mercadolocalmx_backend.preload import warm_up  # noqa: E402
+
+warm_up()
@@ -1,7 +1,7 @@
 # usuarios/admin.py
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin # Importa UserAdmin
-from .models import CustomUser # Importa tu CustomUser
+from .models import ClaimSyncTask, CustomUser, MembershipSweep # Importa tu CustomUser
 
 # Si quieres personalizar cómo se muestra CustomUser en el admin
 class CustomUserAdmin(UserAdmin):
@@ -15,4 +15,19 @@ class CustomUserAdmin(UserAdmin):
     list_display = ('username', 'email', 'is_staff', 'is_business_owner') # Para verlo en la lista
     search_fields = ('username', 'email', 'uid') # Para poder buscar por ellos
 
-admin.site.register(CustomUser, CustomUserAdmin)
\ No newline at end of file
+admin.site.register(CustomUser, CustomUserAdmin)
+
+@admin.register(ClaimSyncTask)
+class ClaimSyncTaskAdmin(admin.ModelAdmin):
+    list_display = ('uid', 'is_business_owner', 'attempts', 'next_attempt_at', 'last_error')
+    search_fields = ('uid',)
+    readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(MembershipSweep)
+class MembershipSweepAdmin(admin.ModelAdmin):
+    list_display = ('started_at', 'businesses_expired', 'owners_revoked', 'batches', 'duration_seconds', 'cutoff')
+    readonly_fields = [field.name for field in MembershipSweep._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
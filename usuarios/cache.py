@@ -0,0 +1,160 @@
+# usuarios/cache.py
+"""
+Caché de usuarios autenticados por uid de Firebase, en dos niveles.
+
+El nivel en memoria de cada proceso se valida contra una generación por uid guardada
+en el nivel compartido: invalidate_user() la cambia, así que un cambio de rol o de
+membresía se ve de inmediato en todos los procesos, no solo en el que guardó el
+usuario. Sin nivel compartido, los demás procesos lo ven en hasta USER_CACHE_LOCAL_TTL.
+
+Cada entrada guarda la generación leída antes de consultar el usuario en la base de
+datos (lookup_user() y luego cache_user()): una fila leída antes de una invalidación
+queda con la generación vieja y no se sirve.
+"""
+import copy
+import logging
+import threading
+import uuid
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+# Nivel 1: caché en memoria del proceso (muy rápida, pero local a cada worker). Guarda
+# (generación, usuario), igual que el nivel compartido.
+_local_cache = TTLCache(
+    maxsize=settings.USER_CACHE_SIZE,
+    ttl=settings.USER_CACHE_LOCAL_TTL,
+)
+_lock = threading.Lock()
+# Invalidaciones hechas en este proceso (ver cache_user).
+_invalidations = 0
+
+
+def _cache_key(uid):
+    return f'usuarios:user:{uid}'
+
+
+def _generation_key(uid):
+    return f'usuarios:user-generation:{uid}'
+
+
+def _shared_cache():
+    """
+    Nivel 2 opcional: caché compartida entre workers (p. ej. Redis), o None
+    si no está habilitada en settings.
+    """
+    if not settings.USER_CACHE_SHARED_ALIAS:
+        return None
+    return caches[settings.USER_CACHE_SHARED_ALIAS]
+
+
+def is_process_local():
+    """True si no hay nivel compartido: lookup_user() solo lee la memoria del proceso."""
+    return _shared_cache() is None
+
+
+def lookup_user(uid):
+    """
+    Devuelve (copia del CustomUser cacheado o None, generación). Se devuelve una copia
+    para que cada petición pueda modificar su request.user sin afectar a otras peticiones
+    concurrentes. Si no hay usuario, la generación se pasa a cache_user() con la fila
+    leída de la base de datos *después* de esta llamada: así una invalidación intermedia
+    no deja en caché la fila vieja.
+    """
+    with _lock:
+        invalidations = _invalidations
+    shared = _shared_cache()
+    generation = None
+    if shared is not None:
+        try:
+            generation = shared.get(_generation_key(uid))
+        except Exception as e:
+            logger.warning(f"No se pudo leer la caché compartida de usuarios para {uid}: {e}")
+            return None, None
+
+    with _lock:
+        entry = _local_cache.get(uid)
+    if entry is not None and entry[0] == generation:
+        return copy.copy(entry[1]), (generation, invalidations)
+
+    if shared is None:
+        return None, (generation, invalidations)
+    try:
+        entry = shared.get(_cache_key(uid))
+    except Exception as e:
+        logger.warning(f"No se pudo leer la caché compartida de usuarios para {uid}: {e}")
+        return None, None
+    # La entrada guarda la generación con la que se leyó el usuario; una de otra generación es vieja.
+    if not isinstance(entry, tuple) or entry[0] != generation:
+        return None, (generation, invalidations)
+    with _lock:
+        _local_cache[uid] = entry
+    return copy.copy(entry[1]), (generation, invalidations)
+
+
+def get_cached_user(uid):
+    """Copia del CustomUser cacheado para el uid de Firebase, o None."""
+    return lookup_user(uid)[0]
+
+
+def cache_user(user, generation):
+    """
+    Guarda el usuario en ambos niveles de caché, indexado por su uid. `generation` es la
+    que devolvió lookup_user() antes de leer el usuario de la base de datos; con None
+    (nivel compartido inaccesible) no se guarda.
+    """
+    if not user.uid or generation is None:
+        return
+    shared_generation, invalidations = generation
+
+    entry = (shared_generation, copy.copy(user))
+    shared = _shared_cache()
+    if shared is not None:
+        try:
+            shared.set(_cache_key(user.uid), entry, settings.USER_CACHE_SHARED_TTL)
+        except Exception as e:
+            logger.warning(f"No se pudo escribir en la caché compartida de usuarios para {user.uid}: {e}")
+            return
+
+    with _lock:
+        # Sin nivel compartido la generación es siempre None: se descarta la fila si este
+        # proceso invalidó algún usuario mientras se leía.
+        if _invalidations == invalidations:
+            _local_cache[user.uid] = entry
+
+
+def invalidate_user(uid):
+    """Elimina el usuario de ambos niveles de caché (también de la memoria de los demás procesos)."""
+    invalidate_users([uid])
+
+
+def invalidate_users(uids):
+    """Elimina varios usuarios de ambos niveles de caché (dos operaciones en la compartida)."""
+    uids = [uid for uid in uids if uid]
+    if not uids:
+        return
+
+    global _invalidations
+    with _lock:
+        _invalidations += 1
+        for uid in uids:
+            _local_cache.pop(uid, None)
+
+    shared = _shared_cache()
+    if shared is not None:
+        try:
+            # Generación nueva (sin expiración): las copias en memoria de otros procesos dejan de valer.
+            generation = uuid.uuid4().hex
+            shared.set_many({_generation_key(uid): generation for uid in uids}, timeout=None)
+            shared.delete_many([_cache_key(uid) for uid in uids])
+        except Exception as e:
+            logger.warning(f"No se pudo invalidar la caché compartida de usuarios para {len(uids)} usuarios: {e}")
+
+
+def clear():
+    """Vacía el nivel en memoria (el compartido expira por TTL)."""
+    with _lock:
+        _local_cache.clear()
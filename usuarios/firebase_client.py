@@ -0,0 +1,81 @@
+# usuarios/firebase_client.py
+"""
+Clientes de Firebase Auth para la sincronización de custom claims.
+
+FirebaseAdminClient usa el SDK de Firebase Admin. FakeFirebaseClient guarda los claims
+en memoria para probar el outbox sin red (`sync_firebase_claims --fake` o
+FIREBASE_CLAIMS_CLIENT='usuarios.firebase_client.FakeFirebaseClient').
+"""
+
+import logging
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from mercadolocalmx_backend.firebase_app import get_app
+
+logger = logging.getLogger(__name__)
+
+# Máximo de identificadores que acepta auth.get_users() por llamada.
+GET_USERS_BATCH_SIZE = 100
+
+
+class FirebaseAdminClient:
+
+    def get_custom_claims(self, uids):
+        """
+        Devuelve {uid: claims} de los usuarios existentes, con una llamada por cada
+        100 uids. Los uids que no existen en Firebase no aparecen en el resultado.
+        """
+        from firebase_admin import auth
+
+        claims = {}
+        uids = list(uids)
+        for i in range(0, len(uids), GET_USERS_BATCH_SIZE):
+            identifiers = [auth.UidIdentifier(uid) for uid in uids[i:i + GET_USERS_BATCH_SIZE]]
+            result = auth.get_users(identifiers, app=get_app())
+            for user in result.users:
+                claims[user.uid] = dict(user.custom_claims or {})
+        return claims
+
+    def set_custom_user_claims(self, uid, claims):
+        from firebase_admin import auth
+        auth.set_custom_user_claims(uid, claims, app=get_app())
+
+    def revoke_refresh_tokens(self, uid):
+        from firebase_admin import auth
+        auth.revoke_refresh_tokens(uid, app=get_app())
+
+
+class FakeFirebaseClient:
+    """
+    Cliente en memoria. Cualquier uid existe salvo los de `missing_uids`; `failures`
+    indica cuántas llamadas a set_custom_user_claims fallarán para un uid antes de
+    funcionar (para probar los reintentos).
+    """
+
+    def __init__(self, missing_uids=(), failures=None):
+        self.claims = {}
+        self.revoked = []
+        self.calls = []
+        self.missing_uids = set(missing_uids)
+        self.failures = dict(failures or {})
+
+    def get_custom_claims(self, uids):
+        self.calls.append(('get_users', list(uids)))
+        return {uid: dict(self.claims.get(uid, {})) for uid in uids if uid not in self.missing_uids}
+
+    def set_custom_user_claims(self, uid, claims):
+        self.calls.append(('set_custom_user_claims', uid))
+        if self.failures.get(uid, 0) > 0:
+            self.failures[uid] -= 1
+            raise ConnectionError(f"Fallo simulado de Firebase para {uid}")
+        self.claims[uid] = dict(claims)
+
+    def revoke_refresh_tokens(self, uid):
+        self.calls.append(('revoke_refresh_tokens', uid))
+        self.revoked.append(uid)
+
+
+def get_client():
+    return import_string(settings.FIREBASE_CLAIMS_CLIENT)()
@@ -0,0 +1,168 @@
+# usuarios/management/commands/benchmark_checkout.py
+import itertools
+import json
+import re
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import stripe
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from mercadolocalmx_backend import stripe_client
+from usuarios.stripe_customers import ensure_customer
+
+User = get_user_model()
+
+
+class _StubStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.ids = itertools.count(1)
+
+
+class _StubStripeHandler(BaseHTTPRequestHandler):
+    """
+    Servidor mínimo que imita los endpoints de Stripe que usa el checkout. Cada
+    respuesta tarda `latency` segundos para simular la ida y vuelta a la API real.
+    """
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    stats = None
+    latency = 0.0
+
+    def setup(self):
+        super().setup()
+        with self.stats.lock:
+            self.stats.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self, status, body):
+        time.sleep(self.latency)
+        with self.stats.lock:
+            self.stats.requests += 1
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        match = re.fullmatch(r'/v1/customers/([\w-]+)', self.path)
+        if match:
+            return self._respond(200, {'id': match.group(1), 'object': 'customer'})
+        self._not_found()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path == '/v1/customers':
+            return self._respond(200, {'id': f'cus_stub{next(self.stats.ids)}', 'object': 'customer'})
+        if self.path == '/v1/checkout/sessions':
+            return self._respond(200, {'id': f'cs_stub{next(self.stats.ids)}', 'object': 'checkout.session'})
+        self._not_found()
+
+    def _not_found(self):
+        self._respond(404, {'error': {'type': 'invalid_request_error', 'message': f'Unrecognized request URL ({self.path})'}})
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la latencia de POST /api/create-checkout-session/ contra un servidor de Stripe "
+        "simulado (sin red): cliente creado en el checkout o por adelantado, y validez del "
+        "cliente verificada en cada checkout o cacheada."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help="Checkouts por escenario.")
+        parser.add_argument('--latency-ms', type=float, default=150.0,
+                            help="Latencia simulada de cada llamada a Stripe.")
+
+    def handle(self, *args, **options):
+        stats = _StubStats()
+        handler = type('Handler', (_StubStripeHandler,), {'stats': stats, 'latency': options['latency_ms'] / 1000})
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        api_base = f'http://127.0.0.1:{server.server_address[1]}'
+
+        overrides = override_settings(
+            STRIPE_SECRET_KEY='sk_test_stub',
+            STRIPE_API_BASE=api_base,
+            STRIPE_MONTHLY_PLAN_PRICE_ID='price_stub',
+            FRONTEND_DOMAIN='http://localhost',
+            STRIPE_PREPROVISION_CUSTOMERS=False,
+        )
+        original = (stripe.api_key, stripe.api_base, stripe.default_http_client)
+        try:
+            with overrides:
+                stripe_client.configure(force=True)
+                self.stdout.write(f"Servidor de Stripe simulado en {api_base}, latencia {options['latency_ms']:.0f} ms.")
+                self.stdout.write(f"{'escenario':<44} {'p50 ms':>8} {'p95 ms':>8} {'llamadas':>9} {'conexiones':>11}")
+                self._run(stats, options['requests'])
+        finally:
+            stripe.api_key, stripe.api_base, stripe.default_http_client = original
+            server.shutdown()
+
+    def _run(self, stats, count):
+        scenarios = [
+            ('primer checkout, cliente creado en línea', 0, False, False),
+            ('primer checkout, cliente creado antes', 86400, True, False),
+            ('checkout repetido, validez sin caché', 0, True, True),
+            ('checkout repetido, validez en caché', 86400, True, True),
+        ]
+        try:
+            with transaction.atomic():
+                for n, (label, ttl, provisioned, repeat) in enumerate(scenarios):
+                    with override_settings(STRIPE_CUSTOMER_CACHE_TTL=ttl):
+                        self._scenario(stats, n, label, count, provisioned, repeat)
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _scenario(self, stats, n, label, count, provisioned, repeat):
+        cache.clear()
+        users = [
+            User.objects.create(username=f'bench-checkout-{n}-{i}', uid=f'bench-checkout-{n}-{i}')
+            for i in range(1 if repeat else count)
+        ]
+        if provisioned:
+            # Lo que hace provision_customer_async en segundo plano al registrarse el usuario.
+            for user in users:
+                ensure_customer(user)
+            if repeat:
+                self._checkout(users[0])  # calentamiento
+
+        samples = []
+        start_requests, start_connections = stats.requests, stats.connections
+        for i in range(count):
+            user = users[0] if repeat else users[i]
+            start = time.perf_counter()
+            response = self._checkout(user)
+            samples.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                self.stderr.write(f"Respuesta inesperada {response.status_code}: {response.data}")
+                return
+
+        samples.sort()
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        calls = (stats.requests - start_requests) / count
+        connections = stats.connections - start_connections
+        self.stdout.write(f"{label:<44} {statistics.median(samples):>8.1f} {p95:>8.1f} {calls:>9.1f} {connections:>11}")
+
+    def _checkout(self, user):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=user.pk))
+        return client.post('/api/create-checkout-session/')
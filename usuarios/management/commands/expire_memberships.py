@@ -0,0 +1,48 @@
+# usuarios/management/commands/expire_memberships.py
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from usuarios import memberships
+
+
+class Command(BaseCommand):
+    help = (
+        "Aplica los vencimientos de membresía (Business.membership_expires_at) por lotes: "
+        "quita is_paid_member e is_business_owner y encola el cambio de claim en Firebase. "
+        "Se ejecuta de forma continua cada MEMBERSHIP_SWEEP_INTERVAL segundos salvo con --once. "
+        "Cada ejecución queda registrada en MembershipSweep (visible en el admin)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.MEMBERSHIP_SWEEP_BATCH_SIZE,
+                            help="Negocios por lote (cada lote es una transacción).")
+        parser.add_argument('--pause', type=float, default=0.0, help="Segundos de espera entre lotes.")
+        parser.add_argument('--interval', type=float, default=settings.MEMBERSHIP_SWEEP_INTERVAL,
+                            help="Segundos entre barridos.")
+        parser.add_argument('--once', action='store_true', help="Hace un barrido y termina.")
+
+    def handle(self, *args, **options):
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        while not self._stopping:
+            sweep = memberships.expire_memberships(batch_size=options['batch_size'], pause=options['pause'])
+            self.stdout.write(
+                f"Barrido: {sweep.businesses_expired} negocios vencidos, {sweep.owners_revoked} dueños sin acceso, "
+                f"{sweep.batches} lotes en {sweep.duration_seconds:.2f} s "
+                f"(vencidas antes de {sweep.cutoff:%Y-%m-%d %H:%M})."
+            )
+            if options['once']:
+                break
+            # Espera en pasos cortos para responder pronto a SIGTERM.
+            deadline = time.monotonic() + options['interval']
+            while not self._stopping and time.monotonic() < deadline:
+                time.sleep(max(0.0, min(1.0, deadline - time.monotonic())))
+
+    def _stop(self, signum, frame):
+        self.stdout.write("Deteniendo el worker al terminar el barrido actual...")
+        self._stopping = True
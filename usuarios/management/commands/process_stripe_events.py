@@ -0,0 +1,42 @@
+# usuarios/management/commands/process_stripe_events.py
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from usuarios import stripe_events
+
+
+class Command(BaseCommand):
+    help = (
+        "Aplica los eventos de webhook de Stripe guardados (StripeEvent), en orden por "
+        "cliente y con reintentos. Se ejecuta de forma continua salvo con --once. "
+        "Debe correr un solo proceso para conservar el orden por cliente."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help="Eventos por lote.")
+        parser.add_argument('--idle-sleep', type=float, default=1.0,
+                            help="Segundos de espera cuando no hay eventos pendientes.")
+        parser.add_argument('--once', action='store_true',
+                            help="Procesa los eventos vencidos y termina.")
+
+    def handle(self, *args, **options):
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        while not self._stopping:
+            result = stripe_events.process_pending(batch_size=options['batch_size'])
+            if result:
+                self.stdout.write("Lote: " + ", ".join(f"{count} {status}" for status, count in sorted(result.items())))
+            # Un lote lleno indica que probablemente quedan más eventos vencidos.
+            if sum(result.values()) >= options['batch_size']:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['idle_sleep'])
+
+    def _stop(self, signum, frame):
+        self.stdout.write("Deteniendo el worker al terminar el lote actual...")
+        self._stopping = True
@@ -0,0 +1,83 @@
+# usuarios/management/commands/replay_stripe_events.py
+from datetime import datetime, time as dt_time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from mercadolocalmx_backend import stripe_client
+from usuarios import stripe_events
+from usuarios.models import StripeEvent
+
+
+class Command(BaseCommand):
+    help = (
+        "Vuelve a poner en cola eventos de Stripe ya guardados para que se apliquen de nuevo "
+        "y, con --fetch, descarga de la API de Stripe los eventos que no llegaron por webhook "
+        "(Stripe conserva los eventos de los últimos 30 días)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Fecha inicial (AAAA-MM-DD) de creación del evento en Stripe.")
+        parser.add_argument('--type', action='append', dest='types', default=[],
+                            help="Tipo de evento (se puede repetir).")
+        parser.add_argument('--customer', help="ID de cliente de Stripe.")
+        parser.add_argument('--event-id', action='append', dest='event_ids', default=[],
+                            help="ID de evento (se puede repetir).")
+        parser.add_argument('--fetch', action='store_true',
+                            help="Descarga de Stripe los eventos desde --since y guarda los que falten.")
+        parser.add_argument('--process', action='store_true',
+                            help="Aplica los eventos en cola al terminar, sin esperar al worker.")
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = timezone.make_aware(datetime.combine(datetime.strptime(options['since'], '%Y-%m-%d'), dt_time.min))
+            except ValueError:
+                raise CommandError("--since debe tener el formato AAAA-MM-DD.")
+
+        if options['fetch']:
+            if since is None:
+                raise CommandError("--fetch requiere --since.")
+            self._fetch(since, options['types'])
+
+        queryset = StripeEvent.objects.all()
+        if since is not None:
+            queryset = queryset.filter(stripe_created_at__gte=since)
+        if options['types']:
+            queryset = queryset.filter(type__in=options['types'])
+        if options['customer']:
+            queryset = queryset.filter(customer_id=options['customer'])
+        if options['event_ids']:
+            queryset = queryset.filter(event_id__in=options['event_ids'])
+
+        queued = queryset.update(
+            status=StripeEvent.STATUS_PENDING, attempts=0, next_attempt_at=timezone.now(), last_error='',
+        )
+        self.stdout.write(f"{queued} eventos en cola para aplicarse de nuevo.")
+
+        if options['process']:
+            total = 0
+            while True:
+                result = stripe_events.process_pending()
+                processed = sum(result.values()) - result['deferred']
+                total += processed
+                if not processed:
+                    break
+            self.stdout.write(self.style.SUCCESS(f"{total} eventos aplicados."))
+
+    def _fetch(self, since, types):
+        stripe = stripe_client.get()
+        params = {'created': {'gte': int(since.timestamp())}, 'limit': 100}
+        if types:
+            params['types'] = types
+        existing = set(
+            StripeEvent.objects.filter(stripe_created_at__gte=since).values_list('event_id', flat=True)
+        )
+        fetched = 0
+        for event in stripe.Event.list(**params).auto_paging_iter():
+            if event.id in existing:
+                continue
+            stripe_events.record_event(event.to_dict())
+            fetched += 1
+        self.stdout.write(f"{fetched} eventos descargados de Stripe que no estaban guardados.")
@@ -0,0 +1,52 @@
+# usuarios/management/commands/sync_firebase_claims.py
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from usuarios import outbox
+from usuarios.firebase_client import FakeFirebaseClient, get_client
+
+
+class Command(BaseCommand):
+    help = (
+        "Procesa el outbox de custom claims de Firebase (ClaimSyncTask) por lotes, "
+        "con reintentos y backoff. Se ejecuta de forma continua salvo con --once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help="Tareas por lote.")
+        parser.add_argument('--idle-sleep', type=float, default=2.0,
+                            help="Segundos de espera cuando no hay tareas pendientes.")
+        parser.add_argument('--once', action='store_true',
+                            help="Procesa las tareas vencidas y termina.")
+        parser.add_argument('--fake', action='store_true',
+                            help="Usa FakeFirebaseClient (en memoria, sin red). Solo con DEBUG=True.")
+
+    def handle(self, *args, **options):
+        if options['fake'] and not settings.DEBUG:
+            # Con la base de datos real, el cliente falso borraría las tareas sin sincronizar nada.
+            raise CommandError("--fake solo se permite con DEBUG=True: completaría las tareas sin tocar Firebase.")
+        client = FakeFirebaseClient() if options['fake'] else get_client()
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        while not self._stopping:
+            result = outbox.process_batch(client, batch_size=options['batch_size'])
+            if result.total:
+                self.stdout.write(
+                    f"Lote: {result.synced} sincronizados, {result.failed} con error, "
+                    f"{result.missing} inexistentes en Firebase."
+                )
+            # Un lote lleno indica que probablemente quedan más tareas vencidas.
+            if result.total >= options['batch_size']:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['idle_sleep'])
+
+    def _stop(self, signum, frame):
+        self.stdout.write("Deteniendo el worker al terminar el lote actual...")
+        self._stopping = True
@@ -0,0 +1,128 @@
+# usuarios/memberships.py
+"""
+Barrido de membresías vencidas.
+
+La visibilidad de un negocio depende de CustomUser.is_business_owner, que cambian los
+webhooks de Stripe. Si un webhook se pierde, el negocio seguiría visible para siempre;
+este barrido aplica Business.membership_expires_at (más MEMBERSHIP_EXPIRY_GRACE_HOURS,
+para no adelantarse a una renovación que aún no llega):
+
+1. Negocios con is_paid_member=True vencidos (índice parcial business_membership_expiry_idx).
+2. Dueños con is_business_owner=True cuyo negocio ya no es de pago y está vencido
+   (índice parcial user_business_owner_idx).
+
+Cada lote es una transacción con UPDATEs por lote (sin save() ni signals por fila): se
+quitan is_paid_member, is_business_owner y has_active_subscription, se encolan los
+cambios de claim de Firebase con enqueue_claim_syncs y, al confirmar, se invalidan la
+caché de usuarios, la de listados de los municipios afectados y las facetas.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from comerciantes import cache as list_cache
+from comerciantes import facets
+from comerciantes.models import Business
+
+from .cache import invalidate_users
+from .models import CustomUser, MembershipSweep, enqueue_claim_syncs
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SweepStats:
+    businesses_expired: int = 0
+    owners_revoked: int = 0
+    batches: int = 0
+
+
+def expiry_cutoff(now=None):
+    return (now or timezone.now()) - timedelta(hours=settings.MEMBERSHIP_EXPIRY_GRACE_HOURS)
+
+
+def lapsed_querysets(cutoff):
+    return [
+        Business.objects.filter(is_paid_member=True, membership_expires_at__lt=cutoff),
+        Business.objects.filter(
+            user__is_business_owner=True, is_paid_member=False, membership_expires_at__lt=cutoff
+        ),
+    ]
+
+
+def expire_batch(queryset, batch_size, now=None):
+    """
+    Aplica el vencimiento a un lote de `queryset`. Devuelve (filas del lote, negocios
+    que dejaron de ser de pago, dueños que perdieron el acceso).
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        batch = queryset.order_by('membership_expires_at', 'pk')
+        if connection.features.has_select_for_update_skip_locked:
+            # Un lote concurrente (o un webhook que está renovando) se salta esas filas.
+            batch = batch.select_for_update(skip_locked=True)
+        rows = list(batch.values('pk', 'user_id', 'user__uid', 'user__is_business_owner', 'municipality')[:batch_size])
+        if not rows:
+            return 0, 0, 0
+
+        # Se vuelve a filtrar con `queryset`: una renovación confirmada entre la lectura y
+        # el UPDATE (sin SKIP LOCKED) no se pisa.
+        expired = queryset.filter(pk__in=[row['pk'] for row in rows], is_paid_member=True).update(
+            is_paid_member=False, updated_at=now
+        )
+        owners = [row for row in rows if row['user__is_business_owner']]
+        revoked = CustomUser.objects.filter(pk__in=[row['user_id'] for row in owners], is_business_owner=True).update(
+            is_business_owner=False, has_active_subscription=False
+        )
+        uids = [row['user__uid'] for row in owners]
+        enqueue_claim_syncs(uids, False)
+
+        transaction.on_commit(lambda: invalidate_users(uids))
+        # is_paid_member también forma parte de la respuesta de los listados.
+        list_cache.bump_generations(*{row['municipality'] for row in rows})
+        if revoked:
+            facets.invalidate(facets.BUSINESS, facets.OFFER)
+    return len(rows), expired, revoked
+
+
+def expire_memberships(batch_size=None, pause=0.0, now=None):
+    """Aplica todos los vencimientos pendientes por lotes y guarda un MembershipSweep."""
+    batch_size = batch_size or settings.MEMBERSHIP_SWEEP_BATCH_SIZE
+    started_at = now or timezone.now()
+    started = time.perf_counter()
+    cutoff = expiry_cutoff(started_at)
+    stats = SweepStats()
+
+    for queryset in lapsed_querysets(cutoff):
+        while True:
+            rows, expired, revoked = expire_batch(queryset, batch_size, started_at)
+            if not rows:
+                break
+            stats.businesses_expired += expired
+            stats.owners_revoked += revoked
+            stats.batches += 1
+            if pause:
+                time.sleep(pause)
+
+    duration = time.perf_counter() - started
+    sweep = MembershipSweep.objects.create(
+        started_at=started_at,
+        finished_at=timezone.now(),
+        cutoff=cutoff,
+        businesses_expired=stats.businesses_expired,
+        owners_revoked=stats.owners_revoked,
+        batches=stats.batches,
+        duration_seconds=duration,
+    )
+    if stats.businesses_expired or stats.owners_revoked:
+        logger.info(
+            f"Barrido de membresías: {stats.businesses_expired} negocios vencidos y "
+            f"{stats.owners_revoked} dueños sin acceso en {stats.batches} lotes ({duration:.1f} s)."
+        )
+    return sweep
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('usuarios', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(condition=models.Q(('is_business_owner', True)), fields=['id'], name='user_business_owner_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0002_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaimSyncTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uid', models.CharField(max_length=128, unique=True)),
+                ('is_business_owner', models.BooleanField()),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Sincronización de claim pendiente',
+                'verbose_name_plural': 'Sincronizaciones de claims pendientes',
+                'indexes': [models.Index(fields=['next_attempt_at'], name='claim_sync_due_idx')],
+            },
+        ),
+    ]
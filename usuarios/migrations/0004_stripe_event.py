@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0003_claim_sync_task'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=255, unique=True)),
+                ('type', models.CharField(max_length=100)),
+                ('customer_id', models.CharField(blank=True, default='', max_length=50)),
+                ('stripe_created_at', models.DateTimeField()),
+                ('payload', models.JSONField()),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('processed', 'Procesado'), ('ignored', 'Ignorado'), ('failed', 'Fallido')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Evento de Stripe',
+                'verbose_name_plural': 'Eventos de Stripe',
+                'indexes': [models.Index(fields=['status', 'stripe_created_at', 'id'], name='stripe_event_queue_idx'), models.Index(fields=['customer_id', 'stripe_created_at'], name='stripe_event_customer_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0004_stripe_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MembershipSweep',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField()),
+                ('cutoff', models.DateTimeField()),
+                ('businesses_expired', models.PositiveIntegerField(default=0)),
+                ('owners_revoked', models.PositiveIntegerField(default=0)),
+                ('batches', models.PositiveIntegerField(default=0)),
+                ('duration_seconds', models.FloatField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Barrido de membresías',
+                'verbose_name_plural': 'Barridos de membresías',
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
@@ -1,12 +1,13 @@
 # usuarios/models.py
 from django.contrib.auth.models import AbstractUser
-from django.db import models
-from django.db.models.signals import post_save
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from django.utils import timezone
 import logging # Importar el módulo de logging
 
-# Importa tu función de utilidad para actualizar los claims de Firebase
-from .utils import update_firebase_custom_claim
+from .cache import invalidate_user
 
 # Crear una instancia de logger para este módulo
 logger = logging.getLogger(__name__)
@@ -19,21 +20,186 @@ class CustomUser(AbstractUser):
     # Nuevo campo para el estado de la suscripción, si lo estás utilizando
     has_active_subscription = models.BooleanField(default=False)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Índice parcial (Postgres/SQLite): solo los dueños de negocio, que son los visibles en los listados.
+            models.Index(fields=['id'], condition=models.Q(is_business_owner=True), name='user_business_owner_idx'),
+        ]
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # Almacena el valor original de 'is_business_owner' cuando la instancia se carga de la DB
         self.__original_is_business_owner = self.is_business_owner
 
+    def save(self, *args, **kwargs):
+        # El guardado y los signals post_save (p. ej. la tarea del outbox de claims)
+        # ocurren en la misma transacción.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+        self.__original_is_business_owner = self.is_business_owner
+
+    def business_owner_changed(self):
+        """Indica si is_business_owner cambió desde que la instancia se cargó de la DB."""
+        return self.__original_is_business_owner != self.is_business_owner
+
     def __str__(self):
         return self.email if self.email else self.username
 
+
+class ClaimSyncTask(models.Model):
+    """
+    Outbox de sincronización del custom claim 'isBusinessOwner' con Firebase.
+
+    Se escribe en la misma transacción que el guardado del usuario y la procesa el
+    worker `manage.py sync_firebase_claims`. Hay como máximo una tarea por uid: un
+    cambio posterior actualiza el valor deseado e incrementa `version`, y el worker
+    solo borra la tarea si la versión no cambió mientras la procesaba.
+    """
+    uid = models.CharField(max_length=128, unique=True)
+    is_business_owner = models.BooleanField()
+    version = models.PositiveIntegerField(default=1)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Sincronización de claim pendiente"
+        verbose_name_plural = "Sincronizaciones de claims pendientes"
+        indexes = [
+            models.Index(fields=['next_attempt_at'], name='claim_sync_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.uid} -> isBusinessOwner={self.is_business_owner}"
+
+
+
+class StripeEvent(models.Model):
+    """
+    Evento de webhook de Stripe recibido, guardado tal cual llegó.
+
+    El webhook solo verifica la firma y lo inserta (el id del evento es único, así que
+    los reintentos de Stripe se ignoran); `manage.py process_stripe_events` los aplica
+    en orden por cliente.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSED = 'processed'
+    STATUS_IGNORED = 'ignored'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pendiente'),
+        (STATUS_PROCESSED, 'Procesado'),
+        (STATUS_IGNORED, 'Ignorado'),
+        (STATUS_FAILED, 'Fallido'),
+    ]
+
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    customer_id = models.CharField(max_length=50, blank=True, default='')
+    # Momento en que Stripe creó el evento: define el orden de aplicación por cliente.
+    stripe_created_at = models.DateTimeField()
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = "Evento de Stripe"
+        verbose_name_plural = "Eventos de Stripe"
+        indexes = [
+            models.Index(fields=['status', 'stripe_created_at', 'id'], name='stripe_event_queue_idx'),
+            models.Index(fields=['customer_id', 'stripe_created_at'], name='stripe_event_customer_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id} ({self.type})"
+
+
+class MembershipSweep(models.Model):
+    """
+    Resultado de cada ejecución del barrido de membresías vencidas
+    (usuarios/memberships.py, `manage.py expire_memberships`).
+    """
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField()
+    # Fecha de corte: membresías con membership_expires_at anterior a esta.
+    cutoff = models.DateTimeField()
+    businesses_expired = models.PositiveIntegerField(default=0)
+    owners_revoked = models.PositiveIntegerField(default=0)
+    batches = models.PositiveIntegerField(default=0)
+    duration_seconds = models.FloatField(default=0)
+
+    class Meta:
+        verbose_name = "Barrido de membresías"
+        verbose_name_plural = "Barridos de membresías"
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"{self.started_at:%Y-%m-%d %H:%M}: {self.businesses_expired} membresías vencidas"
+
+
+def enqueue_claim_sync(uid, is_business_owner):
+    """Crea o actualiza la tarea pendiente del uid para que se procese de inmediato."""
+    now = timezone.now()
+    ClaimSyncTask.objects.update_or_create(
+        uid=uid,
+        defaults={
+            'is_business_owner': is_business_owner,
+            'version': F('version') + 1,
+            'attempts': 0,
+            'next_attempt_at': now,
+            'last_error': '',
+        },
+        create_defaults={
+            'is_business_owner': is_business_owner,
+            'next_attempt_at': now,
+        },
+    )
+
+def enqueue_claim_syncs(uids, is_business_owner):
+    """
+    Versión por lotes de enqueue_claim_sync: inserta las tareas que faltan y actualiza
+    todas con un solo UPDATE (dos consultas sin importar cuántos uids sean).
+    """
+    uids = [uid for uid in uids if uid]
+    if not uids:
+        return
+    now = timezone.now()
+    with transaction.atomic():
+        ClaimSyncTask.objects.bulk_create(
+            [ClaimSyncTask(uid=uid, is_business_owner=is_business_owner, next_attempt_at=now) for uid in uids],
+            ignore_conflicts=True,
+        )
+        ClaimSyncTask.objects.filter(uid__in=uids).update(
+            is_business_owner=is_business_owner,
+            version=F('version') + 1,
+            attempts=0,
+            next_attempt_at=now,
+            last_error='',
+        )
+
+
 # --- Signal para actualizar los custom claims de Firebase ---
 @receiver(post_save, sender=CustomUser)
 def sync_is_business_owner_with_firebase(sender, instance, created, **kwargs):
     """
     Sincroniza el campo is_business_owner del usuario de Django con los custom claims
     de Firebase cada vez que un CustomUser es guardado o creado.
+
+    No hace llamadas de red: encola una ClaimSyncTask que procesa el worker
+    `manage.py sync_firebase_claims`.
     """
+    # Cualquier cambio (is_business_owner, has_active_subscription, ...) debe verse
+    # en la siguiente petición autenticada, así que se descarta la copia cacheada.
+    # Al confirmar la transacción: antes, otra petición podría volver a cachear la fila vieja.
+    uid = instance.uid
+    transaction.on_commit(lambda: invalidate_user(uid))
+
     if kwargs.get('raw', False):
         return
 
@@ -41,15 +207,21 @@ def sync_is_business_owner_with_firebase(sender, instance, created, **kwargs):
     logger.info(f"Signal activado para {instance.email}. Creado: {created}. is_business_owner actual (post-save): {instance.is_business_owner}")
 
     if instance.uid:
-        # Obtener el valor original del campo (antes de la operación de guardado)
-        old_is_business_owner = getattr(instance, '__original_is_business_owner', None)
-
         # Si el valor de is_business_owner cambió
         if (created and instance.is_business_owner) or \
-           (not created and old_is_business_owner != instance.is_business_owner):
-            logger.info(f"CAMBIO DETECTADO para {instance.email}: is_business_owner cambió de '{old_is_business_owner}' a '{instance.is_business_owner}'. Sincronizando con Firebase...")
-            update_firebase_custom_claim(instance.uid, instance.is_business_owner)
+           (not created and instance.business_owner_changed()):
+            logger.info(f"CAMBIO DETECTADO para {instance.email}: is_business_owner cambió a '{instance.is_business_owner}'. Encolando sincronización con Firebase...")
+            enqueue_claim_sync(instance.uid, instance.is_business_owner)
         else:
             logger.info(f"No hubo cambio significativo en is_business_owner para {instance.email}. No se necesita actualizar Firebase.")
     else:
         logger.warning(f"ADVERTENCIA: Usuario {instance.email} no tiene UID de Firebase. No se pudo sincronizar custom claim.")
+
+
+@receiver(post_delete, sender=CustomUser)
+def invalidate_deleted_user_cache(sender, instance, **kwargs):
+    """
+    Un usuario eliminado no debe seguir autenticándose desde la caché.
+    """
+    uid = instance.uid
+    transaction.on_commit(lambda: invalidate_user(uid))
@@ -0,0 +1,105 @@
+# usuarios/outbox.py
+"""
+Procesamiento del outbox de custom claims (modelo ClaimSyncTask).
+
+Cada lote se reserva moviendo su next_attempt_at al futuro (con SKIP LOCKED donde la
+base de datos lo soporta, para poder correr varios workers), se leen los claims
+actuales de todos sus uids con una sola llamada a Firebase y se aplica cada cambio.
+Los fallos se reintentan con backoff exponencial con jitter.
+"""
+
+import logging
+import random
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ClaimSyncTask
+from .utils import update_firebase_custom_claim
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchResult:
+    synced: int = 0
+    failed: int = 0
+    missing: int = 0
+
+    @property
+    def total(self):
+        return self.synced + self.failed + self.missing
+
+
+def backoff_seconds(attempts, base, maximum):
+    """Espera antes del siguiente intento: base * 2^(intentos-1), con tope y jitter."""
+    delay = min(maximum, base * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _claim_batch(batch_size, now):
+    with transaction.atomic():
+        queryset = ClaimSyncTask.objects.filter(next_attempt_at__lte=now).order_by('next_attempt_at')
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        tasks = list(queryset[:batch_size])
+        # Si el worker muere a mitad del lote, las tareas vuelven a estar disponibles al vencer la reserva.
+        ClaimSyncTask.objects.filter(pk__in=[task.pk for task in tasks]).update(
+            next_attempt_at=now + timedelta(seconds=settings.CLAIM_SYNC_LEASE_SECONDS)
+        )
+    return tasks
+
+
+def _complete(task):
+    # Si el usuario cambió otra vez mientras se procesaba, la tarea (con otra versión) se conserva.
+    ClaimSyncTask.objects.filter(pk=task.pk, version=task.version).delete()
+
+
+def _fail(task, error):
+    attempts = task.attempts + 1
+    delay = backoff_seconds(attempts, settings.CLAIM_SYNC_BASE_BACKOFF, settings.CLAIM_SYNC_MAX_BACKOFF)
+    updated = ClaimSyncTask.objects.filter(pk=task.pk, version=task.version).update(
+        attempts=attempts,
+        next_attempt_at=timezone.now() + timedelta(seconds=delay),
+        last_error=str(error)[:1000],
+    )
+    if updated:
+        log = logger.error if attempts >= settings.CLAIM_SYNC_ALERT_ATTEMPTS else logger.warning
+        log(f"Sincronización de claim para {task.uid} falló (intento {attempts}); se reintenta en {delay:.0f} s: {error}")
+
+
+def process_batch(client, batch_size=100):
+    """Procesa un lote de tareas vencidas. Devuelve un BatchResult."""
+    result = BatchResult()
+    tasks = _claim_batch(batch_size, timezone.now())
+    if not tasks:
+        return result
+
+    try:
+        claims = client.get_custom_claims([task.uid for task in tasks])
+    except Exception as e:
+        for task in tasks:
+            _fail(task, e)
+        result.failed = len(tasks)
+        return result
+
+    for task in tasks:
+        if task.uid not in claims:
+            logger.warning(f"El uid {task.uid} no existe en Firebase; se descarta la sincronización de su claim.")
+            _complete(task)
+            result.missing += 1
+            continue
+        try:
+            update_firebase_custom_claim(
+                task.uid, task.is_business_owner, client=client, current_claims=claims[task.uid]
+            )
+        except Exception as e:
+            _fail(task, e)
+            result.failed += 1
+        else:
+            _complete(task)
+            result.synced += 1
+    return result
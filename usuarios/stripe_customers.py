@@ -0,0 +1,139 @@
+# usuarios/stripe_customers.py
+"""
+Clientes de Stripe de los usuarios.
+
+- La validez de un stripe_customer_id se recuerda en la caché de Django durante
+  STRIPE_CUSTOMER_CACHE_TTL, en lugar de consultar Stripe en cada checkout. Si el
+  cliente se borró en Stripe, el checkout lo detecta al crear la sesión y lo reemplaza.
+- El cliente se crea por adelantado en segundo plano cuando FirebaseAuthentication
+  registra a un usuario nuevo, así que el primer checkout ya no tiene que crearlo.
+- Las creaciones usan una idempotency key por usuario: si el checkout y el
+  aprovisionamiento en segundo plano coinciden, Stripe devuelve el mismo cliente.
+- El id se guarda con un UPDATE condicional (sin save(), que dispararía los signals
+  del usuario) y se invalida el usuario en usuarios/cache.py.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q
+
+from mercadolocalmx_backend import stripe_client
+from .cache import invalidate_user
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _validity_key(customer_id):
+    return f'stripe:customer-valid:{customer_id}'
+
+
+def _is_known_valid(customer_id):
+    if not settings.STRIPE_CUSTOMER_CACHE_TTL:
+        return False
+    return cache.get(_validity_key(customer_id)) is not None
+
+
+def _mark_valid(customer_id):
+    if settings.STRIPE_CUSTOMER_CACHE_TTL:
+        cache.set(_validity_key(customer_id), 1, timeout=settings.STRIPE_CUSTOMER_CACHE_TTL)
+
+
+def forget_customer(customer_id):
+    cache.delete(_validity_key(customer_id))
+
+
+def _create_customer(user, replaces=None):
+    idempotency_key = f'customer-{user.pk}' + (f'-replaces-{replaces}' if replaces else '')
+    customer = stripe_client.get().Customer.create(
+        email=user.email,
+        name=user.get_full_name() or user.username,
+        metadata={'django_user_id': user.id},
+        idempotency_key=idempotency_key,
+    )
+    _mark_valid(customer.id)
+    return customer.id
+
+
+def _store_customer_id(user, customer_id, replaces=None):
+    """
+    Guarda el id solo si nadie lo cambió mientras tanto; si otro proceso guardó uno
+    primero, se usa ese. Devuelve el id vigente.
+    """
+    User = get_user_model()
+    if replaces:
+        current = Q(stripe_customer_id=replaces)
+    else:
+        # Los registros antiguos guardan '' en lugar de NULL.
+        current = Q(stripe_customer_id__isnull=True) | Q(stripe_customer_id='')
+    updated = User.objects.filter(current, pk=user.pk).update(stripe_customer_id=customer_id)
+    if not updated:
+        customer_id = User.objects.filter(pk=user.pk).values_list('stripe_customer_id', flat=True).first() or customer_id
+    invalidate_user(user.uid)
+    user.stripe_customer_id = customer_id
+    return customer_id
+
+
+def ensure_customer(user):
+    """Devuelve un stripe_customer_id válido para el usuario, creándolo si hace falta."""
+    customer_id = user.stripe_customer_id
+    if not customer_id:
+        logger.info(f"Creando nuevo cliente de Stripe para el usuario: {user.id}")
+        return _store_customer_id(user, _create_customer(user))
+
+    if _is_known_valid(customer_id):
+        return customer_id
+
+    stripe = stripe_client.get()
+    try:
+        customer = stripe.Customer.retrieve(customer_id)
+        if not getattr(customer, 'deleted', False):
+            _mark_valid(customer_id)
+            return customer_id
+    except stripe.error.InvalidRequestError:
+        pass
+    logger.warning(f"ID de cliente de Stripe inválido para el usuario {user.id}. Creando uno nuevo.")
+    return replace_customer(user, customer_id)
+
+
+def replace_customer(user, invalid_customer_id):
+    """Sustituye un cliente que ya no existe en Stripe por uno nuevo."""
+    forget_customer(invalid_customer_id)
+    customer_id = _create_customer(user, replaces=invalid_customer_id)
+    return _store_customer_id(user, customer_id, replaces=invalid_customer_id)
+
+
+def _provision(user_id):
+    try:
+        user = get_user_model().objects.get(pk=user_id)
+        if not user.stripe_customer_id:
+            ensure_customer(user)
+            logger.info(f"Cliente de Stripe creado por adelantado para el usuario {user_id}.")
+    except Exception as e:
+        # No es crítico: el checkout lo crea si todavía no existe.
+        logger.warning(f"No se pudo crear por adelantado el cliente de Stripe del usuario {user_id}: {e}")
+    finally:
+        # El hilo del executor abre su propia conexión a la base de datos.
+        connection.close()
+
+
+def provision_customer_async(user):
+    """Crea en segundo plano el cliente de Stripe de un usuario recién registrado."""
+    global _executor
+    if not settings.STRIPE_PREPROVISION_CUSTOMERS or not settings.STRIPE_SECRET_KEY:
+        return
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.STRIPE_PROVISIONING_WORKERS, thread_name_prefix='stripe-provision',
+            )
+    user_id = user.pk
+    transaction.on_commit(lambda: _executor.submit(_provision, user_id))
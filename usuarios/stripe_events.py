@@ -0,0 +1,285 @@
+# usuarios/stripe_events.py
+"""
+Registro y aplicación de los eventos de webhook de Stripe (modelo StripeEvent).
+
+`record_event` es lo único que hace el webhook: un INSERT que ignora ids repetidos.
+`process_pending` aplica los eventos pendientes en el orden en que Stripe los creó;
+si el evento de un cliente falla, los siguientes de ese mismo cliente esperan a que
+se reintente con éxito (o se descarte), para no aplicar cambios fuera de orden. Un
+evento de estado de la suscripción (STATE_EVENT_TYPES) que llega después de que ya
+se aplicó uno más nuevo del mismo cliente se marca como procesado sin aplicarlo; de
+un invoice.paid en esa situación solo se registra la fecha del pago.
+
+Los handlers fijan estado (no lo acumulan), así que volver a aplicar un evento con
+`manage.py replay_stripe_events` es seguro.
+"""
+
+import logging
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CustomUser, StripeEvent
+from .outbox import backoff_seconds
+
+logger = logging.getLogger(__name__)
+
+# Estados de suscripción que dan acceso y los que lo quitan. Los demás ('incomplete',
+# p. ej. el primer pago aún en curso) no cambian nada.
+ACTIVE_SUBSCRIPTION_STATUSES = {'active', 'trialing', 'past_due'}
+INACTIVE_SUBSCRIPTION_STATUSES = {'canceled', 'unpaid', 'incomplete_expired', 'paused'}
+
+# Eventos que fijan el estado de la suscripción: si ya se aplicó uno más nuevo del mismo
+# cliente, un evento que cambia la suscripción llega tarde. invoice.paid también la activa,
+# pero no cuenta como estado más nuevo: la factura final de una cancelación puede pagarse
+# después del customer.subscription.deleted.
+STATE_EVENT_TYPES = {'checkout.session.completed', 'customer.subscription.updated', 'customer.subscription.deleted'}
+
+HANDLERS = {}
+# Lo que sí se aplica de un evento que llegó tarde (ver _is_stale); sin entrada, nada.
+SUPERSEDED_HANDLERS = {}
+
+
+def handles(event_type, superseded=None):
+    def register(handler):
+        HANDLERS[event_type] = handler
+        if superseded is not None:
+            SUPERSEDED_HANDLERS[event_type] = superseded
+        return handler
+    return register
+
+
+def _from_timestamp(value):
+    return datetime.fromtimestamp(value, tz=dt_timezone.utc) if value else None
+
+
+def _customer_id(event):
+    obj = event.get('data', {}).get('object', {})
+    if obj.get('object') == 'customer':
+        return obj.get('id') or ''
+    customer = obj.get('customer') or ''
+    # Con expand[] el cliente llega como objeto.
+    return customer.get('id', '') if isinstance(customer, dict) else customer
+
+
+def record_event(event):
+    """Guarda el evento (dict con el JSON de Stripe). Los ids ya guardados se ignoran."""
+    StripeEvent.objects.bulk_create(
+        [
+            StripeEvent(
+                event_id=event['id'],
+                type=event['type'],
+                customer_id=_customer_id(event),
+                stripe_created_at=_from_timestamp(event['created']),
+                payload=event,
+            )
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def _user_for_customer(customer_id):
+    # CustomUser.DoesNotExist se trata como un fallo reintentable.
+    return CustomUser.objects.select_related('business_profile').get(stripe_customer_id=customer_id)
+
+
+def _set_subscription(user, active):
+    if user.is_business_owner == active and user.has_active_subscription == active:
+        return
+    user.is_business_owner = active
+    user.has_active_subscription = active
+    user.save(update_fields=['is_business_owner', 'has_active_subscription'])
+    logger.info(f"Usuario {user.email}: is_business_owner y has_active_subscription actualizados a {active}.")
+
+
+def _business(user):
+    # El acceso inverso lanza RelatedObjectDoesNotExist (un AttributeError) si no hay negocio.
+    return getattr(user, 'business_profile', None)
+
+
+def _update_business(user, **fields):
+    business = _business(user)
+    if business is None:
+        logger.info(f"El usuario {user.email} aún no tiene negocio; no se actualiza la membresía.")
+        return
+    changed = [name for name, value in fields.items() if getattr(business, name) != value]
+    if not changed:
+        return
+    for name in changed:
+        setattr(business, name, fields[name])
+    business.save(update_fields=changed + ['updated_at'])
+
+
+@handles('checkout.session.completed')
+def handle_checkout_completed(session):
+    user = _user_for_customer(session.get('customer'))
+    _set_subscription(user, True)
+
+
+@handles('customer.subscription.deleted')
+def handle_subscription_deleted(subscription):
+    user = _user_for_customer(subscription.get('customer'))
+    _set_subscription(user, False)
+    fields = {'is_paid_member': False}
+    ended_at = _from_timestamp(subscription.get('ended_at'))
+    if ended_at:
+        fields['membership_expires_at'] = ended_at
+    _update_business(user, **fields)
+
+
+def _subscription_period_end(subscription):
+    # En versiones recientes de la API el periodo vive en cada item de la suscripción.
+    if subscription.get('current_period_end'):
+        return subscription['current_period_end']
+    items = subscription.get('items', {}).get('data', [])
+    return max((item.get('current_period_end') or 0 for item in items), default=0) or None
+
+
+@handles('customer.subscription.updated')
+def handle_subscription_updated(subscription):
+    status = subscription.get('status')
+    if status in ACTIVE_SUBSCRIPTION_STATUSES:
+        active = True
+    elif status in INACTIVE_SUBSCRIPTION_STATUSES:
+        active = False
+    else:
+        return
+
+    user = _user_for_customer(subscription.get('customer'))
+    _set_subscription(user, active)
+    fields = {'is_paid_member': active}
+    period_end = _from_timestamp(_subscription_period_end(subscription))
+    if period_end:
+        fields['membership_expires_at'] = period_end
+    _update_business(user, **fields)
+
+
+def _payment_dates(invoice, business):
+    """last_payment_date y membership_expires_at de la factura, solo si las adelantan."""
+    paid_at = _from_timestamp(invoice.get('status_transitions', {}).get('paid_at') or invoice.get('created'))
+    lines = invoice.get('lines', {}).get('data', [])
+    period_end = _from_timestamp(max((line.get('period', {}).get('end') or 0 for line in lines), default=0))
+
+    fields = {}
+    # Un pago solo adelanta las fechas: reaplicar una factura vieja no las regresa.
+    if paid_at:
+        paid_on = timezone.localdate(paid_at)
+        if business is None or business.last_payment_date is None or paid_on > business.last_payment_date:
+            fields['last_payment_date'] = paid_on
+    if period_end:
+        if business is None or business.membership_expires_at is None or period_end > business.membership_expires_at:
+            fields['membership_expires_at'] = period_end
+    return fields
+
+
+def handle_superseded_invoice_paid(invoice):
+    # Un evento de estado más nuevo ya fijó la suscripción y el periodo: solo se registra el pago.
+    user = _user_for_customer(invoice.get('customer'))
+    fields = _payment_dates(invoice, _business(user))
+    if 'last_payment_date' in fields:
+        _update_business(user, last_payment_date=fields['last_payment_date'])
+
+
+@handles('invoice.paid', superseded=handle_superseded_invoice_paid)
+def handle_invoice_paid(invoice):
+    user = _user_for_customer(invoice.get('customer'))
+    _set_subscription(user, True)
+    _update_business(user, is_paid_member=True, **_payment_dates(invoice, _business(user)))
+
+
+def _is_stale(event):
+    """
+    True si ya se aplicó un evento de estado del mismo cliente creado después que este
+    (p. ej. Stripe entregó tarde un customer.subscription.updated o un invoice.paid viejo):
+    aplicarlo regresaría la membresía. El último aplicado sale del índice
+    (customer_id, stripe_created_at).
+    """
+    if event.type not in STATE_EVENT_TYPES and event.type not in SUPERSEDED_HANDLERS:
+        return False
+    if not event.customer_id:
+        return False
+    return StripeEvent.objects.filter(
+        customer_id=event.customer_id,
+        type__in=STATE_EVENT_TYPES,
+        status=StripeEvent.STATUS_PROCESSED,
+        stripe_created_at__gt=event.stripe_created_at,
+    ).exists()
+
+
+def apply_event(event):
+    """
+    Aplica un evento. Devuelve False si falló y se reintentará (los siguientes
+    eventos del mismo cliente deben esperar).
+    """
+    handler = HANDLERS.get(event.type)
+    if handler is None:
+        event.status = StripeEvent.STATUS_IGNORED
+        event.processed_at = timezone.now()
+        event.save(update_fields=['status', 'processed_at'])
+        return True
+
+    if _is_stale(event):
+        logger.info(f"Evento de Stripe {event.event_id} ({event.type}) llegó después de uno más nuevo de {event.customer_id}; no cambia la suscripción.")
+        handler = SUPERSEDED_HANDLERS.get(event.type)
+        if handler is None:
+            event.status = StripeEvent.STATUS_PROCESSED
+            event.processed_at = timezone.now()
+            event.last_error = ''
+            event.save(update_fields=['status', 'processed_at', 'last_error'])
+            return True
+
+    try:
+        with transaction.atomic():
+            handler(event.payload['data']['object'])
+            event.status = StripeEvent.STATUS_PROCESSED
+            event.processed_at = timezone.now()
+            event.last_error = ''
+            event.save(update_fields=['status', 'processed_at', 'last_error'])
+        return True
+    except Exception as e:
+        event.status = StripeEvent.STATUS_PENDING
+        event.attempts += 1
+        event.last_error = str(e)[:1000] or e.__class__.__name__
+        if event.attempts >= settings.STRIPE_EVENT_MAX_ATTEMPTS:
+            event.status = StripeEvent.STATUS_FAILED
+            logger.error(f"Evento de Stripe {event.event_id} ({event.type}) descartado tras {event.attempts} intentos: {e}")
+        else:
+            delay = backoff_seconds(event.attempts, settings.STRIPE_EVENT_BASE_BACKOFF, settings.STRIPE_EVENT_MAX_BACKOFF)
+            event.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+            logger.warning(f"Evento de Stripe {event.event_id} ({event.type}) falló (intento {event.attempts}); se reintenta en {delay:.0f} s: {e}")
+        event.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+        return event.status == StripeEvent.STATUS_FAILED
+
+
+def process_pending(batch_size=100):
+    """
+    Aplica un lote de eventos pendientes y vencidos. Pensado para un solo proceso
+    (el orden por cliente no se garantiza con varios workers a la vez).
+    Devuelve un Counter con los estados resultantes.
+    """
+    now = timezone.now()
+    pending = StripeEvent.objects.filter(status=StripeEvent.STATUS_PENDING)
+    # Clientes con un evento esperando reintento: sus eventos posteriores esperan también.
+    waiting_customers = (
+        pending.filter(next_attempt_at__gt=now).exclude(customer_id='').values('customer_id')
+    )
+    events = list(
+        pending.filter(next_attempt_at__lte=now)
+        .exclude(customer_id__in=waiting_customers)
+        .order_by('stripe_created_at', 'id')[:batch_size]
+    )
+
+    result = Counter()
+    blocked = set()
+    for event in events:
+        customer = event.customer_id
+        if customer in blocked:
+            result['deferred'] += 1
+            continue
+        if not apply_event(event) and customer:
+            blocked.add(customer)
+        result[event.status] += 1
+    return result
@@ -1,3 +1,557 @@
-from django.test import TestCase
+# usuarios/tests.py
+import asyncio
+import contextlib
+import io
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from cachetools import TTLCache
+
+from comerciantes.models import Business
+from mercadolocalmx_backend.authentication import FirebaseAuthentication
+
+from . import cache as user_cache
+from . import memberships, outbox, stripe_customers, stripe_events
+from .firebase_client import FakeFirebaseClient
+from .models import ClaimSyncTask, CustomUser, MembershipSweep, StripeEvent, enqueue_claim_sync
+
+
+@override_settings(CLAIM_SYNC_BASE_BACKOFF=5, CLAIM_SYNC_MAX_BACKOFF=3600)
+class ClaimSyncOutboxTests(TestCase):
+    """Outbox de custom claims (usuarios/outbox.py) contra FakeFirebaseClient."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='dueno', uid='uid-dueno', email='dueno@example.mx')
+
+    def _make_owner(self, is_owner=True):
+        self.user.is_business_owner = is_owner
+        self.user.save()
+
+    def _make_due(self):
+        ClaimSyncTask.objects.update(next_attempt_at=timezone.now())
+
+    def test_owner_change_enqueues_task(self):
+        self._make_owner()
+
+        task = ClaimSyncTask.objects.get(uid='uid-dueno')
+        self.assertTrue(task.is_business_owner)
+        self.assertEqual(task.attempts, 0)
+        self.assertLessEqual(task.next_attempt_at, timezone.now())
+
+    def test_save_without_owner_change_enqueues_nothing(self):
+        self.user.first_name = 'Ana'
+        self.user.save()
+
+        self.assertFalse(ClaimSyncTask.objects.exists())
+
+    def test_repeated_changes_keep_one_task_with_latest_value(self):
+        self._make_owner(True)
+        self._make_owner(False)
+
+        task = ClaimSyncTask.objects.get()
+        self.assertFalse(task.is_business_owner)
+        self.assertEqual(task.version, 2)
+
+    def test_enqueue_resets_a_failing_task(self):
+        self._make_owner()
+        ClaimSyncTask.objects.update(attempts=4, last_error='timeout', next_attempt_at=timezone.now() + timedelta(hours=1))
+
+        enqueue_claim_sync('uid-dueno', True)
+
+        task = ClaimSyncTask.objects.get()
+        self.assertEqual((task.attempts, task.last_error), (0, ''))
+        self.assertLessEqual(task.next_attempt_at, timezone.now())
+
+    def test_process_batch_syncs_claims_and_removes_task(self):
+        self._make_owner()
+        client = FakeFirebaseClient()
+        client.claims['uid-dueno'] = {'role': 'x'}
+
+        result = outbox.process_batch(client)
+
+        self.assertEqual((result.synced, result.failed, result.missing), (1, 0, 0))
+        self.assertEqual(client.claims['uid-dueno'], {'role': 'x', 'isBusinessOwner': True})
+        self.assertEqual(client.revoked, ['uid-dueno'])
+        self.assertFalse(ClaimSyncTask.objects.exists())
+
+    def test_batch_reads_claims_with_one_call(self):
+        for i in range(3):
+            enqueue_claim_sync(f'uid-{i}', True)
+        client = FakeFirebaseClient()
+
+        outbox.process_batch(client)
+
+        self.assertEqual([name for name, _ in client.calls].count('get_users'), 1)
+        self.assertFalse(ClaimSyncTask.objects.exists())
+
+    def test_failure_is_retried_with_backoff(self):
+        self._make_owner()
+        client = FakeFirebaseClient(failures={'uid-dueno': 1})
+
+        before = timezone.now()
+        result = outbox.process_batch(client)
+
+        self.assertEqual(result.failed, 1)
+        task = ClaimSyncTask.objects.get()
+        self.assertEqual(task.attempts, 1)
+        self.assertIn('Fallo simulado', task.last_error)
+        # Primer reintento: entre la mitad y el total de CLAIM_SYNC_BASE_BACKOFF (jitter).
+        self.assertGreaterEqual(task.next_attempt_at, before + timedelta(seconds=2.5))
+        self.assertLessEqual(task.next_attempt_at, timezone.now() + timedelta(seconds=5))
+
+        # No se reintenta antes de tiempo.
+        self.assertEqual(outbox.process_batch(client).total, 0)
+
+        self._make_due()
+        result = outbox.process_batch(client)
+        self.assertEqual(result.synced, 1)
+        self.assertTrue(client.claims['uid-dueno']['isBusinessOwner'])
+        self.assertFalse(ClaimSyncTask.objects.exists())
+
+    def test_firebase_outage_fails_whole_batch(self):
+        self._make_owner()
+        client = FakeFirebaseClient()
+
+        with mock.patch.object(client, 'get_custom_claims', side_effect=ConnectionError("sin red")):
+            result = outbox.process_batch(client)
+
+        self.assertEqual(result.failed, 1)
+        self.assertEqual(ClaimSyncTask.objects.get().attempts, 1)
+
+    def test_missing_firebase_user_completes_task(self):
+        self._make_owner()
+        client = FakeFirebaseClient(missing_uids=['uid-dueno'])
+
+        result = outbox.process_batch(client)
+
+        self.assertEqual(result.missing, 1)
+        self.assertFalse(ClaimSyncTask.objects.exists())
+        self.assertNotIn('uid-dueno', client.claims)
+
+    def test_change_during_processing_keeps_task(self):
+        self._make_owner(True)
+        client = FakeFirebaseClient()
+        set_claims = client.set_custom_user_claims
+
+        def set_and_change(uid, claims):
+            set_claims(uid, claims)
+            # El usuario deja de ser dueño mientras el worker sincroniza el valor anterior.
+            enqueue_claim_sync(uid, False)
+
+        client.set_custom_user_claims = set_and_change
+        outbox.process_batch(client)
+
+        task = ClaimSyncTask.objects.get()
+        self.assertFalse(task.is_business_owner)
+        self.assertEqual(task.version, 2)
+
+    def test_backoff_grows_and_is_capped(self):
+        for attempts, ceiling in ((1, 5), (2, 10), (4, 40), (20, 3600)):
+            delay = outbox.backoff_seconds(attempts, 5, 3600)
+            self.assertGreaterEqual(delay, ceiling / 2)
+            self.assertLessEqual(delay, ceiling)
+
+    @override_settings(DEBUG=False)
+    def test_fake_client_is_refused_outside_debug(self):
+        self._make_owner()
+
+        with self.assertRaises(CommandError):
+            call_command('sync_firebase_claims', '--fake', '--once')
+        self.assertTrue(ClaimSyncTask.objects.exists())
+
+
+@override_settings(MEMBERSHIP_EXPIRY_GRACE_HOURS=24)
+class MembershipSweepTests(TestCase):
+    """Barrido de membresías vencidas (usuarios/memberships.py)."""
+
+    def setUp(self):
+        now = timezone.now()
+        self.paid = [self._business(f'pagado{n}', now - timedelta(days=n + 2), paid=True) for n in range(5)]
+        # Ya no es de pago pero el dueño conserva el acceso (se perdió el webhook).
+        self.lapsed = [self._business(f'vencido{n}', now - timedelta(days=3), paid=False) for n in range(2)]
+        self.in_grace = self._business('gracia', now - timedelta(hours=1), paid=True)
+        self.renewed = self._business('renovado', now + timedelta(days=30), paid=True)
+        ClaimSyncTask.objects.all().delete()
+
+    def _business(self, name, expires_at, paid):
+        user = CustomUser.objects.create(username=name, uid=f'uid-{name}', is_business_owner=True,
+                                         has_active_subscription=True)
+        return Business.objects.create(
+            user=user, name=name, what_they_sell='Pan', hours='9-18', municipality='LEON',
+            street_address='Madero 10', location_type='MERCADO', business_type='PANADERIAS',
+            is_paid_member=paid, membership_expires_at=expires_at,
+        )
+
+    def test_sweep_expires_every_batch(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            sweep = memberships.expire_memberships(batch_size=2)
+
+        expired = self.paid + self.lapsed
+        for business in expired:
+            business.refresh_from_db()
+            business.user.refresh_from_db()
+            self.assertFalse(business.is_paid_member)
+            self.assertFalse(business.user.is_business_owner)
+            self.assertFalse(business.user.has_active_subscription)
+        for business in (self.in_grace, self.renewed):
+            business.refresh_from_db()
+            business.user.refresh_from_db()
+            self.assertTrue(business.is_paid_member)
+            self.assertTrue(business.user.is_business_owner)
+
+        tasks = ClaimSyncTask.objects.all()
+        self.assertEqual({task.uid for task in tasks}, {business.user.uid for business in expired})
+        self.assertFalse(any(task.is_business_owner for task in tasks))
+
+        # 5 negocios de pago en lotes de 2 y luego los 2 dueños con la membresía ya vencida.
+        self.assertEqual(MembershipSweep.objects.get(), sweep)
+        self.assertEqual((sweep.businesses_expired, sweep.owners_revoked, sweep.batches), (5, 7, 4))
+        self.assertLess(sweep.cutoff, sweep.started_at)
+
+    def test_second_sweep_finds_nothing(self):
+        memberships.expire_memberships(batch_size=2)
+        ClaimSyncTask.objects.all().delete()
+
+        sweep = memberships.expire_memberships(batch_size=2)
+
+        self.assertEqual((sweep.businesses_expired, sweep.owners_revoked, sweep.batches), (0, 0, 0))
+        self.assertFalse(ClaimSyncTask.objects.exists())
+        self.assertEqual(MembershipSweep.objects.count(), 2)
+
+
+@override_settings(STRIPE_EVENT_MAX_ATTEMPTS=3, STRIPE_EVENT_BASE_BACKOFF=10, STRIPE_EVENT_MAX_BACKOFF=60)
+class StripeEventWorkerTests(TestCase):
+    """Worker de eventos de Stripe (usuarios/stripe_events.py): orden por cliente, duplicados y reintentos."""
+
+    def setUp(self):
+        self.base = int(timezone.now().timestamp()) - 3600
+        self.ana = self._owner('ana', 'cus_ana')
+
+    def _owner(self, name, customer_id):
+        user = CustomUser.objects.create(username=name, uid=f'uid-{name}', email=f'{name}@example.mx',
+                                         stripe_customer_id=customer_id)
+        Business.objects.create(
+            user=user, name=name, what_they_sell='Pan', hours='9-18', municipality='LEON',
+            street_address='Madero 10', location_type='MERCADO', business_type='PANADERIAS',
+        )
+        return user
+
+    def _record(self, event_id, event_type, seconds, customer, **fields):
+        stripe_events.record_event({
+            'id': event_id,
+            'type': event_type,
+            'created': self.base + seconds,
+            'data': {'object': {'object': 'subscription', 'customer': customer, **fields}},
+        })
+
+    def _is_owner(self, user):
+        user.refresh_from_db()
+        user.business_profile.refresh_from_db()
+        return user.is_business_owner, user.business_profile.is_paid_member
+
+    def _make_due(self):
+        StripeEvent.objects.update(next_attempt_at=timezone.now())
+
+    def test_events_are_applied_in_stripe_order(self):
+        bruno = self._owner('bruno', 'cus_bruno')
+        # Llegan al revés de como Stripe los creó.
+        self._record('evt_3', 'customer.subscription.deleted', 30, 'cus_ana')
+        self._record('evt_4', 'customer.subscription.updated', 40, 'cus_bruno', status='active')
+        self._record('evt_1', 'customer.subscription.updated', 10, 'cus_ana', status='active')
+        self._record('evt_2', 'customer.subscription.deleted', 20, 'cus_bruno')
+
+        result = stripe_events.process_pending()
+
+        self.assertEqual(result, {StripeEvent.STATUS_PROCESSED: 4})
+        self.assertEqual(self._is_owner(self.ana), (False, False))
+        self.assertEqual(self._is_owner(bruno), (True, True))
+
+    def test_duplicate_deliveries_are_applied_once(self):
+        for _ in range(2):
+            self._record('evt_1', 'customer.subscription.updated', 10, 'cus_ana', status='active')
+        self.assertEqual(StripeEvent.objects.count(), 1)
+
+        self.assertEqual(stripe_events.process_pending(), {StripeEvent.STATUS_PROCESSED: 1})
+        # Stripe reintenta la entrega después de que ya se aplicó.
+        self._record('evt_1', 'customer.subscription.updated', 10, 'cus_ana', status='active')
+
+        self.assertEqual(stripe_events.process_pending(), {})
+        event = StripeEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), (StripeEvent.STATUS_PROCESSED, 0))
+
+    def test_failed_event_holds_back_later_events_of_its_customer(self):
+        # cus_nuevo aún no tiene usuario: su primer evento falla y se reintenta.
+        self._record('evt_1', 'checkout.session.completed', 10, 'cus_nuevo')
+        self._record('evt_2', 'customer.subscription.updated', 20, 'cus_ana', status='active')
+        self._record('evt_3', 'customer.subscription.deleted', 30, 'cus_nuevo')
+
+        result = stripe_events.process_pending()
+
+        self.assertEqual(result, {StripeEvent.STATUS_PENDING: 1, 'deferred': 1, StripeEvent.STATUS_PROCESSED: 1})
+        failed = StripeEvent.objects.get(event_id='evt_1')
+        self.assertEqual(failed.attempts, 1)
+        self.assertGreater(failed.next_attempt_at, timezone.now())
+        self.assertIn('does not exist', failed.last_error)
+        self.assertEqual(self._is_owner(self.ana), (True, True))
+        # Mientras espera el reintento, los eventos posteriores del cliente no se tocan.
+        self.assertEqual(stripe_events.process_pending(), {})
+        self.assertEqual(StripeEvent.objects.get(event_id='evt_3').status, StripeEvent.STATUS_PENDING)
+
+        nuevo = self._owner('nuevo', 'cus_nuevo')
+        self._make_due()
+        result = stripe_events.process_pending()
+
+        self.assertEqual(result, {StripeEvent.STATUS_PROCESSED: 2})
+        self.assertEqual(self._is_owner(nuevo), (False, False))
+
+    def test_discarded_event_releases_its_customer(self):
+        self._record('evt_1', 'checkout.session.completed', 10, 'cus_nuevo')
+        self._record('evt_2', 'customer.subscription.updated', 20, 'cus_nuevo', status='active')
+
+        for _ in range(3):
+            stripe_events.process_pending()
+            self._make_due()
+
+        failed = StripeEvent.objects.get(event_id='evt_1')
+        self.assertEqual((failed.status, failed.attempts), (StripeEvent.STATUS_FAILED, 3))
+        # El siguiente evento ya no espera al descartado y empieza sus propios intentos.
+        self.assertEqual(StripeEvent.objects.get(event_id='evt_2').attempts, 1)
+
+    def test_late_older_subscription_event_does_not_regress_membership(self):
+        self._record('evt_2', 'customer.subscription.deleted', 20, 'cus_ana')
+        stripe_events.process_pending()
+        # Stripe entrega tarde una actualización creada antes de la cancelación.
+        self._record('evt_1', 'customer.subscription.updated', 10, 'cus_ana', status='active')
+
+        self.assertEqual(stripe_events.process_pending(), {StripeEvent.STATUS_PROCESSED: 1})
+        self.assertEqual(self._is_owner(self.ana), (False, False))
+        self.assertEqual(StripeEvent.objects.get(event_id='evt_1').status, StripeEvent.STATUS_PROCESSED)
+
+        # Un evento más nuevo sí se aplica.
+        self._record('evt_3', 'customer.subscription.updated', 30, 'cus_ana', status='active')
+        stripe_events.process_pending()
+        self.assertEqual(self._is_owner(self.ana), (True, True))
+
+    def test_late_or_replayed_invoice_does_not_reactivate_a_canceled_subscription(self):
+        self._record('evt_1', 'customer.subscription.updated', 10, 'cus_ana', status='active')
+        self._record('evt_3', 'customer.subscription.deleted', 30, 'cus_ana', ended_at=self.base + 30)
+        stripe_events.process_pending()
+        # Stripe entrega tarde el pago de una factura creada antes de la cancelación.
+        paid_at = self.base + 20
+        self._record('evt_2', 'invoice.paid', 20, 'cus_ana', status_transitions={'paid_at': paid_at},
+                     lines={'data': [{'period': {'end': paid_at + 30 * 86400}}]})
+
+        self.assertEqual(stripe_events.process_pending(), {StripeEvent.STATUS_PROCESSED: 1})
+        self.assertEqual(self._is_owner(self.ana), (False, False))
+        business = self.ana.business_profile
+        # Se registra el pago, pero el periodo sigue siendo el de la cancelación.
+        self.assertEqual(business.last_payment_date, timezone.localdate(datetime.fromtimestamp(paid_at, tz=dt_timezone.utc)))
+        self.assertEqual(business.membership_expires_at, datetime.fromtimestamp(self.base + 30, tz=dt_timezone.utc))
+
+        call_command('replay_stripe_events', '--type', 'invoice.paid', '--process', stdout=io.StringIO())
+
+        self.assertEqual(self._is_owner(self.ana), (False, False))
+        self.ana.refresh_from_db()
+        self.assertFalse(self.ana.has_active_subscription)
+
+    def test_invoice_paid_activates_when_no_newer_state_was_applied(self):
+        self._record('evt_1', 'customer.subscription.deleted', 10, 'cus_ana')
+        self._record('evt_2', 'invoice.paid', 20, 'cus_ana', status_transitions={'paid_at': self.base + 20})
+
+        stripe_events.process_pending()
+
+        self.assertEqual(self._is_owner(self.ana), (True, True))
+
+    def test_unknown_event_types_are_ignored(self):
+        self._record('evt_1', 'customer.created', 10, 'cus_ana')
+
+        self.assertEqual(stripe_events.process_pending(), {StripeEvent.STATUS_IGNORED: 1})
+
+
+@override_settings(STRIPE_CUSTOMER_CACHE_TTL=60)
+class StripeCustomerTests(TestCase):
+    """Clientes de Stripe de usuarios/stripe_customers.py contra un SDK simulado."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = CustomUser.objects.create(username='ana', uid='uid-ana', email='ana@example.mx')
+        self.stripe = mock.MagicMock()
+        self.stripe.error.InvalidRequestError = type('InvalidRequestError', (Exception,), {})
+        self.stripe.Customer.create.return_value = mock.Mock(id='cus_nuevo')
+        self.stripe.Customer.retrieve.return_value = mock.Mock(deleted=False)
+        self.enterContext(mock.patch('mercadolocalmx_backend.stripe_client.get', return_value=self.stripe))
+
+    def _stored(self):
+        return CustomUser.objects.values_list('stripe_customer_id', flat=True).get(pk=self.user.pk)
+
+    def test_legacy_empty_id_is_replaced_by_the_created_customer(self):
+        CustomUser.objects.filter(pk=self.user.pk).update(stripe_customer_id='')
+        self.user.stripe_customer_id = ''
+
+        self.assertEqual(stripe_customers.ensure_customer(self.user), 'cus_nuevo')
+        self.assertEqual(self._stored(), 'cus_nuevo')
+
+    def test_creation_is_idempotent_and_keeps_an_id_stored_meanwhile(self):
+        # Otro proceso (el aprovisionamiento en segundo plano) guardó el cliente primero.
+        CustomUser.objects.filter(pk=self.user.pk).update(stripe_customer_id='cus_otro')
+
+        self.assertEqual(stripe_customers.ensure_customer(self.user), 'cus_otro')
+        self.assertEqual(self._stored(), 'cus_otro')
+        self.assertEqual(self.stripe.Customer.create.call_args.kwargs['idempotency_key'], f'customer-{self.user.pk}')
+
+    def test_valid_customer_is_checked_once(self):
+        self.user.stripe_customer_id = 'cus_ana'
+        self.user.save()
+
+        for _ in range(2):
+            self.assertEqual(stripe_customers.ensure_customer(self.user), 'cus_ana')
+
+        self.stripe.Customer.retrieve.assert_called_once_with('cus_ana')
+        self.stripe.Customer.create.assert_not_called()
+
+    def test_deleted_customer_is_replaced(self):
+        self.user.stripe_customer_id = 'cus_borrado'
+        self.user.save()
+        self.stripe.Customer.retrieve.return_value = mock.Mock(deleted=True)
+
+        self.assertEqual(stripe_customers.ensure_customer(self.user), 'cus_nuevo')
+        self.assertEqual(self._stored(), 'cus_nuevo')
+        self.assertEqual(self.stripe.Customer.create.call_args.kwargs['idempotency_key'],
+                         f'customer-{self.user.pk}-replaces-cus_borrado')
+        # El cliente nuevo ya se sabe válido.
+        stripe_customers.ensure_customer(self.user)
+        self.stripe.Customer.retrieve.assert_called_once()
+
+
+@override_settings(USER_CACHE_SHARED_ALIAS='default')
+class UserCacheTests(TestCase):
+    """Caché de usuarios por uid (usuarios/cache.py) con el nivel compartido en la caché default."""
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.addCleanup(cache.clear)
+        self.addCleanup(user_cache.clear)
+        self.user = CustomUser.objects.create(username='ana', uid='uid-ana', email='ana@example.mx')
+        self.token = {'uid': 'uid-ana', 'email': 'ana@example.mx'}
+
+    def authenticate(self):
+        return FirebaseAuthentication()._user_for_token(self.token)
+
+    def test_cached_user_is_served_without_queries(self):
+        self.authenticate()
+
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+        self.assertEqual(user.pk, self.user.pk)
+        # Cada petición recibe su propia copia.
+        user.is_staff = True
+        self.assertFalse(user_cache.get_cached_user('uid-ana').is_staff)
+
+    def test_save_invalidates_on_commit(self):
+        self.authenticate()
+        self.user.is_business_owner = True
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+            # Hasta que se confirma la transacción se sigue sirviendo la fila confirmada.
+            self.assertFalse(user_cache.get_cached_user('uid-ana').is_business_owner)
+
+        self.assertIsNone(user_cache.get_cached_user('uid-ana'))
+        self.assertTrue(self.authenticate().is_business_owner)
+
+    def test_rolled_back_save_keeps_the_cached_user(self):
+        self.authenticate()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.user.is_staff = True
+                self.user.save()
+                raise RuntimeError
+
+        self.assertEqual(callbacks, [])
+        self.assertFalse(user_cache.get_cached_user('uid-ana').is_staff)
+
+    def test_invalidation_reaches_the_memory_of_other_processes(self):
+        self.authenticate()
+        # Otro proceso, con su propia memoria, guarda el usuario.
+        with mock.patch.object(user_cache, '_local_cache', TTLCache(maxsize=10, ttl=60)):
+            CustomUser.objects.filter(pk=self.user.pk).update(is_staff=True)
+            user_cache.invalidate_user('uid-ana')
+
+        self.assertIsNone(user_cache.get_cached_user('uid-ana'))
+        self.assertTrue(self.authenticate().is_staff)
+
+    def _invalidate_during_fetch(self, other_process):
+        """Autentica mientras otra petición revoca al usuario entre la lectura de la fila y cache_user."""
+        fetch = FirebaseAuthentication._get_or_create_user
+
+        def fetch_then_revoke(authentication, *args):
+            user = fetch(authentication, *args)
+            with other_process:
+                CustomUser.objects.filter(pk=self.user.pk).update(is_business_owner=False)
+                user_cache.invalidate_user('uid-ana')
+            return user
+
+        with mock.patch.object(FirebaseAuthentication, '_get_or_create_user', fetch_then_revoke):
+            self.assertTrue(self.authenticate().is_business_owner)
+
+    def test_invalidation_during_the_fetch_does_not_cache_the_old_row(self):
+        CustomUser.objects.filter(pk=self.user.pk).update(is_business_owner=True)
+
+        self._invalidate_during_fetch(mock.patch.object(user_cache, '_local_cache', TTLCache(maxsize=10, ttl=60)))
+
+        self.assertIsNone(user_cache.get_cached_user('uid-ana'))
+        # Tampoco la ve otro proceso a través del nivel compartido.
+        with mock.patch.object(user_cache, '_local_cache', TTLCache(maxsize=10, ttl=60)):
+            self.assertIsNone(user_cache.get_cached_user('uid-ana'))
+        self.assertFalse(self.authenticate().is_business_owner)
+
+    @override_settings(USER_CACHE_SHARED_ALIAS='')
+    def test_invalidation_during_the_fetch_without_shared_tier(self):
+        CustomUser.objects.filter(pk=self.user.pk).update(is_business_owner=True)
+
+        self._invalidate_during_fetch(contextlib.nullcontext())
+
+        self.assertIsNone(user_cache.get_cached_user('uid-ana'))
+        self.assertFalse(self.authenticate().is_business_owner)
+
+    def test_async_authentication_reads_the_shared_tier_off_the_event_loop(self):
+        self.authenticate()
+        request = RequestFactory().get('/api/offers/', headers={'Authorization': 'Bearer token'})
+        backend_class = type(caches['default'])
+        shared_get = backend_class.get
+        on_loop = []
+
+        def spy(backend, *args, **kwargs):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(args[0])
+            except RuntimeError:
+                pass
+            return shared_get(backend, *args, **kwargs)
+
+        with mock.patch('mercadolocalmx_backend.authentication.get_cached_token', return_value=self.token), \
+                mock.patch.object(backend_class, 'get', autospec=True, side_effect=spy) as get:
+            user, _ = async_to_sync(FirebaseAuthentication().aauthenticate)(request)
+
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertTrue(get.called)
+        self.assertEqual(on_loop, [])
+
+    @override_settings(USER_CACHE_SHARED_ALIAS='')
+    def test_without_shared_tier_the_process_memory_is_used(self):
+        self.authenticate()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate().pk, self.user.pk)
+        user_cache.invalidate_user('uid-ana')
+        self.assertIsNone(user_cache.get_cached_user('uid-ana'))
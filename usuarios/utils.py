@@ -1,30 +1,45 @@
 # usuarios/utils.py
-import firebase_admin
-from firebase_admin import auth
 import logging
 
+from mercadolocalmx_backend.firebase_tokens import invalidate_uid
+
 logger = logging.getLogger(__name__)
 
-def update_firebase_custom_claim(user_uid, is_owner_status):
+def update_firebase_custom_claim(user_uid, is_owner_status, client=None, current_claims=None):
     """
     Actualiza el custom claim 'isBusinessOwner' en Firebase para un usuario dado.
     Esto invalidará el token actual del usuario, forzando un refresco
     para obtener el nuevo claim.
+
+    Hace llamadas de red: se ejecuta desde el worker del outbox (usuarios/outbox.py),
+    que pasa el cliente y los claims ya leídos en lote. Los errores se registran y se
+    vuelven a lanzar para que el worker reintente.
     """
+    if client is None:
+        from .firebase_client import get_client
+        client = get_client()
+
     try:
         # Obtén los claims actuales del usuario
-        user = auth.get_user(user_uid)
-        current_claims = user.custom_claims if user.custom_claims else {}
+        if current_claims is None:
+            found = client.get_custom_claims([user_uid])
+            if user_uid not in found:
+                raise LookupError(f"El usuario {user_uid} no existe en Firebase.")
+            current_claims = found[user_uid]
+        claims = dict(current_claims)
 
         # Actualiza el claim 'isBusinessOwner'
-        current_claims['isBusinessOwner'] = is_owner_status
+        claims['isBusinessOwner'] = is_owner_status
 
         # Establece los nuevos claims para el usuario en Firebase
-        auth.set_custom_user_claims(user_uid, current_claims)
+        client.set_custom_user_claims(user_uid, claims)
 
-        # Opcional: Revocar tokens para forzar al frontend a obtener uno nuevo más rápido
-        auth.revoke_refresh_tokens(user_uid) 
+        # Revocar tokens para forzar al frontend a obtener uno nuevo más rápido
+        client.revoke_refresh_tokens(user_uid)
+        # Fuerza a que la siguiente petición de este uid vuelva a comprobar la revocación
+        invalidate_uid(user_uid)
         logger.info(f"Custom claim 'isBusinessOwner' para {user_uid} actualizado a {is_owner_status}.")
 
     except Exception as e:
         logger.error(f"Error al actualizar custom claim para {user_uid}: {e}")
+        raise